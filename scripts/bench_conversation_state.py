@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Compare helper conversation-state payloads: legacy `v: 2` dicts vs the v3 compact codec.
+
+Usage:
+  python scripts/bench_conversation_state.py
+  python scripts/bench_conversation_state.py --turns 8 24 48 --content-chars 400 --iterations 2000
+
+For each history length this reports the bytes the cache stores (pickled the
+way Django's cache serializers pickle values) and the per-call save/load time
+through `memory.save_state`/`memory.load_state` on an in-memory cache (best of
+five runs). `v3` uses the shipped compression threshold; `v3 raw` never
+compresses, which isolates the framing cost from zlib.
+"""
+from __future__ import annotations
+
+import argparse
+import pickle
+import random
+import sys
+import timeit
+from pathlib import Path
+
+HELPER_SERVICE_DIR = Path(__file__).resolve().parents[1] / "services" / "homework_helper"
+sys.path.insert(0, str(HELPER_SERVICE_DIR))
+
+from django.conf import settings  # noqa: E402
+
+if not settings.configured:
+    settings.configure(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}})
+
+from django.core.cache.backends.locmem import LocMemCache  # noqa: E402
+from tutor.engine import memory, state_codec  # noqa: E402
+
+_WORDS = (
+    "sprite loop variable condition broadcast costume stage motor sensor forever repeat "
+    "check print counter value event block script wire pin jumper input output because "
+    "try compare change step next why does my the a when it is not"
+).split()
+_INTENTS = ("debug", "concept", "strategy", "reflection", "status", "general")
+
+
+def _history(turn_count: int, content_chars: int, rng: random.Random) -> list[dict[str, str]]:
+    turns = []
+    for idx in range(turn_count):
+        words: list[str] = []
+        while sum(len(word) + 1 for word in words) < content_chars:
+            words.append(rng.choice(_WORDS))
+        turn = {"role": "student" if idx % 2 == 0 else "assistant", "content": " ".join(words)}
+        if idx % 2 == 0:
+            turn["intent"] = rng.choice(_INTENTS)
+        turns.append(turn)
+    return turns
+
+
+def _per_call_us(fn, iterations: int) -> float:
+    return min(timeit.repeat(fn, number=iterations, repeat=5)) / iterations * 1_000_000
+
+
+def _measure(turns: list[dict[str, str]], *, compact: bool, iterations: int) -> tuple[int, float, float]:
+    cache = LocMemCache("bench-conversation-state", {})
+    summary = "Earlier: the student built a two-sprite chase game and asked about broadcasts."
+
+    def save() -> None:
+        memory.save_state(
+            cache_backend=cache, key="bench", turns=turns, summary=summary, ttl_seconds=600, compact=compact
+        )
+
+    def load() -> None:
+        memory.load_state(cache_backend=cache, key="bench", max_messages=len(turns))
+
+    save()
+    stored = len(pickle.dumps(cache.get("bench"), pickle.HIGHEST_PROTOCOL))
+    return stored, _per_call_us(save, iterations), _per_call_us(load, iterations)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, nargs="+", default=[8, 24, 48])
+    parser.add_argument("--content-chars", type=int, default=320)
+    parser.add_argument("--iterations", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    shipped_threshold = state_codec.COMPRESS_MIN_BYTES
+    print(f"{'turns':>6} {'format':>8} {'bytes':>8} {'save_us':>9} {'load_us':>9}")
+    for turn_count in args.turns:
+        turns = _history(turn_count, args.content_chars, random.Random(args.seed))
+        rows = [("v2 dict", _measure(turns, compact=False, iterations=args.iterations))]
+        rows.append(("v3", _measure(turns, compact=True, iterations=args.iterations)))
+        state_codec.COMPRESS_MIN_BYTES = sys.maxsize
+        try:
+            rows.append(("v3 raw", _measure(turns, compact=True, iterations=args.iterations)))
+        finally:
+            state_codec.COMPRESS_MIN_BYTES = shipped_threshold
+        for label, (stored, save_us, load_us) in rows:
+            print(f"{turn_count:>6} {label:>8} {stored:>8} {save_us:>9.1f} {load_us:>9.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
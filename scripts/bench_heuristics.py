@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Time helper keyword checks: per-keyword substring scans vs the compiled trie matcher.
+
+Usage:
+  python scripts/bench_heuristics.py
+  python scripts/bench_heuristics.py --keywords 20 120 400 --iterations 5000
+
+`naive` is `any(keyword in message.lower() for keyword in keywords)`, as the
+heuristics used to check keyword lists. `compiled` is
+`heuristics.phrase_matcher(keywords).search(message)`. Keyword sets are random
+lowercase words (seeded); times are per check, best of five runs. `same`
+confirms both agree on every sample message.
+"""
+from __future__ import annotations
+
+import argparse
+import random
+import string
+import sys
+import timeit
+from pathlib import Path
+
+HELPER_SERVICE_DIR = Path(__file__).resolve().parents[1] / "services" / "homework_helper"
+sys.path.insert(0, str(HELPER_SERVICE_DIR))
+
+from tutor.engine import heuristics  # noqa: E402
+
+_MESSAGES = (
+    "My sprite keeps moving when I press space but the broadcast never changes the costume.",
+    "Why does my forever loop stop after the first repeat? It is not working at all.",
+    "The jump button on the Piper controller does nothing on the Mars step.",
+)
+
+
+def _keywords(count: int, rng: random.Random) -> tuple[str, ...]:
+    words: set[str] = set()
+    while len(words) < count:
+        words.add("".join(rng.choices(string.ascii_lowercase, k=rng.randint(4, 10))))
+    return tuple(sorted(words))
+
+
+def _per_check_us(fn, iterations: int) -> float:
+    return min(timeit.repeat(fn, number=iterations, repeat=5)) / iterations / len(_MESSAGES) * 1_000_000
+
+
+def _measure(keywords: tuple[str, ...], iterations: int) -> tuple[float, float, bool]:
+    matcher = heuristics.phrase_matcher(keywords)
+
+    def naive() -> None:
+        for message in _MESSAGES:
+            lowered = message.lower()
+            any(keyword in lowered for keyword in keywords)
+
+    def compiled() -> None:
+        for message in _MESSAGES:
+            matcher.search(message)
+
+    same = all(
+        matcher.search(message) == any(keyword in message.lower() for keyword in keywords) for message in _MESSAGES
+    )
+    return _per_check_us(naive, iterations), _per_check_us(compiled, iterations), same
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--keywords", type=int, nargs="+", default=[20, 120, 400])
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=11)
+    args = parser.parse_args()
+
+    print(f"{'keywords':>8} {'naive_us':>9} {'compiled_us':>12} {'same':>5}")
+    for count in args.keywords:
+        naive_us, compiled_us, same = _measure(_keywords(count, random.Random(args.seed)), args.iterations)
+        print(f"{count:>8} {naive_us:>9.2f} {compiled_us:>12.2f} {'yes' if same else 'NO':>5}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
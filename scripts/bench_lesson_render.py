@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Time lesson markdown rendering: the old per-call pipeline vs the prebuilt sanitizer.
+
+Usage:
+  python scripts/bench_lesson_render.py
+  python scripts/bench_lesson_render.py --course-dir services/classhub/content/courses/swarm_aesthetics --iterations 50
+
+`before` rebuilds the Markdown converter and bleach cleaner for every call and
+then re-scans the output with the image/media regexes, as
+`render_markdown_to_safe_html` used to. `after` is the current
+`render_markdown_to_safe_html`. Both render every lesson file (front matter
+stripped) in the course directory; times are per lesson, best of five runs.
+Pass --images/--asset-base-url to exercise the image allowlist and media URL rewrite.
+"""
+from __future__ import annotations
+
+import argparse
+import re
+import sys
+import timeit
+from pathlib import Path
+from urllib.parse import urlparse
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+CLASSHUB_SERVICE_DIR = REPO_ROOT / "services" / "classhub"
+sys.path.insert(0, str(CLASSHUB_SERVICE_DIR))
+
+import bleach  # noqa: E402
+import markdown as md  # noqa: E402
+from django.conf import settings  # noqa: E402
+
+_IMG_TAG_RE = re.compile(r"<img\b[^>]*>", re.IGNORECASE)
+_IMG_SRC_RE = re.compile(r"""\bsrc\s*=\s*(?:"([^"]*)"|'([^']*)')""", re.IGNORECASE)
+_MEDIA_LINK_ATTR_RE = re.compile(
+    r"""(?P<prefix>\b(?:href|src)\s*=\s*)(?P<quote>["'])(?P<path>/lesson-(?:asset|video)/[^"']+)(?P=quote)""",
+    re.IGNORECASE,
+)
+
+
+def _before(markdown_text: str) -> str:
+    from hub.services.content_links import build_asset_url
+
+    allow_images = bool(settings.CLASSHUB_MARKDOWN_ALLOW_IMAGES)
+    allowed_hosts = {host.lower() for host in settings.CLASSHUB_MARKDOWN_ALLOWED_IMAGE_HOSTS}
+
+    def img_src_allowed(value: str) -> bool:
+        parsed = urlparse((value or "").strip())
+        if parsed.scheme in {"http", "https"}:
+            return (parsed.hostname or "").lower() in allowed_hosts
+        return bool((value or "").strip()) and not (parsed.scheme or parsed.netloc)
+
+    def img_attr_allowed(_tag: str, name: str, value: str) -> bool:
+        return img_src_allowed(value) if name == "src" else name in {"alt", "title", "loading", "decoding"}
+
+    html = md.markdown(markdown_text, extensions=["fenced_code", "tables", "toc"], output_format="html5")
+    tags = set(bleach.sanitizer.ALLOWED_TAGS) | {
+        "p", "pre", "code", "h1", "h2", "h3", "h4", "hr", "br",
+        "table", "thead", "tbody", "tr", "th", "td", "details", "summary",
+    }
+    attrs = {
+        **bleach.sanitizer.ALLOWED_ATTRIBUTES,
+        "a": ["href", "title", "target", "rel"],
+        "code": ["class"],
+        "pre": ["class"],
+        "h1": ["id"],
+        "h2": ["id"],
+        "h3": ["id"],
+        "h4": ["id"],
+    }
+    if allow_images:
+        tags.add("img")
+        attrs["img"] = img_attr_allowed
+    cleaned = bleach.clean(html, tags=list(tags), attributes=attrs, strip=True)
+    if allow_images:
+
+        def enforce_img_src(match: re.Match) -> str:
+            src_match = _IMG_SRC_RE.search(match.group(0))
+            src = (src_match.group(1) or src_match.group(2) or "") if src_match else ""
+            return match.group(0) if src_match and img_src_allowed(src) else ""
+
+        cleaned = _IMG_TAG_RE.sub(enforce_img_src, cleaned)
+    return _MEDIA_LINK_ATTR_RE.sub(
+        lambda m: f"{m.group('prefix')}{m.group('quote')}{build_asset_url(m.group('path'))}{m.group('quote')}",
+        cleaned,
+    )
+
+
+def _lesson_bodies(course_dir: Path) -> list[tuple[str, str]]:
+    bodies = []
+    for path in sorted(course_dir.rglob("*.md")):
+        raw = path.read_text(encoding="utf-8")
+        if raw.startswith("---"):
+            parts = raw.split("---", 2)
+            raw = parts[2] if len(parts) >= 3 else raw
+        bodies.append((path.relative_to(course_dir).as_posix(), raw))
+    return bodies
+
+
+def _per_lesson_ms(fn, body: str, iterations: int) -> float:
+    return min(timeit.repeat(lambda: fn(body), number=iterations, repeat=5)) / iterations * 1000
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--course-dir", default=str(REPO_ROOT / "demo_coursepack" / "demo_classhub_quickstart"))
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--images", action="store_true", help="Enable markdown images (relative + allowlisted hosts).")
+    parser.add_argument("--asset-base-url", default="")
+    args = parser.parse_args()
+
+    settings.configure(
+        CLASSHUB_MARKDOWN_ALLOW_IMAGES=args.images,
+        CLASSHUB_MARKDOWN_ALLOWED_IMAGE_HOSTS=["cdn.example.org"],
+        CLASSHUB_ASSET_BASE_URL=args.asset_base_url.rstrip("/"),
+        CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}},
+    )
+    from hub.services.markdown_content import render_markdown_to_safe_html
+
+    bodies = _lesson_bodies(Path(args.course_dir))
+    if not bodies:
+        print(f"No lesson markdown under {args.course_dir}", file=sys.stderr)
+        return 1
+
+    total_before = total_after = 0.0
+    print(f"{'lesson':<40} {'before_ms':>10} {'after_ms':>10} {'same':>5}")
+    for name, body in bodies:
+        before_ms = _per_lesson_ms(_before, body, args.iterations)
+        after_ms = _per_lesson_ms(render_markdown_to_safe_html, body, args.iterations)
+        same = _before(body) == render_markdown_to_safe_html(body)
+        total_before += before_ms
+        total_after += after_ms
+        print(f"{name[:40]:<40} {before_ms:>10.2f} {after_ms:>10.2f} {'yes' if same else 'NO':>5}")
+    count = len(bodies)
+    print(f"{'mean':<40} {total_before / count:>10.2f} {total_after / count:>10.2f}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
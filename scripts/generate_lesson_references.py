@@ -7,16 +7,28 @@ Usage:
     --course services/classhub/content/courses/piper_scratch_12_session/course.yaml \
     --out services/homework_helper/tutor/reference
 
-This writes one file per lesson: <out>/<lesson_slug>.md
+This writes one file per lesson: <out>/<lesson_slug>.md, plus a prebuilt
+citation index beside it (<out>/<lesson_slug>.index.json) that the helper
+loads instead of re-parsing the markdown.
+
+Rebuild only the index artifacts for existing reference files:
+  python scripts/generate_lesson_references.py --reindex \
+    --out services/homework_helper/tutor/reference
 """
 from __future__ import annotations
 
 import argparse
 import re
+import sys
 from pathlib import Path
 
 import yaml
 
+HELPER_SERVICE_DIR = Path(__file__).resolve().parents[1] / "services" / "homework_helper"
+sys.path.insert(0, str(HELPER_SERVICE_DIR))
+
+from tutor.engine.reference import write_reference_index  # noqa: E402
+
 
 HEADING_RE = re.compile(r"^(#{1,6})\s+(.*)")
 LIST_RE = re.compile(r"^(\s*[-*]|\s*\d+[.)])\s+")
@@ -125,12 +137,21 @@ def _render_reference(
 
 def main() -> int:
     parser = argparse.ArgumentParser()
-    parser.add_argument("--course", required=True, help="Path to course.yaml")
+    parser.add_argument("--course", help="Path to course.yaml")
     parser.add_argument("--out", required=True, help="Output directory for references")
+    parser.add_argument("--reindex", action="store_true", help="Only rebuild index artifacts for <out>/*.md")
+    parser.add_argument("--no-index", action="store_true", help="Skip writing <slug>.index.json artifacts")
     args = parser.parse_args()
 
-    course_path = Path(args.course)
     out_dir = Path(args.out)
+    if args.reindex:
+        for ref_path in sorted(out_dir.glob("*.md")):
+            write_reference_index(ref_path)
+        return 0
+    if not args.course:
+        parser.error("--course is required unless --reindex is given")
+
+    course_path = Path(args.course)
     manifest = yaml.safe_load(course_path.read_text(encoding="utf-8")) or {}
     course_dir = course_path.parent
     lessons = manifest.get("lessons") or []
@@ -151,7 +172,10 @@ def main() -> int:
         title = lesson.get("title") or fm.get("title") or slug
         session = lesson.get("session")
         ref_text = _render_reference(slug, title, session, fm, sections)
-        (out_dir / f"{slug}.md").write_text(ref_text, encoding="utf-8")
+        ref_path = out_dir / f"{slug}.md"
+        ref_path.write_text(ref_text, encoding="utf-8")
+        if not args.no_index:
+            write_reference_index(ref_path)
 
     return 0
 
@@ -32,6 +32,8 @@ if command -v docker >/dev/null 2>&1; then
       echo "[import] Importing $course_slug via docker compose..."
       docker compose "${COMPOSE_ARGS[@]}" exec "${SERVICE}" \
         python3 manage.py import_coursepack --course-slug "${course_slug}" --create-class --replace
+      docker compose "${COMPOSE_ARGS[@]}" exec "${SERVICE}" \
+        python3 manage.py prerender_lessons --course-slug "${course_slug}"
     done
     echo "[import] Done!"
     exit 0
@@ -56,6 +58,7 @@ cd "${ROOT_DIR}/services/classhub"
 for course_slug in "${COURSES[@]}"; do
   echo "[import] Importing $course_slug locally..."
   python3 manage.py import_coursepack --course-slug "${course_slug}" --create-class --replace
+  python3 manage.py prerender_lessons --course-slug "${course_slug}"
 done
 
 echo "[import] Done!"
@@ -5,7 +5,7 @@ from urllib.parse import urlencode
 from django.conf import settings
 from django.http import HttpResponse, HttpResponseRedirect, JsonResponse
 from common.csp import resolve_csp_headers
-from common.request_safety import build_staff_actor_key, client_ip_from_request, fixed_window_allow
+from common.request_safety import RateLimit, allow_many, build_staff_actor_key, client_ip_from_request
 
 logger = logging.getLogger(__name__)
 
@@ -153,13 +153,9 @@ class AuthRateLimitMiddleware:
             if actor:
                 keys.append(f"auth_rate:{namespace}:actor:{actor}")
 
-        for key in keys:
-            if fixed_window_allow(
-                key,
-                limit=limit,
-                window_seconds=window_seconds,
-                request_id=request_id,
-            ):
+        limits = [RateLimit(key=key, limit=limit, window_seconds=window_seconds) for key in keys]
+        for key, allowed in zip(keys, allow_many(limits, request_id=request_id), strict=True):
+            if allowed:
                 continue
             logger.warning(
                 "auth_rate_limited request_id=%s path=%s key=%s",
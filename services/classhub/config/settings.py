@@ -191,6 +191,15 @@ else:
         }
     }
 
+# The helper's cache (its own Redis DB). Class Hub writes student-session
+# version bumps there so the helper drops cached session checks right away.
+HELPER_REDIS_URL = os.getenv("HELPER_REDIS_URL", "").strip()
+if HELPER_REDIS_URL:
+    CACHES["helper"] = {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": HELPER_REDIS_URL,
+    }
+
 LANGUAGE_CODE = "en"
 TIME_ZONE = env("DJANGO_TIME_ZONE", default="America/Chicago").strip() or "America/Chicago"
 USE_I18N = True
@@ -357,10 +366,22 @@ CLASSHUB_MARKDOWN_ALLOWED_IMAGE_HOSTS = [
 # Optional absolute origin used when rendering lesson asset/video links.
 # Example: https://assets.creatempls.org
 CLASSHUB_ASSET_BASE_URL = env("CLASSHUB_ASSET_BASE_URL", default="").strip().rstrip("/")
+# Rendered lesson HTML is cached per lesson file version (path + mtime); 0 disables.
+CLASSHUB_LESSON_HTML_CACHE_SECONDS = env.int("CLASSHUB_LESSON_HTML_CACHE_SECONDS", default=86400)
+# How long a worker trusts its memoized course file mtimes before re-checking disk; 0 = stat every lookup.
+# Imports bump a shared content version, so workers pick those up within a second regardless.
+CLASSHUB_CONTENT_REVALIDATE_SECONDS = env.float("CLASSHUB_CONTENT_REVALIDATE_SECONDS", default=2.0)
+# How long the student session middleware reuses cached student/classroom rows; 0 = query on every request.
+# Renames, deletes, class locks and session-epoch rotations invalidate entries immediately.
+CLASSHUB_STUDENT_SESSION_CACHE_SECONDS = env.int("CLASSHUB_STUDENT_SESSION_CACHE_SECONDS", default=30)
 # Shared request-safety controls for proxy-aware client IP extraction.
 # Safe-by-default: only trust forwarded headers when explicitly enabled.
 REQUEST_SAFETY_TRUST_PROXY_HEADERS = env.bool("REQUEST_SAFETY_TRUST_PROXY_HEADERS", default=False)
 REQUEST_SAFETY_XFF_INDEX = env.int("REQUEST_SAFETY_XFF_INDEX", default=0)
+# In-process rate-limit tier: sync to the shared Redis counter once local usage
+# crosses this fraction of a limit, or after the interval (0 = sync every check).
+REQUEST_SAFETY_PRELIMIT_SYNC_FRACTION = env.float("REQUEST_SAFETY_PRELIMIT_SYNC_FRACTION", default=0.5)
+REQUEST_SAFETY_PRELIMIT_SYNC_INTERVAL_SECONDS = env.float("REQUEST_SAFETY_PRELIMIT_SYNC_INTERVAL_SECONDS", default=2.0)
 CLASSHUB_AUTH_RATE_LIMIT_WINDOW_SECONDS = env.int("CLASSHUB_AUTH_RATE_LIMIT_WINDOW_SECONDS", default=60)
 # Set to 0 to disable these endpoint-specific auth throttles.
 CLASSHUB_ADMIN_LOGIN_RATE_LIMIT_PER_MINUTE = env.int("CLASSHUB_ADMIN_LOGIN_RATE_LIMIT_PER_MINUTE", default=20)
@@ -380,6 +401,8 @@ HELPER_INTERNAL_RESET_URL = env(
 HELPER_INTERNAL_API_TOKEN = env("HELPER_INTERNAL_API_TOKEN", default="").strip()
 HELPER_INTERNAL_RESET_TIMEOUT_SECONDS = env.float("HELPER_INTERNAL_RESET_TIMEOUT_SECONDS", default=2.0)
 HELPER_INTERNAL_RESET_EXPORT_BEFORE_DELETE = env.bool("HELPER_INTERNAL_RESET_EXPORT_BEFORE_DELETE", default=True)
+# Run class resets as helper background jobs; the teacher page polls their progress.
+HELPER_INTERNAL_RESET_BACKGROUND = env.bool("HELPER_INTERNAL_RESET_BACKGROUND", default=True)
 ADMIN_2FA_REQUIRED = env.bool("DJANGO_ADMIN_2FA_REQUIRED", default=True)
 TEACHER_2FA_REQUIRED = env.bool("DJANGO_TEACHER_2FA_REQUIRED", default=True)
 CSP_POLICY_RELAXED = _DEFAULT_CSP_POLICY_RELAXED
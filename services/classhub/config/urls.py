@@ -22,6 +22,7 @@ urlpatterns = [
     # Health endpoint for reverse proxy and uptime checks.
     path("healthz", views.healthz),
     path("internal/events/helper-chat-access", views.internal_helper_chat_access_event),
+    path("internal/events/helper-chat-access/bulk", views.internal_helper_chat_access_events_bulk),
 
     # Headless JSON API
     path("api/v1/student/session", views.api_student_session),
@@ -91,6 +92,7 @@ urlpatterns = [
     path("teach/class/<int:class_id>/delete-student-data", views.teach_delete_student_data),
     path("teach/class/<int:class_id>/reset-roster", views.teach_reset_roster),
     path("teach/class/<int:class_id>/reset-helper-conversations", views.teach_reset_helper_conversations),
+    path("teach/class/<int:class_id>/helper-reset-status", views.teach_helper_reset_status),
     path("teach/class/<int:class_id>/toggle-lock", views.teach_toggle_lock),
     path("teach/class/<int:class_id>/lock", views.teach_lock_class),
     path("teach/class/<int:class_id>/export-submissions-today", views.teach_export_class_submissions_today),
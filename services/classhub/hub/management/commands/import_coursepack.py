@@ -14,6 +14,8 @@ Notes:
 - This command creates one Module per lesson session.
 - Each module gets a link material that points to the markdown renderer route:
     /course/<course_slug>/<lesson_slug>
+- A successful import bumps the shared content version so every web worker
+  re-reads course files; run `prerender_lessons` afterwards to warm lesson HTML.
 """
 
 from __future__ import annotations
@@ -26,6 +28,7 @@ from django.core.management.base import BaseCommand, CommandError
 from django.db import transaction
 
 from hub.models import Class, Module, Material
+from hub.services.markdown_content import bump_content_version
 
 
 def _courses_dir() -> Path:
@@ -100,6 +103,8 @@ class Command(BaseCommand):
     def handle(self, *args, **opts):
         course_slug = opts["course_slug"]
         manifest = _load_manifest(course_slug)
+        # Imports usually follow a content pull; have every worker re-read course files once this commits.
+        transaction.on_commit(bump_content_version)
 
         lessons = manifest.get("lessons") or []
         if not lessons:
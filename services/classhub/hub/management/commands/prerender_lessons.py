@@ -0,0 +1,65 @@
+"""Pre-render lesson HTML into the shared cache.
+
+Run after `import_coursepack` (or any lesson edit) so the first students to open
+a lesson get cached HTML instead of all rendering the same markdown at once:
+
+  python manage.py prerender_lessons --course-slug piper_scratch_12_session
+
+Without --course-slug every course under CONTENT_ROOT/courses is rendered.
+"""
+
+from __future__ import annotations
+
+from django.core.management.base import BaseCommand, CommandError
+
+from hub.services.content_links import courses_dir
+from hub.services.markdown_content import LESSON_HTML_VARIANTS, load_course_manifest, load_lesson_html
+
+
+class Command(BaseCommand):
+    help = "Render learner, locked-intro and teacher lesson HTML into the shared cache."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--course-slug",
+            action="append",
+            default=[],
+            help="Course to pre-render (repeatable). Defaults to every course with a course.yaml.",
+        )
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Re-render even when a fragment is already cached.",
+        )
+
+    def handle(self, *args, **opts):
+        course_slugs = [slug.strip() for slug in opts["course_slug"] if slug.strip()]
+        if not course_slugs:
+            root = courses_dir()
+            course_slugs = sorted(p.parent.name for p in root.glob("*/course.yaml")) if root.is_dir() else []
+        if not course_slugs:
+            raise CommandError("No courses found to pre-render.")
+
+        rendered = 0
+        failed = 0
+        for course_slug in course_slugs:
+            manifest = load_course_manifest(course_slug)
+            if not manifest:
+                raise CommandError(f"Course manifest not found: {course_slug}")
+            for lesson in manifest.get("lessons") or []:
+                lesson_slug = str(lesson.get("slug") or "").strip() if isinstance(lesson, dict) else ""
+                if not lesson_slug:
+                    continue
+                try:
+                    for variant in LESSON_HTML_VARIANTS:
+                        load_lesson_html(course_slug, lesson_slug, variant, refresh=bool(opts["force"]))
+                except ValueError as exc:
+                    failed += 1
+                    self.stderr.write(self.style.WARNING(f"{course_slug}/{lesson_slug}: {exc}"))
+                    continue
+                rendered += 1
+
+        summary = f"Pre-rendered {rendered} lesson(s) across {len(course_slugs)} course(s)."
+        if failed:
+            summary += f" {failed} lesson(s) failed."
+        self.stdout.write(self.style.SUCCESS(summary))
@@ -11,7 +11,7 @@ Later, this becomes the access-control boundary for the helper and for content.
 
 import logging
 
-from .models import StudentIdentity
+from .services.student_session_cache import resolve_student_session
 
 logger = logging.getLogger(__name__)
 
@@ -57,16 +57,8 @@ def _resolve_bearer_token(request):
     if not sid or not cid:
         return False
 
-    student = (
-        StudentIdentity.objects.select_related("classroom")
-        .filter(id=sid, classroom_id=cid)
-        .first()
-    )
-    if student is None:
-        return False
-
-    classroom = getattr(student, "classroom", None)
-    if classroom is None:
+    student, classroom = resolve_student_session(sid, cid)
+    if student is None or classroom is None:
         return False
 
     current_epoch = int(getattr(classroom, "session_epoch", 1) or 1)
@@ -127,13 +119,8 @@ class StudentSessionMiddleware:
         class_epoch = request.session.get("class_epoch")
 
         if sid and cid:
-            # Resolve both records in one query via select_related.
-            student = (
-                StudentIdentity.objects.select_related("classroom")
-                .filter(id=sid, classroom_id=cid)
-                .first()
-            )
-            classroom = getattr(student, "classroom", None) if student is not None else None
+            # Served from the short-lived session cache; one select_related query on a miss.
+            student, classroom = resolve_student_session(sid, cid)
             if student is None or classroom is None:
                 _clear_student_session(request.session)
                 request.student = None
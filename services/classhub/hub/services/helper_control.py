@@ -3,10 +3,21 @@
 from __future__ import annotations
 
 import json
+import logging
 import urllib.error
 import urllib.request
 from dataclasses import dataclass
 
+from django.conf import settings
+from django.core.cache import caches
+
+logger = logging.getLogger(__name__)
+
+_SESSION_VERSION_TTL_SECONDS = 86400
+
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+
 
 @dataclass(frozen=True)
 class HelperResetResult:
@@ -16,6 +27,28 @@ class HelperResetResult:
     archive_path: str = ""
     error_code: str = ""
     status_code: int = 0
+    # Background mode: the helper job tracking this reset. A reply without a job id
+    # (inline mode, or a helper that predates jobs) is already finished.
+    job_id: str = ""
+    job_status: str = ""
+    phase: str = ""
+    processed: int = 0
+    total: int = 0
+    attached: bool = False
+
+    @property
+    def finished(self) -> bool:
+        return not self.job_id or self.job_status in {JOB_DONE, JOB_FAILED}
+
+
+def _validate_endpoint(endpoint_url: str, internal_token: str) -> str:
+    if not endpoint_url:
+        return "helper_endpoint_not_configured"
+    if not internal_token:
+        return "helper_token_not_configured"
+    if not endpoint_url.lower().startswith(("http://", "https://")):
+        return "invalid_endpoint_url_scheme"
+    return ""
 
 
 def reset_class_conversations(
@@ -25,30 +58,55 @@ def reset_class_conversations(
     internal_token: str,
     timeout_seconds: float,
     export_before_reset: bool = True,
+    background: bool = False,
 ) -> HelperResetResult:
+    """Ask the helper to reset a class; with `background`, the helper answers with a job to poll."""
     if class_id <= 0:
         return HelperResetResult(ok=False, error_code="invalid_class_id")
-    if not endpoint_url:
-        return HelperResetResult(ok=False, error_code="helper_endpoint_not_configured")
-    if not internal_token:
-        return HelperResetResult(ok=False, error_code="helper_token_not_configured")
-    if not endpoint_url.lower().startswith(("http://", "https://")):
-        return HelperResetResult(ok=False, error_code="invalid_endpoint_url_scheme")
+    error_code = _validate_endpoint(endpoint_url, internal_token)
+    if error_code:
+        return HelperResetResult(ok=False, error_code=error_code)
 
-    payload = json.dumps(
-        {"class_id": int(class_id), "export_before_reset": bool(export_before_reset)}
-    ).encode("utf-8")
+    body = {"class_id": int(class_id), "export_before_reset": bool(export_before_reset)}
+    if background:
+        body["background"] = True
     request = urllib.request.Request(
         endpoint_url,
-        data=payload,
+        data=json.dumps(body).encode("utf-8"),
         method="POST",
         headers={
             "Content-Type": "application/json",
             "Authorization": f"Bearer {internal_token}",
         },
     )
-    timeout = max(float(timeout_seconds), 0.2)
+    return _send(request, timeout_seconds=timeout_seconds, default_error="helper_reset_failed")
+
+
+def reset_job_status(
+    *,
+    job_id: str,
+    endpoint_url: str,
+    internal_token: str,
+    timeout_seconds: float,
+) -> HelperResetResult:
+    """Poll a background reset job started by `reset_class_conversations(background=True)`."""
+    job_id = str(job_id or "").strip().lower()
+    if len(job_id) != 32 or any(ch not in "0123456789abcdef" for ch in job_id):
+        return HelperResetResult(ok=False, error_code="invalid_job_id")
+    error_code = _validate_endpoint(endpoint_url, internal_token)
+    if error_code:
+        return HelperResetResult(ok=False, error_code=error_code)
+
+    request = urllib.request.Request(
+        f"{endpoint_url.rstrip('/')}/jobs/{job_id}",
+        method="GET",
+        headers={"Authorization": f"Bearer {internal_token}"},
+    )
+    return _send(request, timeout_seconds=timeout_seconds, default_error="helper_job_status_failed")
+
 
+def _send(request: urllib.request.Request, *, timeout_seconds: float, default_error: str) -> HelperResetResult:
+    timeout = max(float(timeout_seconds), 0.2)
     try:
         with urllib.request.urlopen(request, timeout=timeout) as response:  # nosec B310
             status = int(getattr(response, "status", 200) or 200)
@@ -74,27 +132,65 @@ def reset_class_conversations(
     if not parsed.get("ok"):
         return HelperResetResult(
             ok=False,
-            error_code=str(parsed.get("error") or "helper_reset_failed"),
+            error_code=str(parsed.get("error") or default_error),
             status_code=status,
         )
+    return _parse_result(parsed, status_code=status)
+
+
+def _non_negative_int(value) -> int:
     try:
-        deleted = int(parsed.get("deleted_conversations") or 0)
-    except Exception:
-        deleted = 0
-    try:
-        archived = int(parsed.get("archived_conversations") or 0)
+        return max(int(value or 0), 0)
     except Exception:
-        archived = 0
+        return 0
+
+
+def _parse_result(parsed: dict, *, status_code: int) -> HelperResetResult:
+    job_status = str(parsed.get("status") or "").strip().lower()[:16]
+    job_error = str(parsed.get("error") or "").strip().lower()[:80]
     archive_path = str(parsed.get("archive_path") or "").strip()
     return HelperResetResult(
-        ok=True,
-        deleted_conversations=max(deleted, 0),
-        archived_conversations=max(archived, 0),
+        ok=job_status != JOB_FAILED,
+        deleted_conversations=_non_negative_int(parsed.get("deleted_conversations")),
+        archived_conversations=_non_negative_int(parsed.get("archived_conversations")),
         archive_path=archive_path[:512],
-        status_code=status,
+        error_code=(job_error or "helper_reset_failed") if job_status == JOB_FAILED else "",
+        status_code=status_code,
+        job_id=str(parsed.get("job_id") or "").strip()[:64],
+        job_status=job_status,
+        phase=str(parsed.get("phase") or "").strip()[:16],
+        processed=_non_negative_int(parsed.get("processed")),
+        total=_non_negative_int(parsed.get("total")),
+        attached=bool(parsed.get("attached")),
     )
 
 
+def helper_session_version_key(class_id: int) -> str:
+    # Must match tutor.engine.auth.session_version_key in the helper service.
+    return f"helper:session_version:class:{int(class_id)}"
+
+
+def bump_helper_session_version(class_id: int) -> None:
+    """Invalidate the helper's cached student-session checks for one class.
+
+    Writes to the `helper` cache alias (HELPER_REDIS_URL) when configured, else
+    to the default cache, which only reaches the helper when both share it.
+    """
+    alias = "helper" if "helper" in settings.CACHES else "default"
+    key = helper_session_version_key(class_id)
+    try:
+        cache_backend = caches[alias]
+        try:
+            cache_backend.incr(key)
+        except ValueError:
+            if not cache_backend.add(key, 1, timeout=_SESSION_VERSION_TTL_SECONDS):
+                cache_backend.incr(key)
+        cache_backend.touch(key, timeout=_SESSION_VERSION_TTL_SECONDS)
+    except Exception:
+        # Cached helper checks still expire on their own short TTL.
+        logger.warning("helper_session_version_bump_failed class_id=%s", class_id)
+
+
 def _safe_json_dict(raw: str) -> dict:
     try:
         parsed = json.loads(raw or "{}")
@@ -1,27 +1,33 @@
 """Markdown/course parsing and sanitization helpers for Class Hub views."""
 
 import copy
-from functools import lru_cache
+import hashlib
+import json
+import logging
+from functools import lru_cache, partial
 from pathlib import Path
 import re
+import threading
+import time
 from urllib.parse import urlparse
 
 import bleach
 import markdown as md
+from bleach import html5lib_shim
+from bleach.sanitizer import Cleaner
 import yaml
 from django.conf import settings
+from django.core.cache import cache
 from django.utils._os import safe_join
 
-from .content_links import build_asset_url
+from .content_links import asset_base_url, build_asset_url
+
+logger = logging.getLogger(__name__)
 
 _COURSE_SLUG_RE = re.compile(r"^[A-Za-z0-9_-]+$")
 _HEADING_LEVEL2_RE = re.compile(r"^##\s+(.+?)\s*$")
-_IMG_TAG_RE = re.compile(r"<img\b[^>]*>", re.IGNORECASE)
-_IMG_SRC_RE = re.compile(r"""\bsrc\s*=\s*(?:"([^"]*)"|'([^']*)')""", re.IGNORECASE)
-_MEDIA_LINK_ATTR_RE = re.compile(
-    r"""(?P<prefix>\b(?:href|src)\s*=\s*)(?P<quote>["'])(?P<path>/lesson-(?:asset|video)/[^"']+)(?P=quote)""",
-    re.IGNORECASE,
-)
+_MEDIA_PATH_RE = re.compile(r"^/lesson-(?:asset|video)/[^\"']+$", re.IGNORECASE)
+_MEDIA_ATTRS = ((None, "href"), (None, "src"))
 _LEGACY_TEACHER_DETAILS_RE = re.compile(r"(?is)<details>\s*<summary>.*?teacher.*?</summary>.*?</details>")
 _TEACHER_SECTION_PREFIXES = (
     "teacher prep",
@@ -35,15 +41,124 @@ _TEACHER_SECTION_PREFIXES = (
     "notes + options",
 )
 
+LESSON_HTML_LEARNER = "learner"
+LESSON_HTML_INTRO = "intro"
+LESSON_HTML_TEACHER = "teacher"
+LESSON_HTML_VARIANTS = (LESSON_HTML_LEARNER, LESSON_HTML_INTRO, LESSON_HTML_TEACHER)
+# Bump when the markdown/sanitizer pipeline changes output for the same source.
+_LESSON_HTML_RENDER_VERSION = 1
+_LEARNER_FALLBACK_MARKDOWN = "### Learner activity\nAsk your teacher for today's activity steps.\n"
+_LOCKED_INTRO_FALLBACK_MARKDOWN = "### Intro\nYour teacher will open the full lesson on the scheduled date.\n"
+
+
+class FrozenDict(dict):
+    """Read-only dict shared from the course caches; `copy.copy`/`copy.deepcopy` give a mutable dict."""
+
+    __slots__ = ()
+
+    def _read_only(self, *args, **kwargs):
+        raise TypeError("course content from the shared cache is read-only; copy it first")
+
+    __setitem__ = __delitem__ = __ior__ = _read_only
+    clear = pop = popitem = setdefault = update = _read_only
+
+    def __copy__(self) -> dict:
+        return dict(self)
+
+    def __deepcopy__(self, memo) -> dict:
+        return {copy.deepcopy(k, memo): copy.deepcopy(v, memo) for k, v in self.items()}
+
+    def __reduce__(self):
+        return (dict, (dict(self),))
+
+
+class FrozenList(list):
+    """Read-only list counterpart of `FrozenDict`."""
+
+    __slots__ = ()
+
+    def _read_only(self, *args, **kwargs):
+        raise TypeError("course content from the shared cache is read-only; copy it first")
+
+    __setitem__ = __delitem__ = __iadd__ = __imul__ = _read_only
+    append = clear = extend = insert = pop = remove = reverse = sort = _read_only
+
+    def __copy__(self) -> list:
+        return list(self)
+
+    def __deepcopy__(self, memo) -> list:
+        return [copy.deepcopy(item, memo) for item in self]
+
+    def __reduce__(self):
+        return (list, (list(self),))
+
+
+def freeze(value):
+    """Recursively convert parsed YAML into FrozenDict/FrozenList."""
+    if isinstance(value, dict):
+        return FrozenDict({key: freeze(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return FrozenList(freeze(item) for item in value)
+    return value
+
+
+_EMPTY = FrozenDict()
+
+
+class CourseCatalog:
+    """Parsed course.yaml, frozen and indexed by lesson slug.
+
+    One instance is shared per manifest file version; callers must treat it and
+    everything it returns as read-only (mutation raises TypeError).
+    """
+
+    __slots__ = ("slug", "manifest", "lessons", "_lesson_by_slug", "_position_by_slug")
+
+    def __init__(self, slug: str, manifest: FrozenDict):
+        self.slug = slug
+        self.manifest = manifest
+        lessons = manifest.get("lessons")
+        self.lessons = lessons if isinstance(lessons, list) else FrozenList()
+        lesson_by_slug: dict[str, FrozenDict] = {}
+        position_by_slug: dict[str, int] = {}
+        for position, lesson in enumerate(self.lessons):
+            if not isinstance(lesson, dict):
+                continue
+            lesson_slug = lesson.get("slug")
+            # The first entry wins when a manifest repeats a slug, as the linear scans did.
+            if isinstance(lesson_slug, str) and lesson_slug not in lesson_by_slug:
+                lesson_by_slug[lesson_slug] = lesson
+                position_by_slug[lesson_slug] = position
+        self._lesson_by_slug = lesson_by_slug
+        self._position_by_slug = position_by_slug
+
+    def lesson(self, lesson_slug: str) -> FrozenDict | None:
+        return self._lesson_by_slug.get(lesson_slug)
+
+    def position(self, lesson_slug: str) -> int | None:
+        return self._position_by_slug.get(lesson_slug)
+
+    def neighbors(self, lesson_slug: str) -> tuple:
+        """Return (previous, next) manifest entries around a lesson; None at either end."""
+        idx = self._position_by_slug.get(lesson_slug)
+        if idx is None:
+            return None, None
+        prev_lesson = self.lessons[idx - 1] if idx > 0 else None
+        next_lesson = self.lessons[idx + 1] if idx + 1 < len(self.lessons) else None
+        return prev_lesson, next_lesson
+
 
 @lru_cache(maxsize=256)
-def _load_manifest_cached(path_str: str, mtime_ns: int) -> dict:
+def _load_catalog_cached(path_str: str, mtime_ns: int, course_slug: str) -> CourseCatalog:
     manifest_path = Path(path_str)
-    return yaml.safe_load(manifest_path.read_text(encoding="utf-8")) or {}
+    manifest = yaml.safe_load(manifest_path.read_text(encoding="utf-8")) or {}
+    if not isinstance(manifest, dict):
+        manifest = {}
+    return CourseCatalog(course_slug, freeze(manifest))
 
 
 @lru_cache(maxsize=512)
-def _load_lesson_cached(path_str: str, mtime_ns: int) -> tuple[dict, str]:
+def _load_lesson_cached(path_str: str, mtime_ns: int) -> tuple[FrozenDict, str]:
     lesson_path = Path(path_str)
     raw = lesson_path.read_text(encoding="utf-8")
     if raw.startswith("---"):
@@ -56,8 +171,8 @@ def _load_lesson_cached(path_str: str, mtime_ns: int) -> tuple[dict, str]:
             except yaml.scanner.ScannerError as exc:
                 raise ValueError(f"Invalid YAML in {lesson_path}: {exc}") from exc
             body = parts[2].lstrip("\n")
-            return fm, body
-    return {}, raw
+            return freeze(fm) if isinstance(fm, dict) else _EMPTY, body
+    return _EMPTY, raw
 
 
 def validate_front_matter(front_matter_text: str, source: Path) -> None:
@@ -79,10 +194,6 @@ def validate_front_matter(front_matter_text: str, source: Path) -> None:
             )
 
 
-def _courses_dir() -> Path:
-    return (Path(settings.CONTENT_ROOT) / "courses").resolve()
-
-
 def _safe_course_file_path(course_slug: str, rel_path: str) -> Path | None:
     slug = (course_slug or "").strip()
     rel = (rel_path or "").strip()
@@ -90,7 +201,13 @@ def _safe_course_file_path(course_slug: str, rel_path: str) -> Path | None:
         return None
     if not rel:
         return None
-    base_dir = _courses_dir()
+    return _resolve_course_file(str(settings.CONTENT_ROOT), slug, rel)
+
+
+@lru_cache(maxsize=1024)
+def _resolve_course_file(content_root: str, slug: str, rel: str) -> Path | None:
+    # realpath walks every path component; lessons are looked up many times per request.
+    base_dir = (Path(content_root) / "courses").resolve()
     try:
         joined = safe_join(str(base_dir), slug, rel)
     except Exception:
@@ -101,32 +218,142 @@ def _safe_course_file_path(course_slug: str, rel_path: str) -> Path | None:
     return candidate
 
 
-def load_course_manifest(course_slug: str) -> dict:
+CONTENT_VERSION_CACHE_KEY = "classhub:content_version"
+_CONTENT_VERSION_CHECK_SECONDS = 1.0
+_MISSING = object()
+
+
+def _stat_mtime_ns(path: Path) -> int | None:
+    try:
+        return path.stat().st_mtime_ns
+    except OSError:
+        return None
+
+
+class ContentRegistry:
+    """Per-process memo of course file mtimes (None for missing files).
+
+    Hot pages look up the same course.yaml and lesson files for every module,
+    so stat results are reused until the revalidation interval passes
+    (`CLASSHUB_CONTENT_REVALIDATE_SECONDS`, 0 = always stat) or the shared
+    content version in the cache changes. `bump_content_version` changes it
+    after an import so every worker drops its memo together instead of waiting
+    out the interval.
+    """
+
+    def __init__(self, *, clock=time.monotonic):
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._mtimes: dict[str, int | None] = {}
+        self._stats_at = 0.0
+        self._version = None
+        self._version_checked_at = float("-inf")
+
+    def clear(self) -> None:
+        with self._lock:
+            self._mtimes.clear()
+            self._stats_at = self._clock()
+
+    def mtime_ns(self, path: Path) -> int | None:
+        interval = _content_revalidate_seconds()
+        if interval <= 0:
+            return _stat_mtime_ns(path)
+        self._revalidate(interval)
+        key = str(path)
+        value = self._mtimes.get(key, _MISSING)
+        if value is _MISSING:
+            value = _stat_mtime_ns(path)
+            with self._lock:
+                self._mtimes[key] = value
+        return value
+
+    def _revalidate(self, interval: float) -> None:
+        now = self._clock()
+        if now - self._version_checked_at >= min(_CONTENT_VERSION_CHECK_SECONDS, interval):
+            try:
+                version = cache.get(CONTENT_VERSION_CACHE_KEY)
+            except Exception:
+                version = self._version
+            with self._lock:
+                self._version_checked_at = now
+                if version != self._version:
+                    self._version = version
+                    self._mtimes.clear()
+                    self._stats_at = now
+        if now - self._stats_at >= interval:
+            with self._lock:
+                self._mtimes.clear()
+                self._stats_at = now
+
+
+content_registry = ContentRegistry()
+
+
+def _content_revalidate_seconds() -> float:
+    return max(float(getattr(settings, "CLASSHUB_CONTENT_REVALIDATE_SECONDS", 2.0) or 0.0), 0.0)
+
+
+def bump_content_version() -> None:
+    """Tell every worker that course files changed; call after writing content."""
+    content_registry.clear()
+    try:
+        try:
+            cache.incr(CONTENT_VERSION_CACHE_KEY)
+        except ValueError:
+            if not cache.add(CONTENT_VERSION_CACHE_KEY, 1, timeout=None):
+                cache.incr(CONTENT_VERSION_CACHE_KEY)
+    except Exception:
+        # Workers still pick the change up on their next revalidation interval.
+        logger.warning("content_version_bump_failed", exc_info=True)
+
+
+def load_course_catalog(course_slug: str) -> CourseCatalog | None:
+    """Return the shared read-only catalog for a course, or None when it has no manifest."""
     manifest_path = _safe_course_file_path(course_slug, "course.yaml")
-    if manifest_path is None or not manifest_path.exists():
-        return {}
-    mtime_ns = manifest_path.stat().st_mtime_ns
-    return copy.deepcopy(_load_manifest_cached(str(manifest_path), mtime_ns))
+    if manifest_path is None:
+        return None
+    mtime_ns = content_registry.mtime_ns(manifest_path)
+    if mtime_ns is None:
+        return None
+    return _load_catalog_cached(str(manifest_path), mtime_ns, course_slug)
+
 
+def load_course_manifest(course_slug: str) -> FrozenDict:
+    """Return the course manifest (read-only, shared; empty when missing)."""
+    catalog = load_course_catalog(course_slug)
+    return catalog.manifest if catalog is not None else _EMPTY
 
-def load_lesson_markdown(course_slug: str, lesson_slug: str) -> tuple[dict, str, dict]:
-    """Return (front_matter, markdown_body, lesson_meta)."""
-    manifest = load_course_manifest(course_slug)
-    lessons = manifest.get("lessons") or []
-    match = next((l for l in lessons if isinstance(l, dict) and (l.get("slug") == lesson_slug)), None)
+
+def _lesson_source(course_slug: str, lesson_slug: str) -> tuple[Path | None, int, FrozenDict | None]:
+    """Return (lesson_path, mtime_ns, manifest_entry); the path is None when the file is missing."""
+    catalog = load_course_catalog(course_slug)
+    match = catalog.lesson(lesson_slug) if catalog is not None else None
     if not match:
-        return {}, "", {}
+        return None, 0, None
 
     rel = str(match.get("file") or "").strip()
     if not rel:
-        return {}, "", match
+        return None, 0, match
     lesson_path = _safe_course_file_path(course_slug, rel)
-    if lesson_path is None or not lesson_path.exists():
-        return {}, "", match
+    mtime_ns = content_registry.mtime_ns(lesson_path) if lesson_path is not None else None
+    if mtime_ns is None:
+        return None, 0, match
+    return lesson_path, mtime_ns, match
+
+
+def load_lesson_markdown(course_slug: str, lesson_slug: str) -> tuple[FrozenDict, str, FrozenDict]:
+    """Return (front_matter, markdown_body, lesson_meta).
+
+    Front matter and lesson meta are shared read-only mappings; copy them before changing anything.
+    """
+    lesson_path, mtime_ns, match = _lesson_source(course_slug, lesson_slug)
+    if match is None:
+        return _EMPTY, "", _EMPTY
+    if lesson_path is None:
+        return _EMPTY, "", match
 
-    mtime_ns = lesson_path.stat().st_mtime_ns
     fm, body = _load_lesson_cached(str(lesson_path), mtime_ns)
-    return copy.deepcopy(fm), body, match
+    return fm, body, match
 
 
 def is_teacher_section_heading(heading_text: str) -> bool:
@@ -219,41 +446,9 @@ def teacher_panel_markdown(front_matter: dict) -> str:
     return "\n".join(lines).strip() + "\n"
 
 
-def render_markdown_to_safe_html(markdown_text: str) -> str:
-    allow_images = bool(getattr(settings, "CLASSHUB_MARKDOWN_ALLOW_IMAGES", False))
-    allowed_hosts = {
-        str(host).strip().lower()
-        for host in getattr(settings, "CLASSHUB_MARKDOWN_ALLOWED_IMAGE_HOSTS", [])
-        if str(host).strip()
-    }
-
-    def _img_src_allowed(value: str) -> bool:
-        candidate = (value or "").strip()
-        if not candidate:
-            return False
-        parsed = urlparse(candidate)
-        if parsed.scheme in {"http", "https"}:
-            host = (parsed.hostname or "").lower()
-            return host in allowed_hosts
-        if parsed.scheme or parsed.netloc:
-            return False
-        # Relative path (same-origin once rendered).
-        return True
-
-    def _img_attr_allowed(_tag: str, name: str, value: str) -> bool:
-        if name == "src":
-            return _img_src_allowed(value)
-        if name in {"alt", "title", "loading", "decoding"}:
-            return True
-        return False
-
-    html = md.markdown(
-        markdown_text,
-        extensions=["fenced_code", "tables", "toc"],
-        output_format="html5",
-    )
-
-    allowed_tags = set(bleach.sanitizer.ALLOWED_TAGS).union(
+_MARKDOWN_EXTENSIONS = ["fenced_code", "tables", "toc"]
+_SAFE_TAGS = frozenset(
+    set(bleach.sanitizer.ALLOWED_TAGS).union(
         {
             "p",
             "pre",
@@ -274,51 +469,193 @@ def render_markdown_to_safe_html(markdown_text: str) -> str:
             "summary",
         }
     )
-    if allow_images:
-        allowed_tags.add("img")
-
-    allowed_attrs = {
-        **bleach.sanitizer.ALLOWED_ATTRIBUTES,
-        "a": ["href", "title", "target", "rel"],
-        "code": ["class"],
-        "pre": ["class"],
-        "h1": ["id"],
-        "h2": ["id"],
-        "h3": ["id"],
-        "h4": ["id"],
-    }
-    if allow_images:
-        allowed_attrs["img"] = _img_attr_allowed
-
-    cleaned = bleach.clean(html, tags=list(allowed_tags), attributes=allowed_attrs, strip=True)
-    if allow_images:
-        # Bleach may leave <img> tags after stripping disallowed src attributes.
-        # Remove any image tag that does not retain an allowed src.
-        def _enforce_img_src(tag_match: re.Match) -> str:
-            tag = tag_match.group(0)
-            src_match = _IMG_SRC_RE.search(tag)
-            if not src_match:
-                return ""
-            src = (src_match.group(1) or src_match.group(2) or "").strip()
-            return tag if _img_src_allowed(src) else ""
-
-        cleaned = _IMG_TAG_RE.sub(_enforce_img_src, cleaned)
-    cleaned = _MEDIA_LINK_ATTR_RE.sub(
-        lambda match: f"{match.group('prefix')}{match.group('quote')}{build_asset_url(match.group('path'))}{match.group('quote')}",
-        cleaned,
+)
+_SAFE_ATTRIBUTES = {
+    **bleach.sanitizer.ALLOWED_ATTRIBUTES,
+    "a": ["href", "title", "target", "rel"],
+    "code": ["class"],
+    "pre": ["class"],
+    "h1": ["id"],
+    "h2": ["id"],
+    "h3": ["id"],
+    "h4": ["id"],
+}
+# Markdown and bleach parsers keep per-parse state, so each thread gets its own pipeline.
+_pipelines = threading.local()
+
+
+def _render_settings() -> tuple[bool, tuple[str, ...], str]:
+    allowed_hosts = sorted(
+        {
+            str(host).strip().lower()
+            for host in getattr(settings, "CLASSHUB_MARKDOWN_ALLOWED_IMAGE_HOSTS", [])
+            if str(host).strip()
+        }
+    )
+    return (
+        bool(getattr(settings, "CLASSHUB_MARKDOWN_ALLOW_IMAGES", False)),
+        tuple(allowed_hosts),
+        asset_base_url(),
     )
-    return cleaned
+
+
+def _img_src_allowed(value: str, *, allowed_hosts: frozenset[str]) -> bool:
+    candidate = (value or "").strip()
+    if not candidate:
+        return False
+    parsed = urlparse(candidate)
+    if parsed.scheme in {"http", "https"}:
+        host = (parsed.hostname or "").lower()
+        return host in allowed_hosts
+    if parsed.scheme or parsed.netloc:
+        return False
+    # Relative path (same-origin once rendered).
+    return True
+
+
+class _LessonMediaFilter(html5lib_shim.Filter):
+    """Post-sanitizer token pass: drop images left without a src, point lesson media at the asset origin."""
+
+    def __iter__(self):
+        for token in html5lib_shim.Filter.__iter__(self):
+            if token["type"] in {"StartTag", "EmptyTag"}:
+                attrs = token.get("data") or {}
+                # The sanitizer already removed disallowed src values; an image without one is dropped.
+                if token["name"] == "img" and not attrs.get((None, "src")):
+                    continue
+                for attr in _MEDIA_ATTRS:
+                    value = attrs.get(attr)
+                    if value and _MEDIA_PATH_RE.match(value):
+                        attrs[attr] = build_asset_url(value)
+            yield token
+
+
+class _SafeHtmlPipeline:
+    """Markdown converter plus bleach cleaner built once for one set of render settings."""
+
+    def __init__(self, render_settings: tuple[bool, tuple[str, ...], str]):
+        allow_images, allowed_hosts, _asset_base = render_settings
+        tags = set(_SAFE_TAGS)
+        attributes = dict(_SAFE_ATTRIBUTES)
+        if allow_images:
+            src_allowed = partial(_img_src_allowed, allowed_hosts=frozenset(allowed_hosts))
+
+            def img_attr_allowed(_tag: str, name: str, value: str) -> bool:
+                if name == "src":
+                    return src_allowed(value)
+                return name in {"alt", "title", "loading", "decoding"}
+
+            tags.add("img")
+            attributes["img"] = img_attr_allowed
+        self.markdown = md.Markdown(extensions=_MARKDOWN_EXTENSIONS, output_format="html5")
+        self.cleaner = Cleaner(tags=tags, attributes=attributes, strip=True, filters=[_LessonMediaFilter])
+
+    def render(self, markdown_text: str) -> str:
+        html = self.markdown.reset().convert(markdown_text)
+        return self.cleaner.clean(html)
+
+
+def _safe_html_pipeline() -> _SafeHtmlPipeline:
+    render_settings = _render_settings()
+    by_settings = getattr(_pipelines, "by_settings", None)
+    if by_settings is None:
+        by_settings = _pipelines.by_settings = {}
+    pipeline = by_settings.get(render_settings)
+    if pipeline is None:
+        if len(by_settings) >= 8:
+            by_settings.clear()
+        pipeline = by_settings[render_settings] = _SafeHtmlPipeline(render_settings)
+    return pipeline
+
+
+def render_markdown_to_safe_html(markdown_text: str) -> str:
+    """Render lesson markdown to sanitized HTML.
+
+    Parsing, sanitizing, the image-host check and the lesson media URL rewrite
+    all happen in one bleach tree walk, using a pipeline cached per thread and
+    per render settings.
+    """
+    return _safe_html_pipeline().render(markdown_text)
+
+
+def intro_only_markdown(learner_markdown: str) -> str:
+    lines = learner_markdown.splitlines()
+    collected: list[str] = []
+    for line in lines:
+        if line.startswith("## "):
+            break
+        collected.append(line)
+    intro = "\n".join(collected).strip()
+    if intro:
+        return intro + "\n"
+    return _LOCKED_INTRO_FALLBACK_MARKDOWN
+
+
+def learner_lesson_markdown(body_markdown: str, *, locked: bool) -> str:
+    """Learner-facing markdown for a lesson body; locked lessons keep only the intro."""
+    learner_markdown, _ = split_lesson_markdown_for_audiences(body_markdown)
+    if locked:
+        learner_markdown = intro_only_markdown(learner_markdown)
+    if not learner_markdown.strip():
+        learner_markdown = _LEARNER_FALLBACK_MARKDOWN
+    return learner_markdown
+
+
+def _render_settings_fingerprint() -> str:
+    payload = [_LESSON_HTML_RENDER_VERSION, *_render_settings()]
+    return hashlib.sha256(json.dumps(payload).encode("utf-8")).hexdigest()[:16]
+
+
+def lesson_html_cache_key(lesson_path: Path, mtime_ns: int, variant: str) -> str:
+    source = f"{lesson_path}|{int(mtime_ns)}|{variant}|{_render_settings_fingerprint()}"
+    return f"classhub:lesson_html:{hashlib.sha256(source.encode('utf-8')).hexdigest()}"
+
+
+def _lesson_html_cache_seconds() -> int:
+    return max(int(getattr(settings, "CLASSHUB_LESSON_HTML_CACHE_SECONDS", 86400) or 0), 0)
+
+
+def _render_lesson_variant(course_slug: str, lesson_slug: str, variant: str) -> str:
+    front_matter, body_markdown, _ = load_lesson_markdown(course_slug, lesson_slug)
+    if variant == LESSON_HTML_TEACHER:
+        _, teacher_body = split_lesson_markdown_for_audiences(body_markdown)
+        teacher_panel = teacher_panel_markdown(front_matter)
+        teacher_markdown = "\n\n".join(part.strip() for part in [teacher_panel, teacher_body] if part.strip()).strip()
+        if not teacher_markdown:
+            return ""
+        return render_markdown_to_safe_html(teacher_markdown)
+    locked = variant == LESSON_HTML_INTRO
+    return render_markdown_to_safe_html(learner_lesson_markdown(body_markdown, locked=locked))
+
+
+def load_lesson_html(course_slug: str, lesson_slug: str, variant: str, *, refresh: bool = False) -> str:
+    """Return sanitized lesson HTML for one audience, rendered at most once per lesson file version.
+
+    Rendered fragments live in the shared cache under (path, mtime, render settings),
+    so every worker reuses them and a re-imported or edited lesson gets a new key.
+    `refresh=True` re-renders and overwrites the cached fragment.
+    Raises ValueError for invalid lesson front matter, like `load_lesson_markdown`.
+    """
+    if variant not in LESSON_HTML_VARIANTS:
+        raise ValueError(f"unknown lesson HTML variant: {variant}")
+    ttl = _lesson_html_cache_seconds()
+    lesson_path, mtime_ns, _ = _lesson_source(course_slug, lesson_slug)
+    if lesson_path is None or ttl <= 0:
+        return _render_lesson_variant(course_slug, lesson_slug, variant)
+
+    # The mtime is taken before reading: if the file changes mid-render, the fragment lands under the old key.
+    key = lesson_html_cache_key(lesson_path, mtime_ns, variant)
+    if not refresh:
+        html = cache.get(key)
+        if isinstance(html, str):
+            return html
+    html = _render_lesson_variant(course_slug, lesson_slug, variant)
+    cache.set(key, html, timeout=ttl)
+    return html
 
 
 def load_teacher_material_html(course_slug: str, lesson_slug: str) -> str:
     try:
-        front_matter, body_markdown, _ = load_lesson_markdown(course_slug, lesson_slug)
+        return load_lesson_html(course_slug, lesson_slug, LESSON_HTML_TEACHER)
     except ValueError:
         return ""
-
-    _, teacher_body = split_lesson_markdown_for_audiences(body_markdown)
-    teacher_panel = teacher_panel_markdown(front_matter)
-    teacher_markdown = "\n\n".join(part.strip() for part in [teacher_panel, teacher_body] if part.strip()).strip()
-    if not teacher_markdown:
-        return ""
-    return render_markdown_to_safe_html(teacher_markdown)
@@ -0,0 +1,170 @@
+"""Short-lived shared cache of the rows behind a student session.
+
+`StudentSessionMiddleware` resolves (student_id, class_id) on every student
+request. Entries hold the student and classroom field values for
+`CLASSHUB_STUDENT_SESSION_CACHE_SECONDS` and remember the class's session-cache
+version at the time they were read. Model signals drop a student's entry when
+the student is saved or deleted, and bump the class version when the class is
+saved (lock, epoch rotation, rename, ...) or deleted, so those changes apply on
+the next request instead of at expiry.
+
+`last_seen_at` is left out of entries (it is loaded on first access), because
+it is written on most student visits and would otherwise evict the entry each
+time.
+"""
+
+from __future__ import annotations
+
+import logging
+import threading
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import router
+
+from ..models import Class, StudentIdentity
+
+logger = logging.getLogger(__name__)
+
+_STATS_LOG_EVERY = 1000
+_STUDENT_FIELDS = tuple(f.attname for f in StudentIdentity._meta.concrete_fields if f.attname != "last_seen_at")
+_CLASS_FIELDS = tuple(f.attname for f in Class._meta.concrete_fields)
+
+_stats_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0}
+
+
+def student_session_cache_key(student_id: int) -> str:
+    return f"classhub:student_session:student:{int(student_id)}"
+
+
+def class_session_version_key(class_id: int) -> str:
+    return f"classhub:student_session:version:class:{int(class_id)}"
+
+
+def _cache_seconds() -> int:
+    return max(int(getattr(settings, "CLASSHUB_STUDENT_SESSION_CACHE_SECONDS", 30) or 0), 0)
+
+
+def _record(outcome: str) -> None:
+    with _stats_lock:
+        _stats[outcome] += 1
+        lookups = _stats["hits"] + _stats["misses"]
+    if lookups % _STATS_LOG_EVERY == 0:
+        stats = student_session_cache_stats()
+        logger.info(
+            "student_session_cache_stats hits=%s misses=%s hit_rate=%s",
+            stats["hits"],
+            stats["misses"],
+            stats["hit_rate"],
+        )
+
+
+def student_session_cache_stats() -> dict:
+    """Hit/miss counts for this process since start (or the last reset)."""
+    with _stats_lock:
+        stats = dict(_stats)
+    lookups = stats["hits"] + stats["misses"]
+    stats["hit_rate"] = round(stats["hits"] / lookups, 3) if lookups else 0.0
+    return stats
+
+
+def reset_student_session_cache_stats() -> None:
+    with _stats_lock:
+        for outcome in _stats:
+            _stats[outcome] = 0
+
+
+def _load_from_db(student_id: int, class_id: int):
+    # Resolve both records in one query via select_related.
+    student = (
+        StudentIdentity.objects.select_related("classroom")
+        .filter(id=student_id, classroom_id=class_id)
+        .first()
+    )
+    if student is None or student.classroom is None:
+        return None, None
+    return student, student.classroom
+
+
+def _from_entry(entry) -> tuple:
+    student = StudentIdentity.from_db(router.db_for_read(StudentIdentity), _STUDENT_FIELDS, entry["student"])
+    classroom = Class.from_db(router.db_for_read(Class), _CLASS_FIELDS, entry["classroom"])
+    student.classroom = classroom
+    return student, classroom
+
+
+def resolve_student_session(student_id, class_id) -> tuple:
+    """Return (student, classroom) for a session binding, or (None, None) if it no longer exists.
+
+    Callers still compare the classroom's `session_epoch` with the session's; a
+    cached classroom is never older than the last committed epoch rotation.
+    """
+    try:
+        student_id = int(student_id)
+        class_id = int(class_id)
+    except (TypeError, ValueError):
+        return None, None
+
+    ttl = _cache_seconds()
+    if ttl <= 0:
+        return _load_from_db(student_id, class_id)
+
+    entry_key = student_session_cache_key(student_id)
+    version_key = class_session_version_key(class_id)
+    try:
+        cached = cache.get_many([entry_key, version_key])
+    except Exception:
+        logger.warning("student_session_cache_get_failed student_id=%s", student_id)
+        cached = None
+
+    if cached is not None:
+        # Read before the database so a change committed mid-request leaves the entry stale-tagged.
+        version = int(cached.get(version_key) or 0)
+        entry = cached.get(entry_key)
+        if (
+            isinstance(entry, dict)
+            and entry.get("class_id") == class_id
+            and entry.get("version") == version
+        ):
+            _record("hits")
+            return _from_entry(entry)
+    _record("misses")
+
+    student, classroom = _load_from_db(student_id, class_id)
+    if student is None or cached is None:
+        return student, classroom
+    entry = {
+        "class_id": class_id,
+        "version": version,
+        "student": tuple(getattr(student, name) for name in _STUDENT_FIELDS),
+        "classroom": tuple(getattr(classroom, name) for name in _CLASS_FIELDS),
+    }
+    try:
+        cache.set(entry_key, entry, timeout=ttl)
+    except Exception:
+        logger.warning("student_session_cache_set_failed student_id=%s", student_id)
+    return student, classroom
+
+
+def forget_student_session(student_id: int) -> None:
+    """Drop one student's cached entry (rename, delete, ...)."""
+    try:
+        cache.delete(student_session_cache_key(student_id))
+    except Exception:
+        # Entries still expire on their short TTL.
+        logger.warning("student_session_cache_delete_failed student_id=%s", student_id)
+
+
+def bump_class_session_version(class_id: int) -> None:
+    """Invalidate every cached student entry for one class (lock, epoch rotation, delete, ...)."""
+    key = class_session_version_key(class_id)
+    try:
+        try:
+            cache.incr(key)
+        except ValueError:
+            if not cache.add(key, 1, timeout=None):
+                cache.incr(key)
+    except Exception:
+        # Entries still expire on their short TTL.
+        logger.warning("student_session_version_bump_failed class_id=%s", class_id)
@@ -13,6 +13,7 @@ from pathlib import Path
 import defusedxml.ElementTree as ET
 
 from .content_links import courses_dir
+from .markdown_content import bump_content_version
 
 SESSION_TEMPLATE_RE = re.compile(
     r"^\s{0,3}(?:#\s*)?session\s*(\d{1,2})\s*:\s*(.+?)\s*$",
@@ -837,6 +838,7 @@ def _write_course(
         shutil.rmtree(tmp_dir, ignore_errors=True)
         raise
 
+    bump_content_version()
     return destination
 
 
@@ -1,15 +1,26 @@
-"""File cleanup hooks for storage-backed model fields.
+"""Model signal hooks.
 
-These handlers ensure uploaded files are removed when rows are deleted or when
-file fields are replaced with new uploads.
+File cleanup: uploaded files are removed when rows are deleted or when file
+fields are replaced with new uploads.
+
+Helper sessions: deleting a student or changing a class's session epoch bumps
+the class's session version in the helper cache, so the helper stops trusting
+its cached student-session checks for that class.
+
+Student sessions: Class Hub's own session cache drops a student's entry when the
+student is saved or deleted, and bumps the class's cache version whenever the
+class is saved or deleted (lock, epoch rotation, rename, ...).
 """
 
 from __future__ import annotations
 
-from django.db.models.signals import post_delete, pre_save
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
 from django.dispatch import receiver
 
-from .models import LessonAsset, LessonVideo, Submission
+from .models import Class, LessonAsset, LessonVideo, StudentIdentity, Submission
+from .services.helper_control import bump_helper_session_version
+from .services.student_session_cache import bump_class_session_version, forget_student_session
 
 
 def _remove_file_from_storage(field_file) -> None:
@@ -74,3 +85,43 @@ def _lesson_video_file_replaced(sender, instance: LessonVideo, **kwargs):
 def _lesson_video_file_deleted(sender, instance: LessonVideo, **kwargs):
     _remove_file_from_storage(getattr(instance, "video_file", None))
 
+
+def _bump_helper_sessions_on_commit(class_id) -> None:
+    if class_id:
+        # After commit, so the helper cannot re-confirm a row that is about to disappear.
+        transaction.on_commit(lambda: bump_helper_session_version(int(class_id)))
+
+
+def _invalidate_now_and_on_commit(invalidate, object_id) -> None:
+    if not object_id:
+        return
+    # Now, so in-flight requests stop reusing the entry; again after commit, so an
+    # entry re-cached from the pre-commit row is dropped too.
+    invalidate(int(object_id))
+    transaction.on_commit(lambda: invalidate(int(object_id)))
+
+
+@receiver(post_save, sender=StudentIdentity)
+def _student_identity_saved(sender, instance: StudentIdentity, update_fields=None, **kwargs):
+    # last_seen_at is not part of cached entries; visits should not evict them.
+    if update_fields and set(update_fields) <= {"last_seen_at"}:
+        return
+    _invalidate_now_and_on_commit(forget_student_session, instance.pk)
+
+
+@receiver(post_delete, sender=StudentIdentity)
+def _student_identity_deleted(sender, instance: StudentIdentity, **kwargs):
+    _invalidate_now_and_on_commit(forget_student_session, instance.pk)
+    _bump_helper_sessions_on_commit(getattr(instance, "classroom_id", None))
+
+
+@receiver(post_save, sender=Class)
+def _class_saved(sender, instance: Class, update_fields=None, **kwargs):
+    _invalidate_now_and_on_commit(bump_class_session_version, instance.pk)
+    if update_fields and "session_epoch" in update_fields:
+        _bump_helper_sessions_on_commit(instance.pk)
+
+
+@receiver(post_delete, sender=Class)
+def _class_deleted(sender, instance: Class, **kwargs):
+    _invalidate_now_and_on_commit(bump_class_session_version, instance.pk)
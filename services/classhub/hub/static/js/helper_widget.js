@@ -104,6 +104,47 @@
     }
     return text;
   };
+  const readHelperEventStream = async (res, onDelta) => {
+    const reader = res.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = "";
+    let streamed = "";
+    let finalData = null;
+    const handleFrame = (frame) => {
+      let eventName = "message";
+      const dataLines = [];
+      frame.split("\n").forEach((line) => {
+        if (line.startsWith("event:")) eventName = line.slice(6).trim();
+        else if (line.startsWith("data:")) dataLines.push(line.slice(5).trim());
+      });
+      if (!dataLines.length) return;
+      let data = null;
+      try {
+        data = JSON.parse(dataLines.join("\n"));
+      } catch (_err) {
+        return;
+      }
+      if (eventName === "delta") {
+        streamed += (data && data.text) || "";
+        onDelta(streamed);
+      } else if (eventName === "done" || eventName === "error") {
+        finalData = data;
+      }
+    };
+    for (;;) {
+      const { value, done } = await reader.read();
+      if (done) break;
+      buffer += decoder.decode(value, { stream: true });
+      let boundary = buffer.indexOf("\n\n");
+      while (boundary !== -1) {
+        handleFrame(buffer.slice(0, boundary));
+        buffer = buffer.slice(boundary + 2);
+        boundary = buffer.indexOf("\n\n");
+      }
+    }
+    if (buffer.trim()) handleFrame(buffer);
+    return finalData || { error: "stream_incomplete" };
+  };
   const detectPromptGroup = (ref, context, topics) => {
     const meta = `${ref} ${context} ${topics}`.toLowerCase();
     if (
@@ -261,6 +302,7 @@
         const payload = {
           message,
           conversation_id: conversationId,
+          stream: true,
         };
         if (scopeToken) {
           payload.scope_token = scopeToken;
@@ -270,6 +312,7 @@
           method: "POST",
           headers: {
             "Content-Type": "application/json",
+            Accept: "text/event-stream, application/json",
             "X-CSRFToken": csrfToken(),
           },
           credentials: "same-origin",
@@ -278,7 +321,9 @@
 
         let data = null;
         const contentType = (res.headers.get("Content-Type") || "").toLowerCase();
-        if (contentType.includes("application/json")) {
+        if (res.ok && res.body && contentType.includes("text/event-stream")) {
+          data = await readHelperEventStream(res, (partialText) => setOutput(partialText));
+        } else if (contentType.includes("application/json")) {
           try {
             data = await res.json();
           } catch (_err) {
@@ -290,7 +335,7 @@
           conversationId = data.conversation_id.trim();
         }
 
-        if (!res.ok) {
+        if (!res.ok || (data && typeof data.error === "string")) {
           const requestIdHeader = (res.headers.get("X-Request-ID") || "").trim();
           const errorText = formatHelperErrorText({
             status: res.status,
@@ -18,6 +18,28 @@
     });
   });
 
+  const helperResetProgress = document.getElementById("helper-reset-progress");
+  const pollHelperReset = async () => {
+    const url = String((helperResetProgress && helperResetProgress.dataset.statusUrl) || "").trim();
+    if (!url) return;
+    let payload = null;
+    try {
+      const resp = await fetch(url, {
+        method: "GET",
+        credentials: "same-origin",
+        headers: { Accept: "application/json" },
+      });
+      if (resp.ok) payload = await resp.json();
+    } catch (_err) {
+      payload = null;
+    }
+    const state = String((payload && payload.status) || "");
+    if (!payload || state === "idle") return;
+    helperResetProgress.textContent = String(payload.message || "");
+    if (state !== "done" && state !== "failed") window.setTimeout(pollHelperReset, 2000);
+  };
+  pollHelperReset();
+
   const studentIdFor = (el) => {
     if (!el) return "";
     return String(el.getAttribute("data-return-code-student-id") || "").trim();
@@ -312,3 +312,53 @@ class InternalHelperEventEndpointTests(TestCase):
         self.assertFalse(
             StudentEvent.objects.filter(event_type=StudentEvent.EVENT_HELPER_CHAT_ACCESS).exists()
         )
+
+    @override_settings(CLASSHUB_INTERNAL_EVENTS_TOKEN="expected-token")
+    def test_internal_bulk_event_endpoint_inserts_batch_and_skips_invalid_rows(self):
+        events = [
+            {
+                "classroom_id": self.classroom.id,
+                "student_id": self.student.id,
+                "ip_address": "127.0.0.1",
+                "details": {"request_id": f"req-{index}", "actor_type": "student", "prompt": "secret"},
+            }
+            for index in range(20)
+        ]
+        events.append({"details": {"request_id": "req-no-actor"}})
+        events.append({"classroom_id": self.classroom.id, "details": "not-a-dict"})
+        events.append({"classroom_id": self.classroom.id, "student_id": 999999, "details": {"request_id": "stale"}})
+
+        with self.assertNumQueries(3):
+            resp = self.client.post(
+                f"{self.url}/bulk",
+                data=json.dumps({"events": events}),
+                content_type="application/json",
+                HTTP_X_CLASSHUB_INTERNAL_TOKEN="expected-token",
+            )
+
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.json(), {"ok": True, "created": 20, "skipped": 3})
+        stored = StudentEvent.objects.filter(event_type=StudentEvent.EVENT_HELPER_CHAT_ACCESS)
+        self.assertEqual(stored.count(), 20)
+        self.assertFalse(any("prompt" in event.details for event in stored))
+        self.assertEqual({event.ip_address for event in stored}, {"127.0.0.0"})
+
+    @override_settings(CLASSHUB_INTERNAL_EVENTS_TOKEN="expected-token")
+    def test_internal_bulk_event_endpoint_rejects_bad_token_and_oversized_batches(self):
+        body = json.dumps({"events": [{"classroom_id": self.classroom.id}] * 501})
+        forbidden = self.client.post(
+            f"{self.url}/bulk",
+            data=body,
+            content_type="application/json",
+            HTTP_X_CLASSHUB_INTERNAL_TOKEN="wrong-token",
+        )
+        oversized = self.client.post(
+            f"{self.url}/bulk",
+            data=body,
+            content_type="application/json",
+            HTTP_X_CLASSHUB_INTERNAL_TOKEN="expected-token",
+        )
+
+        self.assertEqual(forbidden.status_code, 403)
+        self.assertEqual(oversized.status_code, 413)
+        self.assertFalse(StudentEvent.objects.filter(event_type=StudentEvent.EVENT_HELPER_CHAT_ACCESS).exists())
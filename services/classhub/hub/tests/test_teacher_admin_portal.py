@@ -938,6 +938,30 @@ class TeacherPortalTests(TestCase):
         self.assertEqual(StudentEvent.objects.filter(student_id=student.id).count(), 0)
         self.assertEqual(StudentEvent.objects.filter(classroom=classroom).count(), 1)
 
+    def test_student_removal_and_epoch_change_bump_helper_session_version(self):
+        from django.core.cache import cache
+
+        from ..services.helper_control import helper_session_version_key
+
+        classroom = Class.objects.create(name="Helper Session Class", join_code="HSV12345")
+        student = StudentIdentity.objects.create(classroom=classroom, display_name="Ada")
+        key = helper_session_version_key(classroom.id)
+        cache.delete(key)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            student.delete()
+        self.assertEqual(cache.get(key), 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            classroom.name = "Renamed"
+            classroom.save(update_fields=["name"])
+        self.assertEqual(cache.get(key), 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            classroom.session_epoch += 1
+            classroom.save(update_fields=["session_epoch"])
+        self.assertEqual(cache.get(key), 2)
+
     @patch("hub.views.teacher_parts.content.generate_authoring_templates")
     def test_teach_home_can_generate_authoring_templates(self, mock_generate):
         mock_generate.return_value.output_paths = [
@@ -1374,6 +1398,43 @@ Session 02: Drift Tests
         self.assertEqual(event.classroom_id, classroom.id)
         self.assertEqual(event.metadata.get("error_code"), "helper_unreachable")
 
+    @patch("hub.views.teacher_parts.roster_helper_reset._helper_reset_job_status")
+    @patch("hub.views.teacher_parts.roster_class._reset_helper_class_conversations")
+    def test_teacher_helper_reset_runs_as_background_job(self, reset_mock, status_mock):
+        from django.core.cache import cache
+
+        classroom = Class.objects.create(name="Period Helper Job", join_code="HLJ12345")
+        cache.delete(f"classhub:helper_reset_job:{classroom.id}")
+        job_id = "a" * 32
+        reset_mock.return_value = HelperResetResult(ok=True, job_id=job_id, job_status="queued", status_code=202)
+
+        _force_login_staff_verified(self.client, self.staff)
+        resp = self.client.post(f"/teach/class/{classroom.id}/reset-helper-conversations")
+        self.assertEqual(resp.status_code, 302)
+        self.assertIn("notice=", resp["Location"])
+        self.assertTrue(reset_mock.call_args.kwargs["background"])
+        started = AuditEvent.objects.filter(action="class.reset_helper_conversations_started").order_by("-id").first()
+        self.assertEqual(started.metadata.get("job_id"), job_id)
+
+        status_mock.return_value = HelperResetResult(
+            ok=True, job_id=job_id, job_status="running", phase="clear", processed=2, total=5, status_code=200
+        )
+        running = self.client.get(f"/teach/class/{classroom.id}/helper-reset-status")
+        self.assertEqual(running.json()["status"], "running")
+        self.assertEqual((running.json()["processed"], running.json()["total"]), (2, 5))
+        self.assertIn("no-store", running["Cache-Control"])
+
+        status_mock.return_value = HelperResetResult(
+            ok=True, job_id=job_id, job_status="done", deleted_conversations=5, status_code=200
+        )
+        done = self.client.get(f"/teach/class/{classroom.id}/helper-reset-status")
+        self.assertEqual(done.json()["status"], "done")
+        self.assertEqual(status_mock.call_args.kwargs["job_id"], job_id)
+        self.assertEqual(self.client.get(f"/teach/class/{classroom.id}/helper-reset-status").json(), {"status": "idle"})
+        events = AuditEvent.objects.filter(action="class.reset_helper_conversations", classroom=classroom)
+        self.assertEqual(events.count(), 1)
+        self.assertEqual(events.first().metadata.get("deleted_conversations"), 5)
+
     @override_settings(
         EMAIL_BACKEND="django.core.mail.backends.locmem.EmailBackend",
         CLASSHUB_PRODUCT_NAME="Pilot Classroom Hub",
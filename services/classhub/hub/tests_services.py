@@ -1,12 +1,17 @@
+import copy
+import os
 import zipfile
 import tempfile
-from io import BytesIO
+from io import BytesIO, StringIO
 from pathlib import Path
 from types import SimpleNamespace
+from unittest import skipUnless
 from unittest.mock import patch
 
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.core.cache import cache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management import call_command
 from django.contrib.sessions.middleware import SessionMiddleware
 from django.db import connection
 from django.http import HttpResponse
@@ -14,12 +19,31 @@ from django.test import RequestFactory, SimpleTestCase, TestCase, override_setti
 from django.test.utils import CaptureQueriesContext
 from django.utils import timezone
 
-from common.request_safety import fixed_window_allow, token_bucket_allow
+from common.request_safety import (
+    ALGORITHMS,
+    LockedCacheLimiterEngine,
+    PreLimiter,
+    RateLimit,
+    RedisLimiterEngine,
+    allow_many,
+    fixed_window_allow,
+    limiter_engine,
+    prelimit_allow,
+    token_bucket_allow,
+)
 
 from .middleware import StudentSessionMiddleware
 from .models import Class, Material, StudentEvent, StudentIdentity
 from .services.markdown_content import (
+    CONTENT_VERSION_CACHE_KEY,
+    ContentRegistry,
+    LESSON_HTML_INTRO,
+    LESSON_HTML_LEARNER,
+    LESSON_HTML_TEACHER,
+    bump_content_version,
+    load_course_catalog,
     load_course_manifest,
+    load_lesson_html,
     load_lesson_markdown,
     render_markdown_to_safe_html,
     split_lesson_markdown_for_audiences,
@@ -29,8 +53,10 @@ from .services.content_links import (
     normalize_lesson_videos,
     parse_course_lesson_url,
 )
+from .services import markdown_content
 from .services.filenames import safe_filename
 from .services.ip_privacy import minimize_student_event_ip
+from .services.student_session_cache import reset_student_session_cache_stats, student_session_cache_stats
 from .services.release_state import (
     lesson_available_on,
     lesson_release_state,
@@ -81,6 +107,13 @@ class UploadPolicyServiceTests(SimpleTestCase):
         self.assertEqual(row["naming"], "studentname_session")
 
 
+try:
+    import fakeredis
+    import lupa  # noqa: F401  (fakeredis needs it for EVALSHA)
+except ImportError:  # pragma: no cover - optional test dependency
+    fakeredis = None
+
+
 class _FailingCache:
     def get(self, key):
         raise RuntimeError("cache down")
@@ -163,6 +196,128 @@ class RequestSafetyRateLimitResilienceTests(SimpleTestCase):
         self.assertTrue(allowed)
         self.assertTrue(any("coerce_float" in line for line in logs.output))
 
+    def test_allow_many_consumes_no_budget_when_any_limit_denies(self):
+        store = LocMemCache("request-safety-test", {})
+        actor = RateLimit(key="rl:actor", limit=5, window_seconds=60)
+        ip = RateLimit(key="rl:ip", limit=1, window_seconds=60)
+
+        self.assertEqual(allow_many([actor, ip], cache_backend=store), [True, True])
+        self.assertEqual(allow_many([actor, ip], cache_backend=store), [True, False])
+        self.assertEqual(store.get("rl:actor"), 1)
+        self.assertEqual(allow_many([RateLimit(key="rl:off", limit=0, window_seconds=60)], cache_backend=store), [True])
+
+    def test_allow_many_supports_sliding_and_gcra_algorithms(self):
+        store = LocMemCache("request-safety-algorithms", {})
+        for algorithm in ("sliding_window", "sliding_log", "gcra"):
+            limit = RateLimit(key=f"rl:{algorithm}", limit=2, window_seconds=60, algorithm=algorithm)
+            results = [allow_many([limit], cache_backend=store)[0] for _ in range(3)]
+            self.assertEqual(results, [True, True, False], algorithm)
+        with self.assertRaises(ValueError):
+            RateLimit(key="rl:bad", limit=1, window_seconds=60, algorithm="leaky")
+
+    @override_settings(
+        CACHES={
+            "default": {
+                "BACKEND": "django.core.cache.backends.redis.RedisCache",
+                "LOCATION": "redis://redis:6379/0",
+                "KEY_PREFIX": "site",
+            }
+        }
+    )
+    def test_limiter_engine_uses_lua_engine_for_configured_redis_cache(self):
+        engine = limiter_engine()
+        self.assertIsInstance(engine, RedisLimiterEngine)
+        self.assertIs(limiter_engine(cache), engine)
+        self.assertEqual(engine._make_key("rl:x"), "site:1:rl:x")
+        self.assertIsInstance(limiter_engine(LocMemCache("request-safety-engine", {})), LockedCacheLimiterEngine)
+
+    def test_prelimiter_decides_locally_until_sync_fraction_is_crossed(self):
+        store = LocMemCache("request-safety-prelimit", {})
+        engine = LockedCacheLimiterEngine(store)
+        prelimiter = PreLimiter()
+        limit = RateLimit(key="rl:api", limit=4, window_seconds=60)
+
+        results = [
+            prelimiter.allow_many([limit], engine=engine, sync_fraction=0.5, sync_interval_seconds=60)[0]
+            for _ in range(6)
+        ]
+
+        self.assertEqual(results, [True, True, True, True, False, False])
+        stats = prelimiter.stats()
+        self.assertEqual(stats["local"], 2)
+        self.assertEqual(stats["syncs"], 3)
+        self.assertEqual(stats["denied"], 2)
+
+    def test_prelimiter_logs_stats_while_denying_locally(self):
+        engine = LockedCacheLimiterEngine(LocMemCache("request-safety-prelimit-flood", {}))
+        prelimiter = PreLimiter()
+        limit = RateLimit(key="rl:flood", limit=1, window_seconds=60)
+
+        with patch("common.request_safety.prelimit._STATS_LOG_EVERY", 3):
+            with self.assertLogs("common.request_safety.prelimit", level="INFO") as logs:
+                results = [
+                    prelimiter.allow_many([limit], engine=engine, sync_interval_seconds=60)[0]
+                    for _ in range(3)
+                ]
+
+        self.assertEqual(results, [True, False, False])
+        self.assertEqual(prelimiter.stats()["syncs"], 2)
+        self.assertTrue(any("request_safety_prelimit_stats checks=3" in line for line in logs.output))
+
+    def test_prelimit_allow_uses_cache_directly_for_process_local_backends(self):
+        store = LocMemCache("request-safety-prelimit-local", {})
+        self.assertTrue(prelimit_allow("rl:local", limit=1, window_seconds=60, cache_backend=store))
+        self.assertFalse(prelimit_allow("rl:local", limit=1, window_seconds=60, cache_backend=store))
+        store.clear()
+        self.assertTrue(prelimit_allow("rl:local", limit=1, window_seconds=60, cache_backend=store))
+
+
+@skipUnless(fakeredis, "fakeredis[lua] is not installed")
+class RedisLimiterEngineTests(SimpleTestCase):
+    """Runs the Lua limiter scripts against fakeredis."""
+
+    def setUp(self):
+        self.server = fakeredis.FakeServer()
+        self.redis = fakeredis.FakeRedis(server=self.server)
+        self.engine = RedisLimiterEngine(client=self.redis, make_key=lambda key: f"site:1:{key}")
+
+    def test_each_algorithm_allows_up_to_its_limit(self):
+        for algorithm in ALGORITHMS:
+            limit = RateLimit(key=f"rl:{algorithm}", limit=2, window_seconds=60, algorithm=algorithm)
+            results = [self.engine.allow_many([limit])[0] for _ in range(3)]
+            self.assertEqual(results, [True, True, False], algorithm)
+            self.assertGreater(self.redis.pttl(f"site:1:rl:{algorithm}"), 0, algorithm)
+
+    def test_denied_batch_consumes_no_budget_for_any_algorithm(self):
+        blocker = RateLimit(key="rl:ip", limit=1, window_seconds=60)
+        self.assertEqual(self.engine.allow_many([blocker]), [True])
+        for algorithm in ALGORITHMS:
+            key = f"rl:actor:{algorithm}"
+            limit = RateLimit(key=key, limit=5, window_seconds=60, algorithm=algorithm)
+            self.assertEqual(self.engine.allow_many([limit]), [True])
+            before = self.redis.dump(f"site:1:{key}")
+            self.assertEqual(self.engine.allow_many([limit, blocker]), [True, False], algorithm)
+            self.assertEqual(self.redis.dump(f"site:1:{key}"), before, algorithm)
+        self.assertEqual(self.redis.get("site:1:rl:ip"), b"1")
+
+    def test_sync_flushes_pending_hits_and_checks_every_counter(self):
+        actor = RateLimit(key="rl:actor:sync", limit=10, window_seconds=60)
+        ip = RateLimit(key="rl:ip:sync", limit=3, window_seconds=60)
+        self.assertEqual(self.engine.sync_many([(actor, 4), (ip, 2)]), [(True, 5), (True, 3)])
+        self.assertEqual(self.engine.sync_many([(actor, 1), (ip, 0)]), [(True, 6), (False, 3)])
+        self.assertEqual(self.redis.get("site:1:rl:actor:sync"), b"6")
+
+    def test_script_errors_and_outages_fail_open(self):
+        self.redis.hset("site:1:rl:wrongtype", "x", "1")
+        wrong_type = RateLimit(key="rl:wrongtype", limit=1, window_seconds=60)
+        with self.assertLogs("common.request_safety", level="WARNING") as logs:
+            self.assertEqual(self.engine.allow_many([wrong_type, wrong_type]), [True, True])
+            self.server.connected = False
+            down = RateLimit(key="rl:down", limit=1, window_seconds=60)
+            self.assertEqual(self.engine.allow_many([down]), [True])
+            self.assertEqual(self.engine.sync_many([(down, 3)]), [(True, None)])
+        self.assertEqual(sum("op=eval" in line for line in logs.output), 3)
+
 
 class ReleaseStateServiceTests(SimpleTestCase):
     def test_parse_release_date_handles_invalid(self):
@@ -242,6 +397,21 @@ class MarkdownContentServiceTests(SimpleTestCase):
         self.assertIn('src="https://assets.example.org/lesson-asset/12/download"', html)
         self.assertIn('href="https://assets.example.org/lesson-video/4/stream"', html)
 
+    @override_settings(CLASSHUB_MARKDOWN_ALLOW_IMAGES=True, CLASSHUB_MARKDOWN_ALLOWED_IMAGE_HOSTS=[])
+    def test_render_pipeline_is_reused_until_render_settings_change(self):
+        markdown_text = "![a](/lesson-asset/1/download)\n\n[v](/lesson-video/2/stream?a=1&b=2)"
+        first = render_markdown_to_safe_html(markdown_text)
+        pipeline = markdown_content._safe_html_pipeline()
+        self.assertEqual(render_markdown_to_safe_html(markdown_text), first)
+        self.assertIs(markdown_content._safe_html_pipeline(), pipeline)
+
+        with override_settings(CLASSHUB_ASSET_BASE_URL="https://assets.example.org"):
+            rewritten = render_markdown_to_safe_html(markdown_text)
+            self.assertIsNot(markdown_content._safe_html_pipeline(), pipeline)
+        self.assertIn('src="https://assets.example.org/lesson-asset/1/download"', rewritten)
+        self.assertIn('href="https://assets.example.org/lesson-video/2/stream?a=1&amp;b=2"', rewritten)
+        self.assertIn('src="/lesson-asset/1/download"', first)
+
     @override_settings(CONTENT_ROOT="/tmp/does-not-exist")
     def test_load_course_manifest_rejects_invalid_course_slug(self):
         self.assertEqual(load_course_manifest("../bad"), {})
@@ -266,6 +436,114 @@ class MarkdownContentServiceTests(SimpleTestCase):
         self.assertEqual(body, "")
         self.assertEqual(meta.get("slug"), "lesson-1")
 
+    def test_course_catalog_is_shared_indexed_and_read_only(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            content_root = Path(tmpdir) / "content"
+            course_dir = content_root / "courses" / "demo"
+            course_dir.mkdir(parents=True, exist_ok=True)
+            (course_dir / "course.yaml").write_text(
+                "title: Demo\n"
+                "lessons:\n"
+                "  - slug: one\n"
+                "    title: First\n"
+                "  - slug: two\n"
+                "    title: Second\n"
+                "  - slug: one\n"
+                "    title: Duplicate\n",
+                encoding="utf-8",
+            )
+            with override_settings(CONTENT_ROOT=str(content_root)):
+                catalog = load_course_catalog("demo")
+                self.assertIs(load_course_catalog("demo"), catalog)
+                self.assertIs(load_course_manifest("demo"), catalog.manifest)
+                _fm, _body, meta = load_lesson_markdown("demo", "one")
+
+        self.assertEqual(meta["title"], "First")
+        self.assertIs(catalog.lesson("one"), meta)
+        self.assertEqual(catalog.position("two"), 1)
+        prev_lesson, next_lesson = catalog.neighbors("two")
+        self.assertEqual((prev_lesson["title"], next_lesson["title"]), ("First", "Duplicate"))
+        self.assertEqual(catalog.neighbors("missing"), (None, None))
+        with self.assertRaises(TypeError):
+            meta["title"] = "Changed"
+        with self.assertRaises(TypeError):
+            catalog.manifest["lessons"].append({})
+        editable = copy.deepcopy(catalog.manifest)
+        editable["lessons"][0]["title"] = "Changed"
+        self.assertEqual(type(editable["lessons"]), list)
+        self.assertEqual(catalog.lesson("one")["title"], "First")
+
+    @override_settings(CLASSHUB_CONTENT_REVALIDATE_SECONDS=30)
+    def test_content_registry_reuses_stats_until_interval_or_version_bump(self):
+        now = [100.0]
+        registry = ContentRegistry(clock=lambda: now[0])
+        cache.delete(CONTENT_VERSION_CACHE_KEY)
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = Path(tmpdir) / "course.yaml"
+            self.assertIsNone(registry.mtime_ns(path))
+            path.write_text("title: Demo\n", encoding="utf-8")
+            self.assertIsNone(registry.mtime_ns(path))
+
+            # Another worker's import bumps the shared version; this one notices on its next check.
+            cache.set(CONTENT_VERSION_CACHE_KEY, 1)
+            now[0] += 0.5
+            self.assertIsNone(registry.mtime_ns(path))
+            now[0] += 1.0
+            first = registry.mtime_ns(path)
+            self.assertEqual(first, path.stat().st_mtime_ns)
+
+            os.utime(path, ns=(first, first + 1_000_000))
+            now[0] += 5
+            self.assertEqual(registry.mtime_ns(path), first)
+            now[0] += 30
+            self.assertEqual(registry.mtime_ns(path), first + 1_000_000)
+
+    def test_lesson_html_is_rendered_once_per_file_version(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            content_root = Path(tmpdir) / "content"
+            course_dir = content_root / "courses" / "demo"
+            course_dir.mkdir(parents=True, exist_ok=True)
+            (course_dir / "course.yaml").write_text(
+                "lessons:\n  - slug: lesson-1\n    file: lessons/01.md\n",
+                encoding="utf-8",
+            )
+            lesson_path = course_dir / "lessons" / "01.md"
+            lesson_path.parent.mkdir()
+            lesson_path.write_text(
+                "Welcome\n\n## Build\nMake a sprite\n\n## Teacher prep\nBring cables\n",
+                encoding="utf-8",
+            )
+            cache.clear()
+            with (
+                override_settings(CONTENT_ROOT=str(content_root)),
+                patch(
+                    "hub.services.markdown_content.render_markdown_to_safe_html",
+                    side_effect=render_markdown_to_safe_html,
+                ) as render_mock,
+            ):
+                call_command("prerender_lessons", course_slug=["demo"], stdout=StringIO())
+                self.assertEqual(render_mock.call_count, 3)
+
+                learner = load_lesson_html("demo", "lesson-1", LESSON_HTML_LEARNER)
+                intro = load_lesson_html("demo", "lesson-1", LESSON_HTML_INTRO)
+                teacher = load_lesson_html("demo", "lesson-1", LESSON_HTML_TEACHER)
+                self.assertEqual(render_mock.call_count, 3)
+                self.assertIn("Make a sprite", learner)
+                self.assertNotIn("Make a sprite", intro)
+                self.assertIn("Bring cables", teacher)
+                self.assertNotIn("Bring cables", learner)
+
+                stat = lesson_path.stat()
+                lesson_path.write_text("Welcome\n\n## Build\nMake two sprites\n", encoding="utf-8")
+                os.utime(lesson_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+                bump_content_version()
+                self.assertIn("Make two sprites", load_lesson_html("demo", "lesson-1", LESSON_HTML_LEARNER))
+                self.assertEqual(render_mock.call_count, 4)
+
+                with override_settings(CLASSHUB_ASSET_BASE_URL="https://assets.example.org"):
+                    load_lesson_html("demo", "lesson-1", LESSON_HTML_LEARNER)
+                self.assertEqual(render_mock.call_count, 5)
+
 
 class UiDensityServiceTests(SimpleTestCase):
     def test_default_ui_density_mode_maps_program_profiles(self):
@@ -715,6 +993,60 @@ class StudentSessionMiddlewareTests(TestCase):
         self.assertEqual(request.student.id, self.student.id)
         self.assertEqual(request.classroom.id, self.classroom.id)
 
+    def test_repeat_student_requests_are_served_from_session_cache(self):
+        reset_student_session_cache_stats()
+        request = self._request_with_student_session("/student")
+        with self.assertNumQueries(1):
+            self.middleware(request)
+        request = self._request_with_student_session("/student")
+        with self.assertNumQueries(0):
+            self.middleware(request)
+        self.assertEqual(request.student.display_name, "Ada")
+        self.assertEqual(request.classroom.join_code, "SESS1234")
+        self.assertEqual(student_session_cache_stats(), {"hits": 1, "misses": 1, "hit_rate": 0.5})
+
+        # last_seen_at is loaded on access and saving it keeps the entry.
+        request.student.last_seen_at = timezone.now()
+        request.student.save(update_fields=["last_seen_at"])
+        request = self._request_with_student_session("/student")
+        with self.assertNumQueries(0):
+            self.middleware(request)
+
+    def test_session_epoch_rotation_logs_student_out_immediately(self):
+        request = self._request_with_student_session("/student")
+        self.middleware(request)
+        self.middleware(request)
+        self.assertIsNotNone(request.student)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.classroom.session_epoch += 1
+            self.classroom.save(update_fields=["session_epoch"])
+
+        self.middleware(request)
+        self.assertIsNone(request.student)
+        self.assertIsNone(request.classroom)
+        self.assertNotIn("student_id", request.session)
+
+    def test_rename_lock_and_delete_invalidate_cached_session(self):
+        self.middleware(self._request_with_student_session("/student"))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.student.display_name = "Grace"
+            self.student.save(update_fields=["display_name"])
+            self.classroom.is_locked = True
+            self.classroom.save(update_fields=["is_locked"])
+        request = self._request_with_student_session("/student")
+        with self.assertNumQueries(1):
+            self.middleware(request)
+        self.assertEqual(request.student.display_name, "Grace")
+        self.assertTrue(request.classroom.is_locked)
+
+        request = self._request_with_student_session("/student")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.student.delete()
+        self.middleware(request)
+        self.assertIsNone(request.student)
+
 
 class IPPrivacyServiceTests(SimpleTestCase):
     def test_minimize_student_event_ip_truncates_ipv4_by_default(self):
@@ -17,7 +17,7 @@ from .api_teacher import (
     api_teacher_toggle_lock,
 )
 from .content import course_lesson, course_overview, iter_course_lesson_options
-from .internal import internal_helper_chat_access_event
+from .internal import internal_helper_chat_access_event, internal_helper_chat_access_events_bulk
 from .media import lesson_asset_download, lesson_video_stream
 from .student_join import index, invite_join, join_class
 from .student import (
@@ -70,6 +70,7 @@ from .teacher import (
     teach_change_password,
     teach_rename_student,
     teach_reset_helper_conversations,
+    teach_helper_reset_status,
     teach_reset_roster,
     teach_rotate_code,
     teach_update_class_landing,
@@ -101,6 +102,7 @@ __all__ = [
     "index",
     "invite_join",
     "internal_helper_chat_access_event",
+    "internal_helper_chat_access_events_bulk",
     "iter_course_lesson_options",
     "join_class",
     "lesson_asset_download",
@@ -154,6 +156,7 @@ __all__ = [
     "teach_change_password",
     "teach_rename_student",
     "teach_reset_helper_conversations",
+    "teach_helper_reset_status",
     "teach_reset_roster",
     "teach_rotate_code",
     "teach_set_enrollment_mode",
@@ -9,7 +9,7 @@ from django.http import JsonResponse
 from django.utils import timezone
 from django.views.decorators.http import require_GET, require_POST
 
-from common.request_safety import client_ip_from_request, fixed_window_allow
+from common.request_safety import client_ip_from_request, prelimit_allow
 from ..http.headers import apply_no_store
 from ..models import Class, Submission
 from ..services.org_access import (
@@ -59,7 +59,13 @@ def _teacher_rate_limit(limit: int = 60, window_seconds: int = 60):
                 xff_index=getattr(settings, "REQUEST_SAFETY_XFF_INDEX", 0),
             )
             key = f"api_rate:teacher:{request.user.id}:ip:{client_ip}"
-            if not fixed_window_allow(key, limit=limit, window_seconds=window_seconds):
+            if not prelimit_allow(
+                key,
+                limit=limit,
+                window_seconds=window_seconds,
+                sync_fraction=getattr(settings, "REQUEST_SAFETY_PRELIMIT_SYNC_FRACTION", 0.5),
+                sync_interval_seconds=getattr(settings, "REQUEST_SAFETY_PRELIMIT_SYNC_INTERVAL_SECONDS", 2.0),
+            ):
                 return _json_no_store_response({"error": "rate_limited"}, status=429, private=True)
             return view_func(request, *args, **kwargs)
         return _wrapped_view
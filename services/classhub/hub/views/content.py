@@ -21,10 +21,12 @@ from ..services.content_links import (
     video_mime_type,
 )
 from ..services.markdown_content import (
+    LESSON_HTML_INTRO,
+    LESSON_HTML_LEARNER,
+    load_course_catalog,
     load_course_manifest,
+    load_lesson_html,
     load_lesson_markdown,
-    render_markdown_to_safe_html,
-    split_lesson_markdown_for_audiences,
 )
 from ..services.helper_topics import (
     build_allowed_topics,
@@ -85,19 +87,6 @@ def course_overview(request, course_slug: str):
     )
 
 
-def _intro_only_markdown(learner_markdown: str) -> str:
-    lines = learner_markdown.splitlines()
-    collected: list[str] = []
-    for line in lines:
-        if line.startswith("## "):
-            break
-        collected.append(line)
-    intro = "\n".join(collected).strip()
-    if intro:
-        return intro + "\n"
-    return "### Intro\nYour teacher will open the full lesson on the scheduled date.\n"
-
-
 def _find_lesson_upload_material(classroom_id: int, course_slug: str, lesson_slug: str):
     """Find the upload material linked to a lesson for a specific class."""
     lesson_url = f"/course/{course_slug}/{lesson_slug}"
@@ -197,7 +186,6 @@ def course_lesson(request, course_slug: str, lesson_slug: str):
         lesson_front_matter=fm,
     )
 
-    learner_body_md, _teacher_body_md = split_lesson_markdown_for_audiences(body_md)
     classroom_id = getattr(getattr(request, "classroom", None), "id", 0) or 0
     release_override_map = lesson_release_override_map(classroom_id) if classroom_id else {}
     release_override = release_override_map.get((course_slug, lesson_slug))
@@ -213,21 +201,15 @@ def course_lesson(request, course_slug: str, lesson_slug: str):
     lesson_locked = bool(release_state.get("is_locked"))
     lesson_available_on = release_state.get("available_on")
 
-    if lesson_locked:
-        learner_body_md = _intro_only_markdown(learner_body_md)
-
-    if not learner_body_md.strip():
-        learner_body_md = "### Learner activity\nAsk your teacher for today's activity steps.\n"
-    html = render_markdown_to_safe_html(learner_body_md)
+    # Rendered once per lesson file version and shared across workers; see load_lesson_html.
+    html = load_lesson_html(course_slug, lesson_slug, LESSON_HTML_INTRO if lesson_locked else LESSON_HTML_LEARNER)
     lesson_videos = normalize_lesson_videos(fm)
     lesson_videos.extend(_normalize_stored_lesson_videos(course_slug, lesson_slug))
     if lesson_locked:
         lesson_videos = []
 
-    lessons = manifest.get("lessons") or []
-    idx = next((i for i, l in enumerate(lessons) if l.get("slug") == lesson_slug), None)
-    prev_l = lessons[idx - 1] if isinstance(idx, int) and idx > 0 else None
-    next_l = lessons[idx + 1] if isinstance(idx, int) and idx + 1 < len(lessons) else None
+    catalog = load_course_catalog(course_slug)
+    prev_l, next_l = catalog.neighbors(lesson_slug) if catalog is not None else (None, None)
 
     helper_context = fm.get("title") or lesson_slug
     helper_topics = build_lesson_topics(fm)
@@ -12,7 +12,7 @@ from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_POST
 
-from ..models import StudentEvent
+from ..models import Class, StudentEvent, StudentIdentity
 from ..services.ip_privacy import minimize_student_event_ip
 
 logger = logging.getLogger(__name__)
@@ -95,10 +95,10 @@ def _sanitize_helper_event_details(details: dict) -> dict:
     return clean
 
 
-@csrf_exempt
-@require_POST
-def internal_helper_chat_access_event(request):
-    """Append helper chat metadata from homework_helper into StudentEvent."""
+_MAX_BULK_HELPER_EVENTS = 500
+
+
+def _internal_auth_error(request) -> JsonResponse | None:
     expected = _internal_events_token()
     if not expected:
         return JsonResponse({"error": "internal_event_token_not_configured"}, status=503)
@@ -106,12 +106,14 @@ def internal_helper_chat_access_event(request):
     provided = _request_token(request)
     if not provided or not secrets.compare_digest(provided, expected):
         return JsonResponse({"error": "forbidden"}, status=403)
+    return None
 
-    try:
-        payload = json.loads(request.body.decode("utf-8"))
-    except Exception:
-        return JsonResponse({"error": "bad_json"}, status=400)
 
+def _helper_event_from_payload(payload: dict) -> StudentEvent | None:
+    """Build an unsaved helper-chat StudentEvent, or None when the payload names no actor.
+
+    Raises ValueError("invalid_details") when `details` is not an object.
+    """
     try:
         classroom_id = int(payload.get("classroom_id") or 0)
     except Exception:
@@ -124,21 +126,44 @@ def internal_helper_chat_access_event(request):
     ip_address = minimize_student_event_ip((payload.get("ip_address") or "").strip())
     details = payload.get("details") or {}
     if not isinstance(details, dict):
-        return JsonResponse({"error": "invalid_details"}, status=400)
+        raise ValueError("invalid_details")
     details = _sanitize_helper_event_details(details)
 
     if classroom_id <= 0 and student_id <= 0:
+        return None
+
+    return StudentEvent(
+        classroom_id=classroom_id if classroom_id > 0 else None,
+        student_id=student_id if student_id > 0 else None,
+        event_type=StudentEvent.EVENT_HELPER_CHAT_ACCESS,
+        source="homework_helper.chat",
+        details=details,
+        ip_address=ip_address or None,
+    )
+
+
+@csrf_exempt
+@require_POST
+def internal_helper_chat_access_event(request):
+    """Append helper chat metadata from homework_helper into StudentEvent."""
+    auth_error = _internal_auth_error(request)
+    if auth_error is not None:
+        return auth_error
+
+    try:
+        payload = json.loads(request.body.decode("utf-8"))
+    except Exception:
+        return JsonResponse({"error": "bad_json"}, status=400)
+
+    try:
+        event = _helper_event_from_payload(payload)
+    except ValueError:
+        return JsonResponse({"error": "invalid_details"}, status=400)
+    if event is None:
         return JsonResponse({"ok": True, "skipped": "no_actor"})
 
     try:
-        StudentEvent.objects.create(
-            classroom_id=classroom_id if classroom_id > 0 else None,
-            student_id=student_id if student_id > 0 else None,
-            event_type=StudentEvent.EVENT_HELPER_CHAT_ACCESS,
-            source="homework_helper.chat",
-            details=details,
-            ip_address=ip_address or None,
-        )
+        event.save()
     except Exception as exc:
         logger.warning("internal_helper_event_write_failed: %s", exc.__class__.__name__)
         return JsonResponse({"error": "event_write_failed"}, status=500)
@@ -146,6 +171,67 @@ def internal_helper_chat_access_event(request):
     return JsonResponse({"ok": True})
 
 
+@csrf_exempt
+@require_POST
+def internal_helper_chat_access_events_bulk(request):
+    """Append a batch of helper chat events with one bulk insert.
+
+    Body: `{"events": [<payload accepted by the single-event endpoint>, ...]}`.
+    Events without an actor, with malformed details, or pointing at classes or
+    students that no longer exist are skipped instead of failing the batch.
+    """
+    auth_error = _internal_auth_error(request)
+    if auth_error is not None:
+        return auth_error
+
+    try:
+        payload = json.loads(request.body.decode("utf-8"))
+    except Exception:
+        return JsonResponse({"error": "bad_json"}, status=400)
+    raw_events = payload.get("events") if isinstance(payload, dict) else None
+    if not isinstance(raw_events, list):
+        return JsonResponse({"error": "invalid_events"}, status=400)
+    if len(raw_events) > _MAX_BULK_HELPER_EVENTS:
+        return JsonResponse({"error": "too_many_events", "max_events": _MAX_BULK_HELPER_EVENTS}, status=413)
+
+    events: list[StudentEvent] = []
+    skipped = 0
+    for raw in raw_events:
+        try:
+            event = _helper_event_from_payload(raw) if isinstance(raw, dict) else None
+        except ValueError:
+            event = None
+        if event is None:
+            skipped += 1
+            continue
+        events.append(event)
+
+    # One bulk insert must not fail on a stale id, so drop rows whose class or
+    # student has been deleted since the helper queued them.
+    class_ids = {event.classroom_id for event in events if event.classroom_id}
+    student_ids = {event.student_id for event in events if event.student_id}
+    known_class_ids = set(Class.objects.filter(id__in=class_ids).values_list("id", flat=True)) if class_ids else set()
+    known_student_ids = (
+        set(StudentIdentity.objects.filter(id__in=student_ids).values_list("id", flat=True)) if student_ids else set()
+    )
+    valid = [
+        event
+        for event in events
+        if (not event.classroom_id or event.classroom_id in known_class_ids)
+        and (not event.student_id or event.student_id in known_student_ids)
+    ]
+    skipped += len(events) - len(valid)
+
+    try:
+        StudentEvent.objects.bulk_create(valid)
+    except Exception as exc:
+        logger.warning("internal_helper_event_bulk_write_failed: %s", exc.__class__.__name__)
+        return JsonResponse({"error": "event_write_failed"}, status=500)
+
+    return JsonResponse({"ok": True, "created": len(valid), "skipped": skipped})
+
+
 __all__ = [
     "internal_helper_chat_access_event",
+    "internal_helper_chat_access_events_bulk",
 ]
@@ -43,6 +43,7 @@ from .teacher_parts.roster import (
     teach_move_module,
     teach_rename_student,
     teach_reset_helper_conversations,
+    teach_helper_reset_status,
     teach_reset_roster,
     teach_rotate_code,
     teach_update_class_landing,
@@ -87,6 +88,7 @@ __all__ = [
     "teach_delete_student_data",
     "teach_reset_roster",
     "teach_reset_helper_conversations",
+    "teach_helper_reset_status",
     "teach_toggle_lock",
     "teach_lock_class",
     "teach_export_class_summary_csv",
@@ -11,6 +11,7 @@ from .roster_class import (
     teach_rotate_code,
     teach_toggle_lock,
 )
+from .roster_helper_reset import teach_helper_reset_status
 from .roster_landing import teach_update_class_landing
 from .roster_certificates import (
     teach_download_certificate,
@@ -63,6 +64,7 @@ __all__ = [
     "teach_delete_student_data",
     "teach_reset_roster",
     "teach_reset_helper_conversations",
+    "teach_helper_reset_status",
     "teach_toggle_lock",
     "teach_lock_class",
     "teach_export_class_summary_csv",
@@ -16,6 +16,12 @@ from ...services.teacher_roster_class import (
     build_dashboard_context,
     export_submissions_today_archive,
 )
+from .roster_helper_reset import (
+    audit_helper_reset,
+    helper_reset_endpoint,
+    helper_reset_notice,
+    remember_helper_reset_job,
+)
 from .shared_auth import (
     staff_can_create_classes,
     staff_can_manage_classroom,
@@ -192,24 +198,33 @@ def teach_reset_helper_conversations(request, class_id: int):
 
     result = _reset_helper_class_conversations(
         class_id=classroom.id,
-        endpoint_url=str(getattr(settings, "HELPER_INTERNAL_RESET_URL", "") or "").strip(),
-        internal_token=str(getattr(settings, "HELPER_INTERNAL_API_TOKEN", "") or "").strip(),
-        timeout_seconds=float(getattr(settings, "HELPER_INTERNAL_RESET_TIMEOUT_SECONDS", 2.0) or 2.0),
         export_before_reset=export_before_reset,
+        background=bool(getattr(settings, "HELPER_INTERNAL_RESET_BACKGROUND", True)),
+        **helper_reset_endpoint(),
     )
-    if not result.ok:
+    if result.ok and not result.finished:
+        remember_helper_reset_job(classroom, result, export_before_reset=export_before_reset)
         _audit(
             request,
-            action="class.reset_helper_conversations_failed",
+            action="class.reset_helper_conversations_started",
             classroom=classroom,
             target_type="Class",
             target_id=str(classroom.id),
-            summary=f"Failed helper conversation reset for {classroom.name}",
-            metadata={
-                "error_code": result.error_code,
-                "status_code": result.status_code,
-            },
+            summary=f"Started helper conversation reset for {classroom.name}",
+            metadata={"job_id": result.job_id, "attached": result.attached},
         )
+        notice = "Helper conversation reset started."
+        if result.attached:
+            notice = "Helper conversation reset already running."
+        notice += " Progress is shown next to the reset button."
+        return _safe_internal_redirect(
+            request,
+            _with_notice(_teach_class_path(classroom.id), notice=notice),
+            fallback=_teach_class_path(classroom.id),
+        )
+
+    audit_helper_reset(request, classroom, result, export_before_reset=export_before_reset)
+    if not result.ok:
         return _safe_internal_redirect(
             request,
             _with_notice(
@@ -218,31 +233,9 @@ def teach_reset_helper_conversations(request, class_id: int):
             ),
             fallback=_teach_class_path(classroom.id),
         )
-
-    _audit(
-        request,
-        action="class.reset_helper_conversations",
-        classroom=classroom,
-        target_type="Class",
-        target_id=str(classroom.id),
-        summary=f"Reset helper conversations for {classroom.name}",
-        metadata={
-            "deleted_conversations": result.deleted_conversations,
-            "archived_conversations": result.archived_conversations,
-            "archive_path": result.archive_path,
-            "export_before_reset": export_before_reset,
-            "status_code": result.status_code,
-        },
-    )
-    notice = f"Helper conversations reset. Cleared {result.deleted_conversations} conversation(s)."
-    if result.archived_conversations > 0:
-        notice += f" Archived {result.archived_conversations} conversation(s)"
-        if result.archive_path:
-            notice += f" to {result.archive_path}"
-        notice += "."
     return _safe_internal_redirect(
         request,
-        _with_notice(_teach_class_path(classroom.id), notice=notice),
+        _with_notice(_teach_class_path(classroom.id), notice=helper_reset_notice(result)),
         fallback=_teach_class_path(classroom.id),
     )
 
@@ -0,0 +1,130 @@
+"""Teacher helper-conversation reset bookkeeping and background job status."""
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse, JsonResponse
+from django.views.decorators.http import require_GET
+
+from ...http.headers import apply_no_store
+from ...services.helper_control import HelperResetResult
+from ...services.helper_control import reset_job_status as _helper_reset_job_status
+from .shared_auth import staff_classroom_or_none, staff_member_required
+from .shared_routing import _audit
+
+_JOB_TTL_SECONDS = 3600
+
+
+def _job_cache_key(class_id: int) -> str:
+    return f"classhub:helper_reset_job:{int(class_id)}"
+
+
+def helper_reset_endpoint() -> dict:
+    return {
+        "endpoint_url": str(getattr(settings, "HELPER_INTERNAL_RESET_URL", "") or "").strip(),
+        "internal_token": str(getattr(settings, "HELPER_INTERNAL_API_TOKEN", "") or "").strip(),
+        "timeout_seconds": float(getattr(settings, "HELPER_INTERNAL_RESET_TIMEOUT_SECONDS", 2.0) or 2.0),
+    }
+
+
+def remember_helper_reset_job(classroom, result: HelperResetResult, *, export_before_reset: bool) -> None:
+    cache.set(
+        _job_cache_key(classroom.id),
+        {"job_id": result.job_id, "export_before_reset": bool(export_before_reset)},
+        timeout=_JOB_TTL_SECONDS,
+    )
+
+
+def audit_helper_reset(request, classroom, result: HelperResetResult, *, export_before_reset: bool) -> None:
+    """Record a finished reset, whether it ran inline or as a helper job."""
+    if not result.ok:
+        _audit(
+            request,
+            action="class.reset_helper_conversations_failed",
+            classroom=classroom,
+            target_type="Class",
+            target_id=str(classroom.id),
+            summary=f"Failed helper conversation reset for {classroom.name}",
+            metadata={
+                "error_code": result.error_code,
+                "status_code": result.status_code,
+                "job_id": result.job_id,
+            },
+        )
+        return
+    _audit(
+        request,
+        action="class.reset_helper_conversations",
+        classroom=classroom,
+        target_type="Class",
+        target_id=str(classroom.id),
+        summary=f"Reset helper conversations for {classroom.name}",
+        metadata={
+            "deleted_conversations": result.deleted_conversations,
+            "archived_conversations": result.archived_conversations,
+            "archive_path": result.archive_path,
+            "export_before_reset": export_before_reset,
+            "status_code": result.status_code,
+            "job_id": result.job_id,
+        },
+    )
+
+
+def helper_reset_notice(result: HelperResetResult) -> str:
+    notice = f"Helper conversations reset. Cleared {result.deleted_conversations} conversation(s)."
+    if result.archived_conversations > 0:
+        notice += f" Archived {result.archived_conversations} conversation(s)"
+        if result.archive_path:
+            notice += f" to {result.archive_path}"
+        notice += "."
+    return notice
+
+
+def _status_payload(result: HelperResetResult) -> dict:
+    if not result.ok:
+        return {"status": "failed", "error": result.error_code, "message": "Helper conversation reset failed."}
+    if result.finished:
+        return {"status": "done", "message": helper_reset_notice(result)}
+    if result.total:
+        message = f"Resetting helper conversations ({result.phase or 'queued'}: {result.processed}/{result.total})."
+    else:
+        message = "Helper conversation reset is queued."
+    return {
+        "status": result.job_status or "running",
+        "phase": result.phase,
+        "processed": result.processed,
+        "total": result.total,
+        "message": message,
+    }
+
+
+@staff_member_required
+@require_GET
+def teach_helper_reset_status(request, class_id: int):
+    classroom = staff_classroom_or_none(request.user, class_id)
+    if not classroom:
+        return HttpResponse("Not found", status=404)
+
+    tracked = cache.get(_job_cache_key(classroom.id))
+    if not isinstance(tracked, dict) or not tracked.get("job_id"):
+        payload = {"status": "idle"}
+    else:
+        result = _helper_reset_job_status(job_id=str(tracked["job_id"]), **helper_reset_endpoint())
+        if not result.job_id and result.error_code not in {"job_not_found", "invalid_job_id"}:
+            # Helper unreachable or misconfigured right now: keep the job and let the page poll again.
+            payload = {"status": "unknown", "error": result.error_code, "message": "Checking reset progress..."}
+        else:
+            payload = _status_payload(result)
+            # Whichever poll sees the job finish first removes it, so the outcome is audited once.
+            if payload["status"] in {"done", "failed"} and cache.delete(_job_cache_key(classroom.id)):
+                audit_helper_reset(
+                    request,
+                    classroom,
+                    result,
+                    export_before_reset=bool(tracked.get("export_before_reset")),
+                )
+    response = JsonResponse(payload)
+    apply_no_store(response, private=True, pragma=True)
+    return response
+
+
+__all__ = ["teach_helper_reset_status"]
@@ -0,0 +1,99 @@
+"""Raw Redis clients for caches configured with Django's built-in `RedisCache`.
+
+Django's Redis backend has no public accessor for its connection, but a few
+features need raw commands (Lua scripts for rate limits and the helper
+admission queue, sorted-set indexes). These helpers resolve a cache's alias
+from `settings.CACHES` and return a client for its `LOCATION` (the first
+server, which Django also writes to):
+
+- `redis_client(alias)`: one sync client per process and URL.
+- `async_redis_client(alias)`: one `redis.asyncio` client per running event
+  loop and URL, because async connections are bound to the loop that opened
+  them.
+
+Raw keys bypass `KEY_PREFIX`/`VERSION`; build them with `cache.make_key(...)`
+so deployments that share one Redis keep their namespaces apart.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import threading
+import weakref
+
+from django.conf import settings
+from django.core.cache import cache as default_cache
+from django.core.cache import caches
+
+REDIS_CACHE_BACKEND = "django.core.cache.backends.redis.RedisCache"
+
+_lock = threading.Lock()
+_clients: dict[str, object] = {}
+_clients_pid = os.getpid()
+_async_clients: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+
+
+def redis_url(alias: str = "default") -> str:
+    """Return the write server URL for a `RedisCache` alias, or "" for any other backend."""
+    config = settings.CACHES.get(alias) or {}
+    if config.get("BACKEND") != REDIS_CACHE_BACKEND:
+        return ""
+    location = config.get("LOCATION") or ""
+    if isinstance(location, (list, tuple)):
+        return str(location[0]) if location else ""
+    return str(location).split(",")[0].strip()
+
+
+def cache_alias(cache_backend) -> str | None:
+    """Return the `settings.CACHES` alias for a cache object, or None if it is not configured."""
+    if cache_backend is None or cache_backend is default_cache:
+        return "default"
+    for alias in settings.CACHES:
+        if caches[alias] is cache_backend:
+            return alias
+    return None
+
+
+def redis_client(alias: str = "default"):
+    """Return the process-wide sync client for a `RedisCache` alias, or None if it is not Redis."""
+    global _clients_pid
+    url = redis_url(alias)
+    if not url:
+        return None
+    with _lock:
+        if _clients_pid != os.getpid():
+            # Connections inherited across fork belong to the parent process.
+            _clients.clear()
+            _clients_pid = os.getpid()
+        client = _clients.get(url)
+        if client is None:
+            import redis
+
+            client = redis.Redis.from_url(url)
+            _clients[url] = client
+        return client
+
+
+def async_redis_client(alias: str = "default"):
+    """Return the running loop's async client for a `RedisCache` alias, or None if it is not Redis."""
+    url = redis_url(alias)
+    if not url:
+        return None
+    per_loop = _async_clients.setdefault(asyncio.get_running_loop(), {})
+    client = per_loop.get(url)
+    if client is None:
+        import redis.asyncio as redis_asyncio
+
+        client = redis_asyncio.Redis.from_url(url)
+        per_loop[url] = client
+    return client
+
+
+__all__ = [
+    "REDIS_CACHE_BACKEND",
+    "async_redis_client",
+    "cache_alias",
+    "redis_client",
+    "redis_url",
+]
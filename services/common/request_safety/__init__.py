@@ -4,11 +4,16 @@ Canonical usage:
 - `client_ip_from_request(...)` for proxy-aware IP extraction.
 - `fixed_window_allow(...)` for cache-backed burst limiting.
 - `token_bucket_allow(...)` when smoother refill behavior is needed.
+- `allow_many([RateLimit(...), ...])` to check several limits in one call.
+- `prelimit_allow(...)` / `prelimit_allow_many(...)` for hot paths: an
+  in-process counter tier that syncs to Redis only near the limit.
 - `build_staff_or_student_actor_key(...)` for optional per-actor limits.
 
 Canonical env knobs (documented in docs/REQUEST_SAFETY.md):
 - `REQUEST_SAFETY_TRUST_PROXY_HEADERS` (default: false)
 - `REQUEST_SAFETY_XFF_INDEX` (default: 0; client-most IP in X-Forwarded-For)
+- `REQUEST_SAFETY_PRELIMIT_SYNC_FRACTION` (default: 0.5; 0 syncs every check)
+- `REQUEST_SAFETY_PRELIMIT_SYNC_INTERVAL_SECONDS` (default: 2.0)
 
 Service-specific limit knobs remain local to each service:
 - Class Hub: `CLASSHUB_JOIN_RATE_LIMIT_PER_MINUTE`
@@ -19,72 +24,33 @@ from __future__ import annotations
 
 import logging
 import ipaddress
-import time
 from typing import Mapping
 
-from django.core.cache import cache as default_cache
+from .limiters import (
+    ALGORITHMS,
+    FIXED_WINDOW,
+    GCRA,
+    SLIDING_LOG,
+    SLIDING_WINDOW,
+    LockedCacheLimiterEngine,
+    RateLimit,
+    RedisLimiterEngine,
+    allow_many,
+    limiter_engine,
+)
+from .prelimit import (
+    DEFAULT_SYNC_FRACTION,
+    DEFAULT_SYNC_INTERVAL_SECONDS,
+    PreLimiter,
+    clear_prelimiter,
+    prelimit_allow,
+    prelimit_allow_many,
+    prelimiter_stats,
+)
 
 logger = logging.getLogger(__name__)
 
 
-def _log_cache_warning(
-    *,
-    op: str,
-    key: str,
-    request_id: str,
-    exc: Exception,
-) -> None:
-    rid = (request_id or "").strip() or "unknown"
-    logger.warning(
-        "request_safety_cache_warning request_id=%s op=%s key=%s error=%s",
-        rid,
-        op,
-        key,
-        exc.__class__.__name__,
-    )
-
-
-def _cache_get(store, key: str, *, request_id: str):
-    try:
-        return store.get(key), True
-    except Exception as exc:
-        _log_cache_warning(op="get", key=key, request_id=request_id, exc=exc)
-        return None, False
-
-
-def _cache_set(store, key: str, value, *, timeout: int, request_id: str) -> bool:
-    try:
-        store.set(key, value, timeout=timeout)
-        return True
-    except Exception as exc:
-        _log_cache_warning(op="set", key=key, request_id=request_id, exc=exc)
-        return False
-
-
-def _cache_incr(store, key: str, *, request_id: str):
-    try:
-        return store.incr(key), True
-    except Exception as exc:
-        _log_cache_warning(op="incr", key=key, request_id=request_id, exc=exc)
-        return None, False
-
-
-def _coerce_int(value, *, key: str, request_id: str, default: int = 0) -> int:
-    try:
-        return int(value)
-    except Exception as exc:
-        _log_cache_warning(op="coerce_int", key=key, request_id=request_id, exc=exc)
-        return default
-
-
-def _coerce_float(value, *, key: str, request_id: str, default: float = 0.0) -> float:
-    try:
-        return float(value)
-    except Exception as exc:
-        _log_cache_warning(op="coerce_float", key=key, request_id=request_id, exc=exc)
-        return default
-
-
 def parse_client_ip(
     meta: Mapping[str, str],
     *,
@@ -149,26 +115,11 @@ def fixed_window_allow(
     cache_backend=None,
     request_id: str = "",
 ) -> bool:
-    if limit <= 0:
-        return True
-    store = cache_backend or default_cache
-    window = max(int(window_seconds), 1)
-
-    current, ok = _cache_get(store, key, request_id=request_id)
-    if not ok:
-        # Fail-open: request handling must continue when cache backend is down.
-        return True
-    if current is None:
-        _cache_set(store, key, 1, timeout=window, request_id=request_id)
-        return True
-    current_int = _coerce_int(current, key=key, request_id=request_id, default=0)
-    if current_int >= limit:
-        return False
-    _, incr_ok = _cache_incr(store, key, request_id=request_id)
-    if not incr_ok:
-        next_value = current_int + 1
-        _cache_set(store, key, next_value, timeout=window, request_id=request_id)
-    return True
+    return allow_many(
+        [RateLimit(key=key, limit=limit, window_seconds=max(int(window_seconds), 1))],
+        cache_backend=cache_backend,
+        request_id=request_id,
+    )[0]
 
 
 def token_bucket_allow(
@@ -182,36 +133,15 @@ def token_bucket_allow(
 ) -> bool:
     if capacity <= 0 or refill_per_second <= 0 or cost <= 0:
         return False
-
-    store = cache_backend or default_cache
-    now = time.monotonic()
-    ttl = max(int((capacity / refill_per_second) * 4), 1)
-
-    state, ok = _cache_get(store, key, request_id=request_id)
-    if not ok:
-        # Fail-open: allow requests when limiter state cannot be read.
-        return True
-    if not isinstance(state, dict):
-        _log_cache_warning(
-            op="state_type",
-            key=key,
-            request_id=request_id,
-            exc=ValueError("invalid_state_type"),
-        )
-        state = {}
-    state = state or {"tokens": float(capacity), "last": now}
-    tokens = _coerce_float(state.get("tokens", capacity), key=key, request_id=request_id, default=float(capacity))
-    last = _coerce_float(state.get("last", now), key=key, request_id=request_id, default=now)
-
-    elapsed = max(now - last, 0.0)
-    tokens = min(float(capacity), tokens + (elapsed * float(refill_per_second)))
-
-    allowed = tokens >= float(cost)
-    if allowed:
-        tokens -= float(cost)
-
-    _cache_set(store, key, {"tokens": tokens, "last": now}, timeout=ttl, request_id=request_id)
-    return allowed
+    # GCRA is an exact token bucket: `capacity` burst, one token per 1/refill seconds.
+    limit = RateLimit(
+        key=key,
+        limit=capacity,
+        window_seconds=float(capacity) / float(refill_per_second),
+        algorithm=GCRA,
+        cost=cost,
+    )
+    return allow_many([limit], cache_backend=cache_backend, request_id=request_id)[0]
 
 
 def build_staff_actor_key(request, *, prefix: str = "staff") -> str:
@@ -265,11 +195,28 @@ def build_staff_or_student_actor_key(
 
 
 __all__ = [
+    "ALGORITHMS",
+    "DEFAULT_SYNC_FRACTION",
+    "DEFAULT_SYNC_INTERVAL_SECONDS",
+    "FIXED_WINDOW",
+    "GCRA",
+    "LockedCacheLimiterEngine",
+    "PreLimiter",
+    "RateLimit",
+    "RedisLimiterEngine",
+    "SLIDING_LOG",
+    "SLIDING_WINDOW",
+    "allow_many",
     "build_staff_actor_key",
     "build_staff_or_student_actor_key",
     "build_student_actor_key",
+    "clear_prelimiter",
     "client_ip_from_request",
     "fixed_window_allow",
+    "limiter_engine",
     "parse_client_ip",
+    "prelimit_allow",
+    "prelimit_allow_many",
+    "prelimiter_stats",
     "token_bucket_allow",
 ]
@@ -0,0 +1,513 @@
+"""Pluggable rate limiter engines for `common.request_safety`.
+
+A `RateLimit` names one limit (key, budget, window, algorithm). Engines check a
+batch of limits in one call and consume budget only when every limit allows the
+request, so a request denied by its IP limit does not also spend its actor
+budget.
+
+- `RedisLimiterEngine` runs one Lua script per batch: a single round trip that
+  reads and updates every key atomically, using the Redis clock. It is used
+  for caches configured in `settings.CACHES` with Django's `RedisCache`
+  (client from `common.redis_clients`; keys still go through `make_key`).
+- `LockedCacheLimiterEngine` serializes get/set calls on any other Django cache
+  under a process lock. That makes it atomic for per-process caches such as
+  locmem; other shared caches still race across processes.
+
+Both engines fail open when limiter state cannot be read or written. They also
+expose `sync_many`, which the in-process pre-limiter (`prelimit.py`) uses to
+flush locally counted hits into fixed-window counters.
+"""
+
+from __future__ import annotations
+
+import logging
+import math
+import threading
+import time
+from collections.abc import Callable, Sequence
+from dataclasses import dataclass
+
+from django.core.cache import cache as default_cache
+
+from ..redis_clients import cache_alias, redis_client, redis_url
+
+logger = logging.getLogger(__name__)
+
+FIXED_WINDOW = "fixed_window"
+SLIDING_WINDOW = "sliding_window"
+SLIDING_LOG = "sliding_log"
+GCRA = "gcra"
+ALGORITHMS = (FIXED_WINDOW, SLIDING_WINDOW, SLIDING_LOG, GCRA)
+
+
+def _log_cache_warning(
+    *,
+    op: str,
+    key: str,
+    request_id: str,
+    exc: Exception,
+) -> None:
+    rid = (request_id or "").strip() or "unknown"
+    logger.warning(
+        "request_safety_cache_warning request_id=%s op=%s key=%s error=%s",
+        rid,
+        op,
+        key,
+        exc.__class__.__name__,
+    )
+
+
+def _cache_get(store, key: str, *, request_id: str):
+    try:
+        return store.get(key), True
+    except Exception as exc:
+        _log_cache_warning(op="get", key=key, request_id=request_id, exc=exc)
+        return None, False
+
+
+def _cache_set(store, key: str, value, *, timeout: int, request_id: str) -> bool:
+    try:
+        store.set(key, value, timeout=timeout)
+        return True
+    except Exception as exc:
+        _log_cache_warning(op="set", key=key, request_id=request_id, exc=exc)
+        return False
+
+
+def _cache_incr(store, key: str, *, request_id: str, delta: int = 1):
+    try:
+        return (store.incr(key) if delta == 1 else store.incr(key, delta)), True
+    except Exception as exc:
+        _log_cache_warning(op="incr", key=key, request_id=request_id, exc=exc)
+        return None, False
+
+
+def _cache_add_incr(store, key: str, delta: int, *, timeout: int, request_id: str):
+    """Add `delta` to a counter, creating it with `timeout` when missing."""
+    try:
+        if store.add(key, delta, timeout=timeout):
+            return delta, True
+        return store.incr(key, delta), True
+    except Exception as exc:
+        _log_cache_warning(op="incr", key=key, request_id=request_id, exc=exc)
+        return None, False
+
+
+def _coerce_int(value, *, key: str, request_id: str, default: int = 0) -> int:
+    try:
+        return int(value)
+    except Exception as exc:
+        _log_cache_warning(op="coerce_int", key=key, request_id=request_id, exc=exc)
+        return default
+
+
+def _coerce_float(value, *, key: str, request_id: str, default: float = 0.0) -> float:
+    try:
+        return float(value)
+    except Exception as exc:
+        _log_cache_warning(op="coerce_float", key=key, request_id=request_id, exc=exc)
+        return default
+
+
+@dataclass(frozen=True)
+class RateLimit:
+    """One limit to enforce: at most `limit` units of `cost` per `window_seconds`.
+
+    Algorithms:
+    - `fixed_window`: counter that resets when its window expires.
+    - `sliding_window`: current + weighted previous window counter.
+    - `sliding_log`: exact count of hits within the trailing window.
+    - `gcra`: token bucket (GCRA) allowing bursts of `limit` and refilling
+      `limit` units per window.
+
+    A `limit` of zero or less disables the check.
+    """
+
+    key: str
+    limit: int
+    window_seconds: float
+    algorithm: str = FIXED_WINDOW
+    cost: float = 1.0
+
+    def __post_init__(self):
+        if self.algorithm not in ALGORITHMS:
+            raise ValueError(f"unknown rate limit algorithm: {self.algorithm}")
+
+    @property
+    def window(self) -> float:
+        return max(float(self.window_seconds), 0.001)
+
+    @property
+    def int_cost(self) -> int:
+        return max(int(math.ceil(float(self.cost))), 1)
+
+
+# KEYS[i] is the limiter key for limit i; ARGV holds (algorithm, limit,
+# window_ms, cost) per key. Every limit is evaluated first; state is only
+# written when all of them allow the request.
+_LIMITER_SCRIPT = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+local now_us = t[1] .. string.format('%06d', tonumber(t[2]))
+local allowed = {}
+local state = {}
+local all_ok = 1
+for i = 1, #KEYS do
+  local base = (i - 1) * 4
+  local algo = ARGV[base + 1]
+  local limit = tonumber(ARGV[base + 2])
+  local window = tonumber(ARGV[base + 3])
+  local cost = tonumber(ARGV[base + 4])
+  local key = KEYS[i]
+  local ok = 1
+  if algo == 'fixed_window' then
+    local current = tonumber(redis.call('GET', key) or '0') or 0
+    if current + cost > limit then ok = 0 end
+  elseif algo == 'sliding_window' then
+    local idx = math.floor(now / window)
+    local row = redis.call('HMGET', key, 'w', 'c', 'p')
+    local w = tonumber(row[1]) or -1
+    local curr, prev = 0, 0
+    if w == idx then
+      curr = tonumber(row[2]) or 0
+      prev = tonumber(row[3]) or 0
+    elseif w == idx - 1 then
+      prev = tonumber(row[2]) or 0
+    end
+    local weight = 1 - (now - idx * window) / window
+    if prev * weight + curr + cost > limit then ok = 0 end
+    state[i] = {idx, curr, prev}
+  elseif algo == 'sliding_log' then
+    redis.call('ZREMRANGEBYSCORE', key, '-inf', now - window)
+    local count = redis.call('ZCARD', key)
+    if count + cost > limit then ok = 0 end
+    state[i] = count
+  elseif algo == 'gcra' then
+    local tat = tonumber(redis.call('GET', key)) or now
+    if tat < now then tat = now end
+    local new_tat = tat + (window / limit) * cost
+    if new_tat - now > window then ok = 0 end
+    state[i] = new_tat
+  end
+  allowed[i] = ok
+  if ok == 0 then all_ok = 0 end
+end
+if all_ok == 1 then
+  for i = 1, #KEYS do
+    local base = (i - 1) * 4
+    local algo = ARGV[base + 1]
+    local window = tonumber(ARGV[base + 3])
+    local cost = tonumber(ARGV[base + 4])
+    local key = KEYS[i]
+    if algo == 'fixed_window' then
+      redis.call('INCRBY', key, cost)
+      if redis.call('PTTL', key) < 0 then redis.call('PEXPIRE', key, window) end
+    elseif algo == 'sliding_window' then
+      local s = state[i]
+      redis.call('HSET', key, 'w', s[1], 'c', s[2] + cost, 'p', s[3])
+      redis.call('PEXPIRE', key, window * 2)
+    elseif algo == 'sliding_log' then
+      for j = 1, cost do
+        redis.call('ZADD', key, now, now_us .. '-' .. (state[i] + j))
+      end
+      redis.call('PEXPIRE', key, window)
+    elseif algo == 'gcra' then
+      local ttl = math.max(math.ceil(state[i] - now), 1)
+      redis.call('SET', key, string.format('%.3f', state[i]), 'PX', ttl)
+    end
+  end
+end
+return allowed
+"""
+
+
+# KEYS[i] is a fixed-window counter; ARGV holds (pending, cost, limit,
+# window_ms) per key. Pending hits are always added; `cost` is added to every
+# counter only when all of them stay within their limit. Returns a flat
+# list of (allowed, total) pairs.
+_SYNC_SCRIPT = """
+local totals = {}
+local oks = {}
+local all_ok = 1
+for i = 1, #KEYS do
+  local base = (i - 1) * 4
+  local pending = tonumber(ARGV[base + 1])
+  local cost = tonumber(ARGV[base + 2])
+  local limit = tonumber(ARGV[base + 3])
+  local window = tonumber(ARGV[base + 4])
+  local key = KEYS[i]
+  local total
+  if pending > 0 then
+    total = redis.call('INCRBY', key, pending)
+    if redis.call('PTTL', key) < 0 then redis.call('PEXPIRE', key, window) end
+  else
+    total = tonumber(redis.call('GET', key) or '0') or 0
+  end
+  totals[i] = total
+  oks[i] = 1
+  if total + cost > limit then
+    oks[i] = 0
+    all_ok = 0
+  end
+end
+local out = {}
+for i = 1, #KEYS do
+  if all_ok == 1 then
+    local base = (i - 1) * 4
+    local key = KEYS[i]
+    totals[i] = redis.call('INCRBY', key, tonumber(ARGV[base + 2]))
+    if redis.call('PTTL', key) < 0 then redis.call('PEXPIRE', key, tonumber(ARGV[base + 4])) end
+  end
+  out[i * 2 - 1] = oks[i]
+  out[i * 2] = totals[i]
+end
+return out
+"""
+
+_SyncEntry = tuple[RateLimit, int]
+
+
+class RedisLimiterEngine:
+    """Checks a batch of limits with one atomic Lua script call."""
+
+    shared = True
+
+    def __init__(self, *, client, make_key: Callable[[str], str]):
+        self._script = client.register_script(_LIMITER_SCRIPT)
+        self._sync_script = client.register_script(_SYNC_SCRIPT)
+        self._make_key = make_key
+
+    def allow_many(self, limits: Sequence[RateLimit], *, request_id: str = "") -> list[bool]:
+        if not limits:
+            return []
+        keys: list[str] = []
+        args: list = []
+        for limit in limits:
+            cost = float(limit.cost) if limit.algorithm == GCRA else limit.int_cost
+            keys.append(self._make_key(limit.key))
+            args.extend([limit.algorithm, int(limit.limit), max(int(limit.window * 1000), 1), cost])
+        try:
+            result = self._script(keys=keys, args=args)
+            return [bool(int(value)) for value in result]
+        except Exception as exc:
+            # Fail-open: request handling must continue when the cache backend is down.
+            _log_cache_warning(op="eval", key=limits[0].key, request_id=request_id, exc=exc)
+            return [True] * len(limits)
+
+    def sync_many(self, entries: Sequence[_SyncEntry], *, request_id: str = "") -> list[tuple[bool, int | None]]:
+        """Flush pending hits and check `cost` more per fixed-window counter, in one call.
+
+        Returns (allowed, shared total) per entry; the total is None when the
+        cache could not be reached (and the entry is allowed).
+        """
+        if not entries:
+            return []
+        keys: list[str] = []
+        args: list = []
+        for limit, pending in entries:
+            keys.append(self._make_key(limit.key))
+            args.extend([max(int(pending), 0), limit.int_cost, int(limit.limit), max(int(limit.window * 1000), 1)])
+        try:
+            flat = self._sync_script(keys=keys, args=args)
+            return [(bool(int(flat[idx])), int(flat[idx + 1])) for idx in range(0, len(flat), 2)]
+        except Exception as exc:
+            _log_cache_warning(op="eval", key=entries[0][0].key, request_id=request_id, exc=exc)
+            return [(True, None)] * len(entries)
+
+
+_local_lock = threading.Lock()
+
+_Plan = tuple[bool, Callable[[], object] | None]
+
+
+class LockedCacheLimiterEngine:
+    """Checks limits with plain cache get/set calls under a process-wide lock."""
+
+    shared = False
+
+    def __init__(self, store):
+        self._store = store
+
+    def allow_many(self, limits: Sequence[RateLimit], *, request_id: str = "") -> list[bool]:
+        evaluators = {
+            FIXED_WINDOW: self._fixed_window,
+            SLIDING_WINDOW: self._sliding_window,
+            SLIDING_LOG: self._sliding_log,
+            GCRA: self._gcra,
+        }
+        now = time.time()
+        with _local_lock:
+            plans = [evaluators[limit.algorithm](limit, now=now, request_id=request_id) for limit in limits]
+            allowed = [plan[0] for plan in plans]
+            if all(allowed):
+                for _, commit in plans:
+                    if commit is not None:
+                        commit()
+        return allowed
+
+    def sync_many(self, entries: Sequence[_SyncEntry], *, request_id: str = "") -> list[tuple[bool, int | None]]:
+        store = self._store
+        with _local_lock:
+            totals: list[int | None] = []
+            for limit, pending in entries:
+                timeout = max(int(math.ceil(limit.window)), 1)
+                if pending > 0:
+                    total, _ = _cache_add_incr(store, limit.key, int(pending), timeout=timeout, request_id=request_id)
+                else:
+                    current, ok = _cache_get(store, limit.key, request_id=request_id)
+                    total = _coerce_int(current or 0, key=limit.key, request_id=request_id) if ok else None
+                totals.append(total)
+            oks = [
+                total is None or total + limit.int_cost <= limit.limit
+                for (limit, _), total in zip(entries, totals, strict=True)
+            ]
+            if not all(oks):
+                return list(zip(oks, totals, strict=True))
+            results: list[tuple[bool, int | None]] = []
+            for (limit, _), total in zip(entries, totals, strict=True):
+                timeout = max(int(math.ceil(limit.window)), 1)
+                new_total, ok = _cache_add_incr(
+                    store, limit.key, limit.int_cost, timeout=timeout, request_id=request_id
+                )
+                results.append((True, new_total if ok else total))
+            return results
+
+    def _fixed_window(self, limit: RateLimit, *, now: float, request_id: str) -> _Plan:
+        store, key, cost = self._store, limit.key, limit.int_cost
+        timeout = max(int(math.ceil(limit.window)), 1)
+        current, ok = _cache_get(store, key, request_id=request_id)
+        if not ok:
+            # Fail-open: request handling must continue when cache backend is down.
+            return True, None
+        if current is None:
+            if cost > limit.limit:
+                return False, None
+            return True, lambda: _cache_set(store, key, cost, timeout=timeout, request_id=request_id)
+        count = _coerce_int(current, key=key, request_id=request_id, default=0)
+        if count + cost > limit.limit:
+            return False, None
+
+        def commit():
+            # incr keeps the window's original expiry; set only as a fallback.
+            _, incr_ok = _cache_incr(store, key, request_id=request_id, delta=cost)
+            if not incr_ok:
+                _cache_set(store, key, count + cost, timeout=timeout, request_id=request_id)
+
+        return True, commit
+
+    def _read_state(self, limit: RateLimit, *, expected: type, request_id: str):
+        state, ok = _cache_get(self._store, limit.key, request_id=request_id)
+        if ok and state is not None and not isinstance(state, expected):
+            _log_cache_warning(
+                op="state_type",
+                key=limit.key,
+                request_id=request_id,
+                exc=ValueError("invalid_state_type"),
+            )
+            state = None
+        return state, ok
+
+    def _sliding_window(self, limit: RateLimit, *, now: float, request_id: str) -> _Plan:
+        state, ok = self._read_state(limit, expected=dict, request_id=request_id)
+        if not ok:
+            return True, None
+        state = state or {}
+        window = limit.window
+        idx = int(now // window)
+        stored_idx = _coerce_int(state.get("w", -1), key=limit.key, request_id=request_id, default=-1)
+        current = previous = 0.0
+        if stored_idx == idx:
+            current = _coerce_float(state.get("c", 0), key=limit.key, request_id=request_id)
+            previous = _coerce_float(state.get("p", 0), key=limit.key, request_id=request_id)
+        elif stored_idx == idx - 1:
+            previous = _coerce_float(state.get("c", 0), key=limit.key, request_id=request_id)
+        weight = 1.0 - (now - idx * window) / window
+        cost = float(limit.cost)
+        if previous * weight + current + cost > limit.limit:
+            return False, None
+        value = {"w": idx, "c": current + cost, "p": previous}
+        timeout = max(int(math.ceil(window * 2)), 1)
+        return True, lambda: _cache_set(self._store, limit.key, value, timeout=timeout, request_id=request_id)
+
+    def _sliding_log(self, limit: RateLimit, *, now: float, request_id: str) -> _Plan:
+        state, ok = self._read_state(limit, expected=list, request_id=request_id)
+        if not ok:
+            return True, None
+        cutoff = now - limit.window
+        stamps = [
+            stamp
+            for stamp in (_coerce_float(row, key=limit.key, request_id=request_id) for row in state or [])
+            if stamp > cutoff
+        ]
+        if len(stamps) + limit.int_cost > limit.limit:
+            return False, None
+        value = stamps + [now] * limit.int_cost
+        timeout = max(int(math.ceil(limit.window)), 1)
+        return True, lambda: _cache_set(self._store, limit.key, value, timeout=timeout, request_id=request_id)
+
+    def _gcra(self, limit: RateLimit, *, now: float, request_id: str) -> _Plan:
+        stored, ok = _cache_get(self._store, limit.key, request_id=request_id)
+        if not ok:
+            # Fail-open: allow requests when limiter state cannot be read.
+            return True, None
+        tat = now if stored is None else _coerce_float(stored, key=limit.key, request_id=request_id, default=now)
+        new_tat = max(tat, now) + (limit.window / limit.limit) * float(limit.cost)
+        if new_tat - now > limit.window:
+            return False, None
+        timeout = max(int(math.ceil(new_tat - now)), 1)
+        return True, lambda: _cache_set(self._store, limit.key, new_tat, timeout=timeout, request_id=request_id)
+
+
+_redis_engines_lock = threading.Lock()
+_redis_engines: dict[tuple, RedisLimiterEngine] = {}
+
+
+def limiter_engine(cache_backend=None):
+    """Return the Lua engine for a configured Redis cache, else the locked cache engine."""
+    store = cache_backend or default_cache
+    alias = cache_alias(store)
+    client = redis_client(alias) if alias else None
+    if client is None:
+        return LockedCacheLimiterEngine(store)
+    engine_key = (redis_url(alias), store.key_prefix, store.version)
+    with _redis_engines_lock:
+        engine = _redis_engines.get(engine_key)
+        if engine is None:
+            engine = RedisLimiterEngine(client=client, make_key=store.make_key)
+            _redis_engines[engine_key] = engine
+    return engine
+
+
+def allow_many(
+    limits: Sequence[RateLimit],
+    *,
+    cache_backend=None,
+    request_id: str = "",
+) -> list[bool]:
+    """Check every limit in one engine call; budget is consumed only if all allow.
+
+    Returns one flag per limit, in order. Disabled limits (`limit <= 0`) are
+    always allowed and never touch the cache.
+    """
+    allowed = [True] * len(limits)
+    active = [(idx, limit) for idx, limit in enumerate(limits) if limit.limit > 0]
+    if not active:
+        return allowed
+    results = limiter_engine(cache_backend).allow_many([limit for _, limit in active], request_id=request_id)
+    for (idx, _), result in zip(active, results, strict=True):
+        allowed[idx] = result
+    return allowed
+
+
+__all__ = [
+    "ALGORITHMS",
+    "FIXED_WINDOW",
+    "GCRA",
+    "LockedCacheLimiterEngine",
+    "RateLimit",
+    "RedisLimiterEngine",
+    "SLIDING_LOG",
+    "SLIDING_WINDOW",
+    "allow_many",
+    "limiter_engine",
+]
@@ -0,0 +1,245 @@
+"""In-process pre-limiter tier in front of the shared fixed-window limiter.
+
+Each process counts hits per key locally and only talks to the shared cache
+when it has to:
+
+- when local usage (last synced shared total + unsynced local hits) would cross
+  `sync_fraction` of the limit, or
+- when `sync_interval_seconds` have passed since the key's last sync.
+
+A sync adds the unsynced hits to the shared counter and reads back the total
+from every process in the same engine call that checks the current request.
+Keys far below their limit are therefore decided without a cache round trip.
+
+Trade-off: with N processes a key can overshoot its limit by up to
+N x `sync_fraction` x limit before the shared total is known everywhere, and
+counts are up to `sync_interval_seconds` stale. `sync_fraction=0` syncs every
+check, which matches the shared limiter exactly.
+
+The local tier only applies to shared engines (Redis). Process-local caches
+such as locmem already answer in-process, so checks go straight to them.
+"""
+
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Sequence
+from dataclasses import dataclass
+
+from .limiters import FIXED_WINDOW, RateLimit, allow_many, limiter_engine
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SYNC_FRACTION = 0.5
+DEFAULT_SYNC_INTERVAL_SECONDS = 2.0
+_MAX_KEYS = 10000
+_STATS_LOG_EVERY = 1000
+
+
+@dataclass
+class _LocalWindow:
+    index: int
+    synced_at: float
+    shared_total: int = 0
+    pending: int = 0
+    denied: bool = False
+
+
+class PreLimiter:
+    """Per-process approximate counters that sync to a shared engine on demand."""
+
+    def __init__(self, *, max_keys: int = _MAX_KEYS):
+        self._lock = threading.Lock()
+        self._windows: OrderedDict[str, _LocalWindow] = OrderedDict()
+        self._max_keys = max(int(max_keys), 1)
+        self._stats = {"checks": 0, "local": 0, "syncs": 0, "sync_failures": 0, "denied": 0}
+
+    def _window(self, key: str, *, index: int, now: float) -> _LocalWindow:
+        state = self._windows.get(key)
+        if state is None or state.index != index:
+            state = _LocalWindow(index=index, synced_at=now)
+            self._windows[key] = state
+        self._windows.move_to_end(key)
+        while len(self._windows) > self._max_keys:
+            self._windows.popitem(last=False)
+        return state
+
+    def allow_many(
+        self,
+        limits: Sequence[RateLimit],
+        *,
+        engine,
+        request_id: str = "",
+        sync_fraction: float = DEFAULT_SYNC_FRACTION,
+        sync_interval_seconds: float = DEFAULT_SYNC_INTERVAL_SECONDS,
+    ) -> list[bool]:
+        """Check fixed-window limits, syncing only keys that need the shared total."""
+        for limit in limits:
+            if limit.algorithm != FIXED_WINDOW:
+                raise ValueError(f"pre-limiter supports fixed_window limits only, got {limit.algorithm}")
+        allowed = [True] * len(limits)
+        now = time.time()
+        fraction = min(max(float(sync_fraction), 0.0), 1.0)
+        interval = max(float(sync_interval_seconds), 0.0)
+        to_sync: list[tuple[int, RateLimit, str, int]] = []
+        local_ok: list[tuple[str, int]] = []
+        with self._lock:
+            self._stats["checks"] += 1
+            for idx, limit in enumerate(limits):
+                if limit.limit <= 0:
+                    continue
+                window = max(int(limit.window), 1)
+                index = int(now // window)
+                shared_key = f"{limit.key}:{index}"
+                state = self._window(shared_key, index=index, now=now)
+                fresh = now - state.synced_at < interval
+                if state.denied and fresh:
+                    allowed[idx] = False
+                elif fresh and state.shared_total + state.pending + limit.int_cost <= limit.limit * fraction:
+                    local_ok.append((shared_key, limit.int_cost))
+                else:
+                    # Hand the unsynced hits to this sync; they are restored if it fails.
+                    to_sync.append((idx, limit, shared_key, state.pending))
+                    state.pending = 0
+            if not all(allowed):
+                self._restore_pending(to_sync)
+                self._stats["denied"] += 1
+                self._maybe_log_stats()
+                return allowed
+            if not to_sync:
+                for shared_key, cost in local_ok:
+                    self._windows[shared_key].pending += cost
+                self._stats["local"] += 1
+                self._maybe_log_stats()
+                return allowed
+
+        entries = [
+            (RateLimit(key=shared_key, limit=limit.limit, window_seconds=limit.window_seconds), pending)
+            for _, limit, shared_key, pending in to_sync
+        ]
+        results = engine.sync_many(entries, request_id=request_id)
+
+        with self._lock:
+            self._stats["syncs"] += 1
+            failed = False
+            for (idx, _, shared_key, pending), (ok, total) in zip(to_sync, results, strict=True):
+                state = self._windows.get(shared_key)
+                allowed[idx] = ok
+                if state is None:
+                    continue
+                if total is None:
+                    failed = True
+                    state.pending += pending
+                    continue
+                state.shared_total = total
+                state.synced_at = now
+                state.denied = not ok
+            if failed:
+                self._stats["sync_failures"] += 1
+            if all(allowed):
+                for shared_key, cost in local_ok:
+                    state = self._windows.get(shared_key)
+                    if state is not None:
+                        state.pending += cost
+            else:
+                self._stats["denied"] += 1
+            self._maybe_log_stats()
+        return allowed
+
+    def _restore_pending(self, to_sync) -> None:
+        for _, _, shared_key, pending in to_sync:
+            state = self._windows.get(shared_key)
+            if state is not None:
+                state.pending += pending
+
+    def _maybe_log_stats(self) -> None:
+        if self._stats["checks"] % _STATS_LOG_EVERY == 0:
+            logger.info(
+                "request_safety_prelimit_stats checks=%s local=%s syncs=%s sync_failures=%s denied=%s",
+                self._stats["checks"],
+                self._stats["local"],
+                self._stats["syncs"],
+                self._stats["sync_failures"],
+                self._stats["denied"],
+            )
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["keys"] = len(self._windows)
+        checks = stats["checks"]
+        stats["sync_rate"] = round(stats["syncs"] / checks, 3) if checks else 0.0
+        return stats
+
+    def clear(self) -> None:
+        with self._lock:
+            self._windows.clear()
+            for name in self._stats:
+                self._stats[name] = 0
+
+
+_prelimiter = PreLimiter()
+
+
+def prelimit_allow_many(
+    limits: Sequence[RateLimit],
+    *,
+    cache_backend=None,
+    request_id: str = "",
+    sync_fraction: float = DEFAULT_SYNC_FRACTION,
+    sync_interval_seconds: float = DEFAULT_SYNC_INTERVAL_SECONDS,
+) -> list[bool]:
+    """`allow_many` for fixed-window limits with the in-process tier in front of shared caches."""
+    engine = limiter_engine(cache_backend)
+    if not engine.shared:
+        return allow_many(limits, cache_backend=cache_backend, request_id=request_id)
+    return _prelimiter.allow_many(
+        limits,
+        engine=engine,
+        request_id=request_id,
+        sync_fraction=sync_fraction,
+        sync_interval_seconds=sync_interval_seconds,
+    )
+
+
+def prelimit_allow(
+    key: str,
+    *,
+    limit: int,
+    window_seconds: int,
+    cache_backend=None,
+    request_id: str = "",
+    sync_fraction: float = DEFAULT_SYNC_FRACTION,
+    sync_interval_seconds: float = DEFAULT_SYNC_INTERVAL_SECONDS,
+) -> bool:
+    """Pre-limited drop-in for `fixed_window_allow`."""
+    return prelimit_allow_many(
+        [RateLimit(key=key, limit=limit, window_seconds=max(int(window_seconds), 1))],
+        cache_backend=cache_backend,
+        request_id=request_id,
+        sync_fraction=sync_fraction,
+        sync_interval_seconds=sync_interval_seconds,
+    )[0]
+
+
+def prelimiter_stats() -> dict:
+    """Process counters: checks, local decisions, syncs (and `sync_rate`), failures, denials."""
+    return _prelimiter.stats()
+
+
+def clear_prelimiter() -> None:
+    _prelimiter.clear()
+
+
+__all__ = [
+    "DEFAULT_SYNC_FRACTION",
+    "DEFAULT_SYNC_INTERVAL_SECONDS",
+    "PreLimiter",
+    "clear_prelimiter",
+    "prelimit_allow",
+    "prelimit_allow_many",
+    "prelimiter_stats",
+]
@@ -0,0 +1,11 @@
+import os
+import sys
+from pathlib import Path
+
+from django.core.asgi import get_asgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+SERVICES_DIR = Path(__file__).resolve().parents[2]
+if str(SERVICES_DIR) not in sys.path:
+    sys.path.insert(0, str(SERVICES_DIR))
+application = get_asgi_application()
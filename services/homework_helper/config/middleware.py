@@ -1,16 +1,18 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
 from django.conf import settings
 from django.http import JsonResponse
+from django.utils.deprecation import MiddlewareMixin
+from django_otp.middleware import OTPMiddleware
 from common.csp import resolve_csp_headers
 
+# Middleware here is sync- and async-capable so the ASGI chat view is not
+# forced back onto a worker thread by the middleware chain.
 
-class SecurityHeadersMiddleware:
-    """Attach optional security headers configured via settings."""
 
-    def __init__(self, get_response):
-        self.get_response = get_response
+class SecurityHeadersMiddleware(MiddlewareMixin):
+    """Attach optional security headers configured via settings."""
 
-    def __call__(self, request):
-        response = self.get_response(request)
+    def process_response(self, request, response):
         csp_policy, csp_report_only = resolve_csp_headers(
             mode=getattr(settings, "CSP_MODE", "relaxed"),
             relaxed_policy=getattr(settings, "CSP_POLICY_RELAXED", ""),
@@ -39,14 +41,11 @@ class SecurityHeadersMiddleware:
         return response
 
 
-class SiteModeMiddleware:
+class SiteModeMiddleware(MiddlewareMixin):
     """Gate helper chat when the platform is intentionally degraded."""
 
     _ALWAYS_ALLOWED_PREFIXES = ("/helper/healthz", "/admin/", "/static/")
 
-    def __init__(self, get_response):
-        self.get_response = get_response
-
     @staticmethod
     def _site_mode() -> str:
         mode = (getattr(settings, "SITE_MODE", "normal") or "normal").strip().lower()
@@ -67,14 +66,14 @@ class SiteModeMiddleware:
     def _is_always_allowed(cls, path: str) -> bool:
         return any(path.startswith(prefix) for prefix in cls._ALWAYS_ALLOWED_PREFIXES)
 
-    def __call__(self, request):
+    def process_request(self, request):
         mode = self._site_mode()
         if mode in {"normal", "read-only"}:
-            return self.get_response(request)
+            return None
 
         path = (request.path or "").strip()
         if self._is_always_allowed(path):
-            return self.get_response(request)
+            return None
 
         if mode in {"join-only", "maintenance"} and path.startswith("/helper/chat"):
             response = JsonResponse(
@@ -88,4 +87,21 @@ class SiteModeMiddleware:
             response["Retry-After"] = "120"
             response["Cache-Control"] = "no-store"
             return response
-        return self.get_response(request)
+        return None
+
+
+class AsyncCapableOTPMiddleware(OTPMiddleware):
+    """`django_otp` middleware flagged as async-capable.
+
+    The upstream `__call__` only wraps `request.user` lazily and returns
+    `get_response(request)`, so it already passes the downstream coroutine
+    through unchanged in async mode.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
@@ -83,7 +83,7 @@ MIDDLEWARE = [
     "config.middleware.SiteModeMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
-    "django_otp.middleware.OTPMiddleware",
+    "config.middleware.AsyncCapableOTPMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
@@ -189,17 +189,28 @@ if not DEBUG:
 # Safe-by-default: only trust forwarded headers when explicitly enabled.
 REQUEST_SAFETY_TRUST_PROXY_HEADERS = env.bool("REQUEST_SAFETY_TRUST_PROXY_HEADERS", default=False)
 REQUEST_SAFETY_XFF_INDEX = env.int("REQUEST_SAFETY_XFF_INDEX", default=0)
+# In-process rate-limit tier: sync to the shared Redis counter once local usage
+# crosses this fraction of a limit, or after the interval (0 = sync every check).
+REQUEST_SAFETY_PRELIMIT_SYNC_FRACTION = env.float("REQUEST_SAFETY_PRELIMIT_SYNC_FRACTION", default=0.5)
+REQUEST_SAFETY_PRELIMIT_SYNC_INTERVAL_SECONDS = env.float("REQUEST_SAFETY_PRELIMIT_SYNC_INTERVAL_SECONDS", default=2.0)
 ADMIN_2FA_REQUIRED = env.bool("DJANGO_ADMIN_2FA_REQUIRED", default=True)
 HELPER_REQUIRE_CLASSHUB_TABLE = env.bool("HELPER_REQUIRE_CLASSHUB_TABLE", default=False)
 HELPER_REQUIRE_SCOPE_TOKEN_FOR_STAFF = env.bool("HELPER_REQUIRE_SCOPE_TOKEN_FOR_STAFF", default=False)
 HELPER_REMOTE_MODE_ACKNOWLEDGED = env.bool("HELPER_REMOTE_MODE_ACKNOWLEDGED", default=False)
 HELPER_INTERNAL_API_TOKEN = env("HELPER_INTERNAL_API_TOKEN", default="").strip()
+# Route /helper/chat to the async view; pair with the ASGI server in the helper image.
+HELPER_ASGI_ENABLED = env.bool("HELPER_ASGI_ENABLED", default=False)
 CLASSHUB_INTERNAL_EVENTS_URL = env(
     "CLASSHUB_INTERNAL_EVENTS_URL",
     default="http://classhub_web:8000/internal/events/helper-chat-access",
 ).strip()
 CLASSHUB_INTERNAL_EVENTS_TOKEN = env("CLASSHUB_INTERNAL_EVENTS_TOKEN", default="").strip()
 CLASSHUB_INTERNAL_EVENTS_TIMEOUT_SECONDS = env.float("CLASSHUB_INTERNAL_EVENTS_TIMEOUT_SECONDS", default=0.35)
+# Chat events are buffered and posted in batches to the bulk endpoint off the request path.
+CLASSHUB_INTERNAL_EVENTS_BULK_URL = env("CLASSHUB_INTERNAL_EVENTS_BULK_URL", default="").strip()
+CLASSHUB_INTERNAL_EVENTS_BATCH_SIZE = env.int("CLASSHUB_INTERNAL_EVENTS_BATCH_SIZE", default=50)
+CLASSHUB_INTERNAL_EVENTS_FLUSH_MS = env.int("CLASSHUB_INTERNAL_EVENTS_FLUSH_MS", default=500)
+CLASSHUB_INTERNAL_EVENTS_BUFFER_MAX = env.int("CLASSHUB_INTERNAL_EVENTS_BUFFER_MAX", default=2000)
 CSP_POLICY_RELAXED = _DEFAULT_CSP_POLICY_RELAXED
 CSP_POLICY_STRICT = _DEFAULT_CSP_POLICY_STRICT
 try:
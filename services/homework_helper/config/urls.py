@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.contrib import admin
 from django.urls import path
 from tutor import views
@@ -5,6 +6,7 @@ from tutor import views
 urlpatterns = [
     path("admin/", admin.site.urls),
     path("helper/healthz", views.healthz),
-    path("helper/chat", views.chat),
+    path("helper/chat", views.achat if settings.HELPER_ASGI_ENABLED else views.chat),
     path("helper/internal/reset-class-conversations", views.reset_class_conversations),
+    path("helper/internal/reset-class-conversations/jobs/<str:job_id>", views.reset_class_conversations_job),
 ]
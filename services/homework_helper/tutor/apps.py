@@ -1,5 +1,19 @@
+import logging
+import os
+
 from django.apps import AppConfig
 
 class TutorConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "tutor"
+
+    def ready(self):
+        # Gunicorn imports the app once per worker, so each worker warms its own cache.
+        from .engine.runtime import env_bool
+
+        if env_bool("HELPER_REFERENCE_WARMUP", False, getenv=os.getenv):
+            from .engine.reference import warm_reference_cache
+
+            default_dir = "/app/tutor/reference"
+            reference_dir = (os.getenv("HELPER_REFERENCE_DIR", default_dir) or default_dir).strip()
+            warm_reference_cache(reference_dir, logger=logging.getLogger("tutor.views"))
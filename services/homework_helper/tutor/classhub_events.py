@@ -1,15 +1,26 @@
-"""Best-effort forwarding of helper chat access events to Class Hub."""
+"""Best-effort forwarding of helper chat access events to Class Hub.
+
+Events are buffered in a bounded in-process outbox and posted in batches to the
+Class Hub bulk endpoint by a background thread, so chat requests never wait on
+Class Hub. A full outbox drops new events and counts them instead of blocking.
+"""
 
 from __future__ import annotations
 
+import atexit
 import json
 import logging
+import os
+import threading
+from collections import deque
 from functools import lru_cache
 import urllib.error
 import urllib.request
 
 from django.conf import settings
 
+from .engine import http_pool
+
 logger = logging.getLogger(__name__)
 
 
@@ -17,6 +28,14 @@ def _events_url() -> str:
     return str(getattr(settings, "CLASSHUB_INTERNAL_EVENTS_URL", "") or "").strip()
 
 
+def _events_bulk_url() -> str:
+    explicit = str(getattr(settings, "CLASSHUB_INTERNAL_EVENTS_BULK_URL", "") or "").strip()
+    if explicit:
+        return explicit
+    url = _events_url()
+    return f"{url.rstrip('/')}/bulk" if url else ""
+
+
 def _events_token() -> str:
     return str(getattr(settings, "CLASSHUB_INTERNAL_EVENTS_TOKEN", "") or "").strip()
 
@@ -29,6 +48,13 @@ def _events_timeout_seconds() -> float:
     return raw if raw > 0 else 0.35
 
 
+def _setting_int(name: str, default: int) -> int:
+    try:
+        return int(getattr(settings, name, default))
+    except Exception:
+        return default
+
+
 @lru_cache(maxsize=4)
 def _log_missing_config_once(url_present: bool, token_present: bool) -> None:
     logger.warning(
@@ -38,6 +64,189 @@ def _log_missing_config_once(url_present: bool, token_present: bool) -> None:
     )
 
 
+def _post_json(url: str, token: str, body: dict) -> int:
+    """POST `body` and return the HTTP status; transport errors propagate."""
+    req = urllib.request.Request(
+        url,
+        data=json.dumps(body).encode("utf-8"),
+        method="POST",
+        headers={
+            "Content-Type": "application/json",
+            "X-ClassHub-Internal-Token": token,
+        },
+    )
+    try:
+        with http_pool.urlopen(req, timeout=_events_timeout_seconds()) as resp:
+            return int(getattr(resp, "status", None) or resp.getcode())
+    except urllib.error.HTTPError as exc:
+        return int(exc.code)
+
+
+def _batch_label(events: list[dict]) -> str:
+    first = str(((events[0] if events else {}).get("details") or {}).get("request_id") or "").strip() or "unknown"
+    return first if len(events) == 1 else f"{first}+{len(events) - 1}"
+
+
+def send_helper_chat_access_events(events: list[dict]) -> bool:
+    """Post a batch of event payloads to Class Hub. Never raises.
+
+    Falls back to one post per event when the bulk endpoint is missing (older
+    Class Hub during a rolling deploy).
+    """
+    if not events:
+        return True
+    url = _events_url()
+    token = _events_token()
+    if not url or not token:
+        _log_missing_config_once(bool(url), bool(token))
+        return False
+    if not url.lower().startswith(("http://", "https://")):
+        return False
+
+    request_id = _batch_label(events)
+    try:
+        if len(events) == 1:
+            status = _post_json(url, token, events[0])
+        else:
+            status = _post_json(_events_bulk_url(), token, {"events": events})
+            if status == 404:
+                statuses = [_post_json(url, token, event) for event in events]
+                status = next((code for code in statuses if not 200 <= code < 300), statuses[-1])
+    except Exception as exc:
+        logger.warning(
+            "helper_chat_event_forward_failed request_id=%s error=%s",
+            request_id,
+            exc.__class__.__name__,
+        )
+        return False
+    if not 200 <= status < 300:
+        logger.warning(
+            "helper_chat_event_forward_failed request_id=%s status=%s",
+            request_id,
+            status,
+        )
+        return False
+    return True
+
+
+class HelperEventOutbox:
+    """Bounded buffer of event payloads drained in batches by one daemon thread."""
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._events: deque[dict] = deque()
+        self._worker: threading.Thread | None = None
+        self._pid = os.getpid()
+        self.enqueued = 0
+        self.sent = 0
+        self.failed = 0
+        self.dropped = 0
+        self._dropped_unlogged = 0
+
+    @staticmethod
+    def _batch_size() -> int:
+        return max(_setting_int("CLASSHUB_INTERNAL_EVENTS_BATCH_SIZE", 50), 1)
+
+    @staticmethod
+    def _flush_seconds() -> float:
+        return max(_setting_int("CLASSHUB_INTERNAL_EVENTS_FLUSH_MS", 500), 0) / 1000.0
+
+    def put(self, event: dict) -> bool:
+        """Buffer one payload; return False (and count a drop) when the outbox is full."""
+        with self._cond:
+            if self._pid != os.getpid():
+                # Events buffered before a fork are the parent's to send.
+                self._events.clear()
+                self._worker = None
+                self._pid = os.getpid()
+            if len(self._events) >= max(_setting_int("CLASSHUB_INTERNAL_EVENTS_BUFFER_MAX", 2000), 1):
+                self.dropped += 1
+                self._dropped_unlogged += 1
+                return False
+            self._events.append(event)
+            self.enqueued += 1
+            if len(self._events) == 1 or len(self._events) >= self._batch_size():
+                self._cond.notify_all()
+            return True
+
+    def _take_batch(self) -> list[dict]:
+        with self._cond:
+            size = min(self._batch_size(), len(self._events))
+            return [self._events.popleft() for _ in range(size)]
+
+    def flush(self) -> int:
+        """Send everything buffered so far from the calling thread; return events delivered."""
+        delivered = 0
+        while True:
+            batch = self._take_batch()
+            if not batch:
+                break
+            ok = send_helper_chat_access_events(batch)
+            with self._cond:
+                if ok:
+                    self.sent += len(batch)
+                    delivered += len(batch)
+                else:
+                    self.failed += len(batch)
+        with self._cond:
+            dropped, self._dropped_unlogged = self._dropped_unlogged, 0
+        if dropped:
+            logger.warning(
+                "helper_chat_event_outbox_dropped count=%s total_dropped=%s",
+                dropped,
+                self.dropped,
+            )
+        return delivered
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "buffered": len(self._events),
+                "enqueued": self.enqueued,
+                "sent": self.sent,
+                "failed": self.failed,
+                "dropped": self.dropped,
+            }
+
+    def ensure_worker(self) -> None:
+        with self._cond:
+            if self._worker is not None and self._worker.is_alive():
+                return
+            self._worker = threading.Thread(target=self._run, name="helper-event-outbox", daemon=True)
+            self._worker.start()
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: bool(self._events))
+                # Give a batch time to fill; a full batch wakes the flush early.
+                self._cond.wait_for(lambda: len(self._events) >= self._batch_size(), timeout=self._flush_seconds())
+            try:
+                self.flush()
+            except Exception as exc:  # pragma: no cover - keep the worker alive
+                logger.warning("helper_chat_event_outbox_flush_failed error=%s", exc.__class__.__name__)
+
+
+_outbox = HelperEventOutbox()
+
+
+def flush_helper_chat_access_events() -> int:
+    """Drain the process outbox now (tests, shutdown)."""
+    return _outbox.flush()
+
+
+def helper_chat_event_outbox_stats() -> dict:
+    return _outbox.stats()
+
+
+@atexit.register
+def _flush_at_exit() -> None:
+    try:
+        _outbox.flush()
+    except Exception:
+        return
+
+
 def emit_helper_chat_access_event(
     *,
     classroom_id: int | None,
@@ -45,7 +254,11 @@ def emit_helper_chat_access_event(
     ip_address: str,
     details: dict,
 ) -> None:
-    """Best-effort event forwarding. Never raises."""
+    """Best-effort event forwarding. Never raises or blocks on Class Hub.
+
+    With `CLASSHUB_INTERNAL_EVENTS_FLUSH_MS=0` the event is posted inline
+    instead of buffered.
+    """
     if not classroom_id and not student_id:
         return
 
@@ -63,36 +276,8 @@ def emit_helper_chat_access_event(
         "ip_address": ip_address or None,
         "details": details or {},
     }
-    data = json.dumps(payload).encode("utf-8")
-    req = urllib.request.Request(
-        url,
-        data=data,
-        method="POST",
-        headers={
-            "Content-Type": "application/json",
-            "X-ClassHub-Internal-Token": token,
-        },
-    )
-
-    request_id = str((details or {}).get("request_id") or "").strip() or "unknown"
-    try:
-        with urllib.request.urlopen(req, timeout=_events_timeout_seconds()) as resp:  # nosec B310
-            status = getattr(resp, "status", None) or resp.getcode()
-            if not (200 <= int(status) < 300):
-                logger.warning(
-                    "helper_chat_event_forward_failed request_id=%s status=%s",
-                    request_id,
-                    status,
-                )
-    except urllib.error.HTTPError as exc:
-        logger.warning(
-            "helper_chat_event_forward_failed request_id=%s status=%s",
-            request_id,
-            exc.code,
-        )
-    except Exception as exc:
-        logger.warning(
-            "helper_chat_event_forward_failed request_id=%s error=%s",
-            request_id,
-            exc.__class__.__name__,
-        )
+    if _setting_int("CLASSHUB_INTERNAL_EVENTS_FLUSH_MS", 500) <= 0:
+        send_helper_chat_access_events([payload])
+        return
+    if _outbox.put(payload):
+        _outbox.ensure_worker()
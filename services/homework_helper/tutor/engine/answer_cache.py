@@ -0,0 +1,131 @@
+"""Shared cache of first-turn helper answers, scoped per class and lesson.
+
+Keys combine the class generation, scope fingerprint, reference file, intent,
+backend, and a normalized form of the message. Resetting a class bumps its
+generation, which orphans every cached answer for that class at once; orphaned
+entries expire on their TTL.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import logging
+import re
+import threading
+
+logger = logging.getLogger(__name__)
+
+_NORMALIZE_RE = re.compile(r"[^a-z0-9]+")
+_MAX_ANSWER_CHARS = 8000
+
+_stats_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0, "stores": 0}
+
+
+def normalize_message(message: str) -> str:
+    """Lowercase, drop punctuation, and collapse whitespace so trivial variants share a key."""
+    return " ".join(_NORMALIZE_RE.split((message or "").lower())).strip()
+
+
+def answer_fingerprint(*, scope_fp: str, reference_key: str, message: str, intent: str, backend: str) -> str:
+    parts = [
+        (scope_fp or "").strip() or "noscope",
+        (reference_key or "").strip(),
+        (intent or "").strip(),
+        (backend or "").strip(),
+        normalize_message(message),
+    ]
+    return hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()[:32]
+
+
+def class_generation_key(*, class_id: int) -> str:
+    return f"helper:answer_cache:gen:class:{max(int(class_id), 0)}"
+
+
+def _class_generation(*, cache_backend, class_id: int) -> int:
+    try:
+        return int(cache_backend.get(class_generation_key(class_id=class_id)) or 0)
+    except Exception:
+        logger.warning("answer_cache_get_failed class_id=%s", class_id)
+        return -1
+
+
+def answer_cache_key(*, cache_backend, class_id: int, fingerprint: str) -> str:
+    """Cache key for `fingerprint` under the class's current generation ("" when unreadable)."""
+    generation = _class_generation(cache_backend=cache_backend, class_id=class_id)
+    if generation < 0:
+        return ""
+    return f"helper:answer_cache:{max(int(class_id), 0)}:{generation}:{fingerprint}"
+
+
+def _record(outcome: str) -> dict:
+    with _stats_lock:
+        _stats[outcome] += 1
+        return dict(_stats)
+
+
+def answer_cache_stats() -> dict:
+    with _stats_lock:
+        stats = dict(_stats)
+    lookups = stats["hits"] + stats["misses"]
+    stats["hit_rate"] = round(stats["hits"] / lookups, 3) if lookups else 0.0
+    return stats
+
+
+def load_answer(*, cache_backend, class_id: int, fingerprint: str) -> dict | None:
+    key = answer_cache_key(cache_backend=cache_backend, class_id=class_id, fingerprint=fingerprint)
+    stored = None
+    if key:
+        try:
+            stored = cache_backend.get(key)
+        except Exception:
+            logger.warning("answer_cache_get_failed class_id=%s", class_id)
+    if not isinstance(stored, dict) or not str(stored.get("text") or "").strip():
+        _record("misses")
+        return None
+    _record("hits")
+    return {"text": str(stored["text"]), "model": str(stored.get("model") or "")}
+
+
+def save_answer(*, cache_backend, class_id: int, fingerprint: str, text: str, model: str, ttl_seconds: int) -> None:
+    if not (text or "").strip():
+        return
+    key = answer_cache_key(cache_backend=cache_backend, class_id=class_id, fingerprint=fingerprint)
+    if not key:
+        return
+    try:
+        cache_backend.set(
+            key,
+            {"text": text[:_MAX_ANSWER_CHARS], "model": model or ""},
+            timeout=max(int(ttl_seconds), 30),
+        )
+    except Exception:
+        logger.warning("answer_cache_set_failed class_id=%s", class_id)
+        return
+    _record("stores")
+
+
+def invalidate_class_answers(*, cache_backend, class_id: int) -> None:
+    """Drop every cached answer for a class by moving it to a new generation."""
+    key = class_generation_key(class_id=class_id)
+    try:
+        try:
+            cache_backend.incr(key)
+        except ValueError:
+            # No generation yet: start at 1 so generation-0 entries are orphaned.
+            if not cache_backend.add(key, 1, timeout=None):
+                cache_backend.incr(key)
+    except Exception:
+        logger.warning("answer_cache_invalidate_failed class_id=%s", class_id)
+
+
+__all__ = [
+    "answer_cache_key",
+    "answer_cache_stats",
+    "answer_fingerprint",
+    "class_generation_key",
+    "invalidate_class_answers",
+    "load_answer",
+    "normalize_message",
+    "save_answer",
+]
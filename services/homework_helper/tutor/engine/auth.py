@@ -1,21 +1,96 @@
-"""Auth/session boundary helpers for helper requests."""
+"""Auth/session boundary helpers for helper requests.
+
+Student sessions are checked against Class Hub's `hub_studentidentity` table on
+the shared database. Two caches keep that off the per-request path:
+
+- a table that has been seen once is remembered for the life of the process
+  (tables are not dropped under a running helper; a missing table is re-checked);
+- a confirmed `(class_id, student_id)` pair is cached for a short TTL, tagged
+  with the class's session version. Class Hub bumps that version in the helper
+  cache when it deletes a student or changes `Class.session_epoch`, which makes
+  every cached confirmation for the class stale at once.
+"""
 
 from __future__ import annotations
 
+import logging
+import threading
+
 from django.db.utils import DatabaseError
 
+logger = logging.getLogger(__name__)
+
+_known_tables: set[str] = set()
+_known_tables_lock = threading.Lock()
+
+
+def clear_table_cache() -> None:
+    with _known_tables_lock:
+        _known_tables.clear()
+
+
+def _clear_rollback(connection, transaction_module) -> None:
+    # Postgres marks the transaction as aborted after SQL errors; clear the
+    # rollback flag so this best-effort check doesn't poison the request.
+    if connection.in_atomic_block:
+        try:
+            transaction_module.set_rollback(False)
+        except Exception:
+            pass
+
 
 def table_exists(*, connection, transaction_module, table_name: str) -> bool:
+    if table_name in _known_tables:
+        return True
     try:
         with connection.cursor() as cursor:
-            return table_name in set(connection.introspection.table_names(cursor))
+            present = table_name in set(connection.introspection.table_names(cursor))
     except DatabaseError:
-        if connection.in_atomic_block:
-            try:
-                transaction_module.set_rollback(False)
-            except Exception:
-                pass
+        _clear_rollback(connection, transaction_module)
         return False
+    if present:
+        with _known_tables_lock:
+            _known_tables.add(table_name)
+    return present
+
+
+def session_version_key(class_id: int) -> str:
+    """Written by Class Hub (`helper_control.bump_helper_session_version`); keep the two in sync."""
+    return f"helper:session_version:class:{int(class_id)}"
+
+
+def _session_cache_key(class_id: int, student_id: int) -> str:
+    return f"helper:student_session:{int(class_id)}:{int(student_id)}"
+
+
+def _cached_session(cache_backend, *, student_id: int, class_id: int) -> tuple[bool, int]:
+    """Return `(confirmed, class_version)`; cache errors count as a miss."""
+    version_key = session_version_key(class_id)
+    session_key = _session_cache_key(class_id, student_id)
+    try:
+        values = cache_backend.get_many([version_key, session_key])
+    except Exception:
+        logger.warning("helper_student_session_cache_get_failed class_id=%s", class_id)
+        return False, 0
+    try:
+        version = int(values.get(version_key) or 0)
+    except (TypeError, ValueError):
+        version = 0
+    return values.get(session_key) == version, version
+
+
+def _lookup_student(*, connection, transaction_module, student_id: int, class_id: int) -> bool | None:
+    """True/False when the row was checked, None when the query failed."""
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT 1 FROM hub_studentidentity WHERE id = %s AND classroom_id = %s LIMIT 1",
+                [student_id, class_id],
+            )
+            return cursor.fetchone() is not None
+    except DatabaseError:
+        _clear_rollback(connection, transaction_module)
+        return None
 
 
 def student_session_exists(
@@ -26,31 +101,36 @@ def student_session_exists(
     student_id: int,
     class_id: int,
     table_exists_fn,
+    cache_backend=None,
+    cache_ttl_seconds: int = 0,
 ) -> bool:
+    use_cache = cache_backend is not None and cache_ttl_seconds > 0
+    version = 0
+    if use_cache:
+        confirmed, version = _cached_session(cache_backend, student_id=student_id, class_id=class_id)
+        if confirmed:
+            return True
+
+    require_table = bool(getattr(settings, "HELPER_REQUIRE_CLASSHUB_TABLE", False))
     if not table_exists_fn("hub_studentidentity"):
-        if bool(getattr(settings, "HELPER_REQUIRE_CLASSHUB_TABLE", False)):
-            return False
-        return True
-    try:
-        with connection.cursor() as cursor:
-            cursor.execute(
-                "SELECT 1 FROM hub_studentidentity WHERE id = %s AND classroom_id = %s LIMIT 1",
-                [student_id, class_id],
-            )
-            return cursor.fetchone() is not None
-    except DatabaseError:
-        # Postgres marks the transaction as aborted after SQL errors; clear the
-        # rollback flag so this best-effort check doesn't poison the request.
-        if connection.in_atomic_block:
-            try:
-                transaction_module.set_rollback(False)
-            except Exception:
-                pass
+        return not require_table
+    found = _lookup_student(
+        connection=connection,
+        transaction_module=transaction_module,
+        student_id=student_id,
+        class_id=class_id,
+    )
+    if found is None:
         # MVP default is fail-open for local/demo setups; production can force
         # fail-closed by enabling HELPER_REQUIRE_CLASSHUB_TABLE.
-        if bool(getattr(settings, "HELPER_REQUIRE_CLASSHUB_TABLE", False)):
-            return False
-        return True
+        return not require_table
+    if found and use_cache:
+        # Only confirmed rows are cached, so fail-open answers and removed students are always re-checked.
+        try:
+            cache_backend.set(_session_cache_key(class_id, student_id), version, timeout=int(cache_ttl_seconds))
+        except Exception:
+            logger.warning("helper_student_session_cache_set_failed class_id=%s", class_id)
+    return found
 
 
 def actor_key(*, request, build_actor_key_fn, student_session_exists_fn) -> str:
@@ -2,12 +2,22 @@
 
 from __future__ import annotations
 
+import asyncio
+import inspect
 import json
 import time
 import urllib.error
 import urllib.request
+import weakref
+from collections.abc import AsyncIterator, Awaitable, Callable, Iterator, Mapping
 from dataclasses import dataclass
-from typing import Callable, Mapping, Protocol
+from functools import lru_cache
+from typing import Protocol
+
+from . import http_pool
+
+# Streaming backends yield `(text_delta, model_used)` pairs.
+StreamChunk = tuple[str, str]
 
 
 class BackendInterface(Protocol):
@@ -17,15 +27,62 @@ class BackendInterface(Protocol):
         """Return `(text, model_used)`."""
 
 
+class StreamingBackendInterface(BackendInterface, Protocol):
+    """Backend contract for incremental (token-by-token) completions."""
+
+    def stream_chat(self, *, instructions: str, message: str) -> Iterator[StreamChunk]:
+        """Yield `(text_delta, model_used)` pairs as the completion is generated."""
+
+
+class AsyncBackendInterface(Protocol):
+    """Backend contract for non-blocking completions on the ASGI chat path."""
+
+    async def achat(self, *, instructions: str, message: str) -> tuple[str, str]:
+        """Return `(text, model_used)` without blocking the event loop."""
+
+
+class AsyncStreamingBackendInterface(AsyncBackendInterface, Protocol):
+    """Backend contract for incremental completions relayed on the event loop."""
+
+    def astream_chat(self, *, instructions: str, message: str) -> AsyncIterator[StreamChunk]:
+        """Return an async iterator of `(text_delta, model_used)` pairs."""
+
+
+async def _single_chunk(complete: Callable[[], Awaitable[StreamChunk]]) -> AsyncIterator[StreamChunk]:
+    yield await complete()
+
+
 @dataclass(frozen=True)
 class CallableBackend:
     """Adapter for simple function-based backend implementations."""
 
     chat_fn: Callable[[str, str], tuple[str, str]]
+    stream_fn: Callable[[str, str], Iterator[StreamChunk]] | None = None
+    achat_fn: Callable[[str, str], Awaitable[tuple[str, str]]] | None = None
+    astream_fn: Callable[[str, str], AsyncIterator[StreamChunk]] | None = None
 
     def chat(self, *, instructions: str, message: str) -> tuple[str, str]:
         return self.chat_fn(instructions, message)
 
+    async def achat(self, *, instructions: str, message: str) -> tuple[str, str]:
+        if self.achat_fn is None:
+            # Blocking backends run in a worker thread so the event loop stays free.
+            return await asyncio.to_thread(self.chat_fn, instructions, message)
+        return await self.achat_fn(instructions, message)
+
+    def stream_chat(self, *, instructions: str, message: str) -> Iterator[StreamChunk]:
+        if self.stream_fn is None:
+            # Non-streaming backends relay the full completion as one chunk.
+            yield self.chat_fn(instructions, message)
+            return
+        yield from self.stream_fn(instructions, message)
+
+    def astream_chat(self, *, instructions: str, message: str) -> AsyncIterator[StreamChunk]:
+        if self.astream_fn is None:
+            # Backends without an async stream relay the full async completion as one chunk.
+            return _single_chunk(lambda: self.achat(instructions=instructions, message=message))
+        return self.astream_fn(instructions, message)
+
 
 def invoke_backend(
     backend: str,
@@ -40,6 +97,56 @@ def invoke_backend(
     return implementation.chat(instructions=instructions, message=message)
 
 
+async def ainvoke_backend(
+    backend: str,
+    *,
+    instructions: str,
+    message: str,
+    registry: Mapping[str, BackendInterface],
+) -> tuple[str, str]:
+    implementation = registry.get((backend or "").strip().lower())
+    if implementation is None:
+        raise RuntimeError("unknown_backend")
+    achat = getattr(implementation, "achat", None)
+    if achat is None:
+        return await asyncio.to_thread(implementation.chat, instructions=instructions, message=message)
+    return await achat(instructions=instructions, message=message)
+
+
+def invoke_backend_stream(
+    backend: str,
+    *,
+    instructions: str,
+    message: str,
+    registry: Mapping[str, BackendInterface],
+) -> Iterator[StreamChunk]:
+    implementation = registry.get((backend or "").strip().lower())
+    if implementation is None:
+        raise RuntimeError("unknown_backend")
+    stream_chat = getattr(implementation, "stream_chat", None)
+    if stream_chat is None:
+        return iter([implementation.chat(instructions=instructions, message=message)])
+    return stream_chat(instructions=instructions, message=message)
+
+
+def ainvoke_backend_stream(
+    backend: str,
+    *,
+    instructions: str,
+    message: str,
+    registry: Mapping[str, BackendInterface],
+) -> AsyncIterator[StreamChunk]:
+    implementation = registry.get((backend or "").strip().lower())
+    if implementation is None:
+        raise RuntimeError("unknown_backend")
+    astream_chat = getattr(implementation, "astream_chat", None)
+    if astream_chat is None:
+        return _single_chunk(
+            lambda: ainvoke_backend(backend, instructions=instructions, message=message, registry=registry)
+        )
+    return astream_chat(instructions=instructions, message=message)
+
+
 def is_retryable_backend_error(exc: Exception) -> bool:
     if isinstance(exc, RuntimeError) and str(exc) in {"openai_not_installed", "unknown_backend"}:
         return False
@@ -82,18 +189,197 @@ def call_backend_with_retries(
     raise last_exc or RuntimeError("backend_error")
 
 
-def ollama_chat(
+async def acall_backend_with_retries(
+    backend: str,
+    *,
+    instructions: str,
+    message: str,
+    ainvoke_backend_fn: Callable[[str, str, str], Awaitable[tuple[str, str]]],
+    max_attempts: int,
+    base_backoff: float,
+    sleeper: Callable[[float], Awaitable[None]] = asyncio.sleep,
+) -> tuple[str, str, int]:
+    """Async variant of `call_backend_with_retries`; backoff waits on the event loop."""
+    attempts = max(int(max_attempts), 1)
+    backoff = max(float(base_backoff), 0.0)
+    last_exc: Exception | None = None
+
+    for attempt in range(1, attempts + 1):
+        try:
+            text, model_used = await ainvoke_backend_fn(backend, instructions, message)
+            return text, model_used, attempt
+        except Exception as exc:
+            last_exc = exc
+            if attempt >= attempts or not is_retryable_backend_error(exc):
+                raise
+            sleep_seconds = backoff * (2 ** (attempt - 1))
+            if sleep_seconds > 0:
+                await sleeper(sleep_seconds)
+
+    raise last_exc or RuntimeError("backend_error")
+
+
+def _close_stream(stream) -> None:
+    close = getattr(stream, "close", None)
+    if close is None:
+        return
+    try:
+        close()
+    except Exception:
+        return
+
+
+class ReplayStream:
+    """Iterator that replays an already-read first chunk, then drains the upstream stream.
+
+    `close()` always closes the upstream (HTTP response, SDK stream), even when the
+    iterator was never consumed.
+    """
+
+    def __init__(self, first: StreamChunk | None, upstream):
+        self._pending = [first] if first is not None else []
+        self._upstream = upstream
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> StreamChunk:
+        if self._pending:
+            return self._pending.pop()
+        if self._upstream is None:
+            raise StopIteration
+        return next(self._upstream)
+
+    def close(self) -> None:
+        upstream, self._upstream = self._upstream, None
+        self._pending = []
+        _close_stream(upstream)
+
+
+def call_backend_stream_with_retries(
+    backend: str,
+    *,
+    instructions: str,
+    message: str,
+    invoke_stream_fn: Callable[[str, str, str], Iterator[StreamChunk]],
+    max_attempts: int,
+    base_backoff: float,
+    sleeper: Callable[[float], None] = time.sleep,
+) -> tuple[ReplayStream, int]:
+    """Open a backend stream and read its first chunk, retrying until that succeeds.
+
+    Retries only cover the window before the first chunk arrives; once text has
+    been relayed to the client, a mid-stream failure is surfaced to the caller.
+    Returns `(chunks, attempts)` where `chunks` replays the first chunk.
+    """
+    attempts = max(int(max_attempts), 1)
+    backoff = max(float(base_backoff), 0.0)
+    last_exc: Exception | None = None
+
+    for attempt in range(1, attempts + 1):
+        stream = None
+        try:
+            stream = iter(invoke_stream_fn(backend, instructions, message))
+            try:
+                first = next(stream)
+            except StopIteration:
+                return ReplayStream(None, stream), attempt
+            return ReplayStream(first, stream), attempt
+        except Exception as exc:
+            last_exc = exc
+            _close_stream(stream)
+            if attempt >= attempts or not is_retryable_backend_error(exc):
+                raise
+            sleep_seconds = backoff * (2 ** (attempt - 1))
+            if sleep_seconds > 0:
+                sleeper(sleep_seconds)
+
+    raise last_exc or RuntimeError("backend_error")
+
+
+async def _aclose_stream(stream) -> None:
+    """Close an async stream; `aclose()` for async generators, awaitable `close()` for SDK streams."""
+    close = getattr(stream, "aclose", None) or getattr(stream, "close", None)
+    if close is None:
+        return
+    try:
+        result = close()
+        if inspect.isawaitable(result):
+            await result
+    except Exception:
+        return
+
+
+class AsyncReplayStream:
+    """Async `ReplayStream`: replays the first chunk, then drains the upstream async iterator."""
+
+    def __init__(self, first: StreamChunk | None, upstream):
+        self._pending = [first] if first is not None else []
+        self._upstream = upstream
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> StreamChunk:
+        if self._pending:
+            return self._pending.pop()
+        if self._upstream is None:
+            raise StopAsyncIteration
+        return await anext(self._upstream)
+
+    async def aclose(self) -> None:
+        upstream, self._upstream = self._upstream, None
+        self._pending = []
+        await _aclose_stream(upstream)
+
+
+async def acall_backend_stream_with_retries(
+    backend: str,
+    *,
+    instructions: str,
+    message: str,
+    ainvoke_stream_fn: Callable[[str, str, str], AsyncIterator[StreamChunk]],
+    max_attempts: int,
+    base_backoff: float,
+    sleeper: Callable[[float], Awaitable[None]] = asyncio.sleep,
+) -> tuple[AsyncReplayStream, int]:
+    """Async variant of `call_backend_stream_with_retries`; backoff waits on the event loop."""
+    attempts = max(int(max_attempts), 1)
+    backoff = max(float(base_backoff), 0.0)
+    last_exc: Exception | None = None
+
+    for attempt in range(1, attempts + 1):
+        stream = None
+        try:
+            stream = aiter(ainvoke_stream_fn(backend, instructions, message))
+            try:
+                first = await anext(stream)
+            except StopAsyncIteration:
+                return AsyncReplayStream(None, stream), attempt
+            return AsyncReplayStream(first, stream), attempt
+        except Exception as exc:
+            last_exc = exc
+            await _aclose_stream(stream)
+            if attempt >= attempts or not is_retryable_backend_error(exc):
+                raise
+            sleep_seconds = backoff * (2 ** (attempt - 1))
+            if sleep_seconds > 0:
+                await sleeper(sleep_seconds)
+
+    raise last_exc or RuntimeError("backend_error")
+
+
+def _ollama_request(
     *,
     base_url: str,
     model: str,
     instructions: str,
     message: str,
-    timeout_seconds: int,
     temperature: float,
     top_p: float,
     num_predict: int,
-) -> tuple[str, str]:
-    """Execute a non-streaming Ollama chat completion and return `(text, model_used)`."""
+    stream: bool,
+) -> urllib.request.Request:
     if not base_url.lower().startswith(("http://", "https://")):
         raise ValueError("Invalid base URL scheme")
     url = base_url.rstrip("/") + "/api/chat"
@@ -109,13 +395,41 @@ def ollama_chat(
             {"role": "system", "content": instructions},
             {"role": "user", "content": message},
         ],
-        "stream": False,
+        "stream": stream,
         "options": options,
     }
     data = json.dumps(payload).encode("utf-8")
-    req = urllib.request.Request(url, data=data, headers={"Content-Type": "application/json"})
-    with urllib.request.urlopen(req, timeout=int(timeout_seconds)) as resp:  # nosec B310
+    return urllib.request.Request(url, data=data, headers={"Content-Type": "application/json"})
+
+
+def ollama_chat(
+    *,
+    base_url: str,
+    model: str,
+    instructions: str,
+    message: str,
+    timeout_seconds: int,
+    temperature: float,
+    top_p: float,
+    num_predict: int,
+) -> tuple[str, str]:
+    """Execute a non-streaming Ollama chat completion and return `(text, model_used)`."""
+    req = _ollama_request(
+        base_url=base_url,
+        model=model,
+        instructions=instructions,
+        message=message,
+        temperature=temperature,
+        top_p=top_p,
+        num_predict=num_predict,
+        stream=False,
+    )
+    with http_pool.urlopen(req, timeout=timeout_seconds) as resp:
         body = resp.read().decode("utf-8")
+    return _parse_ollama_reply(body, model)
+
+
+def _parse_ollama_reply(body: str, model: str) -> tuple[str, str]:
     parsed = json.loads(body)
     text = ""
     if isinstance(parsed, dict):
@@ -124,21 +438,157 @@ def ollama_chat(
     return text, parsed.get("model", model) if isinstance(parsed, dict) else model
 
 
-def openai_chat(
+async def aollama_chat(
     *,
-    api_key: str | None,
+    base_url: str,
     model: str,
     instructions: str,
     message: str,
-    max_output_tokens: int,
+    timeout_seconds: int,
+    temperature: float,
+    top_p: float,
+    num_predict: int,
 ) -> tuple[str, str]:
-    """Execute an OpenAI Responses API request and return `(text, model_used)`."""
+    """Async Ollama chat completion over the event loop's pooled `httpx` client.
+
+    Transport and HTTP status failures surface as `urllib.error.URLError`
+    (or `HTTPError`) so retry classification and error mapping match `ollama_chat`.
+    """
+    req = _ollama_request(
+        base_url=base_url,
+        model=model,
+        instructions=instructions,
+        message=message,
+        temperature=temperature,
+        top_p=top_p,
+        num_predict=num_predict,
+        stream=False,
+    )
+    resp = await http_pool.aurlopen(req, timeout=timeout_seconds)
+    return _parse_ollama_reply(resp.text, model)
+
+
+def ollama_chat_stream(
+    *,
+    base_url: str,
+    model: str,
+    instructions: str,
+    message: str,
+    timeout_seconds: int,
+    temperature: float,
+    top_p: float,
+    num_predict: int,
+) -> Iterator[StreamChunk]:
+    """Relay an Ollama NDJSON chat stream as `(text_delta, model_used)` pairs."""
+    req = _ollama_request(
+        base_url=base_url,
+        model=model,
+        instructions=instructions,
+        message=message,
+        temperature=temperature,
+        top_p=top_p,
+        num_predict=num_predict,
+        stream=True,
+    )
+    with http_pool.urlopen(req, timeout=timeout_seconds) as resp:
+        for raw_line in resp:
+            parsed = _parse_ollama_stream_line(raw_line.decode("utf-8"))
+            if parsed is None:
+                continue
+            delta = (parsed.get("message") or {}).get("content") or parsed.get("response") or ""
+            if delta:
+                yield delta, parsed.get("model", model)
+            if parsed.get("done"):
+                return
+
+
+def _parse_ollama_stream_line(line: str) -> dict | None:
+    """Decode one NDJSON stream line; None for blank or non-object lines."""
+    line = line.strip()
+    if not line:
+        return None
+    parsed = json.loads(line)
+    if not isinstance(parsed, dict):
+        return None
+    if parsed.get("error"):
+        raise RuntimeError("ollama_stream_error")
+    return parsed
+
+
+async def aollama_chat_stream(
+    *,
+    base_url: str,
+    model: str,
+    instructions: str,
+    message: str,
+    timeout_seconds: int,
+    temperature: float,
+    top_p: float,
+    num_predict: int,
+) -> AsyncIterator[StreamChunk]:
+    """Async `ollama_chat_stream` over the event loop's pooled `httpx` client."""
+    req = _ollama_request(
+        base_url=base_url,
+        model=model,
+        instructions=instructions,
+        message=message,
+        temperature=temperature,
+        top_p=top_p,
+        num_predict=num_predict,
+        stream=True,
+    )
+    resp = await http_pool.aurlopen_stream(req, timeout=timeout_seconds)
+    try:
+        async for line in resp.iter_lines():
+            parsed = _parse_ollama_stream_line(line)
+            if parsed is None:
+                continue
+            delta = (parsed.get("message") or {}).get("content") or parsed.get("response") or ""
+            if delta:
+                yield delta, parsed.get("model", model)
+            if parsed.get("done"):
+                return
+    finally:
+        await resp.aclose()
+
+
+@lru_cache(maxsize=4)
+def _openai_client(api_key: str | None):
+    """Reuse one OpenAI client (and its connection pool) per API key."""
     try:
-        from openai import OpenAI
+        from openai import DefaultHttpxClient, OpenAI
     except Exception as exc:  # pragma: no cover - optional dependency
         raise RuntimeError("openai_not_installed") from exc
+    return OpenAI(api_key=api_key, http_client=DefaultHttpxClient(limits=http_pool.pool_limits()))
+
+
+_async_openai_clients: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
 
-    client = OpenAI(api_key=api_key)
+
+def _async_openai_client(api_key: str | None):
+    """Reuse one AsyncOpenAI client per API key on the running event loop."""
+    try:
+        from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+    except Exception as exc:  # pragma: no cover - optional dependency
+        raise RuntimeError("openai_not_installed") from exc
+    per_loop = _async_openai_clients.setdefault(asyncio.get_running_loop(), {})
+    client = per_loop.get(api_key)
+    if client is None:
+        client = AsyncOpenAI(api_key=api_key, http_client=DefaultAsyncHttpxClient(limits=http_pool.pool_limits()))
+        per_loop[api_key] = client
+    return client
+
+
+def openai_chat(
+    *,
+    api_key: str | None,
+    model: str,
+    instructions: str,
+    message: str,
+    max_output_tokens: int,
+) -> tuple[str, str]:
+    """Execute an OpenAI Responses API request and return `(text, model_used)`."""
+    client = _openai_client(api_key)
     create_kwargs = {
         "model": model,
         "instructions": instructions,
@@ -150,9 +600,110 @@ def openai_chat(
     return (getattr(response, "output_text", "") or ""), model
 
 
+async def aopenai_chat(
+    *,
+    api_key: str | None,
+    model: str,
+    instructions: str,
+    message: str,
+    max_output_tokens: int,
+) -> tuple[str, str]:
+    """Async OpenAI Responses API request; returns `(text, model_used)`."""
+    create_kwargs = {
+        "model": model,
+        "instructions": instructions,
+        "input": message,
+    }
+    if max_output_tokens > 0:
+        create_kwargs["max_output_tokens"] = max_output_tokens
+    response = await _async_openai_client(api_key).responses.create(**create_kwargs)
+    return (getattr(response, "output_text", "") or ""), model
+
+
+def openai_chat_stream(
+    *,
+    api_key: str | None,
+    model: str,
+    instructions: str,
+    message: str,
+    max_output_tokens: int,
+) -> Iterator[StreamChunk]:
+    """Relay OpenAI Responses API `output_text` deltas as `(text_delta, model_used)` pairs."""
+    client = _openai_client(api_key)
+    create_kwargs = {
+        "model": model,
+        "instructions": instructions,
+        "input": message,
+        "stream": True,
+    }
+    if max_output_tokens > 0:
+        create_kwargs["max_output_tokens"] = max_output_tokens
+    events = client.responses.create(**create_kwargs)
+    try:
+        for event in events:
+            event_type = getattr(event, "type", "")
+            if event_type == "response.output_text.delta":
+                delta = getattr(event, "delta", "") or ""
+                if delta:
+                    yield delta, model
+            elif event_type in {"response.failed", "error"}:
+                raise RuntimeError("openai_stream_error")
+    finally:
+        _close_stream(events)
+
+
+async def aopenai_chat_stream(
+    *,
+    api_key: str | None,
+    model: str,
+    instructions: str,
+    message: str,
+    max_output_tokens: int,
+) -> AsyncIterator[StreamChunk]:
+    """Async `openai_chat_stream` over the event loop's `AsyncOpenAI` client."""
+    create_kwargs = {
+        "model": model,
+        "instructions": instructions,
+        "input": message,
+        "stream": True,
+    }
+    if max_output_tokens > 0:
+        create_kwargs["max_output_tokens"] = max_output_tokens
+    events = await _async_openai_client(api_key).responses.create(**create_kwargs)
+    try:
+        async for event in events:
+            event_type = getattr(event, "type", "")
+            if event_type == "response.output_text.delta":
+                delta = getattr(event, "delta", "") or ""
+                if delta:
+                    yield delta, model
+            elif event_type in {"response.failed", "error"}:
+                raise RuntimeError("openai_stream_error")
+    finally:
+        await _aclose_stream(events)
+
+
 def mock_chat(*, text: str) -> tuple[str, str]:
     """Return deterministic mock backend output for tests/local smoke."""
     normalized = (text or "").strip()
     if not normalized:
         normalized = "Let's solve this step by step. What did you try already?"
     return normalized, "mock-tutor-v1"
+
+
+async def amock_chat(*, text: str) -> tuple[str, str]:
+    """Async twin of `mock_chat` for the ASGI chat path."""
+    return mock_chat(text=text)
+
+
+def mock_chat_stream(*, text: str) -> Iterator[StreamChunk]:
+    """Yield deterministic mock output word-by-word for streaming tests."""
+    normalized, model_used = mock_chat(text=text)
+    for idx, word in enumerate(normalized.split(" ")):
+        yield (word if idx == 0 else " " + word), model_used
+
+
+async def amock_chat_stream(*, text: str) -> AsyncIterator[StreamChunk]:
+    """Async twin of `mock_chat_stream` for the ASGI chat path."""
+    for chunk in mock_chat_stream(text=text):
+        yield chunk
@@ -1,88 +1,264 @@
-"""Cache-backed backend circuit-breaker primitives."""
+"""Cache-backed rolling-window circuit breaker for helper backends.
+
+One breaker per backend/model pair, shared across workers through the cache:
+
+- closed: every request goes through. Outcomes land in time buckets (request
+  and error counters plus a latency histogram) covering the rolling window.
+  The breaker opens when the window's error rate or p95 latency crosses its
+  policy limit.
+- open: requests are rejected until `open_seconds` have passed.
+- half-open: at most `half_open_probes` requests are let through. Enough
+  successful, fast probes close the breaker and clear the window; a failed or
+  slow probe opens it again.
+
+Transitions are returned to the caller (for `log_chat_event`). Cache errors
+fail open so an outage never blocks helper traffic.
+"""
 
 from __future__ import annotations
 
+import time
+from dataclasses import dataclass
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# Upper bounds (ms) of the latency histogram bins; the last bin is unbounded.
+LATENCY_BINS_MS = (250, 500, 1000, 2000, 4000, 8000, 15000, 30000, 60000)
+
+
+@dataclass(frozen=True)
+class CircuitPolicy:
+    window_seconds: int = 60
+    bucket_seconds: int = 10
+    min_failures: int = 5
+    error_rate: float = 0.5
+    min_latency_samples: int = 5
+    p95_latency_ms: int = 20000
+    open_seconds: int = 30
+    half_open_probes: int = 1
+
+
+@dataclass(frozen=True)
+class CircuitDecision:
+    allowed: bool
+    state: str
+    transition: str = ""
+
+
+def circuit_name(backend: str, model: str) -> str:
+    return f"{backend}:{model}" if model and model != backend else backend
 
-def backend_circuit_key(backend: str) -> str:
-    return f"helper:circuit_open:{backend}"
 
+def _state_key(name: str) -> str:
+    return f"helper:circuit:{name}:state"
 
-def backend_failure_counter_key(backend: str) -> str:
-    return f"helper:circuit_failures:{backend}"
 
+def _probe_key(name: str) -> str:
+    return f"helper:circuit:{name}:probes"
 
-def backend_circuit_is_open(*, cache_backend, backend: str, logger) -> bool:
+
+def _probe_ok_key(name: str) -> str:
+    return f"helper:circuit:{name}:probe_ok"
+
+
+def _bucket_fields() -> list[str]:
+    return ["n", "err"] + [f"l{idx}" for idx in range(len(LATENCY_BINS_MS) + 1)]
+
+
+def _bucket_key(name: str, bucket: int, field: str) -> str:
+    return f"helper:circuit:{name}:b:{bucket}:{field}"
+
+
+def _latency_bin(latency_ms: int) -> int:
+    for idx, bound in enumerate(LATENCY_BINS_MS):
+        if latency_ms <= bound:
+            return idx
+    return len(LATENCY_BINS_MS)
+
+
+def _incr(cache_backend, key: str, *, timeout: int) -> int:
     try:
-        return bool(cache_backend.get(backend_circuit_key(backend)))
+        return int(cache_backend.incr(key))
+    except ValueError:
+        if cache_backend.add(key, 1, timeout=timeout):
+            return 1
+        return int(cache_backend.incr(key))
+
+
+def window_stats(*, cache_backend, name: str, policy: CircuitPolicy, now: float | None = None) -> dict:
+    """Requests, errors, error rate, and p95 latency (histogram bin bound) over the rolling window."""
+    now = time.time() if now is None else now
+    bucket_seconds = max(int(policy.bucket_seconds), 1)
+    current = int(now // bucket_seconds)
+    buckets = range(current - max(int(policy.window_seconds) // bucket_seconds, 1) + 1, current + 1)
+    fields = _bucket_fields()
+    keys = [_bucket_key(name, bucket, field) for bucket in buckets for field in fields]
+    values = cache_backend.get_many(keys)
+    totals = dict.fromkeys(fields, 0)
+    for bucket in buckets:
+        for field in fields:
+            totals[field] += int(values.get(_bucket_key(name, bucket, field)) or 0)
+    histogram = [totals[f"l{idx}"] for idx in range(len(LATENCY_BINS_MS) + 1)]
+    samples = sum(histogram)
+    p95_ms = 0
+    if samples:
+        threshold = samples * 0.95
+        seen = 0
+        for idx, count in enumerate(histogram):
+            seen += count
+            if seen >= threshold:
+                p95_ms = LATENCY_BINS_MS[idx] if idx < len(LATENCY_BINS_MS) else LATENCY_BINS_MS[-1] * 2
+                break
+    requests = totals["n"]
+    return {
+        "requests": requests,
+        "errors": totals["err"],
+        "error_rate": round(totals["err"] / requests, 3) if requests else 0.0,
+        "latency_samples": samples,
+        "p95_ms": p95_ms,
+    }
+
+
+def _should_open(stats: dict, policy: CircuitPolicy) -> bool:
+    if stats["errors"] >= max(int(policy.min_failures), 1) and stats["error_rate"] >= policy.error_rate:
+        return True
+    return (
+        policy.p95_latency_ms > 0
+        and stats["latency_samples"] >= max(int(policy.min_latency_samples), 1)
+        and stats["p95_ms"] >= policy.p95_latency_ms
+    )
+
+
+def open_circuit(*, cache_backend, name: str, policy: CircuitPolicy, now: float | None = None) -> None:
+    now = time.time() if now is None else now
+    open_seconds = max(int(policy.open_seconds), 1)
+    cache_backend.set(
+        _state_key(name),
+        {"state": OPEN, "until": now + open_seconds},
+        # The state outlives the open period so the next caller sees half-open.
+        timeout=open_seconds * 10,
+    )
+    cache_backend.delete_many([_probe_key(name), _probe_ok_key(name)])
+
+
+def _close(cache_backend, name: str, policy: CircuitPolicy, *, now: float) -> None:
+    bucket_seconds = max(int(policy.bucket_seconds), 1)
+    current = int(now // bucket_seconds)
+    buckets = range(current - max(int(policy.window_seconds) // bucket_seconds, 1) + 1, current + 1)
+    keys = [_bucket_key(name, bucket, field) for bucket in buckets for field in _bucket_fields()]
+    cache_backend.delete_many([_state_key(name), _probe_key(name), _probe_ok_key(name), *keys])
+
+
+def check_circuit(
+    *, cache_backend, name: str, policy: CircuitPolicy, logger, now: float | None = None
+) -> CircuitDecision:
+    """Decide whether one request may call the backend, admitting half-open probes."""
+    now = time.time() if now is None else now
+    try:
+        state = cache_backend.get(_state_key(name))
+        if not isinstance(state, dict):
+            return CircuitDecision(allowed=True, state=CLOSED)
+        if now < float(state.get("until") or 0):
+            return CircuitDecision(allowed=False, state=OPEN)
+        probes = _incr(cache_backend, _probe_key(name), timeout=max(int(policy.open_seconds), 1))
+        if probes > max(int(policy.half_open_probes), 1):
+            return CircuitDecision(allowed=False, state=HALF_OPEN)
+        transition = ""
+        if state.get("state") != HALF_OPEN:
+            cache_backend.set(
+                _state_key(name),
+                {"state": HALF_OPEN, "until": state.get("until")},
+                timeout=max(int(policy.open_seconds), 1) * 10,
+            )
+            transition = "half_open"
+        return CircuitDecision(allowed=True, state=HALF_OPEN, transition=transition)
     except Exception as exc:
         logger.warning(
             "helper_backend_circuit_check_failed backend=%s error=%s",
-            backend,
+            name,
             exc.__class__.__name__,
         )
         # Fail-open: cache outage should not block helper traffic.
-        return False
+        return CircuitDecision(allowed=True, state=CLOSED)
 
 
-def record_backend_failure(
+def record_outcome(
     *,
     cache_backend,
-    backend: str,
-    threshold: int,
-    ttl: int,
+    name: str,
+    policy: CircuitPolicy,
+    ok: bool,
+    latency_ms: int | None,
     logger,
-) -> None:
-    key = backend_failure_counter_key(backend)
+    now: float | None = None,
+) -> dict | None:
+    """Record one backend call; returns `{"transition": ..., **stats}` when the state changed."""
+    now = time.time() if now is None else now
+    slow = latency_ms is not None and policy.p95_latency_ms > 0 and latency_ms >= policy.p95_latency_ms
     try:
-        current = cache_backend.get(key)
+        state = cache_backend.get(_state_key(name))
+        if isinstance(state, dict):
+            if now < float(state.get("until") or 0):
+                # Started before the breaker opened; the open period already accounts for it.
+                return None
+            if not ok or slow:
+                open_circuit(cache_backend=cache_backend, name=name, policy=policy, now=now)
+                return {"transition": "reopened", "latency_ms": latency_ms}
+            successes = _incr(cache_backend, _probe_ok_key(name), timeout=max(int(policy.open_seconds), 1))
+            if successes >= max(int(policy.half_open_probes), 1):
+                _close(cache_backend, name, policy, now=now)
+                return {"transition": "closed", "latency_ms": latency_ms}
+            return None
+
+        bucket = int(now // max(int(policy.bucket_seconds), 1))
+        timeout = max(int(policy.window_seconds), 1) + max(int(policy.bucket_seconds), 1)
+        _incr(cache_backend, _bucket_key(name, bucket, "n"), timeout=timeout)
+        if not ok:
+            _incr(cache_backend, _bucket_key(name, bucket, "err"), timeout=timeout)
+        if latency_ms is not None:
+            _incr(cache_backend, _bucket_key(name, bucket, f"l{_latency_bin(latency_ms)}"), timeout=timeout)
+        if ok and not slow:
+            # A fast success cannot push the error rate or p95 over a limit.
+            return None
+        stats = window_stats(cache_backend=cache_backend, name=name, policy=policy, now=now)
+        if not _should_open(stats, policy):
+            return None
+        open_circuit(cache_backend=cache_backend, name=name, policy=policy, now=now)
+        return {"transition": "opened", **stats}
     except Exception as exc:
         logger.warning(
-            "helper_backend_circuit_record_failed backend=%s op=get error=%s",
-            backend,
+            "helper_backend_circuit_record_failed backend=%s error=%s",
+            name,
             exc.__class__.__name__,
         )
-        return
-
-    if current is None:
-        try:
-            cache_backend.set(key, 1, timeout=ttl)
-        except Exception as exc:
-            logger.warning(
-                "helper_backend_circuit_record_failed backend=%s op=set error=%s",
-                backend,
-                exc.__class__.__name__,
-            )
-        count = 1
-    else:
-        try:
-            count = int(cache_backend.incr(key))
-        except Exception as exc:
-            logger.warning(
-                "helper_backend_circuit_record_failed backend=%s op=incr error=%s",
-                backend,
-                exc.__class__.__name__,
-            )
-            count = int(current) + 1
-            try:
-                cache_backend.set(key, count, timeout=ttl)
-            except Exception:
-                return
-
-    if count >= threshold:
-        try:
-            cache_backend.set(backend_circuit_key(backend), 1, timeout=ttl)
-        except Exception:
-            return
+        return None
 
 
-def reset_backend_failure_state(*, cache_backend, backend: str, logger) -> None:
+def circuit_state(*, cache_backend, name: str) -> str:
     try:
-        cache_backend.delete(backend_failure_counter_key(backend))
-        cache_backend.delete(backend_circuit_key(backend))
-    except Exception as exc:
-        logger.warning(
-            "helper_backend_circuit_reset_failed backend=%s error=%s",
-            backend,
-            exc.__class__.__name__,
-        )
+        state = cache_backend.get(_state_key(name))
+    except Exception:
+        return CLOSED
+    if not isinstance(state, dict):
+        return CLOSED
+    if time.time() < float(state.get("until") or 0):
+        return OPEN
+    return HALF_OPEN
+
 
+__all__ = [
+    "CLOSED",
+    "CircuitDecision",
+    "CircuitPolicy",
+    "HALF_OPEN",
+    "LATENCY_BINS_MS",
+    "OPEN",
+    "check_circuit",
+    "circuit_name",
+    "circuit_state",
+    "open_circuit",
+    "record_outcome",
+    "window_stats",
+]
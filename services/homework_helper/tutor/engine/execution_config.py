@@ -28,6 +28,12 @@ class ExecutionConfig:
     queue_max_wait_seconds: float
     queue_poll_seconds: float
     queue_slot_ttl_seconds: int
+    queue_class_max_concurrency: int = 0
+    streaming_enabled: bool = True
+    answer_cache_enabled: bool = False
+    answer_cache_ttl_seconds: int = 900
+    single_flight_enabled: bool = True
+    single_flight_wait_seconds: float = 60.0
 
 
 def resolve_execution_config(
@@ -62,8 +68,14 @@ def resolve_execution_config(
         piper_hardware_triage_enabled=env_bool("HELPER_PIPER_HARDWARE_TRIAGE_ENABLED", True),
         queue_max_concurrency=env_int("HELPER_MAX_CONCURRENCY", 2),
         queue_max_wait_seconds=env_float("HELPER_QUEUE_MAX_WAIT_SECONDS", 10.0),
-        queue_poll_seconds=env_float("HELPER_QUEUE_POLL_SECONDS", 0.2),
+        queue_poll_seconds=max(env_float("HELPER_QUEUE_POLL_SECONDS", 1.0), 0.05),
         queue_slot_ttl_seconds=env_int("HELPER_QUEUE_SLOT_TTL_SECONDS", 120),
+        queue_class_max_concurrency=max(env_int("HELPER_QUEUE_CLASS_MAX_CONCURRENCY", 0), 0),
+        streaming_enabled=env_bool("HELPER_STREAMING_ENABLED", True),
+        answer_cache_enabled=env_bool("HELPER_ANSWER_CACHE_ENABLED", False),
+        answer_cache_ttl_seconds=max(env_int("HELPER_ANSWER_CACHE_TTL_SECONDS", 900), 30),
+        single_flight_enabled=env_bool("HELPER_SINGLE_FLIGHT_ENABLED", True),
+        single_flight_wait_seconds=max(env_float("HELPER_SINGLE_FLIGHT_WAIT_SECONDS", 60.0), 0.0),
     )
 
 
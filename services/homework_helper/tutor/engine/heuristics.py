@@ -1,8 +1,18 @@
-"""Policy/heuristic helpers for helper chat behavior."""
+"""Policy/heuristic helpers for helper chat behavior.
+
+Keyword checks run on every chat request. Each keyword set is compiled once into
+a `PhraseMatcher` (cached per distinct keyword tuple, so an env change simply
+builds a new one). The chat turn lowercases and tokenizes each message once with
+`analyze_message` and passes the resulting `MessageText` to every check; the
+checks also accept a plain string. Message text itself is never cached.
+"""
 
 from __future__ import annotations
 
 import re
+from collections.abc import Iterable
+from dataclasses import dataclass
+from functools import lru_cache
 
 DEFAULT_TEXT_LANGUAGE_KEYWORDS = [
     "pascal",
@@ -46,18 +56,94 @@ DEFAULT_PIPER_HARDWARE_KEYWORDS = [
 ]
 
 
+class PhraseMatcher:
+    """Case-insensitive substring matcher compiled once for a fixed phrase set.
+
+    Phrases are merged into one prefix-trie regex, so a message is scanned once
+    however many phrases are configured instead of once per phrase. Matching
+    keeps the old `phrase in text.lower()` semantics, including matches inside
+    longer words.
+    """
+
+    __slots__ = ("phrases", "_pattern")
+
+    def __init__(self, phrases: Iterable[str]):
+        self.phrases = tuple(dict.fromkeys(str(p).lower() for p in phrases if p))
+        self._pattern = re.compile(_trie_pattern(self.phrases)) if self.phrases else None
+
+    def search_lowered(self, lowered: str) -> bool:
+        return self._pattern is not None and self._pattern.search(lowered) is not None
+
+    def search(self, text: str) -> bool:
+        return self.search_lowered((text or "").lower())
+
+
+def _trie_pattern(phrases: Iterable[str]) -> str:
+    trie: dict = {}
+    for phrase in phrases:
+        node = trie
+        for char in phrase:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def emit(node: dict) -> str:
+        alternatives = [re.escape(char) + emit(child) for char, child in sorted(node.items()) if char]
+        if not alternatives:
+            return ""
+        body = alternatives[0] if len(alternatives) == 1 else "(?:" + "|".join(alternatives) + ")"
+        if "" in node:
+            # A phrase ends here and longer ones continue; the suffix is optional.
+            if len(alternatives) == 1 and len(alternatives[0]) > 1:
+                body = f"(?:{body})"
+            body += "?"
+        return body
+
+    return emit(trie)
+
+
+@lru_cache(maxsize=64)
+def phrase_matcher(phrases: tuple[str, ...]) -> PhraseMatcher:
+    """Return the shared matcher for a keyword set; a changed env value is a new key."""
+    return PhraseMatcher(phrases)
+
+
+@lru_cache(maxsize=128)
+def _parse_csv_tuple(raw: str) -> tuple[str, ...]:
+    return tuple(part.strip().lower() for part in (raw or "").split(",") if part.strip())
+
+
 def parse_csv_list(raw: str) -> list[str]:
-    return [part.strip().lower() for part in (raw or "").split(",") if part.strip()]
+    return list(_parse_csv_tuple(raw or ""))
+
 
+_TOKEN_SPLIT = re.compile(r"[^a-z0-9]+")
 
-def contains_text_language(message: str, keywords: list[str]) -> bool:
-    lowered = message.lower()
-    return any(keyword in lowered for keyword in keywords)
+
+def _tokens(lowered: str) -> frozenset[str]:
+    return frozenset(part for part in _TOKEN_SPLIT.split(lowered) if len(part) >= 4)
+
+
+@dataclass(frozen=True)
+class MessageText:
+    """A message lowercased and tokenized once for all keyword checks of one request."""
+
+    lowered: str
+    tokens: frozenset[str]
+
+
+def analyze_message(message: str | MessageText) -> MessageText:
+    if isinstance(message, MessageText):
+        return message
+    lowered = (message or "").lower()
+    return MessageText(lowered=lowered, tokens=_tokens(lowered))
+
+
+def contains_text_language(message: str | MessageText, keywords: list[str]) -> bool:
+    return phrase_matcher(tuple(keywords)).search_lowered(analyze_message(message).lowered)
 
 
 def contains_any_phrase(text: str, phrases: list[str]) -> bool:
-    lowered = (text or "").lower()
-    return any(phrase and phrase in lowered for phrase in phrases)
+    return phrase_matcher(tuple(phrases)).search(text)
 
 
 def is_scratch_context(context_value: str, topics: list[str], reference_text: str) -> bool:
@@ -89,26 +175,31 @@ def is_piper_context(
     return contains_any_phrase(combined, keywords)
 
 
-def is_piper_hardware_question(message: str, *, keywords: list[str]) -> bool:
-    return contains_any_phrase(message, keywords)
+def is_piper_hardware_question(message: str | MessageText, *, keywords: list[str]) -> bool:
+    return phrase_matcher(tuple(keywords)).search_lowered(analyze_message(message).lowered)
 
 
-def select_piper_hardware_check(message: str) -> str:
-    lowered = (message or "").lower()
-    if any(token in lowered for token in ("jump", "cheeseteroid")):
+_HARDWARE_JUMP = PhraseMatcher(("jump", "cheeseteroid"))
+_HARDWARE_ALL_INPUTS = PhraseMatcher(("none", "all", "every", "nothing"))
+_HARDWARE_CONTROLS = PhraseMatcher(("button", "buttons", "control", "controls", "wire", "wiring"))
+_HARDWARE_DIRECTION = PhraseMatcher(("left", "right", "forward", "back", "direction", "one direction"))
+_HARDWARE_STEP = PhraseMatcher(("storymode", "mars", "step", "level"))
+
+
+def select_piper_hardware_check(message: str | MessageText) -> str:
+    lowered = analyze_message(message).lowered
+    if _HARDWARE_JUMP.search_lowered(lowered):
         return "Check only the jump input path: confirm jumper seating and shared ground for that jump control."
-    if any(token in lowered for token in ("none", "all", "every", "nothing")) and any(
-        token in lowered for token in ("button", "buttons", "control", "controls", "wire", "wiring")
-    ):
+    if _HARDWARE_ALL_INPUTS.search_lowered(lowered) and _HARDWARE_CONTROLS.search_lowered(lowered):
         return "Check shared ground first, then reseat one suspect jumper wire and retest before changing anything else."
-    if any(token in lowered for token in ("left", "right", "forward", "back", "direction", "one direction")):
+    if _HARDWARE_DIRECTION.search_lowered(lowered):
         return "Compare the failing direction wire path to a known-good direction and change only one mismatch."
-    if any(token in lowered for token in ("storymode", "mars", "step", "level")):
+    if _HARDWARE_STEP.search_lowered(lowered):
         return "Confirm you are on the exact StoryMode test step where controls are evaluated before rewiring."
     return "Pick one input, verify its jumper path and shared ground, then retest only that single input."
 
 
-def build_piper_hardware_triage_text(message: str) -> str:
+def build_piper_hardware_triage_text(message: str | MessageText) -> str:
     one_check = select_piper_hardware_check(message)
     return (
         "Let's triage this in one pass.\n"
@@ -119,36 +210,40 @@ def build_piper_hardware_triage_text(message: str) -> str:
 
 
 def tokenize(text: str) -> set[str]:
-    parts = re.split(r"[^a-z0-9]+", text.lower())
-    return {p for p in parts if len(p) >= 4}
+    return set(_tokens(text.lower()))
 
 
-def allowed_topic_overlap(message: str, allowed_topics: list[str]) -> bool:
+@lru_cache(maxsize=128)
+def _topic_tokens(allowed_topics: tuple[str, ...]) -> frozenset[str]:
+    return frozenset().union(*(_tokens(topic.lower()) for topic in allowed_topics))
+
+
+def allowed_topic_overlap(message: str | MessageText, allowed_topics: list[str]) -> bool:
     if not allowed_topics:
         return True
-    msg_tokens = tokenize(message)
+    msg_tokens = analyze_message(message).tokens
     if not msg_tokens:
         return False
-    topic_tokens: set[str] = set()
-    for topic in allowed_topics:
-        topic_tokens |= tokenize(topic)
-    return bool(msg_tokens & topic_tokens)
+    return not msg_tokens.isdisjoint(_topic_tokens(tuple(allowed_topics)))
+
+
+# Checked in order; the first intent whose phrases appear wins.
+_INTENT_MATCHERS = (
+    ("debug", PhraseMatcher(("error", "not working", "doesn't", "doesnt", "can't", "cant", "stuck", "broken", "fail"))),
+    ("concept", PhraseMatcher(("what is", "why", "explain", "define", "mean", "difference"))),
+    ("strategy", PhraseMatcher(("next step", "what should i do", "how do i start", "plan", "first step", "sequence"))),
+    ("reflection", PhraseMatcher(("is this right", "check my", "did i do", "review this", "how did i do"))),
+    ("status", PhraseMatcher(("done", "finished", "submitted", "complete", "completed"))),
+)
 
 
-def classify_intent(message: str) -> str:
-    lowered = (message or "").strip().lower()
-    if not lowered:
+def classify_intent(message: str | MessageText) -> str:
+    lowered = analyze_message(message).lowered
+    if not lowered.strip():
         return "general"
-    if any(token in lowered for token in ("error", "not working", "doesn't", "doesnt", "can't", "cant", "stuck", "broken", "fail")):
-        return "debug"
-    if any(token in lowered for token in ("what is", "why", "explain", "define", "mean", "difference")):
-        return "concept"
-    if any(token in lowered for token in ("next step", "what should i do", "how do i start", "plan", "first step", "sequence")):
-        return "strategy"
-    if any(token in lowered for token in ("is this right", "check my", "did i do", "review this", "how did i do")):
-        return "reflection"
-    if any(token in lowered for token in ("done", "finished", "submitted", "complete", "completed")):
-        return "status"
+    for intent, matcher in _INTENT_MATCHERS:
+        if matcher.search_lowered(lowered):
+            return intent
     return "general"
 
 
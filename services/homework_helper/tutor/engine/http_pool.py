@@ -0,0 +1,227 @@
+"""Process-wide keep-alive HTTP clients for the helper's outbound calls.
+
+Ollama requests and Class Hub event forwards used to open a new TCP (and TLS)
+connection per call. Clients here are shared per origin, so repeat calls reuse
+idle connections. `HELPER_HTTP_POOL_MAXSIZE` and `HELPER_HTTP_POOL_IDLE_SECONDS`
+size the idle keep-alive pool only; the number of concurrent calls is not capped
+here, because the admission queue already bounds backend concurrency and a cap
+in httpx would queue requests a second time, out of the queue's sight.
+
+`urlopen` accepts the same `urllib.request.Request` objects callers already
+build and raises `urllib.error.HTTPError`/`URLError`, so retry classification
+and error mapping are unchanged.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import threading
+import urllib.error
+import urllib.parse
+import urllib.request
+import weakref
+
+import httpx
+
+from .runtime import env_float, env_int
+
+_lock = threading.Lock()
+_clients: dict[str, httpx.Client] = {}
+_clients_pid = os.getpid()
+_async_clients: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+
+
+def pool_limits() -> httpx.Limits:
+    maxsize = max(env_int("HELPER_HTTP_POOL_MAXSIZE", 8, getenv=os.getenv), 1)
+    idle_seconds = max(env_float("HELPER_HTTP_POOL_IDLE_SECONDS", 30.0, getenv=os.getenv), 0.0)
+    return httpx.Limits(
+        max_connections=None,
+        max_keepalive_connections=maxsize,
+        keepalive_expiry=idle_seconds,
+    )
+
+
+def _origin(url: str) -> str:
+    parts = urllib.parse.urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}".lower()
+
+
+def client_for(url: str) -> httpx.Client:
+    """Return the shared client for the URL's origin, creating it on first use."""
+    global _clients_pid
+    origin = _origin(url)
+    with _lock:
+        if _clients_pid != os.getpid():
+            # Connections inherited across fork belong to the parent process.
+            _clients.clear()
+            _clients_pid = os.getpid()
+        client = _clients.get(origin)
+        if client is None:
+            client = httpx.Client(limits=pool_limits(), timeout=None)
+            _clients[origin] = client
+        return client
+
+
+def async_client_for(url: str) -> httpx.AsyncClient:
+    """Return the shared async client for the URL's origin on the running event loop.
+
+    Async connections are bound to the loop that opened them, so clients are
+    kept per loop and dropped with it.
+    """
+    loop = asyncio.get_running_loop()
+    per_loop = _async_clients.setdefault(loop, {})
+    origin = _origin(url)
+    client = per_loop.get(origin)
+    if client is None:
+        client = httpx.AsyncClient(limits=pool_limits(), timeout=None)
+        per_loop[origin] = client
+    return client
+
+
+def close_all() -> None:
+    with _lock:
+        clients = list(_clients.values())
+        _clients.clear()
+    for client in clients:
+        client.close()
+
+
+class PooledResponse:
+    """Minimal `urlopen`-style response over a streamed `httpx.Response`."""
+
+    def __init__(self, response: httpx.Response):
+        self._response = response
+        self.status = response.status_code
+
+    def getcode(self) -> int:
+        return self.status
+
+    def read(self) -> bytes:
+        try:
+            return self._response.read()
+        except httpx.HTTPError as exc:
+            raise urllib.error.URLError(str(exc)) from exc
+
+    def __iter__(self):
+        try:
+            for line in self._response.iter_lines():
+                yield f"{line}\n".encode()
+        except httpx.HTTPError as exc:
+            raise urllib.error.URLError(str(exc)) from exc
+
+    def close(self) -> None:
+        self._response.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_exc) -> None:
+        self.close()
+
+
+def urlopen(req: urllib.request.Request, *, timeout: float) -> PooledResponse:
+    """Send `req` over the pooled client for its origin."""
+    client = client_for(req.full_url)
+    request = client.build_request(
+        req.get_method(),
+        req.full_url,
+        content=req.data,
+        headers=dict(req.header_items()),
+        timeout=float(timeout),
+    )
+    try:
+        response = client.send(request, stream=True)
+    except httpx.HTTPError as exc:
+        raise urllib.error.URLError(str(exc)) from exc
+    if response.status_code >= 400:
+        response.close()
+        raise urllib.error.HTTPError(
+            req.full_url,
+            response.status_code,
+            response.reason_phrase,
+            response.headers,
+            None,
+        )
+    return PooledResponse(response)
+
+
+async def aurlopen(req: urllib.request.Request, *, timeout: float) -> httpx.Response:
+    """Async `urlopen`: send `req` over the loop's pooled client and return the read response."""
+    client = async_client_for(req.full_url)
+    try:
+        response = await client.request(
+            req.get_method(),
+            req.full_url,
+            content=req.data,
+            headers=dict(req.header_items()),
+            timeout=float(timeout),
+        )
+    except httpx.HTTPError as exc:
+        raise urllib.error.URLError(str(exc)) from exc
+    if response.status_code >= 400:
+        raise urllib.error.HTTPError(
+            req.full_url,
+            response.status_code,
+            response.reason_phrase,
+            response.headers,
+            None,
+        )
+    return response
+
+
+class AsyncPooledStream:
+    """Async counterpart of `PooledResponse` for a streamed body read line by line."""
+
+    def __init__(self, response: httpx.Response):
+        self._response = response
+        self.status = response.status_code
+
+    async def iter_lines(self):
+        try:
+            async for line in self._response.aiter_lines():
+                yield line
+        except httpx.HTTPError as exc:
+            raise urllib.error.URLError(str(exc)) from exc
+
+    async def aclose(self) -> None:
+        await self._response.aclose()
+
+
+async def aurlopen_stream(req: urllib.request.Request, *, timeout: float) -> AsyncPooledStream:
+    """Async `urlopen` that leaves the body unread so callers can relay it as it arrives."""
+    client = async_client_for(req.full_url)
+    request = client.build_request(
+        req.get_method(),
+        req.full_url,
+        content=req.data,
+        headers=dict(req.header_items()),
+        timeout=float(timeout),
+    )
+    try:
+        response = await client.send(request, stream=True)
+    except httpx.HTTPError as exc:
+        raise urllib.error.URLError(str(exc)) from exc
+    if response.status_code >= 400:
+        await response.aclose()
+        raise urllib.error.HTTPError(
+            req.full_url,
+            response.status_code,
+            response.reason_phrase,
+            response.headers,
+            None,
+        )
+    return AsyncPooledStream(response)
+
+
+__all__ = [
+    "AsyncPooledStream",
+    "PooledResponse",
+    "async_client_for",
+    "aurlopen",
+    "aurlopen_stream",
+    "client_for",
+    "close_all",
+    "pool_limits",
+    "urlopen",
+]
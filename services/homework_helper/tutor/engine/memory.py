@@ -1,12 +1,26 @@
-"""Conversation-memory helpers for helper chat sessions."""
+"""Conversation-memory helpers for helper chat sessions.
+
+Saved conversations are registered in two indexes (per actor and per class) so
+a teacher reset can find every conversation of a class. On Redis each index is
+a sorted set scored by last activity: registering is one pipelined ZADD per
+index, concurrent turns never overwrite each other, and entries are trimmed by
+age once their conversation has expired. Other caches (locmem in dev/tests)
+keep a `{conversation_key: last_activity}` dict updated under a process lock.
+"""
 
 from __future__ import annotations
 
 import hashlib
 import logging
 import re
+import threading
+import time
 import uuid
-from collections.abc import Sequence
+from collections.abc import Callable, Iterator, Sequence
+
+from common.redis_clients import cache_alias, redis_client
+
+from . import state_codec
 
 logger = logging.getLogger(__name__)
 
@@ -63,7 +77,7 @@ def conversation_cache_key(*, actor_key: str, scope_fp: str, conversation_id: st
 
 def conversation_actor_index_key(*, actor_key: str) -> str:
     actor = _ACTOR_SANITIZE_RE.sub("_", (actor_key or "").strip())[:96] or "unknown"
-    return f"helper:conversation:index:actor:{actor}"
+    return f"helper:conversation:index:v2:actor:{actor}"
 
 
 def _class_id_from_actor_key(actor_key: str) -> int | None:
@@ -80,9 +94,94 @@ def _class_id_from_actor_key(actor_key: str) -> int | None:
 
 
 def conversation_class_index_key(*, class_id: int) -> str:
+    return f"helper:conversation:index:v2:class:{max(int(class_id), 0)}"
+
+
+def _legacy_class_index_key(class_id: int) -> str:
+    # List-valued index written before the sorted-set indexes; read until its TTL runs out.
     return f"helper:conversation:index:class:{max(int(class_id), 0)}"
 
 
+_INDEX_MAX_ENTRIES = 1200
+_INDEX_MIN_TTL_SECONDS = 300
+_RESET_BATCH_SIZE = 200
+_index_lock = threading.Lock()
+
+
+class RedisConversationIndex:
+    """Sorted-set indexes scored by last activity, updated without reading them first."""
+
+    def __init__(self, *, client, make_key):
+        self._client = client
+        self._make_key = make_key
+
+    def register(self, index_keys: Sequence[str], conversation_key: str, *, ttl_seconds: int, now: float) -> None:
+        pipe = self._client.pipeline(transaction=False)
+        for index_key in index_keys:
+            key = self._make_key(index_key)
+            pipe.zadd(key, {conversation_key: now})
+            # Conversations idle longer than their TTL are gone; the cap only bounds pathological growth.
+            pipe.zremrangebyscore(key, "-inf", f"({now - ttl_seconds}")
+            pipe.zremrangebyrank(key, 0, -(_INDEX_MAX_ENTRIES + 1))
+            pipe.expire(key, max(int(ttl_seconds), _INDEX_MIN_TTL_SECONDS))
+        pipe.execute()
+
+    def members(self, index_key: str, *, max_items: int) -> list[str]:
+        """Most recent `max_items` conversation keys, oldest first."""
+        raw = self._client.zrange(self._make_key(index_key), -max(int(max_items), 1), -1)
+        return [item.decode("utf-8") if isinstance(item, bytes) else str(item) for item in raw]
+
+    def delete(self, index_key: str) -> None:
+        self._client.delete(self._make_key(index_key))
+
+
+class CacheConversationIndex:
+    """Fallback for caches without sorted sets: activity-ordered dicts under a process lock."""
+
+    def __init__(self, cache_backend):
+        self._cache = cache_backend
+
+    def register(self, index_keys: Sequence[str], conversation_key: str, *, ttl_seconds: int, now: float) -> None:
+        cutoff = now - ttl_seconds
+        with _index_lock:
+            for index_key in index_keys:
+                entries = _coerce_index_entries(self._cache.get(index_key))
+                # Re-inserting keeps the dict ordered by last activity, oldest first.
+                entries.pop(conversation_key, None)
+                entries[conversation_key] = now
+                for key in list(entries):
+                    if entries[key] >= cutoff and len(entries) <= _INDEX_MAX_ENTRIES:
+                        break
+                    del entries[key]
+                self._cache.set(index_key, entries, timeout=max(int(ttl_seconds), _INDEX_MIN_TTL_SECONDS))
+
+    def members(self, index_key: str, *, max_items: int) -> list[str]:
+        return list(_coerce_index_entries(self._cache.get(index_key)))[-max(int(max_items), 1) :]
+
+    def delete(self, index_key: str) -> None:
+        self._cache.delete(index_key)
+
+
+def conversation_index(cache_backend):
+    """Sorted-set index store for a configured `RedisCache`, else the locked dict fallback."""
+    alias = cache_alias(cache_backend)
+    client = redis_client(alias) if alias else None
+    if client is not None:
+        return RedisConversationIndex(client=client, make_key=cache_backend.make_key)
+    return CacheConversationIndex(cache_backend)
+
+
+def _coerce_index_entries(raw) -> dict[str, float]:
+    if not isinstance(raw, dict):
+        return {}
+    out: dict[str, float] = {}
+    for key, score in raw.items():
+        value = str(key or "").strip()
+        if value and isinstance(score, (int, float)):
+            out[value] = float(score)
+    return out
+
+
 def _coerce_key_list(raw, *, max_items: int) -> list[str]:
     if not isinstance(raw, list):
         return []
@@ -129,8 +228,20 @@ def _coerce_summary(raw, *, max_chars: int) -> str:
 
 
 def _coerce_state(raw, *, max_messages: int) -> dict[str, object]:
+    if state_codec.is_compact(raw):
+        # Written by save_state from normalized turns, so only the message cap is re-applied.
+        try:
+            state = state_codec.decode_state(raw)
+        except state_codec.StateDecodeError:
+            logger.warning("conversation_memory_state_decode_failed bytes=%s", len(raw))
+            return {"summary": "", "turns": []}
+        turns = state["turns"]
+        if max_messages > 0 and len(turns) > max_messages:
+            state["turns"] = turns[-max_messages:]
+        return state
     if not isinstance(raw, dict):
         return {"summary": "", "turns": []}
+    # Legacy `v: 2` dict payloads are still read until they expire.
     turns = _coerce_turns(raw.get("turns"))
     if max_messages > 0 and len(turns) > max_messages:
         turns = turns[-max_messages:]
@@ -147,31 +258,31 @@ def load_state(*, cache_backend, key: str, max_messages: int) -> dict[str, objec
     return _coerce_state(stored, max_messages=max_messages)
 
 
-def _register_index_key(
+def _register_index_keys(
     *,
     cache_backend,
-    index_key: str,
+    index_keys: Sequence[str],
     conversation_key: str,
     ttl_seconds: int,
-    max_entries: int = 1200,
 ) -> None:
-    if not index_key:
-        return
     try:
-        existing = cache_backend.get(index_key)
+        conversation_index(cache_backend).register(
+            index_keys, conversation_key, ttl_seconds=max(int(ttl_seconds), 1), now=time.time()
+        )
     except Exception:
-        logger.warning("conversation_memory_cache_get_failed key=%s", index_key)
-        return
-    values = _coerce_key_list(existing, max_items=max_entries)
-    if conversation_key in values:
-        values = [item for item in values if item != conversation_key]
-    values.append(conversation_key)
-    if max_entries > 0 and len(values) > max_entries:
-        values = values[-max_entries:]
+        logger.warning("conversation_memory_index_register_failed keys=%s", ",".join(index_keys))
+
+
+def _class_index_members(*, cache_backend, class_id: int, max_keys: int) -> list[str] | None:
+    """Indexed conversation keys for a class (legacy list entries first); None when the cache failed."""
+    class_key = conversation_class_index_key(class_id=class_id)
     try:
-        cache_backend.set(index_key, values, timeout=max(int(ttl_seconds), 300))
+        legacy = _coerce_key_list(cache_backend.get(_legacy_class_index_key(class_id)), max_items=max_keys)
+        current = conversation_index(cache_backend).members(class_key, max_items=max_keys)
     except Exception:
-        logger.warning("conversation_memory_cache_set_failed key=%s", index_key)
+        logger.warning("conversation_memory_cache_get_failed key=%s", class_key)
+        return None
+    return list(dict.fromkeys([*legacy, *current]))[-max_keys:]
 
 
 def save_state(
@@ -182,34 +293,35 @@ def save_state(
     summary: str,
     ttl_seconds: int,
     actor_key: str = "",
+    compact: bool = True,
 ) -> None:
+    """Store normalized state; `compact` selects the v3 byte codec over the legacy `v: 2` dict."""
     normalized = _coerce_turns(turns)
-    payload = {
-        "v": 2,
-        "summary": _coerce_summary(summary, max_chars=2000),
-        "turns": normalized,
-    }
+    normalized_summary = _coerce_summary(summary, max_chars=2000)
+    if compact:
+        try:
+            payload = state_codec.encode_state(summary=normalized_summary, turns=normalized)
+        except Exception:
+            logger.warning("conversation_memory_encode_failed key=%s", key)
+            return
+    else:
+        payload = {"v": 2, "summary": normalized_summary, "turns": normalized}
     timeout = max(int(ttl_seconds), 60)
     try:
         cache_backend.set(key, payload, timeout=timeout)
     except Exception:
         logger.warning("conversation_memory_cache_set_failed key=%s", key)
         return
-    actor_index_key = conversation_actor_index_key(actor_key=actor_key)
-    _register_index_key(
+    index_keys = [conversation_actor_index_key(actor_key=actor_key)]
+    class_id = _class_id_from_actor_key(actor_key)
+    if class_id is not None:
+        index_keys.append(conversation_class_index_key(class_id=class_id))
+    _register_index_keys(
         cache_backend=cache_backend,
-        index_key=actor_index_key,
+        index_keys=index_keys,
         conversation_key=key,
         ttl_seconds=timeout,
     )
-    class_id = _class_id_from_actor_key(actor_key)
-    if class_id is not None:
-        _register_index_key(
-            cache_backend=cache_backend,
-            index_key=conversation_class_index_key(class_id=class_id),
-            conversation_key=key,
-            ttl_seconds=timeout,
-        )
 
 
 def load_turns(*, cache_backend, key: str, max_messages: int) -> list[dict[str, str]]:
@@ -312,74 +424,118 @@ def summarize_turns(
     return _coerce_summary(summary, max_chars=cap)
 
 
-def clear_class_conversations(*, cache_backend, class_id: int, max_keys: int = 4000) -> int:
+def _delete_class_index(cache_backend, class_id: int) -> None:
     class_key = conversation_class_index_key(class_id=class_id)
     try:
-        indexed = cache_backend.get(class_key)
+        conversation_index(cache_backend).delete(class_key)
+        cache_backend.delete(_legacy_class_index_key(class_id))
     except Exception:
-        logger.warning("conversation_memory_cache_get_failed key=%s", class_key)
-        return 0
+        logger.warning("conversation_memory_cache_delete_failed key=%s", class_key)
 
-    keys = _coerce_key_list(indexed, max_items=max(int(max_keys), 1))
-    if not keys:
-        try:
-            cache_backend.delete(class_key)
-        except Exception:
-            logger.warning("conversation_memory_cache_delete_failed key=%s", class_key)
+
+def _batches(keys: Sequence[str], batch_size: int) -> Iterator[list[str]]:
+    size = max(int(batch_size), 1)
+    for offset in range(0, len(keys), size):
+        yield list(keys[offset : offset + size])
+
+
+def count_class_conversations(*, cache_backend, class_id: int, max_keys: int = 4000) -> int:
+    keys = _class_index_members(cache_backend=cache_backend, class_id=class_id, max_keys=max(int(max_keys), 1))
+    return len(keys or [])
+
+
+def clear_class_conversations(
+    *,
+    cache_backend,
+    class_id: int,
+    max_keys: int = 4000,
+    batch_size: int = _RESET_BATCH_SIZE,
+    on_batch: Callable[[int, int], None] | None = None,
+) -> int:
+    """Delete every indexed conversation of a class with one `delete_many` per batch.
+
+    `on_batch(processed, total)` is called after each batch for progress reporting.
+    """
+    keys = _class_index_members(cache_backend=cache_backend, class_id=class_id, max_keys=max(int(max_keys), 1))
+    if keys is None:
         return 0
 
     deleted = 0
-    for key in keys:
+    processed = 0
+    for batch in _batches(keys, batch_size):
         try:
-            cache_backend.delete(key)
-            deleted += 1
+            cache_backend.delete_many(batch)
+            deleted += len(batch)
         except Exception:
-            logger.warning("conversation_memory_cache_delete_failed key=%s", key)
-    try:
-        cache_backend.delete(class_key)
-    except Exception:
-        logger.warning("conversation_memory_cache_delete_failed key=%s", class_key)
+            logger.warning("conversation_memory_cache_delete_failed keys=%s", len(batch))
+        processed += len(batch)
+        if on_batch is not None:
+            on_batch(processed, len(keys))
+    _delete_class_index(cache_backend, class_id)
     return deleted
 
 
-def snapshot_class_conversations(
+def _snapshot_row(key: str, stored, *, max_messages: int) -> dict[str, object]:
+    actor_key = ""
+    scope_fp = ""
+    conversation_id = ""
+    parsed = _parse_conversation_cache_key(key)
+    if parsed is not None:
+        actor_key, scope_fp, conversation_id = parsed
+    state = _coerce_state(stored, max_messages=max_messages)
+    return {
+        "cache_key": key,
+        "actor_key": actor_key,
+        "scope_fingerprint": scope_fp,
+        "conversation_id": conversation_id,
+        "summary": str(state.get("summary") or ""),
+        "turns": list(state.get("turns") or []),
+    }
+
+
+def iter_class_conversation_batches(
     *,
     cache_backend,
     class_id: int,
     max_keys: int = 4000,
     max_messages: int = 120,
-) -> list[dict[str, object]]:
-    class_key = conversation_class_index_key(class_id=class_id)
-    try:
-        indexed = cache_backend.get(class_key)
-    except Exception:
-        logger.warning("conversation_memory_cache_get_failed key=%s", class_key)
-        return []
-
-    keys = _coerce_key_list(indexed, max_items=max(int(max_keys), 1))
+    batch_size: int = _RESET_BATCH_SIZE,
+) -> Iterator[list[dict[str, object]]]:
+    """Yield snapshot rows for a class's indexed conversations, one `get_many` per batch.
+
+    A batch whose read fails yields rows with empty state, as a failed
+    single-key read did before.
+    """
+    keys = _class_index_members(cache_backend=cache_backend, class_id=class_id, max_keys=max(int(max_keys), 1))
     if not keys:
-        return []
+        return
+    message_limit = max(int(max_messages), 1)
+    for batch in _batches(keys, batch_size):
+        try:
+            stored = cache_backend.get_many(batch)
+        except Exception:
+            logger.warning("conversation_memory_cache_get_failed keys=%s", len(batch))
+            stored = {}
+        yield [_snapshot_row(key, stored.get(key), max_messages=message_limit) for key in batch]
+
 
+def snapshot_class_conversations(
+    *,
+    cache_backend,
+    class_id: int,
+    max_keys: int = 4000,
+    max_messages: int = 120,
+    batch_size: int = _RESET_BATCH_SIZE,
+) -> list[dict[str, object]]:
     snapshots: list[dict[str, object]] = []
-    message_limit = max(int(max_messages), 1)
-    for key in keys:
-        actor_key = ""
-        scope_fp = ""
-        conversation_id = ""
-        parsed = _parse_conversation_cache_key(key)
-        if parsed is not None:
-            actor_key, scope_fp, conversation_id = parsed
-        state = load_state(cache_backend=cache_backend, key=key, max_messages=message_limit)
-        snapshots.append(
-            {
-                "cache_key": key,
-                "actor_key": actor_key,
-                "scope_fingerprint": scope_fp,
-                "conversation_id": conversation_id,
-                "summary": str(state.get("summary") or ""),
-                "turns": list(state.get("turns") or []),
-            }
-        )
+    for batch in iter_class_conversation_batches(
+        cache_backend=cache_backend,
+        class_id=class_id,
+        max_keys=max_keys,
+        max_messages=max_messages,
+        batch_size=batch_size,
+    ):
+        snapshots.extend(batch)
     return snapshots
 
 
@@ -2,12 +2,28 @@
 
 from __future__ import annotations
 
+import hashlib
+import heapq
 import json
+import math
+import os
 import re
-from functools import lru_cache
+import threading
+from collections import Counter, OrderedDict
+from collections.abc import Callable
+from dataclasses import dataclass
 from pathlib import Path
 
 SAFE_REF_KEY_RE = re.compile(r"^[a-z0-9_-]+$")
+_TOKEN_SPLIT_RE = re.compile(r"[^a-z0-9]+")
+# Okapi BM25 defaults; chunks are short, so length normalization stays moderate.
+_BM25_K1 = 1.2
+_BM25_B = 0.75
+_CACHE_DEFAULT_MAX_BYTES = 8 * 1024 * 1024
+REFERENCE_INDEX_FORMAT = "helper-reference-index"
+# Bump when chunking or tokenization changes so stale artifacts are ignored.
+REFERENCE_INDEX_VERSION = 1
+REFERENCE_INDEX_SUFFIX = ".index.json"
 
 
 def resolve_reference_file(reference_key: str | None, reference_dir: str, reference_map_raw: str) -> str:
@@ -30,9 +46,73 @@ def resolve_reference_file(reference_key: str | None, reference_dir: str, refere
     return ""
 
 
+def _tokens(text: str) -> list[str]:
+    return [p for p in _TOKEN_SPLIT_RE.split(text.lower()) if len(p) >= 4]
+
+
 def _tokenize(text: str) -> set[str]:
-    parts = re.split(r"[^a-z0-9]+", text.lower())
-    return {p for p in parts if len(p) >= 4}
+    return set(_tokens(text))
+
+
+@dataclass(frozen=True)
+class ReferenceIndex:
+    """Chunks of one reference file plus a BM25 inverted index over them.
+
+    Iterating, indexing, and `len()` behave like the plain chunk tuple.
+    """
+
+    chunks: tuple[str, ...]
+    postings: dict[str, tuple[tuple[int, int], ...]]
+    chunk_lengths: tuple[int, ...]
+    avg_length: float
+
+    def __len__(self) -> int:
+        return len(self.chunks)
+
+    def __iter__(self):
+        return iter(self.chunks)
+
+    def __getitem__(self, item):
+        return self.chunks[item]
+
+    def __bool__(self) -> bool:
+        return bool(self.chunks)
+
+
+def build_reference_index(chunks: tuple[str, ...]) -> ReferenceIndex:
+    """Tokenize each chunk once into `token -> ((chunk_idx, term_freq), ...)` postings."""
+    postings: dict[str, list[tuple[int, int]]] = {}
+    lengths: list[int] = []
+    for idx, chunk in enumerate(chunks):
+        counts = Counter(_tokens(chunk))
+        lengths.append(sum(counts.values()))
+        for token, freq in counts.items():
+            postings.setdefault(token, []).append((idx, freq))
+    return ReferenceIndex(
+        chunks=tuple(chunks),
+        postings={token: tuple(rows) for token, rows in postings.items()},
+        chunk_lengths=tuple(lengths),
+        avg_length=(sum(lengths) / len(lengths)) if lengths else 0.0,
+    )
+
+
+def rank_reference_chunks(index: ReferenceIndex, query_tokens: set[str], *, limit: int) -> list[int]:
+    """Return up to `limit` chunk positions by BM25 score; ties keep file order."""
+    total = len(index.chunks)
+    if not total or not query_tokens or limit <= 0:
+        return []
+    avg_length = index.avg_length or 1.0
+    scores: dict[int, float] = {}
+    for token in query_tokens:
+        rows = index.postings.get(token)
+        if not rows:
+            continue
+        idf = math.log(1.0 + (total - len(rows) + 0.5) / (len(rows) + 0.5))
+        for idx, freq in rows:
+            norm = _BM25_K1 * (1.0 - _BM25_B + _BM25_B * index.chunk_lengths[idx] / avg_length)
+            scores[idx] = scores.get(idx, 0.0) + idf * freq * (_BM25_K1 + 1.0) / (freq + norm)
+    top = heapq.nsmallest(limit, scores.items(), key=lambda row: (-row[1], row[0]))
+    return [idx for idx, _score in top]
 
 
 def clean_reference_line(line: str) -> str:
@@ -47,22 +127,8 @@ def clean_reference_line(line: str) -> str:
     return re.sub(r"\s+", " ", value).strip()
 
 
-@lru_cache(maxsize=4)
-def load_reference_chunks(path_str: str, *, logger) -> tuple[str, ...]:
-    if not path_str:
-        return tuple()
-    path = Path(path_str)
-    if not path.exists():
-        return tuple()
-    try:
-        text = path.read_text(encoding="utf-8")
-    except Exception as exc:
-        logger.warning(
-            "reference_chunks_load_failed path=%s error=%s",
-            path_str,
-            exc.__class__.__name__,
-        )
-        return tuple()
+def chunk_reference_text(text: str) -> tuple[str, ...]:
+    """Split reference markdown into cleaned chunks of at most ~420 characters."""
     if not text.strip():
         return tuple()
 
@@ -97,32 +163,235 @@ def load_reference_chunks(path_str: str, *, logger) -> tuple[str, ...]:
     return tuple(chunks)
 
 
+_EMPTY_INDEX = build_reference_index(tuple())
+
+
+def reference_index_path(path: Path) -> Path:
+    """Location of the prebuilt index artifact for a reference markdown file."""
+    return path.with_suffix(REFERENCE_INDEX_SUFFIX)
+
+
+def reference_index_payload(text: str) -> dict:
+    """Serialize the index for `text` in the versioned artifact format.
+
+    Postings are flattened to `[chunk_idx, term_freq, chunk_idx, term_freq, ...]`.
+    """
+    index = build_reference_index(chunk_reference_text(text))
+    return {
+        "format": REFERENCE_INDEX_FORMAT,
+        "version": REFERENCE_INDEX_VERSION,
+        "source_sha256": hashlib.sha256(text.encode("utf-8")).hexdigest(),
+        "chunks": list(index.chunks),
+        "chunk_lengths": list(index.chunk_lengths),
+        "postings": {token: [value for row in rows for value in row] for token, rows in sorted(index.postings.items())},
+    }
+
+
+def write_reference_index(path: Path) -> Path:
+    """Build the artifact for a reference markdown file and write it beside the file."""
+    payload = reference_index_payload(path.read_text(encoding="utf-8"))
+    target = reference_index_path(path)
+    target.write_text(json.dumps(payload, separators=(",", ":"), ensure_ascii=False) + "\n", encoding="utf-8")
+    return target
+
+
+def _load_prebuilt_index(path: Path, text: str) -> ReferenceIndex | None:
+    """Return the prebuilt index when it exists and was built from exactly `text`."""
+    try:
+        payload = json.loads(reference_index_path(path).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    if not isinstance(payload, dict):
+        return None
+    if payload.get("format") != REFERENCE_INDEX_FORMAT or payload.get("version") != REFERENCE_INDEX_VERSION:
+        return None
+    if payload.get("source_sha256") != hashlib.sha256(text.encode("utf-8")).hexdigest():
+        return None
+    try:
+        chunks = tuple(str(chunk) for chunk in payload["chunks"])
+        lengths = tuple(int(value) for value in payload["chunk_lengths"])
+        postings = {
+            str(token): tuple(zip(map(int, flat[0::2]), map(int, flat[1::2]), strict=True))
+            for token, flat in payload["postings"].items()
+        }
+    except (KeyError, TypeError, ValueError, AttributeError):
+        return None
+    if len(lengths) != len(chunks):
+        return None
+    # The hash covers only the markdown, so a hand-edited artifact must not reach ranking.
+    if any(not 0 <= idx < len(chunks) for rows in postings.values() for idx, _freq in rows):
+        return None
+    return ReferenceIndex(
+        chunks=chunks,
+        postings=postings,
+        chunk_lengths=lengths,
+        avg_length=(sum(lengths) / len(lengths)) if lengths else 0.0,
+    )
+
+
+def _read_reference_index(path: Path, *, logger) -> ReferenceIndex:
+    try:
+        text = path.read_text(encoding="utf-8")
+    except Exception as exc:
+        logger.warning(
+            "reference_chunks_load_failed path=%s error=%s",
+            path,
+            exc.__class__.__name__,
+        )
+        return _EMPTY_INDEX
+    prebuilt = _load_prebuilt_index(path, text)
+    if prebuilt is not None:
+        return prebuilt
+    return build_reference_index(chunk_reference_text(text))
+
+
+class ReferenceCache:
+    """Byte-budgeted LRU of loaded reference files, validated by mtime and size.
+
+    Prompt text and citation indexes are cached under separate keys but share
+    one budget (`HELPER_REFERENCE_CACHE_MAX_BYTES`). An edited file is reloaded
+    on its next lookup; no restart is needed.
+    """
+
+    def __init__(self, max_bytes: int | None = None):
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[tuple[str, str], tuple[tuple[int, int], object, int]] = OrderedDict()
+        self._max_bytes = max_bytes
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.reloads = 0
+        self.evictions = 0
+
+    def max_bytes(self) -> int:
+        if self._max_bytes is not None:
+            return self._max_bytes
+        raw = os.getenv("HELPER_REFERENCE_CACHE_MAX_BYTES", "").strip()
+        try:
+            return max(int(raw), 0) if raw else _CACHE_DEFAULT_MAX_BYTES
+        except ValueError:
+            return _CACHE_DEFAULT_MAX_BYTES
+
+    def get_or_load(self, kind: str, path: Path, loader: Callable[[Path], object], *, logger):
+        """Return the cached value for `path`, calling `loader` on a miss or a changed file.
+
+        Raises OSError when the file cannot be stat'ed.
+        """
+        stat = path.stat()
+        signature = (stat.st_mtime_ns, stat.st_size)
+        key = (kind, str(path))
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached is not None and cached[0] == signature:
+                self.hits += 1
+                self._entries.move_to_end(key)
+                return cached[1]
+            self.misses += 1
+            if cached is not None:
+                self.reloads += 1
+
+        value = loader(path)
+        size = _estimated_bytes(value)
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.bytes -= previous[2]
+            budget = self.max_bytes()
+            if size <= budget:
+                self._entries[key] = (signature, value, size)
+                self.bytes += size
+            evicted = 0
+            while self.bytes > budget and self._entries:
+                _key, (_sig, _value, freed) = self._entries.popitem(last=False)
+                self.bytes -= freed
+                evicted += 1
+            self.evictions += evicted
+        if evicted:
+            logger.info("reference_cache_evicted count=%s %s", evicted, self.stats_line())
+        return value
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes(),
+                "hits": self.hits,
+                "misses": self.misses,
+                "reloads": self.reloads,
+                "evictions": self.evictions,
+            }
+
+    def stats_line(self) -> str:
+        return " ".join(f"{name}={value}" for name, value in self.stats().items())
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+
+def _estimated_bytes(value: object) -> int:
+    """Rough in-memory footprint used for the byte budget (not exact)."""
+    if isinstance(value, str):
+        return len(value.encode("utf-8"))
+    if isinstance(value, ReferenceIndex):
+        chunk_bytes = sum(len(chunk.encode("utf-8")) for chunk in value.chunks)
+        posting_bytes = sum(len(token) + 16 * len(rows) for token, rows in value.postings.items())
+        return chunk_bytes + posting_bytes + 8 * len(value.chunk_lengths)
+    return 0
+
+
+_reference_cache = ReferenceCache()
+
+
+def reference_cache_stats() -> dict:
+    return _reference_cache.stats()
+
+
+def clear_reference_cache() -> None:
+    _reference_cache.clear()
+
+
+def load_reference_chunks(path_str: str, *, logger) -> ReferenceIndex:
+    """Load and index a reference file through the shared reference cache.
+
+    A matching prebuilt artifact (`scripts/generate_lesson_references.py`) is
+    used instead of re-parsing the markdown.
+    """
+    if not path_str:
+        return _EMPTY_INDEX
+    try:
+        return _reference_cache.get_or_load(
+            "index",
+            Path(path_str),
+            lambda path: _read_reference_index(path, logger=logger),
+            logger=logger,
+        )
+    except OSError:
+        return _EMPTY_INDEX
+
+
 def build_reference_citations(
     *,
     message: str,
     context: str,
     topics: list[str],
-    reference_chunks: tuple[str, ...],
+    reference_chunks: ReferenceIndex | tuple[str, ...],
     source_label: str,
     max_items: int = 3,
 ) -> list[dict]:
     if not reference_chunks:
         return []
+    index = reference_chunks
+    if not isinstance(index, ReferenceIndex):
+        index = build_reference_index(tuple(reference_chunks))
     query_tokens = _tokenize(" ".join([message, context, " ".join(topics)]))
-    ranked: list[tuple[int, int, str]] = []
-    for idx, chunk in enumerate(reference_chunks):
-        chunk_tokens = _tokenize(chunk)
-        overlap = len(query_tokens & chunk_tokens) if query_tokens else 0
-        if overlap <= 0:
-            continue
-        score = overlap * 100 - min(idx, 40)
-        ranked.append((score, idx, chunk))
-
+    ranked = rank_reference_chunks(index, query_tokens, limit=max_items)
     if not ranked:
-        selected = list(reference_chunks[:max_items])
+        selected = list(index.chunks[:max_items])
     else:
-        ranked.sort(key=lambda row: (-row[0], row[1]))
-        selected = [row[2] for row in ranked[:max_items]]
+        selected = [index.chunks[idx] for idx in ranked]
 
     citations: list[dict] = []
     for idx, chunk in enumerate(selected, start=1):
@@ -145,19 +414,13 @@ def format_reference_citations_for_prompt(citations: list[dict]) -> str:
     return "Lesson excerpts:\n" + "\n".join(lines)
 
 
-@lru_cache(maxsize=4)
-def load_reference_text(path_str: str, *, logger) -> str:
-    if not path_str:
-        return ""
-    path = Path(path_str)
-    if not path.exists():
-        return ""
+def _read_reference_text(path: Path, *, logger) -> str:
     try:
         text = path.read_text(encoding="utf-8").strip()
     except Exception as exc:
         logger.warning(
             "reference_text_load_failed path=%s error=%s",
-            path_str,
+            path,
             exc.__class__.__name__,
         )
         return ""
@@ -167,3 +430,30 @@ def load_reference_text(path_str: str, *, logger) -> str:
     lines = [line.strip() for line in text.splitlines() if line.strip() and not line.strip().startswith("#")]
     return " ".join(lines)
 
+
+def load_reference_text(path_str: str, *, logger) -> str:
+    if not path_str:
+        return ""
+    try:
+        return _reference_cache.get_or_load(
+            "text",
+            Path(path_str),
+            lambda path: _read_reference_text(path, logger=logger),
+            logger=logger,
+        )
+    except OSError:
+        return ""
+
+
+def warm_reference_cache(reference_dir: str, *, logger) -> int:
+    """Load every `*.md` under `reference_dir` into the cache; return the file count."""
+    directory = Path(reference_dir) if reference_dir else None
+    if directory is None or not directory.is_dir():
+        return 0
+    loaded = 0
+    for path in sorted(directory.glob("*.md")):
+        load_reference_text(str(path), logger=logger)
+        load_reference_chunks(str(path), logger=logger)
+        loaded += 1
+    logger.info("reference_cache_warmed files=%s %s", loaded, _reference_cache.stats_line())
+    return loaded
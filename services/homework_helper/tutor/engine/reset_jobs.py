@@ -0,0 +1,154 @@
+"""Background class-reset jobs tracked in the shared cache.
+
+A reset can run as a job on a worker thread instead of inside the HTTP request
+Class Hub waits on. The job record (status, phase, progress counters, result)
+lives in the cache so Class Hub can poll any helper worker for it.
+
+Only one job runs per class: starting a reset while that class's job is queued
+or running returns the running job instead of starting a second one. A job
+whose worker stopped reporting for `stale_seconds` (for example after a
+process restart) no longer blocks new resets.
+"""
+
+from __future__ import annotations
+
+import logging
+import re
+import threading
+import time
+import uuid
+from collections.abc import Callable
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+ACTIVE_STATUSES = (QUEUED, RUNNING)
+
+DEFAULT_JOB_TTL_SECONDS = 3600
+DEFAULT_STALE_SECONDS = 120
+_JOB_ID_RE = re.compile(r"^[a-f0-9]{32}$")
+
+# `run_fn(report)` performs the reset; `report(**fields)` publishes progress and the
+# returned dict is merged into the finished job record.
+ResetRunner = Callable[[Callable[..., None]], dict]
+
+
+def _job_key(job_id: str) -> str:
+    return f"helper:reset_job:{job_id}"
+
+
+def _class_key(class_id: int) -> str:
+    return f"helper:reset_job:class:{int(class_id)}"
+
+
+def is_job_id(value: str) -> bool:
+    return bool(_JOB_ID_RE.fullmatch(str(value or "")))
+
+
+def get_job(*, cache_backend, job_id: str) -> dict | None:
+    if not is_job_id(job_id):
+        return None
+    job = cache_backend.get(_job_key(job_id))
+    return dict(job) if isinstance(job, dict) else None
+
+
+def _is_live(job: dict | None, *, now: float, stale_seconds: float) -> bool:
+    if not job or job.get("status") not in ACTIVE_STATUSES:
+        return False
+    return now - float(job.get("updated_at") or 0) < stale_seconds
+
+
+def _spawn_thread(target: Callable[[], None], *, name: str) -> None:
+    threading.Thread(target=target, name=name, daemon=True).start()
+
+
+def start_job(
+    *,
+    cache_backend,
+    class_id: int,
+    run_fn: ResetRunner,
+    request_id: str = "",
+    ttl_seconds: int = DEFAULT_JOB_TTL_SECONDS,
+    stale_seconds: float = DEFAULT_STALE_SECONDS,
+    spawn: Callable[..., None] | None = None,
+) -> tuple[dict, bool]:
+    """Start a reset job for `class_id`, or attach to the one already running.
+
+    Returns `(job, created)`.
+    """
+    ttl = max(int(ttl_seconds), 60)
+    job_id = ""
+    for _ in range(2):
+        candidate = uuid.uuid4().hex
+        if cache_backend.add(_class_key(class_id), candidate, timeout=ttl):
+            job_id = candidate
+            break
+        existing_id = cache_backend.get(_class_key(class_id))
+        existing = get_job(cache_backend=cache_backend, job_id=str(existing_id or ""))
+        if _is_live(existing, now=time.time(), stale_seconds=stale_seconds):
+            return existing, False
+        # Finished or abandoned: free the class slot if it still names that job, then retry once.
+        if existing_id and cache_backend.get(_class_key(class_id)) == existing_id:
+            cache_backend.delete(_class_key(class_id))
+    if not job_id:
+        raise RuntimeError("reset_job_conflict")
+
+    now = time.time()
+    job = {
+        "job_id": job_id,
+        "class_id": int(class_id),
+        "request_id": str(request_id or ""),
+        "status": QUEUED,
+        "phase": "",
+        "processed": 0,
+        "total": 0,
+        "created_at": now,
+        "updated_at": now,
+    }
+    cache_backend.set(_job_key(job_id), job, timeout=ttl)
+    (spawn or _spawn_thread)(
+        lambda: _run(cache_backend, job, run_fn, ttl=ttl),
+        name=f"helper-reset-{int(class_id)}",
+    )
+    return dict(job), True
+
+
+def _run(cache_backend, job: dict, run_fn: ResetRunner, *, ttl: int) -> None:
+    job_key = _job_key(job["job_id"])
+
+    def report(**fields) -> None:
+        job.update(fields)
+        job["updated_at"] = time.time()
+        try:
+            cache_backend.set(job_key, job, timeout=ttl)
+        except Exception:
+            logger.warning("helper_reset_job_progress_failed job_id=%s", job["job_id"])
+
+    report(status=RUNNING)
+    try:
+        result = run_fn(report)
+        report(status=DONE, phase="", **(result or {}))
+    except Exception as exc:
+        logger.exception("helper_reset_job_failed job_id=%s class_id=%s", job["job_id"], job["class_id"])
+        report(status=FAILED, error=exc.__class__.__name__)
+    finally:
+        try:
+            if cache_backend.get(_class_key(job["class_id"])) == job["job_id"]:
+                cache_backend.delete(_class_key(job["class_id"]))
+        except Exception:
+            logger.warning("helper_reset_job_release_failed job_id=%s", job["job_id"])
+
+
+__all__ = [
+    "ACTIVE_STATUSES",
+    "DONE",
+    "FAILED",
+    "QUEUED",
+    "RUNNING",
+    "get_job",
+    "is_job_id",
+    "start_job",
+]
@@ -0,0 +1,461 @@
+"""Multi-backend routing and failover for helper chat calls.
+
+A pool groups the members that can serve one configured backend: one member
+per Ollama base URL, plus optional fallback members (for example the remote
+OpenAI backend) that are only used when no primary member is available.
+
+Each call picks a member by load:
+
+- `least_outstanding` (default): fewest in-flight calls from this process,
+  ties going to the least recently used member.
+- `latency`: in-flight calls weighted by the member's recent latency (EWMA),
+  so a slow host receives proportionally less traffic.
+
+Members whose circuit is open are skipped. A retryable failure moves the retry
+to a member that has not been tried yet without sleeping; backoff only applies
+once every member has been tried in the current pass.
+
+Load counters are per process. They are not shared through the cache because
+a stale shared count is worse than a precise local one for picking a host.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+from collections.abc import AsyncIterator, Awaitable, Callable, Iterator, Sequence
+from dataclasses import dataclass
+
+from .backends import (
+    AsyncReplayStream,
+    ReplayStream,
+    StreamChunk,
+    _aclose_stream,
+    _close_stream,
+    is_retryable_backend_error,
+)
+
+LEAST_OUTSTANDING = "least_outstanding"
+LATENCY = "latency"
+STRATEGIES = (LEAST_OUTSTANDING, LATENCY)
+
+_EWMA_ALPHA = 0.3
+_MAX_POOLS = 32
+
+
+@dataclass(frozen=True)
+class BackendMember:
+    """One endpoint that can serve a backend call."""
+
+    name: str
+    backend: str
+    base_url: str = ""
+    fallback: bool = False
+
+
+@dataclass
+class _MemberLoad:
+    outstanding: int = 0
+    latency_ms: float = 0.0
+    calls: int = 0
+    failures: int = 0
+    last_used: int = 0
+
+
+class BackendPool:
+    """Members of one route plus this process's in-flight and latency counters."""
+
+    def __init__(self, members: Sequence[BackendMember], *, strategy: str = LEAST_OUTSTANDING):
+        if not members:
+            raise ValueError("backend pool needs at least one member")
+        if strategy not in STRATEGIES:
+            raise ValueError(f"unknown balance strategy: {strategy}")
+        self.members = tuple(members)
+        self.strategy = strategy
+        self._lock = threading.Lock()
+        self._loads = {member.name: _MemberLoad() for member in self.members}
+        self._uses = 0
+
+    def _score(self, load: _MemberLoad) -> float:
+        if self.strategy == LATENCY:
+            # Unmeasured members score 0 so they get sampled before being weighed.
+            return (load.outstanding + 1) * load.latency_ms
+        return float(load.outstanding)
+
+    def candidates(self, *, exclude: set[str] | frozenset[str] = frozenset()) -> list[BackendMember]:
+        """Untried members, primaries first, each group ordered from least to most loaded."""
+        with self._lock:
+            scored = []
+            for member in self.members:
+                if member.name in exclude:
+                    continue
+                load = self._loads[member.name]
+                scored.append((member.fallback, self._score(load), load.last_used, member))
+        scored.sort(key=lambda item: item[:3])
+        return [member for *_, member in scored]
+
+    def begin(self, member: BackendMember) -> float:
+        with self._lock:
+            self._uses += 1
+            load = self._loads[member.name]
+            load.outstanding += 1
+            load.last_used = self._uses
+        return time.monotonic()
+
+    def end(self, member: BackendMember, *, started_at: float, ok: bool) -> int:
+        """Release one in-flight call and return its latency in milliseconds."""
+        latency_ms = int((time.monotonic() - started_at) * 1000)
+        with self._lock:
+            load = self._loads[member.name]
+            load.outstanding = max(load.outstanding - 1, 0)
+            load.calls += 1
+            if not ok:
+                load.failures += 1
+            elif load.latency_ms <= 0:
+                load.latency_ms = float(latency_ms)
+            else:
+                load.latency_ms += _EWMA_ALPHA * (latency_ms - load.latency_ms)
+        return latency_ms
+
+    def release(self, member: BackendMember) -> None:
+        """Release one in-flight call without counting it as a finished call."""
+        with self._lock:
+            load = self._loads[member.name]
+            load.outstanding = max(load.outstanding - 1, 0)
+
+    def stats(self) -> dict[str, dict]:
+        with self._lock:
+            return {
+                name: {
+                    "outstanding": load.outstanding,
+                    "latency_ms": int(load.latency_ms),
+                    "calls": load.calls,
+                    "failures": load.failures,
+                }
+                for name, load in self._loads.items()
+            }
+
+
+_pools_lock = threading.Lock()
+_pools: dict[tuple, BackendPool] = {}
+
+
+def get_pool(members: Sequence[BackendMember], *, strategy: str = LEAST_OUTSTANDING) -> BackendPool:
+    """Process-wide pool for this member list, so load counters survive across requests."""
+    key = (tuple(members), strategy)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            if len(_pools) >= _MAX_POOLS:
+                _pools.clear()
+            pool = BackendPool(members, strategy=strategy)
+            _pools[key] = pool
+        return pool
+
+
+def clear_pools() -> None:
+    with _pools_lock:
+        _pools.clear()
+
+
+def _pick(
+    pool: BackendPool,
+    tried: set[str],
+    allow_member_fn: Callable[[BackendMember], bool],
+) -> BackendMember | None:
+    # Circuits are checked in pick order so half-open probes are only taken by the member that is used.
+    for member in pool.candidates(exclude=tried):
+        if allow_member_fn(member):
+            return member
+    return None
+
+
+class _Route:
+    """Member selection state for one call: which members were tried and when to back off."""
+
+    def __init__(self, pool: BackendPool, allow_member_fn, max_attempts: int, base_backoff: float):
+        self.pool = pool
+        self.allow_member_fn = allow_member_fn
+        self.attempts = max(int(max_attempts), 1)
+        self.backoff = max(float(base_backoff), 0.0)
+        self.tried: set[str] = set()
+        self.passes = 0
+
+    def next_member(self) -> tuple[BackendMember | None, float]:
+        """Return `(member, sleep_seconds)`; sleep only after a full pass over the pool failed."""
+        member = _pick(self.pool, self.tried, self.allow_member_fn)
+        if member is not None or not self.tried:
+            return member, 0.0
+        self.passes += 1
+        self.tried.clear()
+        return _pick(self.pool, self.tried, self.allow_member_fn), self.backoff * (2 ** (self.passes - 1))
+
+    def should_retry(self, attempt: int, exc: Exception) -> bool:
+        return attempt < self.attempts and is_retryable_backend_error(exc)
+
+
+def _unavailable(last_exc: Exception | None) -> Exception:
+    return last_exc or RuntimeError("backend_pool_unavailable")
+
+
+def call_with_failover(
+    pool: BackendPool,
+    *,
+    instructions: str,
+    message: str,
+    invoke_member_fn: Callable[[BackendMember, str, str], tuple[str, str]],
+    allow_member_fn: Callable[[BackendMember], bool],
+    record_member_fn: Callable[..., None],
+    max_attempts: int,
+    base_backoff: float,
+    sleeper: Callable[[float], None] = time.sleep,
+) -> tuple[str, str, int]:
+    """`call_backend_with_retries` over a pool: each retry goes to the next least-loaded member."""
+    route = _Route(pool, allow_member_fn, max_attempts, base_backoff)
+    last_exc: Exception | None = None
+    for attempt in range(1, route.attempts + 1):
+        member, sleep_seconds = route.next_member()
+        if member is None:
+            raise _unavailable(last_exc)
+        if sleep_seconds > 0:
+            sleeper(sleep_seconds)
+        route.tried.add(member.name)
+        started_at = pool.begin(member)
+        try:
+            text, model_used = invoke_member_fn(member, instructions, message)
+        except Exception as exc:
+            record_member_fn(member, ok=False, latency_ms=pool.end(member, started_at=started_at, ok=False))
+            last_exc = exc
+            if not route.should_retry(attempt, exc):
+                raise
+            continue
+        record_member_fn(member, ok=True, latency_ms=pool.end(member, started_at=started_at, ok=True))
+        return text, model_used, attempt
+    raise _unavailable(last_exc)
+
+
+async def acall_with_failover(
+    pool: BackendPool,
+    *,
+    instructions: str,
+    message: str,
+    ainvoke_member_fn: Callable[[BackendMember, str, str], Awaitable[tuple[str, str]]],
+    allow_member_fn: Callable[[BackendMember], bool],
+    record_member_fn: Callable[..., None],
+    max_attempts: int,
+    base_backoff: float,
+    sleeper: Callable[[float], Awaitable[None]] = asyncio.sleep,
+) -> tuple[str, str, int]:
+    """Async variant of `call_with_failover`.
+
+    Circuit checks and outcome records are blocking cache calls, so they run in a
+    worker thread like the Redis admission queue calls.
+    """
+    route = _Route(pool, allow_member_fn, max_attempts, base_backoff)
+    last_exc: Exception | None = None
+    for attempt in range(1, route.attempts + 1):
+        member, sleep_seconds = await asyncio.to_thread(route.next_member)
+        if member is None:
+            raise _unavailable(last_exc)
+        if sleep_seconds > 0:
+            await sleeper(sleep_seconds)
+        route.tried.add(member.name)
+        started_at = pool.begin(member)
+        try:
+            text, model_used = await ainvoke_member_fn(member, instructions, message)
+        except Exception as exc:
+            latency_ms = pool.end(member, started_at=started_at, ok=False)
+            await asyncio.to_thread(record_member_fn, member, ok=False, latency_ms=latency_ms)
+            last_exc = exc
+            if not route.should_retry(attempt, exc):
+                raise
+            continue
+        latency_ms = pool.end(member, started_at=started_at, ok=True)
+        await asyncio.to_thread(record_member_fn, member, ok=True, latency_ms=latency_ms)
+        return text, model_used, attempt
+    raise _unavailable(last_exc)
+
+
+class _MemberStream:
+    """Upstream wrapper that keeps the member's in-flight count until the stream ends or is closed."""
+
+    def __init__(self, stream, *, pool: BackendPool, member: BackendMember, started_at: float, record_member_fn):
+        self._stream = stream
+        self._pool = pool
+        self._member = member
+        self._started_at = started_at
+        self._record_member_fn = record_member_fn
+        self._done = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> StreamChunk:
+        try:
+            return next(self._stream)
+        except StopIteration:
+            self._finish(ok=True)
+            raise
+        except Exception:
+            self._finish(ok=False)
+            raise
+
+    def _finish(self, *, ok: bool) -> None:
+        if self._done:
+            return
+        self._done = True
+        latency_ms = self._pool.end(self._member, started_at=self._started_at, ok=ok)
+        self._record_member_fn(self._member, ok=ok, latency_ms=latency_ms)
+
+    def close(self) -> None:
+        _close_stream(self._stream)
+        if self._done:
+            return
+        # Closed before the upstream finished (the client went away): the stream neither
+        # succeeded nor failed, so only the in-flight slot is released.
+        self._done = True
+        self._pool.release(self._member)
+
+
+def call_stream_with_failover(
+    pool: BackendPool,
+    *,
+    instructions: str,
+    message: str,
+    invoke_member_stream_fn: Callable[[BackendMember, str, str], Iterator[StreamChunk]],
+    allow_member_fn: Callable[[BackendMember], bool],
+    record_member_fn: Callable[..., None],
+    max_attempts: int,
+    base_backoff: float,
+    sleeper: Callable[[float], None] = time.sleep,
+) -> tuple[ReplayStream, int]:
+    """`call_backend_stream_with_retries` over a pool; failover only happens before the first chunk."""
+    route = _Route(pool, allow_member_fn, max_attempts, base_backoff)
+    last_exc: Exception | None = None
+    for attempt in range(1, route.attempts + 1):
+        member, sleep_seconds = route.next_member()
+        if member is None:
+            raise _unavailable(last_exc)
+        if sleep_seconds > 0:
+            sleeper(sleep_seconds)
+        route.tried.add(member.name)
+        started_at = pool.begin(member)
+        stream = None
+        try:
+            stream = iter(invoke_member_stream_fn(member, instructions, message))
+            tracked = _MemberStream(
+                stream, pool=pool, member=member, started_at=started_at, record_member_fn=record_member_fn
+            )
+            try:
+                first = next(tracked)
+            except StopIteration:
+                return ReplayStream(None, tracked), attempt
+            return ReplayStream(first, tracked), attempt
+        except Exception as exc:
+            _close_stream(stream)
+            if stream is None:
+                record_member_fn(member, ok=False, latency_ms=pool.end(member, started_at=started_at, ok=False))
+            last_exc = exc
+            if not route.should_retry(attempt, exc):
+                raise
+    raise _unavailable(last_exc)
+
+
+class _AsyncMemberStream:
+    """Async `_MemberStream`; outcome records run in a worker thread like `acall_with_failover`."""
+
+    def __init__(self, stream, *, pool: BackendPool, member: BackendMember, started_at: float, record_member_fn):
+        self._stream = stream
+        self._pool = pool
+        self._member = member
+        self._started_at = started_at
+        self._record_member_fn = record_member_fn
+        self._done = False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> StreamChunk:
+        try:
+            return await anext(self._stream)
+        except StopAsyncIteration:
+            await self._finish(ok=True)
+            raise
+        except Exception:
+            await self._finish(ok=False)
+            raise
+
+    async def _finish(self, *, ok: bool) -> None:
+        if self._done:
+            return
+        self._done = True
+        latency_ms = self._pool.end(self._member, started_at=self._started_at, ok=ok)
+        await asyncio.to_thread(self._record_member_fn, self._member, ok=ok, latency_ms=latency_ms)
+
+    async def aclose(self) -> None:
+        await _aclose_stream(self._stream)
+        if self._done:
+            return
+        self._done = True
+        self._pool.release(self._member)
+
+
+async def acall_stream_with_failover(
+    pool: BackendPool,
+    *,
+    instructions: str,
+    message: str,
+    ainvoke_member_stream_fn: Callable[[BackendMember, str, str], AsyncIterator[StreamChunk]],
+    allow_member_fn: Callable[[BackendMember], bool],
+    record_member_fn: Callable[..., None],
+    max_attempts: int,
+    base_backoff: float,
+    sleeper: Callable[[float], Awaitable[None]] = asyncio.sleep,
+) -> tuple[AsyncReplayStream, int]:
+    """Async variant of `call_stream_with_failover`."""
+    route = _Route(pool, allow_member_fn, max_attempts, base_backoff)
+    last_exc: Exception | None = None
+    for attempt in range(1, route.attempts + 1):
+        member, sleep_seconds = await asyncio.to_thread(route.next_member)
+        if member is None:
+            raise _unavailable(last_exc)
+        if sleep_seconds > 0:
+            await sleeper(sleep_seconds)
+        route.tried.add(member.name)
+        started_at = pool.begin(member)
+        stream = None
+        try:
+            stream = aiter(ainvoke_member_stream_fn(member, instructions, message))
+            tracked = _AsyncMemberStream(
+                stream, pool=pool, member=member, started_at=started_at, record_member_fn=record_member_fn
+            )
+            try:
+                first = await anext(tracked)
+            except StopAsyncIteration:
+                return AsyncReplayStream(None, tracked), attempt
+            return AsyncReplayStream(first, tracked), attempt
+        except Exception as exc:
+            await _aclose_stream(stream)
+            if stream is None:
+                latency_ms = pool.end(member, started_at=started_at, ok=False)
+                await asyncio.to_thread(record_member_fn, member, ok=False, latency_ms=latency_ms)
+            last_exc = exc
+            if not route.should_retry(attempt, exc):
+                raise
+    raise _unavailable(last_exc)
+
+
+__all__ = [
+    "BackendMember",
+    "BackendPool",
+    "LATENCY",
+    "LEAST_OUTSTANDING",
+    "STRATEGIES",
+    "acall_stream_with_failover",
+    "acall_with_failover",
+    "call_stream_with_failover",
+    "call_with_failover",
+    "clear_pools",
+    "get_pool",
+]
@@ -2,10 +2,14 @@
 
 from __future__ import annotations
 
+import asyncio
 import json
 import re
 import uuid
-from django.http import JsonResponse
+from collections.abc import AsyncIterable, AsyncIterator, Awaitable, Callable, Iterable, Iterator
+
+from asgiref.sync import async_to_sync, sync_to_async
+from django.http import JsonResponse, StreamingHttpResponse
 
 EMAIL_RE = re.compile(r"\b[A-Z0-9._%+-]+@[A-Z0-9.-]+\.[A-Z]{2,}\b", re.I)
 PHONE_RE = re.compile(r"\b(?:\+?1[-.\s]?)?\(?\d{3}\)?[-.\s]?\d{3}[-.\s]?\d{4}\b")
@@ -66,6 +70,144 @@ def json_response(payload: dict, *, request_id_value: str, status: int = 200) ->
     return resp
 
 
+def wants_stream(request, payload: dict) -> bool:
+    """Return True when the client opted into an SSE response."""
+    if isinstance(payload, dict) and payload.get("stream") is True:
+        return True
+    accept = (request.META.get("HTTP_ACCEPT", "") or "").lower()
+    return "text/event-stream" in accept
+
+
+def sse_frame(event: str, payload: dict) -> bytes:
+    data = json.dumps(payload, separators=(",", ":"), default=str)
+    return f"event: {event}\ndata: {data}\n\n".encode("utf-8")
+
+
+class SSEStream:
+    """Frame `(event, payload)` pairs as server-sent events.
+
+    Django closes streaming iterables when the response finishes or the client
+    disconnects; `close()` always runs `on_close` so queue slots and upstream
+    connections are released even if the stream was never consumed.
+    """
+
+    def __init__(self, events: Iterator[tuple[str, dict]], *, on_close: Callable[[], None] | None = None):
+        self._events = events
+        self._on_close = on_close
+        self._closed = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> bytes:
+        event, payload = next(self._events)
+        return sse_frame(event, payload)
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        try:
+            close = getattr(self._events, "close", None)
+            if close is not None:
+                close()
+        finally:
+            if self._on_close is not None:
+                self._on_close()
+
+
+class AsyncSSEStream:
+    """`SSEStream` over an async `(event, payload)` iterator for the ASGI chat path.
+
+    `aclose()` closes the events and then awaits `on_close`, so queue slots and
+    upstream connections are released even if the stream was never consumed.
+    """
+
+    def __init__(
+        self,
+        events: AsyncIterator[tuple[str, dict]],
+        *,
+        on_close: Callable[[], Awaitable[None]] | None = None,
+    ):
+        self._events = events
+        self._on_close = on_close
+        self._closed = False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> bytes:
+        event, payload = await anext(self._events)
+        return sse_frame(event, payload)
+
+    async def aclose(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        try:
+            aclose = getattr(self._events, "aclose", None)
+            if aclose is not None:
+                await aclose()
+        finally:
+            if self._on_close is not None:
+                await self._on_close()
+
+
+_pending_closes: set[asyncio.Task] = set()
+
+
+class AsyncFrameRelay:
+    """Serve SSE frames to ASGI servers one frame at a time.
+
+    Django buffers synchronous streaming content entirely under ASGI. Async
+    frame sources (`AsyncSSEStream`) are awaited on the event loop; blocking
+    iterators are pulled through `sync_to_async` one frame at a time.
+    """
+
+    def __init__(self, frames: Iterable[bytes] | AsyncIterable[bytes]):
+        self._source = frames
+        self._is_async = hasattr(frames, "__aiter__")
+        self._frames = aiter(frames) if self._is_async else iter(frames)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> bytes:
+        if self._is_async:
+            return await anext(self._frames)
+        frame = await sync_to_async(next, thread_sensitive=False)(self._frames, None)
+        if frame is None:
+            raise StopAsyncIteration
+        return frame
+
+    def close(self) -> None:
+        aclose = getattr(self._source, "aclose", None)
+        if aclose is None:
+            close = getattr(self._source, "close", None)
+            if close is not None:
+                close()
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # Django's ASGI handler calls close() from a worker thread.
+            async_to_sync(aclose)()
+            return
+        task = loop.create_task(aclose())
+        _pending_closes.add(task)
+        task.add_done_callback(_pending_closes.discard)
+
+
+def stream_response(frames: Iterable[bytes], *, request_id_value: str) -> StreamingHttpResponse:
+    resp = StreamingHttpResponse(frames, content_type="text/event-stream; charset=utf-8")
+    resp["X-Request-ID"] = request_id_value
+    resp["Cache-Control"] = "no-store"
+    resp["Pragma"] = "no-cache"
+    # Ask buffering reverse proxies to flush each frame as it arrives.
+    resp["X-Accel-Buffering"] = "no"
+    return resp
+
+
 def log_chat_event(level: str, event: str, *, request_id_value: str, logger, **fields):
     row = {"event": event, "request_id": request_id_value, **fields}
     line = json.dumps(row, sort_keys=True, default=str)
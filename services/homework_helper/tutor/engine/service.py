@@ -2,14 +2,22 @@
 
 from __future__ import annotations
 
+import asyncio
 import time
 import urllib.error
+from collections.abc import AsyncIterator, Awaitable, Callable, Iterator, Sequence
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Callable
 
+from asgiref.sync import sync_to_async
+
+from .answer_cache import answer_cache_stats, answer_fingerprint
+from .backends import StreamChunk, _aclose_stream
+from .circuit import CircuitDecision
 from .context_envelope import ScopeResolutionError, resolve_context_envelope
 from .execution_config import resolve_execution_config
+from .heuristics import MessageText, analyze_message
+from .memory import _class_id_from_actor_key
 from .runtime_config import resolve_policy_bundle
 
 
@@ -24,22 +32,21 @@ class ChatDeps:
     load_scope_from_token: Callable[..., dict]
     resolve_reference_file: Callable[[str | None, str, str], str]
     load_reference_text: Callable[[str], str]
-    load_reference_chunks: Callable[[str], tuple[str, ...]]
+    load_reference_chunks: Callable[[str], Sequence[str]]
     build_reference_citations: Callable[..., list[dict]]
     format_reference_citations_for_prompt: Callable[[list[dict]], str]
     parse_csv_list: Callable[[str], list[str]]
-    contains_text_language: Callable[[str, list[str]], bool]
+    contains_text_language: Callable[[MessageText, list[str]], bool]
     is_scratch_context: Callable[[str, list[str], str], bool]
     is_piper_context: Callable[[str, list[str], str, str], bool]
-    is_piper_hardware_question: Callable[[str], bool]
-    build_piper_hardware_triage_text: Callable[[str], str]
-    allowed_topic_overlap: Callable[[str, list[str]], bool]
+    is_piper_hardware_question: Callable[[MessageText], bool]
+    build_piper_hardware_triage_text: Callable[[MessageText], str]
+    allowed_topic_overlap: Callable[[MessageText, list[str]], bool]
     build_instructions: Callable[..., str]
-    backend_circuit_is_open: Callable[[str], bool]
+    check_backend_circuit: Callable[[str], CircuitDecision]
     call_backend_with_retries: Callable[[str, str, str], tuple[str, str, int]]
-    record_backend_failure: Callable[[str], None]
-    reset_backend_failure_state: Callable[[str], None]
-    acquire_slot: Callable[[int, float, float, int], tuple[str | None, str | None]]
+    record_backend_outcome: Callable[..., dict | None]
+    acquire_slot: Callable[..., tuple[str | None, str | None]]
     release_slot: Callable[[str | None, str | None], None]
     truncate_response_text: Callable[[str], tuple[str, bool]]
     normalize_conversation_id: Callable[[str], str]
@@ -49,403 +56,1045 @@ class ChatDeps:
     compact_conversation: Callable[..., tuple[str, list[dict], bool]]
     clear_conversation_turns: Callable[..., None]
     format_conversation_for_prompt: Callable[..., str]
-    classify_intent: Callable[[str], str]
+    classify_intent: Callable[[MessageText], str]
     build_follow_up_suggestions: Callable[..., list[str]]
+    call_backend_stream_with_retries: Callable[[str, str, str], tuple[Iterator[tuple[str, str]], int]] | None = None
+    stream_response: Callable[..., object] | None = None
+    load_cached_answer: Callable[..., dict | None] | None = None
+    save_cached_answer: Callable[..., None] | None = None
+    begin_flight: Callable[..., object | None] | None = None
 
 
-def handle_chat(
-    *,
-    request,
-    payload: dict,
-    request_id: str,
-    actor_key: str,
-    actor_type: str,
-    client_ip: str,
-    settings,
-    started_at: float,
-    default_text_language_keywords: list[str],
-    signature_expired_exc: type[Exception],
-    bad_signature_exc: type[Exception],
-    deps: ChatDeps,
-):
-    conversation_id = deps.normalize_conversation_id(str(payload.get("conversation_id") or ""))
-    conversation_enabled = False
-    intent = ""
-    conversation_compacted = False
+@dataclass(frozen=True)
+class AsyncChatDeps:
+    """Awaitable counterparts of the blocking `ChatDeps` hooks used by `ahandle_chat`."""
 
-    def _response(body: dict, *, status: int = 200):
+    acquire_slot: Callable[..., Awaitable[tuple[str | None, str | None]]]
+    release_slot: Callable[[str | None, str | None], Awaitable[None]]
+    call_backend_with_retries: Callable[[str, str, str], Awaitable[tuple[str, str, int]]]
+    call_backend_stream_with_retries: (
+        Callable[[str, str, str], Awaitable[tuple[AsyncIterator[StreamChunk], int]]] | None
+    ) = None
+
+
+def _queue_class_key(actor_key: str) -> str:
+    """Group queue tickets per class; staff and anonymous callers share one group each."""
+    class_id = _class_id_from_actor_key(actor_key)
+    if class_id is not None:
+        return f"class:{class_id}"
+    if (actor_key or "").startswith("staff:"):
+        return "staff"
+    return "anon"
+
+
+class _ChatTurn:
+    """Per-request state shared by the sync and async chat orchestration paths.
+
+    `prepare()` runs every local step (scope, policy redirects, references, prompt
+    assembly, circuit check). `handle_chat` and `ahandle_chat` only differ in how
+    they wait for a queue slot and call the backend.
+    """
+
+    def __init__(
+        self,
+        *,
+        payload: dict,
+        request_id: str,
+        actor_key: str,
+        actor_type: str,
+        client_ip: str,
+        settings,
+        started_at: float,
+        default_text_language_keywords: list[str],
+        signature_expired_exc: type[Exception],
+        bad_signature_exc: type[Exception],
+        deps: ChatDeps,
+    ):
+        self.payload = payload
+        self.request_id = request_id
+        self.actor_key = actor_key
+        self.actor_type = actor_type
+        self.client_ip = client_ip
+        self.settings = settings
+        self.started_at = started_at
+        self.signature_expired_exc = signature_expired_exc
+        self.bad_signature_exc = bad_signature_exc
+        self.deps = deps
+
+        self.conversation_id = deps.normalize_conversation_id(str(payload.get("conversation_id") or ""))
+        self.conversation_enabled = False
+        self.intent = ""
+        self.conversation_compacted = False
+        self.attempts_used = 0
+        self.queue_wait_ms = 0
+        # (class_id, fingerprint) of a first-turn answer cache miss to fill on success.
+        self.answer_cache_slot: tuple[int, str] | None = None
+        self.backend_started_at: float | None = None
+        # Single-flight group this turn leads; streamed replies publish to it when the stream ends.
+        self.flight = None
+
+        self.execution_config = resolve_execution_config(
+            env_int=deps.env_int,
+            env_float=deps.env_float,
+            env_bool=deps.env_bool,
+            parse_csv_list=deps.parse_csv_list,
+            default_text_language_keywords=default_text_language_keywords,
+        )
+        self.backend = self.execution_config.backend
+
+    def with_conversation(self, body: dict) -> dict:
         payload_with_conversation = dict(body or {})
-        payload_with_conversation["conversation_id"] = conversation_id
-        payload_with_conversation["conversation_enabled"] = conversation_enabled
-        if intent and "intent" not in payload_with_conversation:
-            payload_with_conversation["intent"] = intent
+        payload_with_conversation["conversation_id"] = self.conversation_id
+        payload_with_conversation["conversation_enabled"] = self.conversation_enabled
+        if self.intent and "intent" not in payload_with_conversation:
+            payload_with_conversation["intent"] = self.intent
         if "conversation_compacted" not in payload_with_conversation:
-            payload_with_conversation["conversation_compacted"] = conversation_compacted
-        return deps.json_response(payload_with_conversation, status=status, request_id=request_id)
-
-    execution_config = resolve_execution_config(
-        env_int=deps.env_int,
-        env_float=deps.env_float,
-        env_bool=deps.env_bool,
-        parse_csv_list=deps.parse_csv_list,
-        default_text_language_keywords=default_text_language_keywords,
-    )
+            payload_with_conversation["conversation_compacted"] = self.conversation_compacted
+        return payload_with_conversation
 
-    try:
-        envelope = resolve_context_envelope(
-            payload=payload,
-            actor_type=actor_type,
-            require_scope_for_staff=bool(getattr(settings, "HELPER_REQUIRE_SCOPE_TOKEN_FOR_STAFF", False)),
-            max_scope_token_age_seconds=execution_config.scope_token_max_age_seconds,
-            load_scope_from_token=deps.load_scope_from_token,
-            signature_expired_exc=signature_expired_exc,
-            bad_signature_exc=bad_signature_exc,
+    def response(self, body: dict, *, status: int = 200):
+        return self.deps.json_response(self.with_conversation(body), status=status, request_id=self.request_id)
+
+    def prepare(self):
+        """Run the pre-backend steps; return an early response, or None to call the backend."""
+        deps = self.deps
+        payload = self.payload
+        execution_config = self.execution_config
+        request_id = self.request_id
+        actor_type = self.actor_type
+
+        try:
+            envelope = resolve_context_envelope(
+                payload=payload,
+                actor_type=actor_type,
+                require_scope_for_staff=bool(getattr(self.settings, "HELPER_REQUIRE_SCOPE_TOKEN_FOR_STAFF", False)),
+                max_scope_token_age_seconds=execution_config.scope_token_max_age_seconds,
+                load_scope_from_token=deps.load_scope_from_token,
+                signature_expired_exc=self.signature_expired_exc,
+                bad_signature_exc=self.bad_signature_exc,
+            )
+        except ScopeResolutionError as exc:
+            deps.log_chat_event(
+                exc.log_level,
+                exc.log_event,
+                request_id=request_id,
+                actor_type=actor_type,
+                ip=self.client_ip,
+            )
+            return self.response({"error": exc.response_error}, status=400)
+
+        if envelope.ignored_unsigned_scope_fields:
+            deps.log_chat_event(
+                "info",
+                "unsigned_scope_fields_ignored",
+                request_id=request_id,
+                actor_type=actor_type,
+                ip=self.client_ip,
+            )
+
+        scope_token = envelope.scope_token
+        context_value = envelope.context
+        topics = envelope.topics
+        allowed_topics = envelope.allowed_topics
+        reference_key = envelope.reference_key
+        self.scope_verified = envelope.scope_verified
+
+        self.conversation_enabled = execution_config.conversation_enabled and bool(self.actor_key)
+        self.conversation_scope_fp = deps.scope_fingerprint(scope_token)
+        if execution_config.conversation_max_messages <= 0:
+            self.conversation_enabled = False
+
+        if self.conversation_enabled and bool(payload.get("reset_conversation")):
+            deps.clear_conversation_turns(
+                conversation_id=self.conversation_id,
+                actor_key=self.actor_key,
+                scope_fingerprint=self.conversation_scope_fp,
+            )
+
+        self.history_turns: list[dict] = []
+        self.history_summary = ""
+        if self.conversation_enabled:
+            conversation_state = deps.load_conversation_state(
+                conversation_id=self.conversation_id,
+                actor_key=self.actor_key,
+                scope_fingerprint=self.conversation_scope_fp,
+                max_messages=execution_config.conversation_max_messages,
+            )
+            self.history_turns = list(conversation_state.get("turns") or [])
+            self.history_summary = str(conversation_state.get("summary") or "").strip()
+
+        message = (payload.get("message") or "").strip()
+        if not message:
+            return self.response({"error": "missing_message"}, status=400)
+
+        message = deps.redact(message)[:8000]
+        self.message = message
+        # Lowered and tokenized once; every keyword check below reuses it.
+        message_text = analyze_message(message)
+        self.intent = deps.classify_intent(message_text)
+        self.follow_up_suggestions = deps.build_follow_up_suggestions(
+            intent=self.intent,
+            context=context_value or "",
+            topics=topics,
+            allowed_topics=allowed_topics,
+            history_summary=self.history_summary,
+            max_items=execution_config.follow_up_suggestions_max,
         )
-    except ScopeResolutionError as exc:
-        deps.log_chat_event(
-            exc.log_level,
-            exc.log_event,
-            request_id=request_id,
-            actor_type=actor_type,
-            ip=client_ip,
+
+        conversation_prompt = ""
+        if self.conversation_enabled and (self.history_turns or self.history_summary):
+            conversation_prompt = deps.format_conversation_for_prompt(
+                self.history_turns,
+                max_chars=execution_config.conversation_history_max_chars,
+                summary=self.history_summary,
+            )
+        self.model_message = message
+        if conversation_prompt:
+            self.model_message = f"{conversation_prompt}\n\nStudent (latest):\n{message}"
+
+        backend = self.backend
+        policy_bundle = resolve_policy_bundle()
+        self.strictness = policy_bundle.strictness
+        scope_mode = policy_bundle.scope_mode
+        if backend == "openai" and not bool(getattr(self.settings, "HELPER_REMOTE_MODE_ACKNOWLEDGED", False)):
+            deps.log_chat_event(
+                "warning",
+                "remote_backend_not_acknowledged",
+                request_id=request_id,
+                actor_type=actor_type,
+                backend=backend,
+            )
+            return self.response({"error": "remote_backend_not_acknowledged"}, status=503)
+
+        reference_dir = execution_config.reference_dir
+        reference_map_raw = execution_config.reference_map_raw
+        default_reference_file = execution_config.default_reference_file
+        if reference_key:
+            reference_file = deps.resolve_reference_file(reference_key, reference_dir, reference_map_raw)
+        else:
+            reference_file = default_reference_file
+        reference_text = deps.load_reference_text(reference_file)
+        reference_chunks = deps.load_reference_chunks(reference_file)
+        reference_source = reference_key or (Path(reference_file).stem if reference_file else "")
+        self.citations = deps.build_reference_citations(
+            message=message,
+            context=context_value or "",
+            topics=topics,
+            reference_chunks=reference_chunks,
+            source_label=reference_source,
+            max_items=execution_config.reference_max_citations,
+        )
+        reference_citations = deps.format_reference_citations_for_prompt(self.citations)
+        lang_keywords = execution_config.text_language_keywords
+        if deps.contains_text_language(message_text, lang_keywords) and deps.is_scratch_context(
+            context_value or "", topics, reference_text
+        ):
+            deps.log_chat_event(
+                "info",
+                "policy_redirect_text_language",
+                request_id=request_id,
+                actor_type=actor_type,
+                backend=backend,
+            )
+            redirect_text = (
+                "We're using Scratch blocks in this class, not text programming languages. "
+                "Tell me which Scratch block or part of your project you're stuck on, "
+                "and I'll help you with the Scratch version."
+            )
+            return self._policy_reply(redirect_text)
+        if (
+            execution_config.piper_hardware_triage_enabled
+            and deps.is_piper_context(context_value or "", topics, reference_text, reference_key)
+            and deps.is_piper_hardware_question(message_text)
+            and not self.citations
+        ):
+            deps.log_chat_event(
+                "info",
+                "policy_redirect_piper_hardware_triage",
+                request_id=request_id,
+                actor_type=actor_type,
+                backend=backend,
+            )
+            triage_text = deps.build_piper_hardware_triage_text(message_text)
+            return self._policy_reply(triage_text, triage_mode="piper_hardware")
+        if allowed_topics:
+            filter_mode = policy_bundle.topic_filter_mode
+            if filter_mode == "strict" and not deps.allowed_topic_overlap(message_text, allowed_topics):
+                deps.log_chat_event(
+                    "info",
+                    "policy_redirect_allowed_topics",
+                    request_id=request_id,
+                    actor_type=actor_type,
+                    backend=backend,
+                )
+                redirect_text = (
+                    "Let's keep this focused on today's lesson topics: "
+                    + ", ".join(allowed_topics)
+                    + ". Which part of that do you need help with?"
+                )
+                return self._policy_reply(redirect_text)
+        self.instructions = deps.build_instructions(
+            self.strictness,
+            context=context_value or "",
+            topics=topics,
+            scope_mode=scope_mode,
+            allowed_topics=allowed_topics,
+            reference_text=reference_text,
+            reference_citations=reference_citations,
         )
-        return _response({"error": exc.response_error}, status=400)
 
-    if envelope.ignored_unsigned_scope_fields:
+        cached_reply = self._cached_answer_reply(reference_file)
+        if cached_reply is not None:
+            return cached_reply
+        decision = deps.check_backend_circuit(backend)
+        if decision.transition:
+            self.log_circuit_transition({"transition": decision.transition})
+        if not decision.allowed:
+            deps.log_chat_event(
+                "warning",
+                "backend_circuit_open",
+                request_id=request_id,
+                backend=backend,
+                circuit_state=decision.state,
+            )
+            return self.response({"error": "backend_unavailable"}, status=503)
+        return None
+
+    def _cached_answer_reply(self, reference_file: str):
+        """Serve a cached first-turn answer, or remember the miss so `complete` can fill it."""
+        deps = self.deps
+        class_id = _class_id_from_actor_key(self.actor_key)
+        if (
+            not self.execution_config.answer_cache_enabled
+            or deps.load_cached_answer is None
+            or class_id is None
+            or self.history_turns
+            or self.history_summary
+        ):
+            return None
+        fingerprint = answer_fingerprint(
+            scope_fp=self.conversation_scope_fp,
+            reference_key=reference_file,
+            message=self.message,
+            intent=self.intent,
+            backend=self.backend,
+        )
+        cached = deps.load_cached_answer(class_id=class_id, fingerprint=fingerprint)
+        if cached is None:
+            self.answer_cache_slot = (class_id, fingerprint)
+            return None
+
+        safe_text, truncated = deps.truncate_response_text(cached["text"])
+        self.persist_turns(safe_text)
+        total_ms = int((time.monotonic() - self.started_at) * 1000)
         deps.log_chat_event(
             "info",
-            "unsigned_scope_fields_ignored",
-            request_id=request_id,
-            actor_type=actor_type,
-            ip=client_ip,
+            "answer_cache_hit",
+            request_id=self.request_id,
+            actor_type=self.actor_type,
+            backend=self.backend,
+            intent=self.intent,
+            total_ms=total_ms,
+            answer_cache_hit_rate=answer_cache_stats()["hit_rate"],
         )
-
-    scope_token = envelope.scope_token
-    context_value = envelope.context
-    topics = envelope.topics
-    allowed_topics = envelope.allowed_topics
-    reference_key = envelope.reference_key
-    scope_verified = envelope.scope_verified
-
-    conversation_enabled = execution_config.conversation_enabled and bool(actor_key)
-    conversation_scope_fp = deps.scope_fingerprint(scope_token)
-    max_conversation_messages = execution_config.conversation_max_messages
-    conversation_ttl_seconds = execution_config.conversation_ttl_seconds
-    conversation_turn_max_chars = execution_config.conversation_turn_max_chars
-    conversation_history_max_chars = execution_config.conversation_history_max_chars
-    conversation_summary_max_chars = execution_config.conversation_summary_max_chars
-    if max_conversation_messages <= 0:
-        conversation_enabled = False
-
-    if conversation_enabled and bool(payload.get("reset_conversation")):
-        deps.clear_conversation_turns(
-            conversation_id=conversation_id,
-            actor_key=actor_key,
-            scope_fingerprint=conversation_scope_fp,
+        return self.response(
+            {
+                "text": safe_text,
+                "model": cached.get("model") or "",
+                "backend": self.backend,
+                "strictness": self.strictness,
+                "attempts": 0,
+                "queue_wait_ms": 0,
+                "total_ms": total_ms,
+                "truncated": truncated,
+                "scope_verified": self.scope_verified,
+                "citations": self.citations,
+                "intent": self.intent,
+                "follow_up_suggestions": self.follow_up_suggestions,
+                "answer_cached": True,
+            }
         )
 
-    history_turns: list[dict] = []
-    history_summary = ""
-    if conversation_enabled:
-        conversation_state = deps.load_conversation_state(
-            conversation_id=conversation_id,
-            actor_key=actor_key,
-            scope_fingerprint=conversation_scope_fp,
-            max_messages=max_conversation_messages,
-        )
-        history_turns = list(conversation_state.get("turns") or [])
-        history_summary = str(conversation_state.get("summary") or "").strip()
-
-    message = (payload.get("message") or "").strip()
-    if not message:
-        return _response({"error": "missing_message"}, status=400)
-
-    message = deps.redact(message)[:8000]
-    intent = deps.classify_intent(message)
-    follow_up_suggestions = deps.build_follow_up_suggestions(
-        intent=intent,
-        context=context_value or "",
-        topics=topics,
-        allowed_topics=allowed_topics,
-        history_summary=history_summary,
-        max_items=execution_config.follow_up_suggestions_max,
-    )
+    def _policy_reply(self, text: str, *, triage_mode: str = ""):
+        self.persist_turns(text)
+        body = {
+            "text": text,
+            "model": "",
+            "backend": self.backend,
+            "strictness": self.strictness,
+            "attempts": 0,
+            "scope_verified": self.scope_verified,
+            "citations": self.citations,
+            "intent": self.intent,
+            "follow_up_suggestions": self.follow_up_suggestions,
+        }
+        if triage_mode:
+            body["triage_mode"] = triage_mode
+        return self.response(body)
 
-    def _persist_turns(assistant_text: str) -> None:
-        nonlocal history_turns, history_summary, conversation_compacted
-        if not conversation_enabled:
+    def persist_turns(self, assistant_text: str) -> None:
+        if not self.conversation_enabled:
             return
-        user_turn = {"role": "student", "content": message[:conversation_turn_max_chars], "intent": intent}
-        assistant_turn = {"role": "assistant", "content": deps.redact(assistant_text)[:conversation_turn_max_chars], "intent": intent}
-        next_turns = [*history_turns, user_turn, assistant_turn]
+        deps = self.deps
+        execution_config = self.execution_config
+        turn_max_chars = execution_config.conversation_turn_max_chars
+        user_turn = {"role": "student", "content": self.message[:turn_max_chars], "intent": self.intent}
+        assistant_turn = {
+            "role": "assistant",
+            "content": deps.redact(assistant_text)[:turn_max_chars],
+            "intent": self.intent,
+        }
+        next_turns = [*self.history_turns, user_turn, assistant_turn]
         next_summary, next_turns, compacted = deps.compact_conversation(
             turns=next_turns,
-            max_messages=max_conversation_messages,
-            summary=history_summary,
-            summary_max_chars=conversation_summary_max_chars,
+            max_messages=execution_config.conversation_max_messages,
+            summary=self.history_summary,
+            summary_max_chars=execution_config.conversation_summary_max_chars,
         )
         deps.save_conversation_state(
-            conversation_id=conversation_id,
-            actor_key=actor_key,
-            scope_fingerprint=conversation_scope_fp,
+            conversation_id=self.conversation_id,
+            actor_key=self.actor_key,
+            scope_fingerprint=self.conversation_scope_fp,
             turns=next_turns,
             summary=next_summary,
-            ttl_seconds=conversation_ttl_seconds,
+            ttl_seconds=execution_config.conversation_ttl_seconds,
         )
-        history_turns = next_turns
-        history_summary = next_summary
+        self.history_turns = next_turns
+        self.history_summary = next_summary
         if compacted:
-            conversation_compacted = True
+            self.conversation_compacted = True
             deps.log_chat_event(
                 "info",
                 "conversation_compacted",
-                request_id=request_id,
-                actor_type=actor_type,
-                backend=execution_config.backend,
-                conversation_id=conversation_id,
+                request_id=self.request_id,
+                actor_type=self.actor_type,
+                backend=self.backend,
+                conversation_id=self.conversation_id,
             )
 
-    conversation_prompt = ""
-    if conversation_enabled and (history_turns or history_summary):
-        conversation_prompt = deps.format_conversation_for_prompt(
-            history_turns,
-            max_chars=conversation_history_max_chars,
-            summary=history_summary,
+    def queue_settings(self) -> tuple[int, float, float, int]:
+        execution_config = self.execution_config
+        return (
+            execution_config.queue_max_concurrency,
+            execution_config.queue_max_wait_seconds,
+            execution_config.queue_poll_seconds,
+            execution_config.queue_slot_ttl_seconds,
         )
-    model_message = message
-    if conversation_prompt:
-        model_message = f"{conversation_prompt}\n\nStudent (latest):\n{message}"
-
-    backend = execution_config.backend
-    policy_bundle = resolve_policy_bundle()
-    strictness = policy_bundle.strictness
-    scope_mode = policy_bundle.scope_mode
-    if backend == "openai" and not bool(getattr(settings, "HELPER_REMOTE_MODE_ACKNOWLEDGED", False)):
-        deps.log_chat_event(
+
+    def log_queue_unavailable(self, exc: Exception) -> None:
+        self.deps.log_chat_event(
             "warning",
-            "remote_backend_not_acknowledged",
-            request_id=request_id,
-            actor_type=actor_type,
-            backend=backend,
+            "queue_unavailable",
+            request_id=self.request_id,
+            actor_type=self.actor_type,
+            backend=self.backend,
+            error_type=exc.__class__.__name__,
         )
-        return _response({"error": "remote_backend_not_acknowledged"}, status=503)
-
-    reference_dir = execution_config.reference_dir
-    reference_map_raw = execution_config.reference_map_raw
-    default_reference_file = execution_config.default_reference_file
-    if reference_key:
-        reference_file = deps.resolve_reference_file(reference_key, reference_dir, reference_map_raw)
-    else:
-        reference_file = default_reference_file
-    reference_text = deps.load_reference_text(reference_file)
-    reference_chunks = deps.load_reference_chunks(reference_file)
-    reference_source = reference_key or (Path(reference_file).stem if reference_file else "")
-    citations = deps.build_reference_citations(
-        message=message,
-        context=context_value or "",
-        topics=topics,
-        reference_chunks=reference_chunks,
-        source_label=reference_source,
-        max_items=execution_config.reference_max_citations,
-    )
-    reference_citations = deps.format_reference_citations_for_prompt(citations)
-    lang_keywords = execution_config.text_language_keywords
-    if deps.contains_text_language(message, lang_keywords) and deps.is_scratch_context(context_value or "", topics, reference_text):
-        deps.log_chat_event("info", "policy_redirect_text_language", request_id=request_id, actor_type=actor_type, backend=backend)
-        redirect_text = (
-            "We're using Scratch blocks in this class, not text programming languages. "
-            "Tell me which Scratch block or part of your project you're stuck on, "
-            "and I'll help you with the Scratch version."
+
+    def queue_scope(self) -> dict:
+        """Queue keyword arguments that apply the per-class sub-quota."""
+        return {
+            "class_key": _queue_class_key(self.actor_key),
+            "class_quota": self.execution_config.queue_class_max_concurrency,
+        }
+
+    def queue_outcome(self, grant, *, queue_error: bool, queue_started_at: float):
+        """Record the queue wait; return a busy response when no slot was granted."""
+        self.queue_wait_ms = int((time.monotonic() - queue_started_at) * 1000)
+        if self.execution_config.queue_max_concurrency <= 0 or (grant is not None and grant[0] is not None):
+            return None
+        if queue_error:
+            self.deps.log_chat_event(
+                "warning",
+                "queue_fail_open",
+                request_id=self.request_id,
+                actor_type=self.actor_type,
+                backend=self.backend,
+                queue_wait_ms=self.queue_wait_ms,
+            )
+            return None
+        queue_position = int(getattr(grant, "queue_position", 0) or 0)
+        eta_seconds = int(getattr(grant, "eta_seconds", 0) or 0)
+        class_limited = getattr(grant, "reason", "") == "class_quota"
+        self.deps.log_chat_event(
+            "warning",
+            "queue_class_busy" if class_limited else "queue_busy",
+            request_id=self.request_id,
+            actor_type=self.actor_type,
+            backend=self.backend,
+            queue_wait_ms=self.queue_wait_ms,
+            queue_position=queue_position,
         )
-        _persist_turns(redirect_text)
-        return _response(
+        resp = self.response(
             {
-                "text": redirect_text,
-                "model": "",
-                "backend": backend,
-                "strictness": strictness,
-                "attempts": 0,
-                "scope_verified": scope_verified,
-                "citations": citations,
-                "intent": intent,
-                "follow_up_suggestions": follow_up_suggestions,
-            }
+                "error": "class_busy" if class_limited else "busy",
+                "queue_position": queue_position,
+                "queue_eta_seconds": eta_seconds,
+            },
+            status=429 if class_limited else 503,
         )
-    if (
-        execution_config.piper_hardware_triage_enabled
-        and deps.is_piper_context(context_value or "", topics, reference_text, reference_key)
-        and deps.is_piper_hardware_question(message)
-        and not citations
-    ):
-        deps.log_chat_event(
-            "info",
-            "policy_redirect_piper_hardware_triage",
-            request_id=request_id,
-            actor_type=actor_type,
-            backend=backend,
+        resp["Retry-After"] = str(max(eta_seconds, 1))
+        return resp
+
+    def record_backend_result(self, *, ok: bool) -> None:
+        """Feed this turn's backend call into the circuit breaker; skipped when no call was made."""
+        if self.backend_started_at is None:
+            return
+        latency_ms = int((time.monotonic() - self.backend_started_at) * 1000)
+        self.backend_started_at = None
+        transition = self.deps.record_backend_outcome(self.backend, ok=ok, latency_ms=latency_ms)
+        if transition:
+            self.log_circuit_transition(transition)
+
+    def log_circuit_transition(self, transition: dict) -> None:
+        fields = dict(transition)
+        name = fields.pop("transition")
+        self.deps.log_chat_event(
+            "warning" if name in {"opened", "reopened"} else "info",
+            f"backend_circuit_{name}",
+            request_id=self.request_id,
+            backend=self.backend,
+            **fields,
         )
-        triage_text = deps.build_piper_hardware_triage_text(message)
-        _persist_turns(triage_text)
-        return _response(
-            {
-                "text": triage_text,
-                "model": "",
-                "backend": backend,
-                "strictness": strictness,
-                "attempts": 0,
-                "scope_verified": scope_verified,
-                "triage_mode": "piper_hardware",
-                "citations": citations,
-                "intent": intent,
-                "follow_up_suggestions": follow_up_suggestions,
-            }
+
+    def backend_error_response(self, exc: Exception):
+        deps = self.deps
+        backend = self.backend
+        request_id = self.request_id
+        self.record_backend_result(ok=False)
+        if isinstance(exc, RuntimeError):
+            if str(exc) == "openai_not_installed":
+                deps.log_chat_event("error", "openai_not_installed", request_id=request_id, backend=backend)
+                return self.response({"error": "openai_not_installed"}, status=500)
+            if str(exc) == "unknown_backend":
+                deps.log_chat_event("error", "unknown_backend", request_id=request_id, backend=backend)
+                return self.response({"error": "unknown_backend"}, status=500)
+            if str(exc) == "backend_pool_unavailable":
+                deps.log_chat_event("warning", "backend_pool_unavailable", request_id=request_id, backend=backend)
+                return self.response({"error": "backend_unavailable"}, status=503)
+            deps.log_chat_event(
+                "error",
+                "backend_runtime_error",
+                request_id=request_id,
+                backend=backend,
+                error_type=exc.__class__.__name__,
+            )
+            return self.response({"error": "backend_error"}, status=502)
+        if isinstance(exc, (urllib.error.URLError, urllib.error.HTTPError)):
+            deps.log_chat_event("error", "backend_transport_error", request_id=request_id, backend=backend)
+            if backend == "ollama":
+                return self.response({"error": "ollama_error"}, status=502)
+            return self.response({"error": "backend_error"}, status=502)
+        if isinstance(exc, ValueError):
+            deps.log_chat_event("error", "backend_parse_error", request_id=request_id, backend=backend)
+            return self.response({"error": "backend_error"}, status=502)
+        deps.log_chat_event("error", "backend_error", request_id=request_id, backend=backend)
+        return self.response({"error": "backend_error"}, status=502)
+
+    def wants_stream(self, stream: bool, call_backend_stream_fn) -> bool:
+        """Stream only when asked for, enabled, and wired to both a backend stream and an SSE response."""
+        return bool(
+            stream
+            and self.execution_config.streaming_enabled
+            and call_backend_stream_fn is not None
+            and self.deps.stream_response is not None
         )
-    if allowed_topics:
-        filter_mode = policy_bundle.topic_filter_mode
-        if filter_mode == "strict" and not deps.allowed_topic_overlap(message, allowed_topics):
-            deps.log_chat_event("info", "policy_redirect_allowed_topics", request_id=request_id, actor_type=actor_type, backend=backend)
-            redirect_text = (
-                "Let's keep this focused on today's lesson topics: "
-                + ", ".join(allowed_topics)
-                + ". Which part of that do you need help with?"
+
+    def begin_flight(self):
+        """Join the single-flight group for this exact prompt, or return None to call the backend alone."""
+        if not self.execution_config.single_flight_enabled or self.deps.begin_flight is None:
+            return None
+        try:
+            return self.deps.begin_flight(
+                backend=self.backend,
+                instructions=self.instructions,
+                message=self.model_message,
+                lease_seconds=self.execution_config.queue_slot_ttl_seconds,
             )
-            _persist_turns(redirect_text)
-            return _response(
-                {
-                    "text": redirect_text,
-                    "model": "",
-                    "backend": backend,
-                    "strictness": strictness,
-                    "attempts": 0,
-                    "scope_verified": scope_verified,
-                    "citations": citations,
-                    "intent": intent,
-                    "follow_up_suggestions": follow_up_suggestions,
-                }
+        except Exception:
+            return None
+
+    def end_flight(self, result: dict | None) -> None:
+        """Publish to followers once; None tells them to make their own call."""
+        flight, self.flight = self.flight, None
+        if flight is not None:
+            flight.publish(result)
+
+    def final_stream_body(self, body: dict, on_stream_complete: Callable[[dict], None] | None) -> dict:
+        final_body = self.with_conversation(body)
+        final_body.setdefault("request_id", self.request_id)
+        if on_stream_complete is not None:
+            try:
+                on_stream_complete(final_body)
+            except Exception:
+                pass
+        return final_body
+
+    def replay_stream(self, body: dict, *, on_stream_complete: Callable[[dict], None] | None):
+        """Serve a coalesced reply to a streaming client as one delta frame plus the final frame."""
+
+        def _replay():
+            if body.get("text"):
+                yield "delta", {"text": body["text"]}
+            yield "done", self.final_stream_body(body, on_stream_complete)
+
+        return self.deps.stream_response(_replay(), request_id=self.request_id)
+
+    def areplay_stream(self, body: dict, *, on_stream_complete: Callable[[dict], None] | None):
+        """Async `replay_stream` for the ASGI chat path."""
+
+        async def _replay():
+            if body.get("text"):
+                yield "delta", {"text": body["text"]}
+            yield "done", await sync_to_async(self.final_stream_body)(body, on_stream_complete)
+
+        return self.deps.stream_response(_replay(), request_id=self.request_id)
+
+    def complete(self, raw_text: str, model_name: str, *, streamed: bool = False, coalesced: bool = False) -> dict:
+        deps = self.deps
+        safe_text, truncated = deps.truncate_response_text(raw_text or "")
+        self.persist_turns(safe_text)
+        if self.answer_cache_slot is not None and deps.save_cached_answer is not None:
+            class_id, fingerprint = self.answer_cache_slot
+            deps.save_cached_answer(
+                class_id=class_id,
+                fingerprint=fingerprint,
+                text=safe_text,
+                model=model_name,
+                ttl_seconds=self.execution_config.answer_cache_ttl_seconds,
             )
-    instructions = deps.build_instructions(
-        strictness,
-        context=context_value or "",
-        topics=topics,
-        scope_mode=scope_mode,
-        allowed_topics=allowed_topics,
-        reference_text=reference_text,
-        reference_citations=reference_citations,
+
+        self.record_backend_result(ok=True)
+        total_ms = int((time.monotonic() - self.started_at) * 1000)
+        deps.log_chat_event(
+            "info",
+            "success",
+            request_id=self.request_id,
+            actor_type=self.actor_type,
+            backend=self.backend,
+            attempts=self.attempts_used,
+            queue_wait_ms=self.queue_wait_ms,
+            response_chars=len(safe_text),
+            truncated=truncated,
+            total_ms=total_ms,
+            intent=self.intent,
+            streamed=streamed,
+            coalesced=coalesced,
+        )
+        body = {
+            "text": safe_text,
+            "model": model_name,
+            "backend": self.backend,
+            "strictness": self.strictness,
+            "attempts": self.attempts_used,
+            "queue_wait_ms": self.queue_wait_ms,
+            "total_ms": total_ms,
+            "truncated": truncated,
+            "scope_verified": self.scope_verified,
+            "citations": self.citations,
+            "intent": self.intent,
+            "follow_up_suggestions": self.follow_up_suggestions,
+        }
+        if coalesced:
+            body["coalesced"] = True
+        return body
+
+    def stream_reply(
+        self,
+        backend_stream,
+        *,
+        slot_key: str | None,
+        token: str | None,
+        on_stream_complete: Callable[[dict], None] | None,
+    ):
+        deps = self.deps
+        backend = self.backend
+        request_id = self.request_id
+        slot_released = False
+        # The relay publishes to followers once the stream ends, not when the response is returned.
+        flight, self.flight = self.flight, None
+
+        def _publish(result: dict | None) -> None:
+            nonlocal flight
+            if flight is not None:
+                flight, leader = None, flight
+                leader.publish(result)
+
+        def _release_stream_slot() -> None:
+            nonlocal slot_released
+            if slot_released:
+                return
+            slot_released = True
+            deps.release_slot(slot_key, token)
+
+        def _close_backend_stream() -> None:
+            close = getattr(backend_stream, "close", None)
+            if close is not None:
+                try:
+                    close()
+                except Exception:
+                    pass
+            _release_stream_slot()
+
+        def _close_stream() -> None:
+            _close_backend_stream()
+            _publish(None)
+
+        def _relay_stream():
+            streamed_text = ""
+            streamed_model = ""
+            relayed_chars = 0
+            relayed = False
+            try:
+                for delta, chunk_model in backend_stream:
+                    streamed_model = chunk_model or streamed_model
+                    streamed_text += delta or ""
+                    visible_text, truncated = deps.truncate_response_text(streamed_text)
+                    if len(visible_text) > relayed_chars:
+                        yield "delta", {"text": visible_text[relayed_chars:]}
+                        relayed_chars = len(visible_text)
+                    if truncated:
+                        break
+                relayed = True
+            except GeneratorExit:
+                deps.log_chat_event(
+                    "info",
+                    "stream_aborted",
+                    request_id=request_id,
+                    actor_type=self.actor_type,
+                    backend=backend,
+                    relayed_chars=relayed_chars,
+                )
+                raise
+            except Exception as exc:
+                self.record_backend_result(ok=False)
+                deps.log_chat_event(
+                    "error",
+                    "backend_stream_error",
+                    request_id=request_id,
+                    backend=backend,
+                    error_type=exc.__class__.__name__,
+                    relayed_chars=relayed_chars,
+                )
+                yield "error", self.final_stream_body({"error": "backend_error"}, on_stream_complete)
+                return
+            finally:
+                _close_backend_stream()
+                if not relayed:
+                    _publish(None)
+            body = self.complete(streamed_text, streamed_model, streamed=True)
+            _publish({"text": streamed_text, "model": streamed_model})
+            yield "done", self.final_stream_body(body, on_stream_complete)
+
+        return deps.stream_response(_relay_stream(), request_id=request_id, on_close=_close_stream)
+
+    def astream_reply(
+        self,
+        backend_stream,
+        *,
+        slot_key: str | None,
+        token: str | None,
+        release_slot_fn: Callable[[str | None, str | None], Awaitable[None]],
+        on_stream_complete: Callable[[dict], None] | None,
+    ):
+        """Async `stream_reply`: chunks are awaited on the event loop instead of a worker thread."""
+        deps = self.deps
+        backend = self.backend
+        request_id = self.request_id
+        slot_released = False
+        flight, self.flight = self.flight, None
+
+        async def _publish(result: dict | None) -> None:
+            nonlocal flight
+            if flight is not None:
+                flight, leader = None, flight
+                await sync_to_async(leader.publish)(result)
+
+        async def _aclose_backend_stream() -> None:
+            nonlocal slot_released
+            await _aclose_stream(backend_stream)
+            if slot_released:
+                return
+            slot_released = True
+            await release_slot_fn(slot_key, token)
+
+        async def _aclose_stream_and_flight() -> None:
+            await _aclose_backend_stream()
+            await _publish(None)
+
+        async def _finish_stream(body: dict) -> dict:
+            return await sync_to_async(self.final_stream_body)(body, on_stream_complete)
+
+        async def _relay_stream():
+            streamed_text = ""
+            streamed_model = ""
+            relayed_chars = 0
+            relayed = False
+            try:
+                async for delta, chunk_model in backend_stream:
+                    streamed_model = chunk_model or streamed_model
+                    streamed_text += delta or ""
+                    visible_text, truncated = deps.truncate_response_text(streamed_text)
+                    if len(visible_text) > relayed_chars:
+                        yield "delta", {"text": visible_text[relayed_chars:]}
+                        relayed_chars = len(visible_text)
+                    if truncated:
+                        break
+                relayed = True
+            except (GeneratorExit, asyncio.CancelledError):
+                deps.log_chat_event(
+                    "info",
+                    "stream_aborted",
+                    request_id=request_id,
+                    actor_type=self.actor_type,
+                    backend=backend,
+                    relayed_chars=relayed_chars,
+                )
+                raise
+            except Exception as exc:
+                await sync_to_async(self.record_backend_result)(ok=False)
+                deps.log_chat_event(
+                    "error",
+                    "backend_stream_error",
+                    request_id=request_id,
+                    backend=backend,
+                    error_type=exc.__class__.__name__,
+                    relayed_chars=relayed_chars,
+                )
+                yield "error", await _finish_stream({"error": "backend_error"})
+                return
+            finally:
+                await _aclose_backend_stream()
+                if not relayed:
+                    await _publish(None)
+            body = await sync_to_async(self.complete)(streamed_text, streamed_model, streamed=True)
+            await _publish({"text": streamed_text, "model": streamed_model})
+            yield "done", await _finish_stream(body)
+
+        return deps.stream_response(_relay_stream(), request_id=request_id, on_close=_aclose_stream_and_flight)
+
+
+def handle_chat(
+    *,
+    request,
+    payload: dict,
+    request_id: str,
+    actor_key: str,
+    actor_type: str,
+    client_ip: str,
+    settings,
+    started_at: float,
+    default_text_language_keywords: list[str],
+    signature_expired_exc: type[Exception],
+    bad_signature_exc: type[Exception],
+    deps: ChatDeps,
+    stream: bool = False,
+    on_stream_complete: Callable[[dict], None] | None = None,
+):
+    turn = _ChatTurn(
+        payload=payload,
+        request_id=request_id,
+        actor_key=actor_key,
+        actor_type=actor_type,
+        client_ip=client_ip,
+        settings=settings,
+        started_at=started_at,
+        default_text_language_keywords=default_text_language_keywords,
+        signature_expired_exc=signature_expired_exc,
+        bad_signature_exc=bad_signature_exc,
+        deps=deps,
     )
+    early_response = turn.prepare()
+    if early_response is not None:
+        return early_response
+
+    stream_requested = turn.wants_stream(stream, deps.call_backend_stream_with_retries)
+    flight = turn.begin_flight()
+    if flight is not None and not flight.leader:
+        shared = flight.wait(turn.execution_config.single_flight_wait_seconds)
+        if shared is not None:
+            body = turn.complete(shared["text"], shared["model"], streamed=stream_requested, coalesced=True)
+            if stream_requested:
+                return turn.replay_stream(body, on_stream_complete=on_stream_complete)
+            return turn.response(body)
+        flight = None
+    turn.flight = flight
+    shared_result = None
+    try:
+        response = _handle_backend_call(
+            turn,
+            stream_requested=stream_requested,
+            on_stream_complete=on_stream_complete,
+        )
+        if isinstance(response, tuple):
+            shared_result = {"text": response[0], "model": response[1]}
+    finally:
+        # Followers fall back to their own call when the leader shares nothing.
+        # A streamed reply has already taken the flight and publishes when it ends.
+        turn.end_flight(shared_result)
+    if isinstance(response, tuple):
+        return turn.response(turn.complete(*response))
+    return response
 
-    if deps.backend_circuit_is_open(backend):
-        deps.log_chat_event("warning", "backend_circuit_open", request_id=request_id, backend=backend)
-        return _response({"error": "backend_unavailable"}, status=503)
 
-    max_concurrency = execution_config.queue_max_concurrency
-    max_wait = execution_config.queue_max_wait_seconds
-    poll = execution_config.queue_poll_seconds
-    ttl = execution_config.queue_slot_ttl_seconds
+def _handle_backend_call(turn: _ChatTurn, *, stream_requested: bool, on_stream_complete):
+    """Queue, call the backend, and return `(text, model)` or a finished response."""
+    deps = turn.deps
     queue_started_at = time.monotonic()
-    slot_key, token = None, None
+    grant = None
     queue_error = False
     try:
-        slot_key, token = deps.acquire_slot(max_concurrency, max_wait, poll, ttl)
+        grant = deps.acquire_slot(*turn.queue_settings(), **turn.queue_scope())
     except Exception as exc:
         queue_error = True
-        deps.log_chat_event(
-            "warning",
-            "queue_unavailable",
-            request_id=request_id,
-            actor_type=actor_type,
-            backend=backend,
-            error_type=exc.__class__.__name__,
-        )
-    queue_wait_ms = int((time.monotonic() - queue_started_at) * 1000)
-    if max_concurrency > 0 and slot_key is None:
-        if queue_error:
-            deps.log_chat_event(
-                "warning",
-                "queue_fail_open",
-                request_id=request_id,
-                actor_type=actor_type,
-                backend=backend,
-                queue_wait_ms=queue_wait_ms,
-            )
-        else:
-            deps.log_chat_event(
-                "warning",
-                "queue_busy",
-                request_id=request_id,
-                actor_type=actor_type,
-                backend=backend,
-                queue_wait_ms=queue_wait_ms,
-            )
-            return _response({"error": "busy"}, status=503)
+        turn.log_queue_unavailable(exc)
+    busy_response = turn.queue_outcome(grant, queue_error=queue_error, queue_started_at=queue_started_at)
+    slot_key, token = (grant[0], grant[1]) if grant is not None else (None, None)
+    if busy_response is not None:
+        return busy_response
 
-    attempts_used = 0
     model_used = ""
+    backend_stream = None
+    turn.backend_started_at = time.monotonic()
     try:
-        text, model_used, attempts_used = deps.call_backend_with_retries(backend, instructions, model_message)
-    except RuntimeError as exc:
-        deps.record_backend_failure(backend)
-        if str(exc) == "openai_not_installed":
-            deps.log_chat_event("error", "openai_not_installed", request_id=request_id, backend=backend)
-            return _response({"error": "openai_not_installed"}, status=500)
-        if str(exc) == "unknown_backend":
-            deps.log_chat_event("error", "unknown_backend", request_id=request_id, backend=backend)
-            return _response({"error": "unknown_backend"}, status=500)
-        deps.log_chat_event(
-            "error",
-            "backend_runtime_error",
-            request_id=request_id,
-            backend=backend,
-            error_type=exc.__class__.__name__,
-        )
-        return _response({"error": "backend_error"}, status=502)
-    except (urllib.error.URLError, urllib.error.HTTPError):
-        deps.record_backend_failure(backend)
-        deps.log_chat_event("error", "backend_transport_error", request_id=request_id, backend=backend)
-        if backend == "ollama":
-            return _response({"error": "ollama_error"}, status=502)
-        return _response({"error": "backend_error"}, status=502)
-    except ValueError:
-        deps.record_backend_failure(backend)
-        deps.log_chat_event("error", "backend_parse_error", request_id=request_id, backend=backend)
-        return _response({"error": "backend_error"}, status=502)
-    except Exception:
-        deps.record_backend_failure(backend)
-        deps.log_chat_event("error", "backend_error", request_id=request_id, backend=backend)
-        return _response({"error": "backend_error"}, status=502)
+        if stream_requested:
+            backend_stream, turn.attempts_used = deps.call_backend_stream_with_retries(
+                turn.backend, turn.instructions, turn.model_message
+            )
+        else:
+            text, model_used, turn.attempts_used = deps.call_backend_with_retries(
+                turn.backend, turn.instructions, turn.model_message
+            )
+    except Exception as exc:
+        return turn.backend_error_response(exc)
     finally:
-        deps.release_slot(slot_key, token)
+        # Streams keep their slot until the last chunk has been relayed.
+        if backend_stream is None:
+            deps.release_slot(slot_key, token)
 
-    safe_text, truncated = deps.truncate_response_text(text or "")
-    _persist_turns(safe_text)
+    if backend_stream is None:
+        return text, model_used
+    return turn.stream_reply(backend_stream, slot_key=slot_key, token=token, on_stream_complete=on_stream_complete)
 
-    deps.reset_backend_failure_state(backend)
-    total_ms = int((time.monotonic() - started_at) * 1000)
-    deps.log_chat_event(
-        "info",
-        "success",
+
+async def ahandle_chat(
+    *,
+    request,
+    payload: dict,
+    request_id: str,
+    actor_key: str,
+    actor_type: str,
+    client_ip: str,
+    settings,
+    started_at: float,
+    default_text_language_keywords: list[str],
+    signature_expired_exc: type[Exception],
+    bad_signature_exc: type[Exception],
+    deps: ChatDeps,
+    async_deps: AsyncChatDeps,
+    stream: bool = False,
+    on_stream_complete: Callable[[dict], None] | None = None,
+):
+    """Async variant of `handle_chat` for ASGI workers.
+
+    Cache/file work before and after the model call runs through `sync_to_async`;
+    the queue wait, retry backoff, backend call, and SSE relay are awaited so one
+    event loop can hold many in-flight completions.
+    """
+    turn = _ChatTurn(
+        payload=payload,
         request_id=request_id,
+        actor_key=actor_key,
         actor_type=actor_type,
-        backend=backend,
-        attempts=attempts_used,
-        queue_wait_ms=queue_wait_ms,
-        response_chars=len(safe_text),
-        truncated=truncated,
-        total_ms=total_ms,
-        intent=intent,
+        client_ip=client_ip,
+        settings=settings,
+        started_at=started_at,
+        default_text_language_keywords=default_text_language_keywords,
+        signature_expired_exc=signature_expired_exc,
+        bad_signature_exc=bad_signature_exc,
+        deps=deps,
     )
-    return _response(
-        {
-            "text": safe_text,
-            "model": model_used,
-            "backend": backend,
-            "strictness": strictness,
-            "attempts": attempts_used,
-            "queue_wait_ms": queue_wait_ms,
-            "total_ms": total_ms,
-            "truncated": truncated,
-            "scope_verified": scope_verified,
-            "citations": citations,
-            "intent": intent,
-            "follow_up_suggestions": follow_up_suggestions,
-        }
+    early_response = await sync_to_async(turn.prepare)()
+    if early_response is not None:
+        return early_response
+
+    stream_requested = turn.wants_stream(stream, async_deps.call_backend_stream_with_retries)
+    flight = await sync_to_async(turn.begin_flight)()
+    if flight is not None and not flight.leader:
+        shared = await flight.await_result(turn.execution_config.single_flight_wait_seconds)
+        if shared is not None:
+            body = await sync_to_async(turn.complete)(
+                shared["text"], shared["model"], streamed=stream_requested, coalesced=True
+            )
+            if stream_requested:
+                return turn.areplay_stream(body, on_stream_complete=on_stream_complete)
+            return turn.response(body)
+        flight = None
+    turn.flight = flight
+    shared_result = None
+    try:
+        response = await _ahandle_backend_call(
+            turn,
+            async_deps,
+            stream_requested=stream_requested,
+            on_stream_complete=on_stream_complete,
+        )
+        if isinstance(response, tuple):
+            shared_result = {"text": response[0], "model": response[1]}
+    finally:
+        await sync_to_async(turn.end_flight)(shared_result)
+    if isinstance(response, tuple):
+        body = await sync_to_async(turn.complete)(*response)
+        return turn.response(body)
+    return response
+
+
+async def _ahandle_backend_call(
+    turn: _ChatTurn,
+    async_deps: AsyncChatDeps,
+    *,
+    stream_requested: bool,
+    on_stream_complete,
+):
+    """Async `_handle_backend_call`."""
+    queue_started_at = time.monotonic()
+    grant = None
+    queue_error = False
+    try:
+        grant = await async_deps.acquire_slot(*turn.queue_settings(), **turn.queue_scope())
+    except Exception as exc:
+        queue_error = True
+        turn.log_queue_unavailable(exc)
+    busy_response = turn.queue_outcome(grant, queue_error=queue_error, queue_started_at=queue_started_at)
+    slot_key, token = (grant[0], grant[1]) if grant is not None else (None, None)
+    if busy_response is not None:
+        return busy_response
+
+    model_used = ""
+    backend_stream = None
+    turn.backend_started_at = time.monotonic()
+    try:
+        if stream_requested:
+            backend_stream, turn.attempts_used = await async_deps.call_backend_stream_with_retries(
+                turn.backend, turn.instructions, turn.model_message
+            )
+        else:
+            text, model_used, turn.attempts_used = await async_deps.call_backend_with_retries(
+                turn.backend, turn.instructions, turn.model_message
+            )
+    except Exception as exc:
+        return await sync_to_async(turn.backend_error_response)(exc)
+    finally:
+        # Streams keep their slot until the last chunk has been relayed.
+        if backend_stream is None:
+            await async_deps.release_slot(slot_key, token)
+
+    if backend_stream is None:
+        return text, model_used
+    return turn.astream_reply(
+        backend_stream,
+        slot_key=slot_key,
+        token=token,
+        release_slot_fn=async_deps.release_slot,
+        on_stream_complete=on_stream_complete,
     )
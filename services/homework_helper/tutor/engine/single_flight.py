@@ -0,0 +1,140 @@
+"""Single-flight coalescing of identical in-flight helper backend calls.
+
+The first request for a prompt key takes a lease in the shared cache and calls
+the backend (the leader). Identical requests that arrive while the lease is
+held wait for the leader's published result instead of taking a queue slot and
+calling the model again. Followers in the leader's process are woken directly;
+followers in other processes poll the cache. When the leader fails, its lease
+lapses, or the wait runs out, followers fall back to their own call.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import logging
+import threading
+import time
+import uuid
+
+from asgiref.sync import sync_to_async
+
+logger = logging.getLogger(__name__)
+
+_POLL_START_SECONDS = 0.05
+_POLL_MAX_SECONDS = 0.5
+_RESULT_TTL_SECONDS = 30
+
+_local_lock = threading.Lock()
+_local_events: dict[tuple[str, str], threading.Event] = {}
+
+
+def flight_key(*, backend: str, model: str, instructions: str, message: str) -> str:
+    digest = hashlib.sha256()
+    for part in (backend, model, instructions, message):
+        digest.update((part or "").encode("utf-8"))
+        digest.update(b"\x1f")
+    return digest.hexdigest()[:40]
+
+
+def _lock_key(key: str) -> str:
+    return f"helper:flight:lock:{key}"
+
+
+def _result_key(key: str, token: str) -> str:
+    return f"helper:flight:result:{key}:{token}"
+
+
+class Flight:
+    """One request's membership in a flight: the leader publishes, followers wait."""
+
+    def __init__(self, *, cache_backend, key: str, token: str, leader: bool):
+        self.cache_backend = cache_backend
+        self.key = key
+        self.token = token
+        self.leader = leader
+
+    def publish(self, result: dict | None) -> None:
+        """Leader only: share `result` (None = failed, followers run their own call) and end the flight."""
+        if not self.leader:
+            return
+        cache_backend = self.cache_backend
+        try:
+            cache_backend.set(_result_key(self.key, self.token), {"result": result}, timeout=_RESULT_TTL_SECONDS)
+            if cache_backend.get(_lock_key(self.key)) == self.token:
+                cache_backend.delete(_lock_key(self.key))
+        except Exception:
+            logger.warning("single_flight_publish_failed")
+        with _local_lock:
+            event = _local_events.pop((self.key, self.token), None)
+        if event is not None:
+            event.set()
+
+    def _poll(self) -> tuple[bool, dict | None]:
+        """Return (done, result); done is True once the flight has ended one way or another."""
+        cache_backend = self.cache_backend
+        try:
+            stored = cache_backend.get(_result_key(self.key, self.token))
+            if isinstance(stored, dict):
+                result = stored.get("result")
+                return True, result if isinstance(result, dict) else None
+            if cache_backend.get(_lock_key(self.key)) != self.token:
+                # Lease released or expired without a result: the leader is gone.
+                return True, None
+        except Exception:
+            logger.warning("single_flight_poll_failed")
+            return True, None
+        return False, None
+
+    def wait(self, timeout: float) -> dict | None:
+        """Follower: block until the leader publishes; None means make the call yourself."""
+        deadline = time.monotonic() + max(float(timeout), 0.0)
+        with _local_lock:
+            event = _local_events.get((self.key, self.token))
+        interval = _POLL_START_SECONDS
+        while True:
+            done, result = self._poll()
+            remaining = deadline - time.monotonic()
+            if done or remaining <= 0:
+                return result
+            if event is not None:
+                event.wait(min(interval, remaining))
+            else:
+                time.sleep(min(interval, remaining))
+            interval = min(interval * 2, _POLL_MAX_SECONDS)
+
+    async def await_result(self, timeout: float) -> dict | None:
+        """Async `wait`: sleeps on the event loop between cache polls."""
+        deadline = time.monotonic() + max(float(timeout), 0.0)
+        interval = _POLL_START_SECONDS
+        while True:
+            done, result = await sync_to_async(self._poll)()
+            remaining = deadline - time.monotonic()
+            if done or remaining <= 0:
+                return result
+            await asyncio.sleep(min(interval, remaining))
+            interval = min(interval * 2, _POLL_MAX_SECONDS)
+
+
+def begin_flight(*, cache_backend, key: str, lease_seconds: int) -> Flight | None:
+    """Join the flight for `key`, leading it when none is in progress.
+
+    Returns None when the cache is unavailable or a flight ended between the
+    two cache calls; the caller then proceeds without coalescing.
+    """
+    token = uuid.uuid4().hex
+    try:
+        if cache_backend.add(_lock_key(key), token, timeout=max(int(lease_seconds), 1)):
+            with _local_lock:
+                _local_events[(key, token)] = threading.Event()
+            return Flight(cache_backend=cache_backend, key=key, token=token, leader=True)
+        leader_token = cache_backend.get(_lock_key(key))
+    except Exception:
+        logger.warning("single_flight_begin_failed")
+        return None
+    if not leader_token:
+        return None
+    return Flight(cache_backend=cache_backend, key=key, token=str(leader_token), leader=False)
+
+
+__all__ = ["Flight", "begin_flight", "flight_key"]
@@ -0,0 +1,137 @@
+"""Compact binary encoding for cached helper conversation state.
+
+Conversation state used to be cached as a `{"v": 2, "summary", "turns"}` dict
+of turn dicts, pickled by the cache backend and re-validated field by field on
+every load. Version 3 stores the same state as one framed byte string:
+
+    header   b"HS" + version (u8) + flags (u8)
+    body     turn count n (u16)
+             n role ids (u8), n intent ids (u8)
+             n + 1 text lengths in characters (u32): the summary, then each turn
+             the summary and every turn's content as one UTF-8 string
+             ("surrogatepass", so lone surrogates from JSON input round-trip)
+
+The columns are read with one `struct.unpack_from` and the text is decoded
+once, then sliced per turn. When the body reaches `COMPRESS_MIN_BYTES` it is
+zlib-compressed and the `compressed` flag bit is set; tutoring prose in long
+histories compresses to a third or less of its size. Only `memory.save_state`
+writes this format, from already-normalized turns, so decoding skips the
+field-by-field re-validation.
+
+The id tables below are part of the stored format: append new values, never
+reorder them.
+"""
+
+from __future__ import annotations
+
+import struct
+import zlib
+from collections.abc import Sequence
+
+MAGIC = b"HS"
+VERSION = 3
+FLAG_COMPRESSED = 0x01
+
+ROLES = ("", "student", "assistant")
+INTENTS = ("", "debug", "concept", "strategy", "reflection", "status", "general")
+_ROLE_IDS = {role: idx for idx, role in enumerate(ROLES) if role}
+_INTENT_IDS = {intent: idx for idx, intent in enumerate(INTENTS)}
+
+# Short histories are stored uncompressed: framing alone loads faster than the
+# legacy dict, and zlib costs more CPU than it saves bytes on small bodies.
+# Level 1 keeps most of the size win at a fraction of the default level's CPU cost.
+COMPRESS_MIN_BYTES = 2048
+_COMPRESS_LEVEL = 1
+_MAX_TURNS = 0xFFFF
+
+_HEADER = struct.Struct(">2sBB")
+_U16 = struct.Struct(">H")
+
+
+class StateDecodeError(ValueError):
+    """Raised when a cached value looks like compact state but cannot be decoded."""
+
+
+def is_compact(raw) -> bool:
+    return isinstance(raw, (bytes, bytearray)) and bytes(raw[:2]) == MAGIC
+
+
+def _columns(count: int) -> struct.Struct:
+    return struct.Struct(f">{count}B{count}B{count + 1}I")
+
+
+def encode_state(
+    *, summary: str, turns: Sequence[dict[str, str]], compress_min_bytes: int | None = None
+) -> bytes:
+    """Encode normalized state; turns must already have valid roles and non-empty content."""
+    turns = turns[-_MAX_TURNS:]
+    contents = [turn["content"] for turn in turns]
+    body = b"".join(
+        (
+            _U16.pack(len(turns)),
+            _columns(len(turns)).pack(
+                *[_ROLE_IDS[turn["role"]] for turn in turns],
+                *[_INTENT_IDS.get(turn.get("intent", ""), 0) for turn in turns],
+                len(summary),
+                *[len(content) for content in contents],
+            ),
+            "".join([summary, *contents]).encode("utf-8", "surrogatepass"),
+        )
+    )
+
+    flags = 0
+    if len(body) >= (COMPRESS_MIN_BYTES if compress_min_bytes is None else compress_min_bytes):
+        compressed = zlib.compress(body, _COMPRESS_LEVEL)
+        if len(compressed) < len(body):
+            body = compressed
+            flags |= FLAG_COMPRESSED
+    return _HEADER.pack(MAGIC, VERSION, flags) + body
+
+
+def decode_state(raw: bytes) -> dict[str, object]:
+    """Decode `encode_state` output into `{"summary": str, "turns": [...]}`."""
+    try:
+        magic, version, flags = _HEADER.unpack_from(raw, 0)
+        if magic != MAGIC or version != VERSION:
+            raise StateDecodeError(f"unsupported conversation state version: {version}")
+        body = bytes(raw[_HEADER.size :])
+        if flags & FLAG_COMPRESSED:
+            body = zlib.decompress(body)
+
+        (count,) = _U16.unpack_from(body, 0)
+        columns = _columns(count)
+        values = columns.unpack_from(body, _U16.size)
+        text = body[_U16.size + columns.size :].decode("utf-8", "surrogatepass")
+    except StateDecodeError:
+        raise
+    except (struct.error, zlib.error, UnicodeDecodeError) as exc:
+        raise StateDecodeError(str(exc)) from exc
+
+    lengths = values[2 * count :]
+    if sum(lengths) != len(text):
+        raise StateDecodeError("truncated conversation state")
+    offset = lengths[0]
+    summary = text[:offset]
+    turns: list[dict[str, str]] = []
+    for role_id, intent_id, length in zip(values[:count], values[count : 2 * count], lengths[1:], strict=True):
+        content = text[offset : offset + length]
+        offset += length
+        if not 0 < role_id < len(ROLES):
+            continue
+        turn = {"role": ROLES[role_id], "content": content}
+        if 0 < intent_id < len(INTENTS):
+            turn["intent"] = INTENTS[intent_id]
+        turns.append(turn)
+    return {"summary": summary, "turns": turns}
+
+
+__all__ = [
+    "COMPRESS_MIN_BYTES",
+    "INTENTS",
+    "ROLES",
+    "StateDecodeError",
+    "VERSION",
+    "decode_state",
+    "encode_state",
+    "is_compact",
+]
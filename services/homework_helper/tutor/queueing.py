@@ -1,37 +1,511 @@
+"""Fair FIFO admission for helper model calls.
+
+Every request takes a ticket in arrival order. When a holder releases its slot
+(or its lease expires) the slot is handed to the oldest eligible ticket, and
+that waiter is woken directly instead of re-polling slot keys. An optional
+per-class sub-quota caps how many slots one class may hold at once; blocked
+tickets keep their place in line while later tickets from other classes go
+ahead.
+
+Redis caches share one queue across workers (a Lua script keeps ticketing and
+hand-off atomic; waiters block on `BLPOP`). Queue keys go through the cache's
+`make_key`, so `KEY_PREFIX` applies. Other cache backends (LocMem in tests and
+local dev) fall back to an in-process queue with the same rules.
+"""
+
+import asyncio
+import math
+import threading
 import time
 import uuid
+from collections.abc import Callable
+from typing import NamedTuple
 
-from django.core.cache import cache
+from common.redis_clients import async_redis_client, redis_client
+from django.core.cache import caches
 
+QUEUE_PREFIX = "helper:queue"
+_WAKE_PREFIX = f"{QUEUE_PREFIX}:wake:"
+_REDIS_KEYS = [
+    f"{QUEUE_PREFIX}:waiting",
+    f"{QUEUE_PREFIX}:waiting_deadlines",
+    f"{QUEUE_PREFIX}:active",
+    f"{QUEUE_PREFIX}:seq",
+    f"{QUEUE_PREFIX}:granted_at",
+    f"{QUEUE_PREFIX}:stats",
+]
+# Waiters that vanish without abandoning their ticket are purged this long after
+# their own max wait, so they cannot hold the head of the line forever.
+_WAITER_GRACE_SECONDS = 5.0
+# Redis truncates BLPOP timeouts to milliseconds and treats 0 as "block forever".
+_MIN_BLOCK_SECONDS = 0.01
+_HOLD_EWMA_WEIGHT = 0.2
 
-def acquire_slot(max_concurrency: int, max_wait_seconds: float, poll_seconds: float, ttl_seconds: int):
-    """Acquire a queue slot using cache-backed locks.
 
-    Returns (slot_key, token) or (None, None) on timeout.
+class SlotGrant(NamedTuple):
+    """Outcome of an admission attempt.
+
+    `slot_key`/`token` are None when no slot was granted; `reason` is then
+    `busy` (all slots taken) or `class_quota` (the class is at its sub-quota),
+    and `queue_position`/`eta_seconds` describe where the ticket stood.
+    """
+
+    slot_key: str | None
+    token: str | None
+    queue_position: int = 0
+    eta_seconds: int = 0
+    reason: str = ""
+
+
+class _QueueState(NamedTuple):
+    granted: bool
+    position: int
+    class_blocked: bool
+    avg_hold_ms: float
+    max_active: int
+
+
+def _member(class_key: str, token: str) -> str:
+    return f"{class_key}|{token}"
+
+
+def _class_of(member: str) -> str:
+    return member.rsplit("|", 1)[0]
+
+
+def _eta_seconds(position: int, max_active: int, avg_hold_ms: float) -> int:
+    if avg_hold_ms <= 0 or max_active <= 0:
+        return 0
+    return int(math.ceil((position // max_active + 1) * avg_hold_ms / 1000.0))
+
+
+def _not_granted(state: _QueueState) -> SlotGrant:
+    position = max(state.position, 0)
+    return SlotGrant(
+        None,
+        None,
+        queue_position=position,
+        eta_seconds=_eta_seconds(position, state.max_active, state.avg_hold_ms),
+        reason="class_quota" if state.class_blocked else "busy",
+    )
+
+
+# KEYS: waiting, waiting_deadlines, active, seq, granted_at, stats
+# ARGV: op, member, lease_ms, max_active, class_quota, wait_ms, wake_prefix
+# Wake lists are addressed by prefix, so this assumes a single Redis node.
+_PUMP_SCRIPT = """
+local waiting, deadlines, active, seq, granted_at, stats = KEYS[1], KEYS[2], KEYS[3], KEYS[4], KEYS[5], KEYS[6]
+local op, member = ARGV[1], ARGV[2]
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+
+if op == 'enqueue' then
+  redis.call('HSET', stats, 'lease_ms', ARGV[3], 'max_active', ARGV[4], 'class_quota', ARGV[5])
+  redis.call('ZADD', waiting, redis.call('INCR', seq), member)
+  redis.call('ZADD', deadlines, now + tonumber(ARGV[6]), member)
+elseif op == 'release' then
+  local started = redis.call('HGET', granted_at, member)
+  if redis.call('ZREM', active, member) == 1 and started then
+    local hold = now - tonumber(started)
+    local avg = tonumber(redis.call('HGET', stats, 'avg_hold_ms') or '0') or 0
+    if avg > 0 then avg = avg * (1 - WEIGHT) + hold * WEIGHT else avg = hold end
+    redis.call('HSET', stats, 'avg_hold_ms', tostring(avg))
+  end
+  redis.call('HDEL', granted_at, member)
+elseif op == 'abandon' then
+  redis.call('ZREM', waiting, member)
+  redis.call('ZREM', deadlines, member)
+end
+
+local lease_ms = tonumber(redis.call('HGET', stats, 'lease_ms') or '0') or 0
+local max_active = tonumber(redis.call('HGET', stats, 'max_active') or '0') or 0
+local quota = tonumber(redis.call('HGET', stats, 'class_quota') or '0') or 0
+
+for _, m in ipairs(redis.call('ZRANGEBYSCORE', active, '-inf', now)) do
+  redis.call('HDEL', granted_at, m)
+end
+redis.call('ZREMRANGEBYSCORE', active, '-inf', now)
+for _, m in ipairs(redis.call('ZRANGEBYSCORE', deadlines, '-inf', now)) do
+  redis.call('ZREM', waiting, m)
+end
+redis.call('ZREMRANGEBYSCORE', deadlines, '-inf', now)
+
+local function class_of(m)
+  return string.match(m, '^(.*)|') or ''
+end
+
+local per_class = {}
+local holders = redis.call('ZRANGE', active, 0, -1)
+local n_active = #holders
+for _, m in ipairs(holders) do
+  local c = class_of(m)
+  per_class[c] = (per_class[c] or 0) + 1
+end
+if n_active < max_active then
+  for _, m in ipairs(redis.call('ZRANGE', waiting, 0, -1)) do
+    if n_active >= max_active then
+      break
+    end
+    local c = class_of(m)
+    if quota <= 0 or (per_class[c] or 0) < quota then
+      redis.call('ZREM', waiting, m)
+      redis.call('ZREM', deadlines, m)
+      redis.call('ZADD', active, now + lease_ms, m)
+      redis.call('HSET', granted_at, m, now)
+      per_class[c] = (per_class[c] or 0) + 1
+      n_active = n_active + 1
+      redis.call('RPUSH', ARGV[7] .. m, '1')
+      redis.call('PEXPIRE', ARGV[7] .. m, math.max(lease_ms, 1000))
+    end
+  end
+end
+
+local avg = redis.call('HGET', stats, 'avg_hold_ms') or '0'
+if redis.call('ZSCORE', active, member) then
+  return {1, 0, 0, avg, max_active}
+end
+local rank = redis.call('ZRANK', waiting, member)
+if not rank then
+  rank = -1
+end
+local blocked = 0
+if quota > 0 and (per_class[class_of(member)] or 0) >= quota then
+  blocked = 1
+end
+return {0, rank, blocked, avg, max_active}
+""".replace("WEIGHT", repr(_HOLD_EWMA_WEIGHT))
+
+
+def _parse_state(raw) -> _QueueState:
+    granted, rank, blocked, avg, max_active = raw
+    if isinstance(avg, bytes):
+        avg = avg.decode("ascii")
+    return _QueueState(
+        granted=bool(int(granted)),
+        position=int(rank),
+        class_blocked=bool(int(blocked)),
+        avg_hold_ms=float(avg or 0),
+        max_active=int(max_active),
+    )
+
+
+class RedisAdmissionQueue:
+    """Cross-worker FIFO queue backed by the helper's Redis cache."""
+
+    def __init__(self, *, client, make_key: Callable[[str], str] = str, async_client_fn=None):
+        self._client = client
+        self._keys = [make_key(key) for key in _REDIS_KEYS]
+        self._wake_prefix = make_key(_WAKE_PREFIX)
+        self._script = client.register_script(_PUMP_SCRIPT)
+        self._async_client_fn = async_client_fn
+
+    def _args(
+        self, op: str, member: str, *, lease_seconds=0, max_active=0, class_quota=0, max_wait_seconds=0.0
+    ) -> list:
+        wait_ms = int((max(float(max_wait_seconds), 0.0) + _WAITER_GRACE_SECONDS) * 1000)
+        return [op, member, int(lease_seconds) * 1000, int(max_active), int(class_quota), wait_ms, self._wake_prefix]
+
+    def _pump(self, op: str, member: str, **limits) -> _QueueState:
+        return _parse_state(self._script(keys=self._keys, args=self._args(op, member, **limits)))
+
+    def acquire(
+        self, max_active, max_wait_seconds, poll_seconds, ttl_seconds, *, class_key, class_quota
+    ) -> SlotGrant:
+        token = uuid.uuid4().hex
+        member = _member(class_key, token)
+        deadline = time.monotonic() + max(float(max_wait_seconds), 0.0)
+        state = last = self._pump(
+            "enqueue",
+            member,
+            lease_seconds=ttl_seconds,
+            max_active=max_active,
+            class_quota=class_quota,
+            max_wait_seconds=max_wait_seconds,
+        )
+        while not state.granted:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                state = self._pump("abandon", member)
+                if not state.granted:
+                    return _not_granted(last)
+                break
+            # The wake list is pushed on hand-off; the timeout only covers expired leases.
+            self._client.blpop(
+                [self._wake_prefix + member], timeout=max(min(remaining, poll_seconds), _MIN_BLOCK_SECONDS)
+            )
+            state = self._pump("poll", member)
+            if not state.granted:
+                last = state
+        self._client.delete(self._wake_prefix + member)
+        return SlotGrant(member, token)
+
+    def _async_pump(self):
+        # One client per event loop (see `common.redis_clients`); registering a script only hashes it.
+        client = self._async_client_fn()
+        script = client.register_script(_PUMP_SCRIPT)
+
+        async def pump(op: str, member: str, **limits) -> _QueueState:
+            return _parse_state(await script(keys=self._keys, args=self._args(op, member, **limits)))
+
+        return client, pump
+
+    async def aacquire(
+        self, max_active, max_wait_seconds, poll_seconds, ttl_seconds, *, class_key, class_quota
+    ) -> SlotGrant:
+        client, pump = self._async_pump()
+        token = uuid.uuid4().hex
+        member = _member(class_key, token)
+        deadline = time.monotonic() + max(float(max_wait_seconds), 0.0)
+        state = last = await pump(
+            "enqueue",
+            member,
+            lease_seconds=ttl_seconds,
+            max_active=max_active,
+            class_quota=class_quota,
+            max_wait_seconds=max_wait_seconds,
+        )
+        while not state.granted:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                state = await pump("abandon", member)
+                if not state.granted:
+                    return _not_granted(last)
+                break
+            await client.blpop(
+                [self._wake_prefix + member], timeout=max(min(remaining, poll_seconds), _MIN_BLOCK_SECONDS)
+            )
+            state = await pump("poll", member)
+            if not state.granted:
+                last = state
+        await client.delete(self._wake_prefix + member)
+        return SlotGrant(member, token)
+
+    def release(self, slot_key: str) -> None:
+        self._pump("release", slot_key)
+
+    async def arelease(self, slot_key: str) -> None:
+        _client, pump = self._async_pump()
+        await pump("release", slot_key)
+
+
+class LocalAdmissionQueue:
+    """In-process FIFO queue used when the cache is not Redis."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # Dict insertion order is arrival order: member -> waiter deadline.
+        self._waiting: dict[str, float] = {}
+        self._active: dict[str, tuple[float, float]] = {}
+        self._wakeups: dict[str, threading.Event] = {}
+        self._max_active = 0
+        self._class_quota = 0
+        self._lease_seconds = 0.0
+        self._avg_hold_ms = 0.0
+
+    def _pump_locked(self, member: str) -> _QueueState:
+        now = time.monotonic()
+        for held, (expires_at, _granted_at) in list(self._active.items()):
+            if expires_at <= now:
+                del self._active[held]
+                self._wakeups.pop(held, None)
+        for waiter, waiter_deadline in list(self._waiting.items()):
+            if waiter_deadline <= now:
+                del self._waiting[waiter]
+                self._wakeups.pop(waiter, None)
+
+        per_class: dict[str, int] = {}
+        for held in self._active:
+            per_class[_class_of(held)] = per_class.get(_class_of(held), 0) + 1
+        for waiter in list(self._waiting):
+            if len(self._active) >= self._max_active:
+                break
+            waiter_class = _class_of(waiter)
+            if self._class_quota > 0 and per_class.get(waiter_class, 0) >= self._class_quota:
+                continue
+            del self._waiting[waiter]
+            self._active[waiter] = (now + self._lease_seconds, now)
+            per_class[waiter_class] = per_class.get(waiter_class, 0) + 1
+            wakeup = self._wakeups.get(waiter)
+            if wakeup is not None:
+                wakeup.set()
+
+        if member in self._active:
+            return _QueueState(True, 0, False, self._avg_hold_ms, self._max_active)
+        position = list(self._waiting).index(member) if member in self._waiting else -1
+        blocked = self._class_quota > 0 and per_class.get(_class_of(member), 0) >= self._class_quota
+        return _QueueState(False, position, blocked, self._avg_hold_ms, self._max_active)
+
+    def _enqueue(self, member: str, max_active, max_wait_seconds, ttl_seconds, class_quota) -> _QueueState:
+        with self._lock:
+            self._max_active = int(max_active)
+            self._class_quota = int(class_quota)
+            self._lease_seconds = float(ttl_seconds)
+            self._waiting[member] = time.monotonic() + max(float(max_wait_seconds), 0.0) + _WAITER_GRACE_SECONDS
+            self._wakeups[member] = threading.Event()
+            state = self._pump_locked(member)
+            if state.granted:
+                self._wakeups.pop(member, None)
+            return state
+
+    def _poll(self, member: str, *, abandon: bool = False) -> _QueueState:
+        with self._lock:
+            if abandon:
+                self._waiting.pop(member, None)
+            state = self._pump_locked(member)
+            if state.granted or abandon:
+                self._wakeups.pop(member, None)
+            return state
+
+    def _wakeup(self, member: str) -> threading.Event:
+        with self._lock:
+            return self._wakeups.get(member) or threading.Event()
+
+    def acquire(
+        self, max_active, max_wait_seconds, poll_seconds, ttl_seconds, *, class_key, class_quota
+    ) -> SlotGrant:
+        token = uuid.uuid4().hex
+        member = _member(class_key, token)
+        deadline = time.monotonic() + max(float(max_wait_seconds), 0.0)
+        state = last = self._enqueue(member, max_active, max_wait_seconds, ttl_seconds, class_quota)
+        while not state.granted:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                state = self._poll(member, abandon=True)
+                if not state.granted:
+                    return _not_granted(last)
+                break
+            self._wakeup(member).wait(min(remaining, poll_seconds))
+            state = self._poll(member)
+            if not state.granted:
+                last = state
+        return SlotGrant(member, token)
+
+    async def aacquire(
+        self, max_active, max_wait_seconds, poll_seconds, ttl_seconds, *, class_key, class_quota
+    ) -> SlotGrant:
+        token = uuid.uuid4().hex
+        member = _member(class_key, token)
+        deadline = time.monotonic() + max(float(max_wait_seconds), 0.0)
+        state = last = self._enqueue(member, max_active, max_wait_seconds, ttl_seconds, class_quota)
+        while not state.granted:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                state = self._poll(member, abandon=True)
+                if not state.granted:
+                    return _not_granted(last)
+                break
+            # Local mode is single-process dev/test, so a waiter thread is acceptable here.
+            await asyncio.to_thread(self._wakeup(member).wait, min(remaining, poll_seconds))
+            state = self._poll(member)
+            if not state.granted:
+                last = state
+        return SlotGrant(member, token)
+
+    async def arelease(self, slot_key: str) -> None:
+        self.release(slot_key)
+
+    def release(self, slot_key: str) -> None:
+        with self._lock:
+            lease = self._active.pop(slot_key, None)
+            self._wakeups.pop(slot_key, None)
+            if lease is not None:
+                hold_ms = (time.monotonic() - lease[1]) * 1000
+                if self._avg_hold_ms > 0:
+                    self._avg_hold_ms = self._avg_hold_ms * (1 - _HOLD_EWMA_WEIGHT) + hold_ms * _HOLD_EWMA_WEIGHT
+                else:
+                    self._avg_hold_ms = hold_ms
+            self._pump_locked(slot_key)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._waiting.clear()
+            self._active.clear()
+            self._wakeups.clear()
+            self._avg_hold_ms = 0.0
+
+
+_local_queue = LocalAdmissionQueue()
+_redis_queue: RedisAdmissionQueue | None = None
+
+
+def admission_queue():
+    """Return the Redis-backed queue when the default cache is Redis, else the local one."""
+    global _redis_queue
+    client = redis_client("default")
+    if client is None:
+        return _local_queue
+    if _redis_queue is None:
+        _redis_queue = RedisAdmissionQueue(
+            client=client,
+            make_key=caches["default"].make_key,
+            async_client_fn=lambda: async_redis_client("default"),
+        )
+    return _redis_queue
+
+
+def acquire_slot(
+    max_concurrency: int,
+    max_wait_seconds: float,
+    poll_seconds: float,
+    ttl_seconds: int,
+    *,
+    class_key: str = "",
+    class_quota: int = 0,
+) -> SlotGrant:
+    """Wait in the FIFO queue for a slot.
+
+    Returns a `SlotGrant`; `(slot_key, token)` unpack from its first two fields
+    and are None on timeout.
     """
     if max_concurrency <= 0:
-        return None, None
+        return SlotGrant(None, None)
+    return admission_queue().acquire(
+        max_concurrency,
+        max_wait_seconds,
+        poll_seconds,
+        ttl_seconds,
+        class_key=class_key,
+        class_quota=class_quota,
+    )
 
-    deadline = time.monotonic() + max_wait_seconds
-    token = uuid.uuid4().hex
 
-    while True:
-        for idx in range(max_concurrency):
-            key = f"helper:slot:{idx}"
-            if cache.add(key, token, timeout=ttl_seconds):
-                return key, token
-        if time.monotonic() >= deadline:
-            return None, None
-        time.sleep(poll_seconds)
+async def aacquire_slot(
+    max_concurrency: int,
+    max_wait_seconds: float,
+    poll_seconds: float,
+    ttl_seconds: int,
+    *,
+    class_key: str = "",
+    class_quota: int = 0,
+) -> SlotGrant:
+    """Async variant of `acquire_slot`; waits on the event loop."""
+    if max_concurrency <= 0:
+        return SlotGrant(None, None)
+    return await admission_queue().aacquire(
+        max_concurrency,
+        max_wait_seconds,
+        poll_seconds,
+        ttl_seconds,
+        class_key=class_key,
+        class_quota=class_quota,
+    )
 
 
 def release_slot(slot_key: str | None, token: str | None):
     if not slot_key or not token:
         return
     try:
-        current = cache.get(slot_key)
-        if current == token:
-            cache.delete(slot_key)
+        admission_queue().release(slot_key)
+    except Exception:
+        # Best-effort release; the lease TTL will eventually clear the slot.
+        return
+
+
+async def arelease_slot(slot_key: str | None, token: str | None):
+    if not slot_key or not token:
+        return
+    try:
+        await admission_queue().arelease(slot_key)
     except Exception:
-        # Best-effort release; TTL will eventually clear the slot.
+        # Best-effort release; the lease TTL will eventually clear the slot.
         return
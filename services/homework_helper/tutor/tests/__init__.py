@@ -4,26 +4,31 @@ from .test_access import (
     HelperSecurityHeaderTests,
     HelperSiteModeTests,
 )
-from .test_chat_endpoint import HelperChatAuthTests
+from .test_chat_endpoint import HelperAsyncChatTests, HelperChatAuthTests
 from .test_engine import (
     AuthEngineTests,
     BackendEngineTests,
     HeuristicsEngineTests,
+    HttpPoolEngineTests,
+    ReferenceEngineTests,
     RuntimeEngineTests,
 )
 from .test_events import ClassHubEventForwardingTests
 from .test_internal_reset import HelperInternalResetTests
+from .test_queueing import AdmissionQueueTests
 from .test_view_modules import (
     HelperChatRequestModuleTests,
     HelperChatRuntimeModuleTests,
 )
 
 __all__ = [
+    "AdmissionQueueTests",
     "AuthEngineTests",
     "BackendEngineTests",
     "ClassHubEventForwardingTests",
     "HeuristicsEngineTests",
     "HelperAdminAccessTests",
+    "HelperAsyncChatTests",
     "HelperChatAuthTests",
     "HelperCSPModeTests",
     "HelperInternalResetTests",
@@ -31,5 +36,7 @@ __all__ = [
     "HelperChatRuntimeModuleTests",
     "HelperSecurityHeaderTests",
     "HelperSiteModeTests",
+    "HttpPoolEngineTests",
+    "ReferenceEngineTests",
     "RuntimeEngineTests",
 ]
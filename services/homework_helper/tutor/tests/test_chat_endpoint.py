@@ -1,18 +1,29 @@
+import asyncio
 import json
 import os
 import tempfile
+import threading
 import time
 import urllib.error
 from pathlib import Path
-from unittest.mock import patch
+from unittest.mock import AsyncMock, patch
 
 from django.contrib.auth import get_user_model
 from django.core.cache import cache
 from django.db.utils import ProgrammingError
 from django.test import TestCase, override_settings
+from django.urls import path
 from common.helper_scope import issue_scope_token
 
 from .. import views
+from ..engine import circuit as engine_circuit
+from ..engine import heuristics
+from ..engine import single_flight
+from ..queueing import SlotGrant
+from ..views_chat_runtime import backend_model_name
+
+# Routes /helper/chat to the async view, as `HELPER_ASGI_ENABLED=1` does in config.urls.
+urlpatterns = [path("helper/chat", views.achat)]
 
 
 class HelperChatAuthTests(TestCase):
@@ -279,6 +290,62 @@ class HelperChatAuthTests(TestCase):
         self.assertIn("Student (latest):", third_backend_message)
         self.assertIn("Third question", third_backend_message)
 
+    @patch("tutor.engine.backends.invoke_backend")
+    @patch.dict("os.environ", {"HELPER_ANSWER_CACHE_ENABLED": "1"}, clear=False)
+    def test_chat_answer_cache_serves_repeated_first_turn_questions(self, invoke_backend_mock):
+        invoke_backend_mock.side_effect = [("Use a move block.", "fake-model"), ("Follow-up answer", "fake-model")]
+        self._set_student_session(student_id=101)
+        first = self._post_chat({"message": "How do I make the sprite move?"})
+        self._set_student_session(student_id=102)
+        second = self._post_chat({"message": "how do i make the sprite MOVE"})
+
+        self.assertEqual(first.status_code, 200)
+        self.assertNotIn("answer_cached", first.json())
+        self.assertEqual(second.json().get("text"), "Use a move block.")
+        self.assertTrue(second.json().get("answer_cached"))
+        self.assertEqual(invoke_backend_mock.call_count, 1)
+
+        # Turns with history always go to the model.
+        follow_up = self._post_chat(
+            {"message": "How do I make the sprite move?", "conversation_id": second.json()["conversation_id"]}
+        )
+        self.assertEqual(follow_up.json().get("text"), "Follow-up answer")
+        self.assertEqual(invoke_backend_mock.call_count, 2)
+
+    @patch("tutor.views.acquire_slot")
+    @patch("tutor.engine.backends.invoke_backend")
+    def test_chat_follower_reuses_in_flight_leader_reply(self, invoke_backend_mock, acquire_slot_mock):
+        self._set_student_session()
+        leader = single_flight.begin_flight(cache_backend=cache, key="same-prompt", lease_seconds=30)
+        follower = single_flight.begin_flight(cache_backend=cache, key="same-prompt", lease_seconds=30)
+        threading.Timer(0.05, leader.publish, args=({"text": "Shared answer", "model": "fake-model"},)).start()
+
+        with patch("tutor.views._begin_flight", return_value=follower):
+            resp = self._post_chat({"message": "How do I make the sprite move?"})
+
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.json().get("text"), "Shared answer")
+        self.assertTrue(resp.json().get("coalesced"))
+        self.assertFalse(invoke_backend_mock.called)
+        self.assertFalse(acquire_slot_mock.called)
+
+    def test_chat_accepts_lone_surrogate_in_message(self):
+        self._set_student_session()
+        resp = self._post_chat({"message": "My sprite \ud800 is not moving"})
+        self.assertEqual(resp.status_code, 200)
+
+        follow_up = self._post_chat({"message": "Still stuck", "conversation_id": resp.json()["conversation_id"]})
+        self.assertEqual(follow_up.status_code, 200)
+
+    def test_chat_analyzes_message_once_for_keyword_checks(self):
+        self._set_student_session()
+        with patch("tutor.engine.service.analyze_message", wraps=heuristics.analyze_message) as analyze_mock:
+            resp = self._post_chat({"message": "My sprite is not working, what should I check first?"})
+
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.json().get("intent"), "debug")
+        analyze_mock.assert_called_once()
+
     def test_chat_returns_intent_tag(self):
         self._set_student_session()
         resp = self._post_chat({"message": "My sprite is not working, what should I check first?"})
@@ -318,7 +385,7 @@ class HelperChatAuthTests(TestCase):
             time.sleep(float(timeout or 0))
             raise urllib.error.URLError("down")
 
-        with patch("tutor.classhub_events.urllib.request.urlopen", side_effect=_slow_unreachable):
+        with patch("tutor.classhub_events.http_pool.urlopen", side_effect=_slow_unreachable):
             started = time.monotonic()
             resp = self._post_chat({"message": "How do I move a sprite?"})
             elapsed = time.monotonic() - started
@@ -655,11 +722,43 @@ class HelperChatAuthTests(TestCase):
         self.assertIn(resp.json().get("error"), {"ollama_error", "backend_error"})
         self.assertEqual(chat_mock.call_count, 2)
 
+    @patch("tutor.views.time.sleep")
+    @patch.dict(
+        "os.environ",
+        {
+            "HELPER_LLM_BACKEND": "ollama",
+            "OLLAMA_BASE_URLS": "http://gpu-a:11434,http://gpu-b:11434",
+            "HELPER_BACKEND_MAX_ATTEMPTS": "1",
+        },
+        clear=False,
+    )
+    def test_chat_fails_over_to_another_ollama_host_without_sleeping(self, sleep_mock):
+        self._set_student_session()
+
+        def ollama_chat(*, base_url, **_kwargs):
+            if base_url == "http://gpu-a:11434":
+                raise urllib.error.URLError("busy")
+            return "From B", "fake-model"
+
+        with patch("tutor.engine.backends.ollama_chat", side_effect=ollama_chat) as chat_mock:
+            first = self._post_chat({"message": "hello"})
+            second = self._post_chat({"message": "hello again"})
+
+        self.assertEqual([first.status_code, second.status_code], [200, 200])
+        self.assertEqual([first.json().get("text"), second.json().get("text")], ["From B", "From B"])
+        # Both requests try the least recently used host first and fail over to B within the same attempt budget.
+        self.assertEqual(chat_mock.call_count, 4)
+        sleep_mock.assert_not_called()
+
     @patch.dict("os.environ", {"HELPER_LLM_BACKEND": "ollama"}, clear=False)
     def test_chat_returns_503_when_backend_circuit_open(self):
         self._set_student_session()
 
-        cache.set("helper:circuit_open:ollama", 1, timeout=30)
+        engine_circuit.open_circuit(
+            cache_backend=cache,
+            name=engine_circuit.circuit_name("ollama", backend_model_name("ollama")),
+            policy=engine_circuit.CircuitPolicy(),
+        )
         with patch("tutor.engine.backends.ollama_chat") as chat_mock:
             resp = self._post_chat({"message": "hello"})
 
@@ -673,7 +772,7 @@ class HelperChatAuthTests(TestCase):
         original_get = cache.get
 
         def flaky_get(key, *args, **kwargs):
-            if key == "helper:circuit_open:ollama":
+            if key.startswith("helper:circuit:"):
                 raise RuntimeError("cache-down")
             return original_get(key, *args, **kwargs)
 
@@ -691,6 +790,21 @@ class HelperChatAuthTests(TestCase):
         self.assertEqual(resp.status_code, 200)
         self.assertEqual(resp.json().get("text"), "Hint")
 
+    @patch(
+        "tutor.views.acquire_slot",
+        return_value=SlotGrant(None, None, queue_position=4, eta_seconds=12, reason="class_quota"),
+    )
+    def test_chat_reports_queue_position_when_class_is_at_quota(self, acquire_slot_mock):
+        self._set_student_session()
+
+        resp = self._post_chat({"message": "queue check"})
+        self.assertEqual(resp.status_code, 429)
+        self.assertEqual(resp.json().get("error"), "class_busy")
+        self.assertEqual(resp.json().get("queue_position"), 4)
+        self.assertEqual(resp.json().get("queue_eta_seconds"), 12)
+        self.assertEqual(resp["Retry-After"], "12")
+        self.assertTrue(acquire_slot_mock.call_args.kwargs["class_key"].startswith("class:"))
+
     @patch.dict(
         "os.environ",
         {
@@ -706,3 +820,311 @@ class HelperChatAuthTests(TestCase):
         self.assertEqual(resp.status_code, 200)
         self.assertTrue(resp.json().get("truncated"))
         self.assertEqual(len(resp.json().get("text") or ""), 220)
+
+    def _read_sse(self, resp) -> list[tuple[str, dict]]:
+        raw = b"".join(resp.streaming_content).decode("utf-8")
+        frames: list[tuple[str, dict]] = []
+        for block in raw.strip().split("\n\n"):
+            lines = dict(line.split(": ", 1) for line in block.splitlines())
+            frames.append((lines["event"], json.loads(lines["data"])))
+        return frames
+
+    @patch.dict("os.environ", {"HELPER_MOCK_RESPONSE_TEXT": "Try a move block first."}, clear=False)
+    def test_chat_streams_sse_deltas_when_client_requests_stream(self):
+        self._set_student_session()
+
+        resp = self._post_chat({"message": "How do I move a sprite?", "stream": True})
+        self.assertEqual(resp.status_code, 200)
+        self.assertTrue(resp.streaming)
+        self.assertTrue(resp["Content-Type"].startswith("text/event-stream"))
+        self.assertEqual(resp["Cache-Control"], "no-store")
+
+        frames = self._read_sse(resp)
+        deltas = [data["text"] for event, data in frames if event == "delta"]
+        self.assertGreater(len(deltas), 1)
+        self.assertEqual("".join(deltas), "Try a move block first.")
+        event, done = frames[-1]
+        self.assertEqual(event, "done")
+        self.assertEqual(done.get("text"), "Try a move block first.")
+        self.assertEqual(done.get("request_id"), resp["X-Request-ID"])
+        self.assertTrue(done.get("conversation_id"))
+        self.assertIn("follow_up_suggestions", done)
+        self.assertIsNone(cache.get("helper:slot:0"))
+
+    @patch("tutor.engine.backends.invoke_backend")
+    def test_chat_stream_persists_turns_for_follow_up_requests(self, invoke_backend_mock):
+        self._set_student_session()
+        invoke_backend_mock.return_value = ("Second answer", "fake-model")
+        conversation_id = "123e4567-e89b-12d3-a456-426614174999"
+
+        first = self._post_chat({"message": "First question", "conversation_id": conversation_id, "stream": True})
+        self.assertEqual(self._read_sse(first)[-1][0], "done")
+        second = self._post_chat({"message": "Second question", "conversation_id": conversation_id})
+        self.assertEqual(second.status_code, 200)
+
+        backend_message = str(invoke_backend_mock.call_args.kwargs["message"])
+        self.assertIn("Recent conversation:", backend_message)
+        self.assertIn("First question", backend_message)
+
+    @patch.dict(
+        "os.environ",
+        {
+            "HELPER_MOCK_RESPONSE_TEXT": " ".join(["word"] * 80),
+            "HELPER_RESPONSE_MAX_CHARS": "220",
+        },
+        clear=False,
+    )
+    def test_chat_stream_stops_relaying_at_response_limit(self):
+        self._set_student_session()
+
+        resp = self._post_chat({"message": "truncate", "stream": True})
+        frames = self._read_sse(resp)
+        streamed = "".join(data["text"] for event, data in frames if event == "delta")
+        self.assertLessEqual(len(streamed), 220)
+        event, done = frames[-1]
+        self.assertEqual(event, "done")
+        self.assertTrue(done.get("truncated"))
+        self.assertLessEqual(len(done.get("text") or ""), 220)
+
+    @patch("tutor.views.time.sleep", return_value=None)
+    @patch.dict(
+        "os.environ",
+        {
+            "HELPER_LLM_BACKEND": "ollama",
+            "HELPER_BACKEND_MAX_ATTEMPTS": "2",
+            "HELPER_BACKOFF_SECONDS": "0",
+        },
+        clear=False,
+    )
+    def test_chat_stream_returns_json_error_when_backend_fails_before_first_chunk(self, _sleep_mock):
+        self._set_student_session()
+
+        with patch(
+            "tutor.engine.backends.ollama_chat_stream",
+            side_effect=urllib.error.URLError("still down"),
+        ) as stream_mock:
+            resp = self._post_chat({"message": "stream fail", "stream": True})
+
+        self.assertFalse(resp.streaming)
+        self.assertEqual(resp.status_code, 502)
+        self.assertEqual(resp.json().get("error"), "ollama_error")
+        self.assertEqual(stream_mock.call_count, 2)
+        self.assertIsNone(cache.get("helper:slot:0"))
+
+    @patch("tutor.views.acquire_slot")
+    @patch("tutor.engine.backends.invoke_backend")
+    def test_chat_stream_follower_replays_leader_reply_as_sse(self, invoke_backend_mock, acquire_slot_mock):
+        self._set_student_session()
+        leader = single_flight.begin_flight(cache_backend=cache, key="same-prompt", lease_seconds=30)
+        follower = single_flight.begin_flight(cache_backend=cache, key="same-prompt", lease_seconds=30)
+        threading.Timer(0.05, leader.publish, args=({"text": "Shared answer", "model": "fake-model"},)).start()
+
+        with patch("tutor.views._begin_flight", return_value=follower):
+            resp = self._post_chat({"message": "How do I make the sprite move?", "stream": True})
+
+        self.assertTrue(resp.streaming)
+        frames = self._read_sse(resp)
+        self.assertEqual(frames[0], ("delta", {"text": "Shared answer"}))
+        event, done = frames[-1]
+        self.assertEqual(event, "done")
+        self.assertEqual(done.get("text"), "Shared answer")
+        self.assertTrue(done.get("coalesced"))
+        self.assertTrue(done.get("conversation_id"))
+        self.assertFalse(invoke_backend_mock.called)
+        self.assertFalse(acquire_slot_mock.called)
+
+    @patch.dict("os.environ", {"HELPER_MOCK_RESPONSE_TEXT": "Try a move block first."}, clear=False)
+    def test_chat_stream_leader_publishes_reply_once_stream_ends(self):
+        self._set_student_session()
+        leader = single_flight.begin_flight(cache_backend=cache, key="same-prompt", lease_seconds=30)
+        follower = single_flight.begin_flight(cache_backend=cache, key="same-prompt", lease_seconds=30)
+
+        with patch("tutor.views._begin_flight", return_value=leader):
+            resp = self._post_chat({"message": "How do I move a sprite?", "stream": True})
+
+        self.assertIsNone(follower.wait(0))
+        self.assertEqual(self._read_sse(resp)[-1][0], "done")
+        self.assertEqual((follower.wait(1) or {}).get("text"), "Try a move block first.")
+
+    @patch.dict("os.environ", {"HELPER_STREAMING_ENABLED": "0"}, clear=False)
+    def test_chat_falls_back_to_json_when_streaming_disabled(self):
+        self._set_student_session()
+
+        resp = self.client.post(
+            "/helper/chat",
+            data=json.dumps({"message": "How do I move a sprite?", "scope_token": self._scope_token()}),
+            content_type="application/json",
+            HTTP_ACCEPT="text/event-stream",
+        )
+        self.assertFalse(resp.streaming)
+        self.assertEqual(resp.json().get("text"), "Hint")
+
+    @patch("tutor.views.emit_helper_chat_access_event")
+    def test_chat_stream_emits_helper_access_event_after_final_frame(self, event_mock):
+        self._set_student_session()
+
+        resp = self._post_chat({"message": "How do I move a sprite?", "stream": True})
+        event_mock.assert_not_called()
+        self._read_sse(resp)
+        event_mock.assert_called_once()
+        details = event_mock.call_args.kwargs.get("details") or {}
+        self.assertEqual(details.get("backend"), "mock")
+        self.assertEqual(details.get("intent"), "general")
+        self.assertEqual(details.get("attempts"), 1)
+
+
+@override_settings(ROOT_URLCONF=__name__)
+class HelperAsyncChatTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self._default_env_patch = patch.dict(
+            "os.environ",
+            {
+                "HELPER_LLM_BACKEND": "mock",
+                "HELPER_MOCK_RESPONSE_TEXT": "Hint",
+                "HELPER_TOPIC_FILTER_MODE": "soft",
+            },
+            clear=False,
+        )
+        self._default_env_patch.start()
+        self.addCleanup(self._default_env_patch.stop)
+        session = self.client.session
+        session["student_id"] = 101
+        session["class_id"] = 5
+        session.save()
+        self.async_client.cookies = self.client.cookies
+
+    async def _apost_chat(self, payload: dict):
+        body = dict(payload)
+        body.setdefault(
+            "scope_token",
+            issue_scope_token(
+                context="Lesson scope: Session 1",
+                topics=["scratch motion"],
+                allowed_topics=["scratch motion", "sprites"],
+                reference="piper_scratch",
+            ),
+        )
+        return await self.async_client.post(
+            "/helper/chat",
+            data=json.dumps(body),
+            content_type="application/json",
+        )
+
+    async def test_async_chat_returns_json_reply_and_releases_slot(self):
+        resp = await self._apost_chat({"message": "How do I move a sprite?"})
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp["Cache-Control"], "no-store")
+        self.assertEqual(resp.json().get("text"), "Hint")
+        self.assertEqual(resp.json().get("attempts"), 1)
+        self.assertTrue(resp.json().get("conversation_id"))
+        self.assertIsNone(await cache.aget("helper:slot:0"))
+
+    @patch.dict(
+        "os.environ",
+        {
+            "HELPER_LLM_BACKEND": "ollama",
+            "HELPER_BACKEND_MAX_ATTEMPTS": "2",
+            "HELPER_BACKOFF_SECONDS": "0",
+        },
+        clear=False,
+    )
+    async def test_async_chat_retries_transient_backend_errors(self):
+        with patch(
+            "tutor.views._aollama_chat",
+            new=AsyncMock(side_effect=[urllib.error.URLError("temporary"), ("Recovered", "llama-test")]),
+        ) as chat_mock:
+            resp = await self._apost_chat({"message": "retry please"})
+
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.json().get("text"), "Recovered")
+        self.assertEqual(resp.json().get("attempts"), 2)
+        self.assertEqual(chat_mock.await_count, 2)
+
+    @patch.dict("os.environ", {"HELPER_LLM_BACKEND": "ollama", "HELPER_BACKOFF_SECONDS": "0"}, clear=False)
+    async def test_async_chat_maps_backend_transport_errors(self):
+        with patch("tutor.views._aollama_chat", new=AsyncMock(side_effect=urllib.error.URLError("down"))):
+            resp = await self._apost_chat({"message": "hello"})
+
+        self.assertEqual(resp.status_code, 502)
+        self.assertEqual(resp.json().get("error"), "ollama_error")
+
+    @patch("tutor.views.aacquire_slot", new=AsyncMock(return_value=(None, None)))
+    async def test_async_chat_returns_busy_when_no_slot_is_granted(self):
+        resp = await self._apost_chat({"message": "queue check"})
+        self.assertEqual(resp.status_code, 503)
+        self.assertEqual(resp.json().get("error"), "busy")
+
+    @patch.dict("os.environ", {"HELPER_MOCK_RESPONSE_TEXT": "Try a move block first."}, clear=False)
+    @patch("tutor.views.engine_service.handle_chat", side_effect=AssertionError("sync chat path"))
+    @patch("tutor.views.acquire_slot", side_effect=AssertionError("sync queue"))
+    @patch("tutor.views.release_slot", side_effect=AssertionError("sync queue"))
+    @patch("tutor.views._mock_chat_stream", side_effect=AssertionError("sync backend stream"))
+    async def test_async_chat_streams_sse_frames_without_buffering(self, *_sync_mocks):
+        resp = await self._apost_chat({"message": "How do I move a sprite?", "stream": True})
+        self.assertTrue(resp.streaming)
+        self.assertTrue(resp.is_async)
+
+        raw = b"".join([chunk async for chunk in resp.streaming_content]).decode("utf-8")
+        frames = []
+        for block in raw.strip().split("\n\n"):
+            lines = dict(line.split(": ", 1) for line in block.splitlines())
+            frames.append((lines["event"], json.loads(lines["data"])))
+        self.assertEqual("".join(data["text"] for event, data in frames if event == "delta"), "Try a move block first.")
+        self.assertEqual(frames[-1][0], "done")
+
+    @patch("tutor.views.aacquire_slot", new=AsyncMock(side_effect=AssertionError("follower took a slot")))
+    async def test_async_chat_stream_follower_replays_leader_reply_as_sse(self):
+        leader = single_flight.begin_flight(cache_backend=cache, key="same-prompt", lease_seconds=30)
+        follower = single_flight.begin_flight(cache_backend=cache, key="same-prompt", lease_seconds=30)
+        asyncio.get_running_loop().call_later(0.05, leader.publish, {"text": "Shared answer", "model": "fake-model"})
+
+        with patch("tutor.views._begin_flight", return_value=follower):
+            resp = await self._apost_chat({"message": "How do I move a sprite?", "stream": True})
+
+        self.assertTrue(resp.is_async)
+        raw = b"".join([chunk async for chunk in resp.streaming_content]).decode("utf-8")
+        frames = []
+        for block in raw.strip().split("\n\n"):
+            lines = dict(line.split(": ", 1) for line in block.splitlines())
+            frames.append((lines["event"], json.loads(lines["data"])))
+        self.assertEqual(frames[0], ("delta", {"text": "Shared answer"}))
+        self.assertEqual(frames[-1][0], "done")
+        self.assertTrue(frames[-1][1].get("coalesced"))
+
+    @patch.dict("os.environ", {"HELPER_MOCK_RESPONSE_TEXT": "one two three four"}, clear=False)
+    async def test_async_chat_stream_releases_slot_when_client_leaves_early(self):
+        with patch("tutor.views.arelease_slot", new=AsyncMock()) as release_mock:
+            resp = await self._apost_chat({"message": "How do I move a sprite?", "stream": True})
+            content = resp.streaming_content
+            first = await anext(content)
+            self.assertTrue(first.startswith(b"event: delta"))
+            release_mock.assert_not_awaited()
+            with self.assertLogs("tutor.views_chat_helpers", level="INFO") as logs:
+                # The server stops iterating and closes the response when the client disconnects.
+                await content.aclose()
+                resp.close()
+                for _ in range(3):
+                    await asyncio.sleep(0)
+
+        release_mock.assert_awaited_once()
+        self.assertTrue(release_mock.await_args.args[0])
+        self.assertTrue(any('"event": "stream_aborted"' in line for line in logs.output))
+
+    @patch.dict(
+        "os.environ",
+        {"HELPER_LLM_BACKEND": "ollama", "HELPER_BACKEND_MAX_ATTEMPTS": "2", "HELPER_BACKOFF_SECONDS": "0"},
+        clear=False,
+    )
+    async def test_async_chat_stream_returns_json_error_when_backend_fails_before_first_chunk(self):
+        async def failing_stream(**_kwargs):
+            raise urllib.error.URLError("down")
+            yield
+
+        with patch("tutor.engine.backends.aollama_chat_stream", side_effect=failing_stream) as stream_mock:
+            resp = await self._apost_chat({"message": "stream fail", "stream": True})
+
+        self.assertFalse(resp.streaming)
+        self.assertEqual(resp.status_code, 502)
+        self.assertEqual(resp.json().get("error"), "ollama_error")
+        self.assertEqual(stream_mock.call_count, 2)
@@ -1,16 +1,37 @@
+import json
+import os
+import random
+import string
+import tempfile
+import threading
 import urllib.error
+import urllib.request
+from pathlib import Path
 from types import SimpleNamespace
 from unittest.mock import MagicMock, patch
 
-from django.test import SimpleTestCase
+import httpx
+from asgiref.sync import async_to_sync
+from common import redis_clients
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.test import SimpleTestCase, override_settings
 
 from ..engine import auth
 from ..engine import backends
+from ..engine import circuit
 from ..engine import context_envelope
 from ..engine import execution_config
 from ..engine import heuristics
+from ..engine import http_pool
+from ..engine import memory
+from ..engine import reference
+from ..engine import reset_jobs
+from ..engine import routing
 from ..engine import runtime
 from ..engine import runtime_config
+from ..engine import single_flight
+from ..engine import state_codec
 
 
 class BackendEngineTests(SimpleTestCase):
@@ -86,7 +107,7 @@ class BackendEngineTests(SimpleTestCase):
         self.assertIn("step by step", text.lower())
         self.assertEqual(model, "mock-tutor-v1")
 
-    @patch("tutor.engine.backends.urllib.request.urlopen")
+    @patch("tutor.engine.backends.http_pool.urlopen")
     def test_ollama_chat_parses_response_payload(self, urlopen_mock):
         ctx = MagicMock()
         ctx.__enter__.return_value.read.return_value = (
@@ -107,6 +128,753 @@ class BackendEngineTests(SimpleTestCase):
         self.assertEqual(text, "Try one block at a time.")
         self.assertEqual(model, "llama-test")
 
+    @patch("tutor.engine.backends.http_pool.urlopen")
+    def test_ollama_chat_stream_relays_ndjson_deltas(self, urlopen_mock):
+        ctx = MagicMock()
+        ctx.__enter__.return_value.__iter__.return_value = iter(
+            [
+                b'{"message":{"content":"Try "},"model":"llama-test","done":false}\n',
+                b"\n",
+                b'{"message":{"content":"one block."},"model":"llama-test","done":false}\n',
+                b'{"message":{"content":""},"model":"llama-test","done":true}\n',
+            ]
+        )
+        urlopen_mock.return_value = ctx
+
+        chunks = list(
+            backends.ollama_chat_stream(
+                base_url="http://ollama:11434",
+                model="llama3.2:1b",
+                instructions="Tutor mode",
+                message="How do I move a sprite?",
+                timeout_seconds=30,
+                temperature=0.2,
+                top_p=0.9,
+                num_predict=0,
+            )
+        )
+        self.assertEqual(chunks, [("Try ", "llama-test"), ("one block.", "llama-test")])
+        sent = urlopen_mock.call_args.args[0]
+        self.assertIn(b'"stream": true', sent.data)
+
+    def test_call_backend_stream_with_retries_retries_until_first_chunk(self):
+        sleeps: list[float] = []
+        calls = {"count": 0}
+
+        def invoke_stream_fn(_backend: str, _instructions: str, _message: str):
+            calls["count"] += 1
+            if calls["count"] == 1:
+                raise urllib.error.URLError("temporary")
+            return iter([("Hel", "m1"), ("lo", "m1")])
+
+        chunks, attempts = backends.call_backend_stream_with_retries(
+            "ollama",
+            instructions="system",
+            message="hello",
+            invoke_stream_fn=invoke_stream_fn,
+            max_attempts=2,
+            base_backoff=0.5,
+            sleeper=lambda seconds: sleeps.append(seconds),
+        )
+        self.assertEqual(attempts, 2)
+        self.assertEqual(list(chunks), [("Hel", "m1"), ("lo", "m1")])
+        self.assertEqual(sleeps, [0.5])
+
+    def test_callable_backend_without_stream_fn_relays_single_chunk(self):
+        backend = backends.CallableBackend(chat_fn=lambda instructions, message: ("full answer", "m1"))
+        chunks = list(
+            backends.invoke_backend_stream(
+                "mock",
+                instructions="system",
+                message="hello",
+                registry={"mock": backend},
+            )
+        )
+        self.assertEqual(chunks, [("full answer", "m1")])
+
+    def test_acall_backend_with_retries_awaits_backoff_then_succeeds(self):
+        sleeps: list[float] = []
+        calls = {"count": 0}
+
+        async def ainvoke_backend_fn(_backend: str, _instructions: str, _message: str):
+            calls["count"] += 1
+            if calls["count"] < 3:
+                raise urllib.error.URLError("temporary")
+            return "ok", "model-1"
+
+        async def sleeper(seconds: float) -> None:
+            sleeps.append(seconds)
+
+        text, model, attempts = async_to_sync(backends.acall_backend_with_retries)(
+            "ollama",
+            instructions="system",
+            message="hello",
+            ainvoke_backend_fn=ainvoke_backend_fn,
+            max_attempts=3,
+            base_backoff=0.5,
+            sleeper=sleeper,
+        )
+        self.assertEqual((text, model, attempts), ("ok", "model-1", 3))
+        self.assertEqual(sleeps, [0.5, 1.0])
+
+    def test_ainvoke_backend_runs_sync_only_backend_in_thread(self):
+        registry = {"mock": backends.CallableBackend(chat_fn=lambda instructions, message: (message, "m1"))}
+        text, model = async_to_sync(backends.ainvoke_backend)(
+            "mock",
+            instructions="system",
+            message="hello",
+            registry=registry,
+        )
+        self.assertEqual((text, model), ("hello", "m1"))
+
+    def test_aollama_chat_parses_reply_and_maps_http_errors(self):
+        replies = [
+            httpx.Response(200, json={"message": {"content": "Try one block."}, "model": "llama-test"}),
+            httpx.Response(500, text="boom"),
+        ]
+        transport = httpx.MockTransport(lambda request: replies.pop(0))
+        real_client = httpx.AsyncClient
+
+        def client_factory(**kwargs):
+            return real_client(transport=transport, **kwargs)
+
+        kwargs = {
+            "base_url": "http://ollama:11434",
+            "model": "llama3.2:1b",
+            "instructions": "Tutor mode",
+            "message": "How do I move a sprite?",
+            "timeout_seconds": 30,
+            "temperature": 0.2,
+            "top_p": 0.9,
+            "num_predict": 0,
+        }
+        with patch("httpx.AsyncClient", side_effect=client_factory):
+            self.assertEqual(async_to_sync(backends.aollama_chat)(**kwargs), ("Try one block.", "llama-test"))
+            with self.assertRaises(urllib.error.URLError):
+                async_to_sync(backends.aollama_chat)(**kwargs)
+
+    def test_aollama_chat_stream_relays_ndjson_deltas_and_maps_http_errors(self):
+        body = (
+            b'{"message":{"content":"Try "},"model":"llama-test"}\n\n'
+            b'{"message":{"content":"one block."},"model":"llama-test","done":true}\n'
+        )
+        sent = []
+        replies = [httpx.Response(200, content=body), httpx.Response(500, text="boom")]
+
+        def handler(request):
+            sent.append(request.content)
+            return replies.pop(0)
+
+        transport = httpx.MockTransport(handler)
+        real_client = httpx.AsyncClient
+
+        def client_factory(**kwargs):
+            return real_client(transport=transport, **kwargs)
+
+        async def _collect():
+            stream = backends.aollama_chat_stream(
+                base_url="http://ollama:11434",
+                model="llama3.2:1b",
+                instructions="Tutor mode",
+                message="How do I move a sprite?",
+                timeout_seconds=30,
+                temperature=0.2,
+                top_p=0.9,
+                num_predict=0,
+            )
+            return [chunk async for chunk in stream]
+
+        with patch("httpx.AsyncClient", side_effect=client_factory):
+            self.assertEqual(async_to_sync(_collect)(), [("Try ", "llama-test"), ("one block.", "llama-test")])
+            with self.assertRaises(urllib.error.HTTPError):
+                async_to_sync(_collect)()
+        self.assertIn(b'"stream": true', sent[0])
+
+    def test_acall_backend_stream_with_retries_retries_until_first_chunk(self):
+        sleeps: list[float] = []
+        calls = {"count": 0}
+
+        async def stream(fail: bool):
+            if fail:
+                raise urllib.error.URLError("temporary")
+            yield "Hel", "m1"
+            yield "lo", "m1"
+
+        def ainvoke_stream_fn(_backend: str, _instructions: str, _message: str):
+            calls["count"] += 1
+            return stream(calls["count"] == 1)
+
+        async def sleeper(seconds: float) -> None:
+            sleeps.append(seconds)
+
+        async def _run():
+            chunks, attempts = await backends.acall_backend_stream_with_retries(
+                "ollama",
+                instructions="system",
+                message="hello",
+                ainvoke_stream_fn=ainvoke_stream_fn,
+                max_attempts=2,
+                base_backoff=0.5,
+                sleeper=sleeper,
+            )
+            return [chunk async for chunk in chunks], attempts
+
+        chunks, attempts = async_to_sync(_run)()
+        self.assertEqual(attempts, 2)
+        self.assertEqual(chunks, [("Hel", "m1"), ("lo", "m1")])
+        self.assertEqual(sleeps, [0.5])
+
+    def test_ainvoke_backend_stream_relays_async_completion_without_stream_fn(self):
+        async def achat_fn(_instructions: str, message: str):
+            return message, "m1"
+
+        registry = {"mock": backends.CallableBackend(chat_fn=lambda instructions, message: ("", ""), achat_fn=achat_fn)}
+
+        async def _collect():
+            stream = backends.ainvoke_backend_stream("mock", instructions="system", message="hello", registry=registry)
+            return [chunk async for chunk in stream]
+
+        self.assertEqual(async_to_sync(_collect)(), [("hello", "m1")])
+
+
+class HttpPoolEngineTests(SimpleTestCase):
+    def setUp(self):
+        http_pool.close_all()
+        self.addCleanup(http_pool.close_all)
+
+    def test_client_for_shares_one_client_per_origin(self):
+        first = http_pool.client_for("http://ollama:11434/api/chat")
+        self.assertIs(http_pool.client_for("http://OLLAMA:11434/api/tags"), first)
+        self.assertIsNot(http_pool.client_for("http://classhub_web:8000/internal/events"), first)
+
+    @patch.dict("os.environ", {"HELPER_HTTP_POOL_MAXSIZE": "3", "HELPER_HTTP_POOL_IDLE_SECONDS": "12"}, clear=False)
+    def test_pool_limits_follow_env(self):
+        limits = http_pool.pool_limits()
+        self.assertIsNone(limits.max_connections)
+        self.assertEqual(limits.max_keepalive_connections, 3)
+        self.assertEqual(limits.keepalive_expiry, 12.0)
+
+    def test_urlopen_maps_status_and_transport_errors_to_urllib(self):
+        def handler(request):
+            if request.url.path == "/down":
+                raise httpx.ConnectError("refused", request=request)
+            return httpx.Response(503 if request.url.path == "/busy" else 200, text="ok")
+
+        client = httpx.Client(transport=httpx.MockTransport(handler))
+        with patch.object(http_pool, "client_for", return_value=client):
+            with http_pool.urlopen(urllib.request.Request("http://ollama:11434/ok"), timeout=1) as resp:
+                self.assertEqual((resp.status, resp.read()), (200, b"ok"))
+            with self.assertRaises(urllib.error.HTTPError) as ctx:
+                http_pool.urlopen(urllib.request.Request("http://ollama:11434/busy"), timeout=1)
+            self.assertEqual(ctx.exception.code, 503)
+            with self.assertRaises(urllib.error.URLError):
+                http_pool.urlopen(urllib.request.Request("http://ollama:11434/down"), timeout=1)
+
+
+class ReferenceEngineTests(SimpleTestCase):
+    def test_bm25_prefers_chunks_matching_rarer_terms(self):
+        index = reference.build_reference_index(
+            (
+                "Sprites move when you use motion blocks in a loop.",
+                "Sprites change costumes to animate walking sprites.",
+                "Broadcast messages let sprites coordinate scene changes.",
+            )
+        )
+        self.assertEqual(index.postings["sprites"][1], (1, 2))
+
+        ranked = reference.rank_reference_chunks(index, {"sprites", "broadcast"}, limit=2)
+        self.assertEqual(ranked[0], 2)
+
+    def test_build_reference_citations_keeps_file_order_on_ties_and_falls_back(self):
+        chunks = ("Use a forever loop for motion.", "Another forever loop example here.", "Unrelated text.")
+        tied = reference.build_reference_citations(
+            message="forever", context="", topics=[], reference_chunks=chunks, source_label="s1", max_items=1
+        )
+        self.assertEqual(tied[0]["text"], chunks[0])
+
+        fallback = reference.build_reference_citations(
+            message="zzzz", context="", topics=[], reference_chunks=chunks, source_label="s1", max_items=2
+        )
+        self.assertEqual([row["text"] for row in fallback], list(chunks[:2]))
+
+    def test_load_reference_chunks_reuses_index_until_file_changes(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "lesson.md"
+            path.write_text("Motion blocks move the sprite across the stage.\n", encoding="utf-8")
+            first = reference.load_reference_chunks(str(path), logger=MagicMock())
+            self.assertIs(reference.load_reference_chunks(str(path), logger=MagicMock()), first)
+
+            path.write_text("Costume blocks switch how the sprite looks on stage.\n", encoding="utf-8")
+            os.utime(path, ns=(path.stat().st_atime_ns, path.stat().st_mtime_ns + 1_000_000))
+            second = reference.load_reference_chunks(str(path), logger=MagicMock())
+
+        self.assertIsNot(second, first)
+        self.assertIn("costume", second.postings)
+        self.assertEqual(list(second), ["Costume blocks switch how the sprite looks on stage."])
+
+    def test_load_reference_chunks_prefers_matching_prebuilt_index(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "lesson.md"
+            path.write_text("Motion blocks move the sprite across the stage.\n", encoding="utf-8")
+            artifact = reference.write_reference_index(path)
+            self.assertEqual(artifact.name, "lesson.index.json")
+
+            with patch.object(reference, "chunk_reference_text", side_effect=AssertionError("parsed markdown")):
+                index = reference.load_reference_chunks(str(path), logger=MagicMock())
+            self.assertEqual(list(index), ["Motion blocks move the sprite across the stage."])
+            self.assertEqual(index.postings["sprite"], ((0, 1),))
+
+            path.write_text("Costume blocks switch how the sprite looks on stage.\n", encoding="utf-8")
+            os.utime(path, ns=(path.stat().st_atime_ns, path.stat().st_mtime_ns + 1_000_000))
+            stale = reference.load_reference_chunks(str(path), logger=MagicMock())
+
+        self.assertEqual(list(stale), ["Costume blocks switch how the sprite looks on stage."])
+
+    def test_load_reference_chunks_rebuilds_when_prebuilt_postings_are_invalid(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "lesson.md"
+            path.write_text("Motion blocks move the sprite across the stage.\n", encoding="utf-8")
+            artifact = reference.write_reference_index(path)
+            payload = json.loads(artifact.read_text(encoding="utf-8"))
+            for bad_postings in ([5, 1], [-1, 1], ["zero", 1], [None, 1]):
+                payload["postings"]["sprite"] = bad_postings
+                artifact.write_text(json.dumps(payload), encoding="utf-8")
+                reference.clear_reference_cache()
+
+                index = reference.load_reference_chunks(str(path), logger=MagicMock())
+                self.assertEqual(index.postings["sprite"], ((0, 1),))
+                self.assertEqual(reference.rank_reference_chunks(index, {"sprite"}, limit=1), [0])
+
+    def test_reference_cache_evicts_least_recent_files_over_byte_budget(self):
+        cache = reference.ReferenceCache(max_bytes=120)
+        logger = MagicMock()
+        with tempfile.TemporaryDirectory() as tmp:
+            paths = []
+            for name in ("a", "b", "c"):
+                path = Path(tmp) / f"{name}.md"
+                path.write_text(name * 50, encoding="utf-8")
+                paths.append(path)
+            for path in paths[:2]:
+                cache.get_or_load("text", path, lambda p: p.read_text(encoding="utf-8"), logger=logger)
+            cache.get_or_load("text", paths[0], lambda p: p.read_text(encoding="utf-8"), logger=logger)
+            cache.get_or_load("text", paths[2], lambda p: p.read_text(encoding="utf-8"), logger=logger)
+
+            loader = MagicMock(side_effect=lambda p: p.read_text(encoding="utf-8"))
+            cache.get_or_load("text", paths[0], loader, logger=logger)
+            self.assertFalse(loader.called)
+            cache.get_or_load("text", paths[1], loader, logger=logger)
+            self.assertTrue(loader.called)
+
+        stats = cache.stats()
+        self.assertEqual(stats["hits"], 2)
+        self.assertLessEqual(stats["bytes"], 120)
+        self.assertGreaterEqual(stats["evictions"], 2)
+        self.assertIn("reference_cache_evicted", logger.info.call_args.args[0])
+
+    def test_load_reference_text_reloads_after_edit_and_warmup_loads_directory(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "lesson.md"
+            path.write_text("# Title\nUse motion blocks.\n", encoding="utf-8")
+            self.assertEqual(reference.load_reference_text(str(path), logger=MagicMock()), "Use motion blocks.")
+
+            path.write_text("# Title\nUse costume blocks.\n", encoding="utf-8")
+            os.utime(path, ns=(path.stat().st_atime_ns, path.stat().st_mtime_ns + 1_000_000))
+            self.assertEqual(reference.load_reference_text(str(path), logger=MagicMock()), "Use costume blocks.")
+
+            self.assertEqual(reference.warm_reference_cache(tmp, logger=MagicMock()), 1)
+            self.assertEqual(reference.warm_reference_cache(str(Path(tmp) / "missing"), logger=MagicMock()), 0)
+
+
+class SingleFlightEngineTests(SimpleTestCase):
+    def setUp(self):
+        self.cache = LocMemCache("single-flight-tests", {})
+
+    def test_follower_receives_leader_result_and_next_request_leads_again(self):
+        key = single_flight.flight_key(backend="ollama", model="m", instructions="sys", message="move?")
+        leader = single_flight.begin_flight(cache_backend=self.cache, key=key, lease_seconds=30)
+        follower = single_flight.begin_flight(cache_backend=self.cache, key=key, lease_seconds=30)
+        self.assertTrue(leader.leader)
+        self.assertFalse(follower.leader)
+
+        threading.Timer(0.05, leader.publish, args=({"text": "Use a move block.", "model": "m"},)).start()
+        self.assertEqual(follower.wait(5), {"text": "Use a move block.", "model": "m"})
+        self.assertTrue(single_flight.begin_flight(cache_backend=self.cache, key=key, lease_seconds=30).leader)
+
+    def test_follower_falls_back_when_leader_fails_or_lease_is_gone(self):
+        leader = single_flight.begin_flight(cache_backend=self.cache, key="k1", lease_seconds=30)
+        follower = single_flight.begin_flight(cache_backend=self.cache, key="k1", lease_seconds=30)
+        leader.publish(None)
+        self.assertIsNone(follower.wait(5))
+
+        single_flight.begin_flight(cache_backend=self.cache, key="k2", lease_seconds=30)
+        orphan = single_flight.begin_flight(cache_backend=self.cache, key="k2", lease_seconds=30)
+        self.cache.delete("helper:flight:lock:k2")
+        self.assertIsNone(orphan.wait(5))
+
+
+class ConversationIndexEngineTests(SimpleTestCase):
+    def setUp(self):
+        self.cache = LocMemCache("conversation-index-tests", {})
+
+    def test_fallback_index_orders_by_activity_and_trims_by_age(self):
+        index = memory.conversation_index(self.cache)
+        self.assertIsInstance(index, memory.CacheConversationIndex)
+        index.register(["idx"], "conv-a", ttl_seconds=600, now=1000.0)
+        index.register(["idx"], "conv-b", ttl_seconds=600, now=1100.0)
+        index.register(["idx"], "conv-a", ttl_seconds=600, now=1200.0)
+        self.assertEqual(index.members("idx", max_items=10), ["conv-b", "conv-a"])
+        self.assertEqual(index.members("idx", max_items=1), ["conv-a"])
+
+        index.register(["idx"], "conv-c", ttl_seconds=600, now=1750.0)
+        self.assertEqual(index.members("idx", max_items=10), ["conv-a", "conv-c"])
+
+    def test_clear_class_conversations_covers_legacy_list_index(self):
+        legacy_key = "helper:conversation:student_7_1:noscope:" + "a" * 32
+        self.cache.set("helper:conversation:index:class:7", [legacy_key], timeout=300)
+        self.cache.set(legacy_key, {"summary": "", "turns": []}, timeout=300)
+        current_key = memory.conversation_cache_key(actor_key="student:7:2", scope_fp="noscope", conversation_id="b")
+        memory.save_state(
+            cache_backend=self.cache,
+            key=current_key,
+            turns=[{"role": "student", "content": "hi"}],
+            summary="",
+            ttl_seconds=300,
+            actor_key="student:7:2",
+        )
+
+        snapshot = memory.snapshot_class_conversations(cache_backend=self.cache, class_id=7)
+        self.assertEqual([row["cache_key"] for row in snapshot], [legacy_key, current_key])
+        self.assertEqual(memory.clear_class_conversations(cache_backend=self.cache, class_id=7), 2)
+        self.assertIsNone(self.cache.get(current_key))
+        self.assertIsNone(self.cache.get("helper:conversation:index:class:7"))
+        self.assertEqual(memory.snapshot_class_conversations(cache_backend=self.cache, class_id=7), [])
+
+    @override_settings(
+        CACHES={"default": {"BACKEND": redis_clients.REDIS_CACHE_BACKEND, "LOCATION": "redis://redis:6379/1"}}
+    )
+    def test_conversation_index_uses_shared_client_for_configured_redis_cache(self):
+        index = memory.conversation_index(caches["default"])
+        self.assertIsInstance(index, memory.RedisConversationIndex)
+        self.assertIs(index._client, redis_clients.redis_client("default"))
+
+    def test_redis_index_registers_with_one_pipeline_and_no_reads(self):
+        client = MagicMock()
+        pipe = client.pipeline.return_value
+        index = memory.RedisConversationIndex(client=client, make_key=lambda key: f":1:{key}")
+
+        index.register(["actor-idx", "class-idx"], "conv", ttl_seconds=900, now=5000.0)
+
+        client.pipeline.assert_called_once_with(transaction=False)
+        pipe.zadd.assert_any_call(":1:class-idx", {"conv": 5000.0})
+        pipe.zremrangebyscore.assert_any_call(":1:actor-idx", "-inf", "(4100.0")
+        self.assertEqual(pipe.expire.call_count, 2)
+        pipe.execute.assert_called_once_with()
+        client.get.assert_not_called()
+
+
+class StateCodecEngineTests(SimpleTestCase):
+    def setUp(self):
+        self.cache = LocMemCache("state-codec-tests", {})
+
+    def test_compact_state_round_trips_and_compresses_long_histories(self):
+        turns = [
+            {"role": "student", "content": f"Why does my loop stop at {idx}? ünïcode", "intent": "debug"}
+            if idx % 2 == 0
+            else {"role": "assistant", "content": "Check the loop condition and print the counter. " * 4}
+            for idx in range(20)
+        ]
+        encoded = state_codec.encode_state(summary="Earlier: sprites", turns=turns)
+        self.assertTrue(state_codec.is_compact(encoded))
+        self.assertTrue(encoded[3] & state_codec.FLAG_COMPRESSED)
+        self.assertEqual(state_codec.decode_state(encoded), {"summary": "Earlier: sprites", "turns": turns})
+        self.assertEqual(set(state_codec.INTENTS) - {""}, memory._ALLOWED_INTENTS)
+
+        with self.assertRaises(state_codec.StateDecodeError):
+            state_codec.decode_state(encoded[:-5])
+
+    def test_compact_state_round_trips_lone_surrogates(self):
+        turns = [{"role": "student", "content": "broken \ud800 emoji"}]
+        encoded = state_codec.encode_state(summary="\udfff", turns=turns)
+        self.assertEqual(state_codec.decode_state(encoded), {"summary": "\udfff", "turns": turns})
+
+    def test_load_state_reads_compact_and_legacy_payloads(self):
+        memory.save_state(
+            cache_backend=self.cache,
+            key="conv-new",
+            turns=[{"role": "student", "content": " hi ", "intent": "Concept"}, {"role": "bogus", "content": "x"}],
+            summary="",
+            ttl_seconds=300,
+        )
+        self.assertIsInstance(self.cache.get("conv-new"), bytes)
+        self.cache.set(
+            "conv-old",
+            {"v": 2, "summary": "s", "turns": [{"role": "assistant", "content": "ok", "intent": "nope"}]},
+            timeout=300,
+        )
+        self.cache.set("conv-bad", b"HS\x03\x01garbage", timeout=300)
+
+        self.assertEqual(
+            memory.load_state(cache_backend=self.cache, key="conv-new", max_messages=10),
+            {"summary": "", "turns": [{"role": "student", "content": "hi", "intent": "concept"}]},
+        )
+        self.assertEqual(
+            memory.load_state(cache_backend=self.cache, key="conv-old", max_messages=10),
+            {"summary": "s", "turns": [{"role": "assistant", "content": "ok"}]},
+        )
+        self.assertEqual(
+            memory.load_state(cache_backend=self.cache, key="conv-bad", max_messages=10),
+            {"summary": "", "turns": []},
+        )
+
+
+class CircuitEngineTests(SimpleTestCase):
+    def setUp(self):
+        self.cache = LocMemCache("circuit-tests", {})
+        self.logger = MagicMock()
+        self.policy = circuit.CircuitPolicy(min_failures=2, error_rate=0.5, open_seconds=30, half_open_probes=1)
+
+    def _record(self, *, ok, latency_ms=100, now=1000.0):
+        return circuit.record_outcome(
+            cache_backend=self.cache,
+            name="ollama:m",
+            policy=self.policy,
+            ok=ok,
+            latency_ms=latency_ms,
+            logger=self.logger,
+            now=now,
+        )
+
+    def _check(self, now):
+        return circuit.check_circuit(
+            cache_backend=self.cache, name="ollama:m", policy=self.policy, logger=self.logger, now=now
+        )
+
+    def test_error_rate_opens_then_half_open_probe_closes(self):
+        self.assertIsNone(self._record(ok=True))
+        self.assertIsNone(self._record(ok=False))
+        opened = self._record(ok=False)
+        self.assertEqual(opened["transition"], "opened")
+        self.assertEqual(opened["requests"], 3)
+        self.assertFalse(self._check(1010.0).allowed)
+
+        probe = self._check(1031.0)
+        self.assertEqual((probe.allowed, probe.state, probe.transition), (True, "half_open", "half_open"))
+        self.assertFalse(self._check(1031.5).allowed)
+        self.assertEqual(self._record(ok=True, now=1032.0)["transition"], "closed")
+        self.assertEqual(self._check(1033.0), circuit.CircuitDecision(allowed=True, state="closed"))
+        stats = circuit.window_stats(cache_backend=self.cache, name="ollama:m", policy=self.policy, now=1033.0)
+        self.assertEqual(stats["requests"], 0)
+
+    def test_slow_p95_opens_and_slow_probe_reopens(self):
+        policy = circuit.CircuitPolicy(min_latency_samples=3, p95_latency_ms=8000, open_seconds=30)
+        self.policy = policy
+        for _ in range(2):
+            self.assertIsNone(self._record(ok=True, latency_ms=12000))
+        opened = self._record(ok=True, latency_ms=12000)
+        self.assertEqual(opened["transition"], "opened")
+        self.assertGreaterEqual(opened["p95_ms"], 8000)
+
+        self.assertTrue(self._check(1031.0).allowed)
+        self.assertEqual(self._record(ok=True, latency_ms=9000, now=1040.0)["transition"], "reopened")
+        self.assertFalse(self._check(1041.0).allowed)
+
+    def test_cache_errors_fail_open(self):
+        broken = MagicMock()
+        broken.get.side_effect = RuntimeError("cache down")
+        decision = circuit.check_circuit(cache_backend=broken, name="x", policy=self.policy, logger=self.logger)
+        self.assertTrue(decision.allowed)
+        self.assertIsNone(
+            circuit.record_outcome(
+                cache_backend=broken, name="x", policy=self.policy, ok=False, latency_ms=5, logger=self.logger
+            )
+        )
+
+
+class RoutingEngineTests(SimpleTestCase):
+    def setUp(self):
+        self.a = routing.BackendMember(name="ollama@a", backend="ollama", base_url="http://a:11434")
+        self.b = routing.BackendMember(name="ollama@b", backend="ollama", base_url="http://b:11434")
+        self.remote = routing.BackendMember(name="openai", backend="openai", fallback=True)
+        self.pool = routing.BackendPool([self.a, self.b, self.remote])
+        self.records = []
+
+    def _record(self, member, *, ok, latency_ms):
+        self.records.append((member.name, ok))
+
+    def test_candidates_prefer_least_outstanding_primaries_then_fallback(self):
+        self.pool.begin(self.a)
+        self.assertEqual(self.pool.candidates(), [self.b, self.a, self.remote])
+        self.pool.begin(self.b)
+        self.pool.begin(self.b)
+        self.assertEqual(self.pool.candidates(exclude={"ollama@a"}), [self.b, self.remote])
+
+        latency_pool = routing.BackendPool([self.a, self.b], strategy=routing.LATENCY)
+        latency_pool.end(self.a, started_at=latency_pool.begin(self.a) - 2.0, ok=True)
+        latency_pool.end(self.b, started_at=latency_pool.begin(self.b) - 0.1, ok=True)
+        latency_pool.begin(self.b)
+        self.assertEqual(latency_pool.candidates()[0], self.b)
+
+    def test_failover_retries_next_member_without_sleeping_and_skips_open_circuits(self):
+        calls = []
+        sleeps = []
+
+        def invoke(member, _instructions, _message):
+            calls.append(member.name)
+            if member.backend == "ollama":
+                raise urllib.error.URLError("busy")
+            return "fallback answer", "gpt"
+
+        text, model, attempts = routing.call_with_failover(
+            self.pool,
+            instructions="sys",
+            message="hi",
+            invoke_member_fn=invoke,
+            allow_member_fn=lambda member: member.name != "ollama@b",
+            record_member_fn=self._record,
+            max_attempts=3,
+            base_backoff=0.5,
+            sleeper=sleeps.append,
+        )
+
+        self.assertEqual((text, model, attempts), ("fallback answer", "gpt", 2))
+        self.assertEqual(calls, ["ollama@a", "openai"])
+        self.assertEqual(sleeps, [])
+        self.assertEqual(self.records, [("ollama@a", False), ("openai", True)])
+        self.assertEqual(self.pool.stats()["ollama@a"]["outstanding"], 0)
+
+    def test_failover_backs_off_after_full_pass_and_reports_unavailable_pool(self):
+        pool = routing.BackendPool([self.a, self.b])
+        sleeps = []
+        outcomes = iter([urllib.error.URLError("x"), urllib.error.URLError("y"), ("ok", "m")])
+
+        def invoke(_member, _instructions, _message):
+            outcome = next(outcomes)
+            if isinstance(outcome, Exception):
+                raise outcome
+            return outcome
+
+        result = routing.call_with_failover(
+            pool,
+            instructions="sys",
+            message="hi",
+            invoke_member_fn=invoke,
+            allow_member_fn=lambda _member: True,
+            record_member_fn=self._record,
+            max_attempts=3,
+            base_backoff=0.5,
+            sleeper=sleeps.append,
+        )
+        self.assertEqual(result, ("ok", "m", 3))
+        self.assertEqual(sleeps, [0.5])
+
+        with self.assertRaises(RuntimeError) as exc_info:
+            routing.call_with_failover(
+                pool,
+                instructions="sys",
+                message="hi",
+                invoke_member_fn=invoke,
+                allow_member_fn=lambda _member: False,
+                record_member_fn=self._record,
+                max_attempts=3,
+                base_backoff=0.5,
+                sleeper=sleeps.append,
+            )
+        self.assertEqual(str(exc_info.exception), "backend_pool_unavailable")
+
+    def test_stream_failover_holds_member_until_stream_closes(self):
+        def invoke_stream(member, _instructions, _message):
+            if member.name == "ollama@a":
+                raise urllib.error.URLError("down")
+            return iter([("Hel", "m"), ("lo", "m")])
+
+        pool = routing.BackendPool([self.a, self.b])
+        stream, attempts = routing.call_stream_with_failover(
+            pool,
+            instructions="sys",
+            message="hi",
+            invoke_member_stream_fn=invoke_stream,
+            allow_member_fn=lambda _member: True,
+            record_member_fn=self._record,
+            max_attempts=2,
+            base_backoff=0,
+            sleeper=lambda _seconds: None,
+        )
+        self.assertEqual(attempts, 2)
+        self.assertEqual(pool.stats()["ollama@b"]["outstanding"], 1)
+        self.assertEqual("".join(delta for delta, _ in stream), "Hello")
+        stream.close()
+        self.assertEqual(pool.stats()["ollama@b"]["outstanding"], 0)
+        self.assertEqual(self.records, [("ollama@a", False), ("ollama@b", True)])
+
+    def test_stream_closed_early_releases_member_without_recording_outcome(self):
+        pool = routing.BackendPool([self.a, self.b])
+        stream, _attempts = routing.call_stream_with_failover(
+            pool,
+            instructions="sys",
+            message="hi",
+            invoke_member_stream_fn=lambda _member, _instructions, _message: iter([("Hel", "m"), ("lo", "m")]),
+            allow_member_fn=lambda _member: True,
+            record_member_fn=self._record,
+            max_attempts=1,
+            base_backoff=0,
+            sleeper=lambda _seconds: None,
+        )
+        self.assertEqual(next(stream), ("Hel", "m"))
+        stream.close()
+        stream.close()
+        self.assertEqual(pool.stats()["ollama@a"], {"outstanding": 0, "latency_ms": 0, "calls": 0, "failures": 0})
+        self.assertEqual(self.records, [])
+
+    def _acall_stream(self, pool, *, max_attempts: int = 2):
+        async def member_stream(member):
+            if member.name == "ollama@a":
+                raise urllib.error.URLError("down")
+            yield "Hel", "m"
+            yield "lo", "m"
+
+        async def sleeper(_seconds: float) -> None:
+            return None
+
+        return routing.acall_stream_with_failover(
+            pool,
+            instructions="sys",
+            message="hi",
+            ainvoke_member_stream_fn=lambda member, _instructions, _message: member_stream(member),
+            allow_member_fn=lambda _member: True,
+            record_member_fn=self._record,
+            max_attempts=max_attempts,
+            base_backoff=0,
+            sleeper=sleeper,
+        )
+
+    def test_async_stream_failover_records_member_outcome_when_drained(self):
+        pool = routing.BackendPool([self.a, self.b])
+
+        async def _run():
+            stream, attempts = await self._acall_stream(pool)
+            outstanding = pool.stats()["ollama@b"]["outstanding"]
+            text = "".join([delta async for delta, _ in stream])
+            await stream.aclose()
+            return attempts, outstanding, text
+
+        self.assertEqual(async_to_sync(_run)(), (2, 1, "Hello"))
+        self.assertEqual(pool.stats()["ollama@b"]["outstanding"], 0)
+        self.assertEqual(self.records, [("ollama@a", False), ("ollama@b", True)])
+
+    def test_async_stream_closed_early_releases_member_without_recording_outcome(self):
+        pool = routing.BackendPool([self.b])
+
+        async def _run():
+            stream, _attempts = await self._acall_stream(pool, max_attempts=1)
+            first = await anext(stream)
+            await stream.aclose()
+            await stream.aclose()
+            return first
+
+        self.assertEqual(async_to_sync(_run)(), ("Hel", "m"))
+        self.assertEqual(pool.stats()["ollama@b"], {"outstanding": 0, "latency_ms": 0, "calls": 0, "failures": 0})
+        self.assertEqual(self.records, [])
+
 
 class HeuristicsEngineTests(SimpleTestCase):
     def test_truncate_response_text_limits_output(self):
@@ -118,6 +886,21 @@ class HeuristicsEngineTests(SimpleTestCase):
         self.assertTrue(heuristics.allowed_topic_overlap("sprite motion blocks", ["sprite control", "events"]))
         self.assertFalse(heuristics.allowed_topic_overlap("database joins", ["scratch sprites", "motion blocks"]))
 
+    def test_keyword_checks_reuse_one_message_analysis(self):
+        topics = ["storymode buttons"]
+        heuristics.allowed_topic_overlap("warm topic tokens", topics)
+        text = heuristics.analyze_message("My StoryMode jump BUTTON is not working in Python")
+        self.assertIs(heuristics.analyze_message(text), text)
+        self.assertIn("button", text.tokens)
+
+        with patch.object(heuristics, "_tokens", side_effect=AssertionError("message tokenized again")):
+            self.assertTrue(heuristics.contains_text_language(text, heuristics.DEFAULT_TEXT_LANGUAGE_KEYWORDS))
+            hardware_keywords = heuristics.DEFAULT_PIPER_HARDWARE_KEYWORDS
+            self.assertTrue(heuristics.is_piper_hardware_question(text, keywords=hardware_keywords))
+            self.assertEqual(heuristics.classify_intent(text), "debug")
+            self.assertTrue(heuristics.allowed_topic_overlap(text, topics))
+            self.assertIn("jump input path", heuristics.build_piper_hardware_triage_text(text))
+
     def test_build_piper_hardware_triage_text_includes_guided_steps(self):
         text = heuristics.build_piper_hardware_triage_text("StoryMode jump button is not working")
         lowered = text.lower()
@@ -125,6 +908,74 @@ class HeuristicsEngineTests(SimpleTestCase):
         self.assertIn("do this one check now", lowered)
         self.assertIn("retest only that same input", lowered)
 
+    def test_phrase_matcher_keeps_substring_semantics(self):
+        keywords = ["go", "golang", "c++", "c#", "java", "javascript", "physical controls", ""]
+        matcher = heuristics.phrase_matcher(tuple(keywords))
+        self.assertIs(matcher, heuristics.phrase_matcher(tuple(keywords)))
+        samples = ["I use GoLang", "C# loops", "c+ only", "Physical Controls broke", "algorithm", "", "jav a"]
+        for text in samples:
+            expected = any(keyword and keyword in text.lower() for keyword in keywords)
+            self.assertEqual(matcher.search(text), expected, text)
+        self.assertEqual(heuristics.classify_intent("Can you explain why it is broken?"), "debug")
+        self.assertEqual(heuristics.classify_intent("   "), "general")
+
+    def test_compiled_matchers_agree_with_naive_substring_scan(self):
+        rng = random.Random(11)
+        keywords = sorted({"".join(rng.choices(string.ascii_lowercase, k=rng.randint(3, 8))) for _ in range(120)})
+        keywords += ["not working", "what is", "jump"]
+        matcher = heuristics.phrase_matcher(tuple(keywords))
+        base = "My sprite keeps moving when I press space but the broadcast never changes the costume."
+        messages = [base, base.upper(), "", "   ", "What IS a broadcast?", "the jumper is NOT WORKING"]
+        messages += ["".join(rng.choices(string.ascii_lowercase + " ", k=80)) for _ in range(200)]
+        outcomes = set()
+        for message in messages:
+            lowered = message.lower()
+            expected = any(keyword in lowered for keyword in keywords)
+            self.assertEqual(matcher.search(message), expected, message)
+            outcomes.add(expected)
+        self.assertEqual(outcomes, {True, False})
+
+
+class ResetJobEngineTests(SimpleTestCase):
+    def setUp(self):
+        self.cache = LocMemCache("reset-job-tests", {})
+
+    def test_failed_job_is_recorded_and_frees_the_class(self):
+        def boom(report):
+            report(phase="clear", processed=1, total=4)
+            raise OSError("disk")
+
+        job, created = reset_jobs.start_job(
+            cache_backend=self.cache, class_id=3, run_fn=boom, spawn=lambda target, name: target()
+        )
+        self.assertTrue(created)
+        stored = reset_jobs.get_job(cache_backend=self.cache, job_id=job["job_id"])
+        self.assertEqual((stored["status"], stored["error"], stored["processed"]), ("failed", "OSError", 1))
+
+        again, created = reset_jobs.start_job(
+            cache_backend=self.cache, class_id=3, run_fn=lambda report: {}, spawn=lambda target, name: target()
+        )
+        self.assertTrue(created)
+        self.assertNotEqual(again["job_id"], job["job_id"])
+
+    def test_stale_running_job_is_replaced(self):
+        stuck, _created = reset_jobs.start_job(
+            cache_backend=self.cache, class_id=4, run_fn=lambda report: {}, spawn=lambda target, name: None
+        )
+        attached, created = reset_jobs.start_job(
+            cache_backend=self.cache, class_id=4, run_fn=lambda report: {}, spawn=lambda target, name: None
+        )
+        self.assertFalse(created)
+        self.assertEqual(attached["job_id"], stuck["job_id"])
+
+        with patch("tutor.engine.reset_jobs.time.time", return_value=stuck["updated_at"] + 600):
+            fresh, created = reset_jobs.start_job(
+                cache_backend=self.cache, class_id=4, run_fn=lambda report: {}, spawn=lambda target, name: None
+            )
+        self.assertTrue(created)
+        self.assertNotEqual(fresh["job_id"], stuck["job_id"])
+        self.assertIsNone(reset_jobs.get_job(cache_backend=self.cache, job_id="../etc"))
+
 
 class RuntimeConfigEngineTests(SimpleTestCase):
     def test_resolve_program_profile_defaults_to_secondary(self):
@@ -179,6 +1030,7 @@ class ExecutionConfigEngineTests(SimpleTestCase):
                 "HELPER_REFERENCE_MAX_CITATIONS": 0,  # clamps up to 1
                 "HELPER_MAX_CONCURRENCY": 7,
                 "HELPER_QUEUE_SLOT_TTL_SECONDS": 121,
+                "HELPER_QUEUE_CLASS_MAX_CONCURRENCY": -1,  # clamps up to 0
             }
             return values.get(name, default)
 
@@ -223,6 +1075,7 @@ class ExecutionConfigEngineTests(SimpleTestCase):
         self.assertEqual(cfg.queue_max_wait_seconds, 9.5)
         self.assertEqual(cfg.queue_poll_seconds, 0.3)
         self.assertEqual(cfg.queue_slot_ttl_seconds, 121)
+        self.assertEqual(cfg.queue_class_max_concurrency, 0)
 
     def test_resolve_execution_config_prefers_env_text_keywords(self):
         cfg = execution_config.resolve_execution_config(
@@ -326,6 +1179,31 @@ class RuntimeEngineTests(SimpleTestCase):
         self.assertFalse(runtime.env_bool("B", True, getenv=lambda k, d="": env.get(k, d)))
         self.assertTrue(runtime.env_bool("C", True, getenv=lambda k, d="": env.get(k, d)))
 
+    def test_async_frame_relay_awaits_async_sse_stream_and_closes_it_once(self):
+        closed = []
+
+        async def events():
+            yield "delta", {"text": "Hi"}
+            yield "done", {"text": "Hi"}
+
+        async def on_close() -> None:
+            closed.append(True)
+
+        async def _collect(relay):
+            return [frame async for frame in relay]
+
+        relay = runtime.AsyncFrameRelay(runtime.AsyncSSEStream(events(), on_close=on_close))
+        frames = async_to_sync(_collect)(relay)
+        self.assertEqual(frames[0], b'event: delta\ndata: {"text":"Hi"}\n\n')
+        self.assertEqual(len(frames), 2)
+        relay.close()
+        relay.close()
+        self.assertEqual(closed, [True])
+
+        # Never iterated (the client left before the first frame): close() still runs on_close.
+        runtime.AsyncFrameRelay(runtime.AsyncSSEStream(events(), on_close=on_close)).close()
+        self.assertEqual(closed, [True, True])
+
 
 class AuthEngineTests(SimpleTestCase):
     def test_student_session_exists_respects_require_table_when_missing(self):
@@ -351,6 +1229,65 @@ class AuthEngineTests(SimpleTestCase):
         )
         self.assertFalse(blocked)
 
+    def test_table_exists_remembers_only_present_tables(self):
+        auth.clear_table_cache()
+        self.addCleanup(auth.clear_table_cache)
+        tables = ["other"]
+        cursor = MagicMock()
+        connection = SimpleNamespace(
+            cursor=MagicMock(return_value=cursor),
+            introspection=SimpleNamespace(table_names=lambda _cursor: list(tables)),
+            in_atomic_block=False,
+        )
+        self.assertFalse(auth.table_exists(connection=connection, transaction_module=None, table_name="hub_x"))
+        tables.append("hub_x")
+        self.assertTrue(auth.table_exists(connection=connection, transaction_module=None, table_name="hub_x"))
+        tables.clear()
+        self.assertTrue(auth.table_exists(connection=connection, transaction_module=None, table_name="hub_x"))
+        self.assertEqual(connection.cursor.call_count, 2)
+
+    def test_student_session_confirmation_is_cached_until_class_version_bump(self):
+        cache_backend = LocMemCache("student-session-tests", {})
+        rows = {(7, 3)}
+        queries = []
+
+        class _Cursor:
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *exc):
+                return False
+
+            def execute(self, _sql, params):
+                queries.append(tuple(params))
+                self._row = (1,) if tuple(params) in rows else None
+
+            def fetchone(self):
+                return self._row
+
+        def check(student_id, class_id):
+            return auth.student_session_exists(
+                connection=SimpleNamespace(cursor=_Cursor, in_atomic_block=False),
+                transaction_module=None,
+                settings=SimpleNamespace(HELPER_REQUIRE_CLASSHUB_TABLE=True),
+                student_id=student_id,
+                class_id=class_id,
+                table_exists_fn=lambda _name: True,
+                cache_backend=cache_backend,
+                cache_ttl_seconds=60,
+            )
+
+        self.assertTrue(check(7, 3))
+        self.assertTrue(check(7, 3))
+        self.assertFalse(check(8, 3))
+        self.assertFalse(check(8, 3))
+        self.assertEqual(queries, [(7, 3), (8, 3), (8, 3)])
+
+        rows.clear()
+        cache_backend.set(auth.session_version_key(3), 1)
+        self.assertFalse(check(7, 3))
+        self.assertEqual(queries[-1], (7, 3))
+
     def test_actor_key_blocks_student_when_session_invalid(self):
         request = SimpleNamespace(session={"student_id": 1, "class_id": 2})
         key = auth.actor_key(
@@ -1,19 +1,22 @@
+import json
 import urllib.error
 from types import SimpleNamespace
-from unittest.mock import patch
+from unittest.mock import MagicMock, patch
 
 from django.test import TestCase, override_settings
 
 from tutor import classhub_events
 
+
 class ClassHubEventForwardingTests(TestCase):
     @override_settings(
         CLASSHUB_INTERNAL_EVENTS_URL="http://classhub_web:8000/internal/events/helper-chat-access",
         CLASSHUB_INTERNAL_EVENTS_TOKEN="token-123",
+        CLASSHUB_INTERNAL_EVENTS_FLUSH_MS=0,
         CLASSHUB_INTERNAL_EVENTS_TIMEOUT_SECONDS=0.35,
     )
     def test_emit_helper_chat_access_event_uses_short_default_timeout(self):
-        with patch("tutor.classhub_events.urllib.request.urlopen") as urlopen_mock:
+        with patch("tutor.classhub_events.http_pool.urlopen") as urlopen_mock:
             response = SimpleNamespace(status=200)
             urlopen_mock.return_value.__enter__.return_value = response
             classhub_events.emit_helper_chat_access_event(
@@ -28,10 +31,11 @@ class ClassHubEventForwardingTests(TestCase):
     @override_settings(
         CLASSHUB_INTERNAL_EVENTS_URL="http://classhub_web:8000/internal/events/helper-chat-access",
         CLASSHUB_INTERNAL_EVENTS_TOKEN="token-123",
+        CLASSHUB_INTERNAL_EVENTS_FLUSH_MS=0,
         CLASSHUB_INTERNAL_EVENTS_TIMEOUT_SECONDS=3,
     )
     def test_emit_helper_chat_access_event_posts_to_internal_endpoint(self):
-        with patch("tutor.classhub_events.urllib.request.urlopen") as urlopen_mock:
+        with patch("tutor.classhub_events.http_pool.urlopen") as urlopen_mock:
             response = SimpleNamespace(status=200)
             urlopen_mock.return_value.__enter__.return_value = response
             classhub_events.emit_helper_chat_access_event(
@@ -53,7 +57,7 @@ class ClassHubEventForwardingTests(TestCase):
         CLASSHUB_INTERNAL_EVENTS_TOKEN="",
     )
     def test_emit_helper_chat_access_event_skips_when_config_missing(self):
-        with patch("tutor.classhub_events.urllib.request.urlopen") as urlopen_mock:
+        with patch("tutor.classhub_events.http_pool.urlopen") as urlopen_mock:
             classhub_events.emit_helper_chat_access_event(
                 classroom_id=5,
                 student_id=101,
@@ -65,10 +69,11 @@ class ClassHubEventForwardingTests(TestCase):
     @override_settings(
         CLASSHUB_INTERNAL_EVENTS_URL="http://classhub_web:8000/internal/events/helper-chat-access",
         CLASSHUB_INTERNAL_EVENTS_TOKEN="token-123",
+        CLASSHUB_INTERNAL_EVENTS_FLUSH_MS=0,
     )
     def test_emit_helper_chat_access_event_swallows_http_errors(self):
         with patch(
-            "tutor.classhub_events.urllib.request.urlopen",
+            "tutor.classhub_events.http_pool.urlopen",
             side_effect=urllib.error.HTTPError(
                 url="http://classhub_web:8000/internal/events/helper-chat-access",
                 code=403,
@@ -88,11 +93,12 @@ class ClassHubEventForwardingTests(TestCase):
     @override_settings(
         CLASSHUB_INTERNAL_EVENTS_URL="http://classhub_web:8000/internal/events/helper-chat-access",
         CLASSHUB_INTERNAL_EVENTS_TOKEN="token-123",
+        CLASSHUB_INTERNAL_EVENTS_FLUSH_MS=0,
         CLASSHUB_INTERNAL_EVENTS_TIMEOUT_SECONDS=0.35,
     )
     def test_emit_helper_chat_access_event_logs_request_id_without_payload(self):
         with (
-            patch("tutor.classhub_events.urllib.request.urlopen", side_effect=urllib.error.URLError("down")),
+            patch("tutor.classhub_events.http_pool.urlopen", side_effect=urllib.error.URLError("down")),
             self.assertLogs("tutor.classhub_events", level="WARNING") as logs,
         ):
             classhub_events.emit_helper_chat_access_event(
@@ -113,4 +119,64 @@ class ClassHubEventForwardingTests(TestCase):
         self.assertNotIn("class_code", output)
         self.assertNotIn("my name is Ada", output)
 
+    @override_settings(
+        CLASSHUB_INTERNAL_EVENTS_URL="http://classhub_web:8000/internal/events/helper-chat-access",
+        CLASSHUB_INTERNAL_EVENTS_TOKEN="token-123",
+        CLASSHUB_INTERNAL_EVENTS_BATCH_SIZE=10,
+    )
+    def test_outbox_flushes_buffered_events_as_one_bulk_post(self):
+        outbox = classhub_events.HelperEventOutbox()
+        for index in range(3):
+            outbox.put({"classroom_id": 5, "student_id": 101, "details": {"request_id": f"req-{index}"}})
+
+        with patch("tutor.classhub_events.http_pool.urlopen") as urlopen_mock:
+            urlopen_mock.return_value.__enter__.return_value = SimpleNamespace(status=200)
+            self.assertEqual(outbox.flush(), 3)
+
+        self.assertEqual(urlopen_mock.call_count, 1)
+        req = urlopen_mock.call_args.args[0]
+        self.assertEqual(req.full_url, "http://classhub_web:8000/internal/events/helper-chat-access/bulk")
+        self.assertEqual(len(json.loads(req.data)["events"]), 3)
+        self.assertEqual(outbox.stats()["sent"], 3)
+
+    @override_settings(
+        CLASSHUB_INTERNAL_EVENTS_URL="http://classhub_web:8000/internal/events/helper-chat-access",
+        CLASSHUB_INTERNAL_EVENTS_TOKEN="token-123",
+        CLASSHUB_INTERNAL_EVENTS_BUFFER_MAX=2,
+    )
+    def test_outbox_counts_drops_when_full(self):
+        outbox = classhub_events.HelperEventOutbox()
+        accepted = [outbox.put({"classroom_id": 5, "details": {"request_id": f"req-{i}"}}) for i in range(4)]
+
+        self.assertEqual(accepted, [True, True, False, False])
+        self.assertEqual(outbox.stats()["dropped"], 2)
+        with (
+            patch("tutor.classhub_events.http_pool.urlopen") as urlopen_mock,
+            self.assertLogs("tutor.classhub_events", level="WARNING") as logs,
+        ):
+            urlopen_mock.return_value.__enter__.return_value = SimpleNamespace(status=200)
+            outbox.flush()
+        self.assertIn("helper_chat_event_outbox_dropped count=2", " ".join(logs.output))
+
+    @override_settings(
+        CLASSHUB_INTERNAL_EVENTS_URL="http://classhub_web:8000/internal/events/helper-chat-access",
+        CLASSHUB_INTERNAL_EVENTS_TOKEN="token-123",
+    )
+    def test_outbox_falls_back_to_single_posts_when_bulk_endpoint_is_missing(self):
+        outbox = classhub_events.HelperEventOutbox()
+        outbox.put({"classroom_id": 5, "details": {"request_id": "req-a"}})
+        outbox.put({"classroom_id": 5, "details": {"request_id": "req-b"}})
+        not_found = urllib.error.HTTPError(url="bulk", code=404, msg="not found", hdrs=None, fp=None)
+
+        accepted = MagicMock()
+        accepted.__enter__.return_value = SimpleNamespace(status=200)
+
+        with patch(
+            "tutor.classhub_events.http_pool.urlopen",
+            side_effect=[not_found, accepted, accepted],
+        ) as urlopen_mock:
+            self.assertEqual(outbox.flush(), 2)
 
+        urls = [call.args[0].full_url for call in urlopen_mock.call_args_list]
+        self.assertTrue(urls[0].endswith("/bulk"))
+        self.assertEqual(urls[1:], ["http://classhub_web:8000/internal/events/helper-chat-access"] * 2)
@@ -7,6 +7,7 @@ from unittest.mock import patch
 from django.core.cache import cache
 from django.test import TestCase, override_settings
 
+from tutor.engine import answer_cache as engine_answer_cache
 from tutor.engine import memory as engine_memory
 
 class HelperInternalResetTests(TestCase):
@@ -65,6 +66,26 @@ class HelperInternalResetTests(TestCase):
         self.assertGreaterEqual(int(body.get("deleted_conversations") or 0), 1)
         self.assertIsNone(cache.get(key))
 
+    @override_settings(HELPER_INTERNAL_API_TOKEN="token-123")
+    def test_internal_reset_invalidates_cached_class_answers(self):
+        for class_id in (55, 56):
+            engine_answer_cache.save_answer(
+                cache_backend=cache, class_id=class_id, fingerprint="fp", text="Cached", model="m", ttl_seconds=300
+            )
+
+        resp = self.client.post(
+            "/helper/internal/reset-class-conversations",
+            data=json.dumps({"class_id": 55}),
+            content_type="application/json",
+            HTTP_AUTHORIZATION="Bearer token-123",
+        )
+        self.assertEqual(resp.status_code, 200)
+        self.assertIsNone(engine_answer_cache.load_answer(cache_backend=cache, class_id=55, fingerprint="fp"))
+        self.assertEqual(
+            engine_answer_cache.load_answer(cache_backend=cache, class_id=56, fingerprint="fp"),
+            {"text": "Cached", "model": "m"},
+        )
+
     @override_settings(HELPER_INTERNAL_API_TOKEN="token-123")
     @patch.dict(
         "os.environ",
@@ -110,3 +131,100 @@ class HelperInternalResetTests(TestCase):
                 self.assertTrue(os.path.exists(archive_path))
                 self.assertTrue(Path(archive_path).resolve().is_relative_to(Path(temp_dir).resolve()))
         self.assertIsNone(cache.get(key))
+
+    @override_settings(HELPER_INTERNAL_API_TOKEN="token-123")
+    @patch.dict(
+        "os.environ",
+        {
+            "HELPER_INTERNAL_RESET_EXPORT_BEFORE_DELETE": "1",
+            "HELPER_CLASS_RESET_ARCHIVE_ENABLED": "1",
+            "HELPER_CLASS_RESET_BATCH_SIZE": "2",
+        },
+        clear=False,
+    )
+    def test_internal_reset_archives_and_deletes_in_batches(self):
+        keys = []
+        for student_id in range(5):
+            actor_key = f"student:77:{student_id}"
+            key = engine_memory.conversation_cache_key(actor_key=actor_key, scope_fp="noscope", conversation_id="c")
+            engine_memory.save_state(
+                cache_backend=cache,
+                key=key,
+                turns=[{"role": "student", "content": f"question {student_id}"}],
+                summary="",
+                ttl_seconds=300,
+                actor_key=actor_key,
+            )
+            keys.append(key)
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            with (
+                patch.dict("os.environ", {"HELPER_CLASS_RESET_ARCHIVE_DIR": temp_dir}, clear=False),
+                patch.object(cache, "get_many", wraps=cache.get_many) as get_many_mock,
+                patch.object(cache, "delete_many", wraps=cache.delete_many) as delete_many_mock,
+            ):
+                resp = self.client.post(
+                    "/helper/internal/reset-class-conversations",
+                    data=json.dumps({"class_id": 77, "export_before_reset": True}),
+                    content_type="application/json",
+                    HTTP_AUTHORIZATION="Bearer token-123",
+                )
+                body = resp.json()
+                archive = json.loads(Path(body["archive_path"]).read_text(encoding="utf-8"))
+
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual((body["archived_conversations"], body["deleted_conversations"]), (5, 5))
+        self.assertEqual(archive["conversation_count"], 5)
+        self.assertEqual([row["cache_key"] for row in archive["conversations"]], keys)
+        self.assertEqual(archive["conversations"][0]["turns"][0]["content"], "question 0")
+        self.assertEqual(get_many_mock.call_count, 3)
+        self.assertEqual(delete_many_mock.call_count, 3)
+        self.assertEqual(cache.get_many(keys), {})
+
+    @override_settings(HELPER_INTERNAL_API_TOKEN="token-123")
+    def test_internal_reset_background_job_reports_progress(self):
+        keys = []
+        for student_id in range(3):
+            actor_key = f"student:88:{student_id}"
+            key = engine_memory.conversation_cache_key(actor_key=actor_key, scope_fp="noscope", conversation_id="c")
+            engine_memory.save_state(
+                cache_backend=cache, key=key, turns=[], summary="hi", ttl_seconds=300, actor_key=actor_key
+            )
+            keys.append(key)
+
+        pending = []
+        with patch("tutor.engine.reset_jobs._spawn_thread", side_effect=lambda target, name: pending.append(target)):
+            first = self.client.post(
+                "/helper/internal/reset-class-conversations",
+                data=json.dumps({"class_id": 88, "background": True}),
+                content_type="application/json",
+                HTTP_AUTHORIZATION="Bearer token-123",
+            )
+            second = self.client.post(
+                "/helper/internal/reset-class-conversations",
+                data=json.dumps({"class_id": 88, "background": True}),
+                content_type="application/json",
+                HTTP_AUTHORIZATION="Bearer token-123",
+            )
+        self.assertEqual(first.status_code, 202)
+        job_id = first.json()["job_id"]
+        self.assertEqual((first.json()["status"], first.json()["attached"]), ("queued", False))
+        self.assertEqual((second.json()["job_id"], second.json()["attached"]), (job_id, True))
+        self.assertEqual(len(pending), 1)
+
+        pending[0]()
+        status = self.client.get(
+            f"/helper/internal/reset-class-conversations/jobs/{job_id}",
+            HTTP_AUTHORIZATION="Bearer token-123",
+        )
+        body = status.json()
+        self.assertEqual(status.status_code, 200)
+        self.assertEqual(body["status"], "done")
+        self.assertEqual((body["processed"], body["total"], body["deleted_conversations"]), (3, 3, 3))
+        self.assertEqual(cache.get_many(keys), {})
+
+        missing = self.client.get(
+            f"/helper/internal/reset-class-conversations/jobs/{'0' * 32}",
+            HTTP_AUTHORIZATION="Bearer token-123",
+        )
+        self.assertEqual(missing.status_code, 404)
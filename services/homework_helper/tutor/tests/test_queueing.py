@@ -0,0 +1,227 @@
+import threading
+import time
+from unittest import skipUnless
+
+from asgiref.sync import async_to_sync
+from common import redis_clients
+from django.test import SimpleTestCase, override_settings
+
+from .. import queueing
+
+try:
+    import fakeredis
+    import lupa  # noqa: F401  (fakeredis needs it for EVALSHA)
+except ImportError:  # pragma: no cover - optional test dependency
+    fakeredis = None
+
+
+class AdmissionQueueTests(SimpleTestCase):
+    def setUp(self):
+        self.queue = queueing.LocalAdmissionQueue()
+
+    def _acquire(self, class_key="class:1", *, max_active=1, max_wait=0.0, class_quota=0):
+        return self.queue.acquire(max_active, max_wait, 0.05, 30, class_key=class_key, class_quota=class_quota)
+
+    def _wait_for_waiters(self, count: int):
+        deadline = time.monotonic() + 2
+        while len(self.queue._waiting) < count and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(len(self.queue._waiting), count)
+
+    def test_release_hands_slot_to_waiters_in_arrival_order(self):
+        holder = self._acquire()
+        self.assertIsNotNone(holder.slot_key)
+
+        granted: list[str] = []
+        lock = threading.Lock()
+
+        def _wait(name: str):
+            grant = self._acquire(max_wait=5.0)
+            with lock:
+                granted.append(name)
+            self.queue.release(grant.slot_key)
+
+        threads = []
+        for index, name in enumerate(["first", "second", "third"]):
+            thread = threading.Thread(target=_wait, args=(name,))
+            thread.start()
+            threads.append(thread)
+            self._wait_for_waiters(index + 1)
+
+        self.queue.release(holder.slot_key)
+        for thread in threads:
+            thread.join(timeout=5)
+        self.assertEqual(granted, ["first", "second", "third"])
+
+    def test_timeout_reports_position_and_eta(self):
+        holder = self._acquire()
+        time.sleep(0.02)
+        self.queue.release(holder.slot_key)
+        holder = self._acquire()
+
+        grant = self._acquire(max_wait=0.05)
+
+        self.assertIsNone(grant.slot_key)
+        self.assertEqual(grant.reason, "busy")
+        self.assertEqual(grant.queue_position, 0)
+        self.assertGreaterEqual(grant.eta_seconds, 1)
+        self.assertEqual(self.queue._waiting, {})
+        self.queue.release(holder.slot_key)
+
+    def test_class_quota_lets_other_classes_pass(self):
+        first = self._acquire("class:1", max_active=3, class_quota=1)
+        self.assertIsNotNone(first.slot_key)
+
+        blocked = self._acquire("class:1", max_active=3, class_quota=1)
+        self.assertIsNone(blocked.slot_key)
+        self.assertEqual(blocked.reason, "class_quota")
+
+        other = self._acquire("class:2", max_active=3, class_quota=1)
+        self.assertIsNotNone(other.slot_key)
+
+    def test_async_acquire_is_woken_by_release(self):
+        holder = self._acquire()
+        timer = threading.Timer(0.05, self.queue.release, args=(holder.slot_key,))
+        timer.start()
+
+        grant = async_to_sync(self.queue.aacquire)(1, 5.0, 2.0, 30, class_key="class:1", class_quota=0)
+
+        timer.join()
+        self.assertIsNotNone(grant.slot_key)
+
+    def test_purged_waiters_drop_their_wakeup(self):
+        holder = self._acquire()
+        # A waiter that vanished without abandoning its ticket.
+        self.queue._waiting["class:9|ghost"] = 0.0
+        self.queue._wakeups["class:9|ghost"] = threading.Event()
+
+        self.queue.release(holder.slot_key)
+
+        self.assertEqual(self.queue._waiting, {})
+        self.assertEqual(self.queue._wakeups, {})
+
+
+@skipUnless(fakeredis, "fakeredis[lua] is not installed")
+class RedisAdmissionQueueTests(SimpleTestCase):
+    """Runs the Lua pump script against fakeredis."""
+
+    def setUp(self):
+        server = fakeredis.FakeServer()
+        self.redis = fakeredis.FakeRedis(server=server)
+        self.queue = queueing.RedisAdmissionQueue(
+            client=self.redis,
+            make_key=lambda key: f"site:1:{key}",
+            async_client_fn=lambda: fakeredis.FakeAsyncRedis(server=server),
+        )
+
+    def _acquire(self, class_key="class:1", *, max_active=1, max_wait=0.0, class_quota=0):
+        return self.queue.acquire(max_active, max_wait, 0.05, 30, class_key=class_key, class_quota=class_quota)
+
+    def _waiting(self) -> list[str]:
+        return [member.decode() for member in self.redis.zrange("site:1:helper:queue:waiting", 0, -1)]
+
+    def _wait_for_waiters(self, count: int):
+        deadline = time.monotonic() + 2
+        while len(self._waiting()) < count and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(len(self._waiting()), count)
+
+    def test_grant_busy_timeout_and_class_quota(self):
+        holder = self._acquire(max_active=2, class_quota=1)
+        self.assertEqual(holder.slot_key, f"class:1|{holder.token}")
+        self.assertIsNotNone(self.redis.zscore("site:1:helper:queue:active", holder.slot_key))
+
+        blocked = self._acquire(max_active=2, max_wait=0.05, class_quota=1)
+        self.assertIsNone(blocked.slot_key)
+        self.assertEqual((blocked.reason, blocked.queue_position), ("class_quota", 0))
+
+        other = self._acquire("class:2", max_active=2, class_quota=1)
+        self.assertIsNotNone(other.slot_key)
+        busy = self._acquire("class:3", max_active=2, max_wait=0.05, class_quota=1)
+        self.assertEqual((busy.slot_key, busy.reason), (None, "busy"))
+        self.assertEqual(self._waiting(), [])
+        self.assertTrue(all(key.startswith(b"site:1:helper:queue:") for key in self.redis.keys("*")))
+
+    def test_release_hands_slot_to_waiters_in_arrival_order(self):
+        holder = self._acquire()
+        granted: list[str] = []
+        lock = threading.Lock()
+
+        def _wait(name: str):
+            grant = self._acquire(max_wait=5.0)
+            with lock:
+                granted.append(name)
+            self.queue.release(grant.slot_key)
+
+        threads = []
+        for index, name in enumerate(["first", "second"]):
+            thread = threading.Thread(target=_wait, args=(name,))
+            thread.start()
+            threads.append(thread)
+            self._wait_for_waiters(index + 1)
+
+        self.queue.release(holder.slot_key)
+        for thread in threads:
+            thread.join(timeout=5)
+        self.assertEqual(granted, ["first", "second"])
+        self.assertEqual(self.redis.zcard("site:1:helper:queue:active"), 0)
+        self.assertGreater(float(self.redis.hget("site:1:helper:queue:stats", "avg_hold_ms")), 0)
+        self.assertEqual(self.redis.keys("site:1:helper:queue:wake:*"), [])
+
+    def test_stale_tickets_and_expired_leases_are_pruned(self):
+        holder = self._acquire()
+        # Lease ran out without a release (crashed worker).
+        self.redis.zadd("site:1:helper:queue:active", {holder.slot_key: 0})
+        # A waiter that vanished without abandoning its ticket, ahead of everyone else.
+        self.redis.zadd("site:1:helper:queue:waiting", {"class:9|ghost": 0})
+        self.redis.zadd("site:1:helper:queue:waiting_deadlines", {"class:9|ghost": 0})
+
+        grant = self._acquire()
+
+        self.assertIsNotNone(grant.slot_key)
+        self.assertEqual(self._waiting(), [])
+        self.assertIsNone(self.redis.hget("site:1:helper:queue:granted_at", holder.slot_key))
+
+    def test_zero_poll_interval_still_times_out(self):
+        holder = self._acquire()
+        grants = []
+        # A 0 s BLPOP timeout would block forever.
+        thread = threading.Thread(
+            target=lambda: grants.append(self.queue.acquire(1, 0.1, 0, 30, class_key="class:1", class_quota=0)),
+            daemon=True,
+        )
+        thread.start()
+        thread.join(timeout=3)
+
+        self.assertFalse(thread.is_alive())
+        self.assertEqual(grants[0].reason, "busy")
+        self.queue.release(holder.slot_key)
+
+    def test_async_acquire_and_release_use_wake_list(self):
+        holder = self._acquire()
+        timer = threading.Timer(0.05, self.queue.release, args=(holder.slot_key,))
+        timer.start()
+
+        grant = async_to_sync(self.queue.aacquire)(1, 5.0, 2.0, 30, class_key="class:1", class_quota=0)
+        timer.join()
+
+        self.assertIsNotNone(grant.slot_key)
+        async_to_sync(self.queue.arelease)(grant.slot_key)
+        self.assertEqual(self.redis.zcard("site:1:helper:queue:active"), 0)
+
+
+class RedisClientTests(SimpleTestCase):
+    @override_settings(
+        CACHES={"default": {"BACKEND": redis_clients.REDIS_CACHE_BACKEND, "LOCATION": "redis://redis:6379/1"}}
+    )
+    def test_async_client_is_reused_within_one_event_loop(self):
+        async def _clients():
+            return redis_clients.async_redis_client(), redis_clients.async_redis_client()
+
+        first, second = async_to_sync(_clients)()
+        self.assertIs(first, second)
+        self.assertIs(redis_clients.redis_client(), redis_clients.redis_client())
+
+    def test_non_redis_cache_has_no_client(self):
+        self.assertEqual(redis_clients.redis_url("default"), "")
+        self.assertIsNone(redis_clients.redis_client())
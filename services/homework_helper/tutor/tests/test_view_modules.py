@@ -45,13 +45,13 @@ class HelperChatRequestModuleTests(TestCase):
         self.assertEqual(classroom_id, 0)
         self.assertEqual(student_id, 202)
 
-    def test_enforce_rate_limits_blocks_actor_before_ip_check(self):
+    def test_enforce_rate_limits_reports_actor_limit_before_ip_limit(self):
         calls = []
         events = []
 
-        def fixed_window_allow_fn(key, **kwargs):
-            calls.append((key, kwargs))
-            return False
+        def allow_many_fn(limits, **kwargs):
+            calls.append(([limit.key for limit in limits], kwargs))
+            return [False, False]
 
         def log_chat_event_fn(level, event, **fields):
             events.append((level, event, fields))
@@ -66,24 +66,23 @@ class HelperChatRequestModuleTests(TestCase):
             request_id="req-1",
             actor_limit=30,
             ip_limit=90,
-            fixed_window_allow_fn=fixed_window_allow_fn,
+            allow_many_fn=allow_many_fn,
             cache_backend=object(),
             log_chat_event_fn=log_chat_event_fn,
             json_response_fn=json_response_fn,
         )
 
         self.assertEqual(len(calls), 1)
-        self.assertTrue(calls[0][0].startswith("rl:actor:"))
+        self.assertTrue(calls[0][0][0].startswith("rl:actor:"))
         self.assertEqual(response["status"], 429)
         self.assertEqual(response["payload"], {"error": "rate_limited"})
         self.assertEqual(events[0][1], "rate_limited_actor")
 
     def test_enforce_rate_limits_blocks_ip_after_actor_passes(self):
-        call_results = iter([True, False])
         events = []
 
-        def fixed_window_allow_fn(*_args, **_kwargs):
-            return next(call_results)
+        def allow_many_fn(*_args, **_kwargs):
+            return [True, False]
 
         def log_chat_event_fn(level, event, **fields):
             events.append((level, event, fields))
@@ -98,7 +97,7 @@ class HelperChatRequestModuleTests(TestCase):
             request_id="req-2",
             actor_limit=30,
             ip_limit=90,
-            fixed_window_allow_fn=fixed_window_allow_fn,
+            allow_many_fn=allow_many_fn,
             cache_backend=object(),
             log_chat_event_fn=log_chat_event_fn,
             json_response_fn=json_response_fn,
@@ -115,13 +114,40 @@ class HelperChatRequestModuleTests(TestCase):
             request_id="req-3",
             actor_limit=30,
             ip_limit=90,
-            fixed_window_allow_fn=lambda *_args, **_kwargs: True,
+            allow_many_fn=lambda *_args, **_kwargs: [True, True],
             cache_backend=object(),
             log_chat_event_fn=lambda *_args, **_kwargs: None,
             json_response_fn=lambda *_args, **_kwargs: None,
         )
         self.assertIsNone(response)
 
+    def test_enforce_rate_limits_checks_actor_and_ip_in_one_batch(self):
+        batches = []
+        events = []
+
+        def allow_many_fn(limits, **kwargs):
+            batches.append(([limit.key for limit in limits], kwargs))
+            return [True, False]
+
+        response = views_chat_request.enforce_rate_limits(
+            actor="student:101:5",
+            actor_type="student",
+            client_ip="203.0.113.9",
+            request_id="req-4",
+            actor_limit=30,
+            ip_limit=90,
+            allow_many_fn=allow_many_fn,
+            cache_backend="cache",
+            log_chat_event_fn=lambda level, event, **fields: events.append(event),
+            json_response_fn=lambda payload, *, status, request_id: {"status": status},
+        )
+
+        self.assertEqual(len(batches), 1)
+        self.assertEqual(batches[0][0], ["rl:actor:student:101:5:m", "rl:ip:203.0.113.9:m"])
+        self.assertEqual(batches[0][1], {"cache_backend": "cache", "request_id": "req-4"})
+        self.assertEqual(response["status"], 429)
+        self.assertEqual(events, ["rate_limited_ip"])
+
     def test_parse_chat_payload_rejects_bad_json(self):
         events = []
 
@@ -178,46 +204,63 @@ class HelperChatRequestModuleTests(TestCase):
 
 
 class HelperChatRuntimeModuleTests(TestCase):
-    def test_backend_circuit_is_open_delegates_to_engine_module(self):
+    @patch.dict("os.environ", {"OLLAMA_MODEL": "llama3.2:1b"}, clear=False)
+    def test_check_backend_circuit_delegates_per_backend_model(self):
         cache_backend = object()
         logger_obj = object()
+        policy = object()
         with patch(
-            "tutor.views_chat_runtime.engine_circuit.backend_circuit_is_open",
-            return_value=True,
-        ) as backend_circuit_is_open_mock:
-            result = views_chat_runtime.backend_circuit_is_open(
+            "tutor.views_chat_runtime.engine_circuit.check_circuit",
+            return_value="decision",
+        ) as check_circuit_mock:
+            result = views_chat_runtime.check_backend_circuit(
                 cache_backend=cache_backend,
                 backend="ollama",
+                policy=policy,
                 logger=logger_obj,
             )
 
-        self.assertTrue(result)
-        backend_circuit_is_open_mock.assert_called_once_with(
+        self.assertEqual(result, "decision")
+        check_circuit_mock.assert_called_once_with(
             cache_backend=cache_backend,
-            backend="ollama",
+            name="ollama:llama3.2:1b",
+            policy=policy,
             logger=logger_obj,
         )
 
-    def test_record_backend_failure_delegates_to_engine_module(self):
+    def test_record_backend_outcome_delegates_to_engine_module(self):
         cache_backend = object()
         logger_obj = object()
-        with patch("tutor.views_chat_runtime.engine_circuit.record_backend_failure") as record_backend_failure_mock:
-            views_chat_runtime.record_backend_failure(
+        policy = object()
+        with patch("tutor.views_chat_runtime.engine_circuit.record_outcome") as record_outcome_mock:
+            views_chat_runtime.record_backend_outcome(
                 cache_backend=cache_backend,
-                backend="ollama",
-                threshold=5,
-                ttl=30,
+                backend="mock",
+                policy=policy,
+                ok=False,
+                latency_ms=1200,
                 logger=logger_obj,
             )
 
-        record_backend_failure_mock.assert_called_once_with(
+        record_outcome_mock.assert_called_once_with(
             cache_backend=cache_backend,
-            backend="ollama",
-            threshold=5,
-            ttl=30,
+            name="mock",
+            policy=policy,
+            ok=False,
+            latency_ms=1200,
             logger=logger_obj,
         )
 
+    def test_circuit_policy_reads_env_knobs(self):
+        env = {"HELPER_CIRCUIT_BREAKER_P95_MS": 9000, "HELPER_CIRCUIT_BREAKER_HALF_OPEN_PROBES": 2}
+        policy = views_chat_runtime.circuit_policy(
+            env_int=lambda name, default: env.get(name, default),
+            env_float=lambda name, default: default,
+        )
+        self.assertEqual(policy.p95_latency_ms, 9000)
+        self.assertEqual(policy.half_open_probes, 2)
+        self.assertEqual(policy.open_seconds, 30)
+
     @patch.dict(
         "os.environ",
         {
@@ -287,6 +330,54 @@ class HelperChatRuntimeModuleTests(TestCase):
             },
         )
 
+    @patch.dict(
+        "os.environ",
+        {
+            "OLLAMA_BASE_URLS": "http://gpu-a:11434, http://gpu-b:11434",
+            "HELPER_BACKEND_FALLBACKS": "openai",
+            "HELPER_BACKEND_BALANCE": "latency",
+        },
+        clear=False,
+    )
+    def test_backend_pool_builds_ollama_members_with_fallback(self):
+        pool = views_chat_runtime.backend_pool("ollama", remote_acknowledged=True)
+
+        self.assertEqual(pool.strategy, "latency")
+        self.assertEqual(
+            [(member.name, member.base_url, member.fallback) for member in pool.members],
+            [
+                ("ollama@http://gpu-a:11434", "http://gpu-a:11434", False),
+                ("ollama@http://gpu-b:11434", "http://gpu-b:11434", False),
+                ("openai", "", True),
+            ],
+        )
+        self.assertIs(views_chat_runtime.backend_pool("ollama", remote_acknowledged=True), pool)
+        unacknowledged = views_chat_runtime.backend_pool("ollama", remote_acknowledged=False)
+        self.assertEqual([member.name for member in unacknowledged.members if member.fallback], [])
+        self.assertTrue(views_chat_runtime.member_circuit_name(pool.members[1]).endswith("@gpu-b:11434"))
+
+        captured = {}
+
+        def ollama_chat_fn(base_url, model, instructions, message):
+            captured["base_url"] = base_url
+            return "answer", model
+
+        views_chat_runtime.invoke_backend(
+            backend="ollama",
+            instructions="system",
+            message="question",
+            ollama_chat_fn=ollama_chat_fn,
+            openai_chat_fn=lambda *_args: ("nope", "nope"),
+            mock_chat_fn=lambda: ("nope", "nope"),
+            ollama_base_url=pool.members[1].base_url,
+        )
+        self.assertEqual(captured["base_url"], "http://gpu-b:11434")
+
+    @patch.dict("os.environ", {"OLLAMA_BASE_URLS": "", "HELPER_BACKEND_FALLBACKS": ""}, clear=False)
+    def test_backend_pool_is_none_for_single_endpoint(self):
+        self.assertIsNone(views_chat_runtime.backend_pool("ollama", remote_acknowledged=False))
+        self.assertIsNone(views_chat_runtime.backend_pool("mock", remote_acknowledged=False))
+
     def test_invoke_backend_uses_mock_registry_entry(self):
         text, model = views_chat_runtime.invoke_backend(
             backend="mock",
@@ -1,8 +1,11 @@
+import asyncio
 import logging
 import os
 import time
-from functools import lru_cache
+from collections.abc import Callable
+from dataclasses import dataclass
 
+from asgiref.sync import sync_to_async
 from django.conf import settings
 from django.core.cache import cache
 from django.core.signing import BadSignature, SignatureExpired
@@ -12,7 +15,7 @@ from common.helper_scope import parse_scope_token
 from common.request_safety import (
     build_staff_or_student_actor_key,
     client_ip_from_request,
-    fixed_window_allow,
+    prelimit_allow_many,
 )
 from django.db import connection, transaction
 
@@ -20,9 +23,10 @@ from .classhub_events import emit_helper_chat_access_event
 from .engine import auth as engine_auth  # re-exported patch surface in tests
 from .engine import service as engine_service
 from .policy import build_instructions
-from .queueing import acquire_slot, release_slot
-from .views_chat_deps import DEFAULT_TEXT_LANGUAGE_KEYWORDS, build_chat_deps
+from .queueing import aacquire_slot, acquire_slot, arelease_slot, release_slot
+from .views_chat_deps import DEFAULT_TEXT_LANGUAGE_KEYWORDS, build_async_chat_deps, build_chat_deps
 from .views_chat_helpers import (
+    _async_stream_response,
     _build_follow_up_suggestions,
     _build_helper_event_details,
     _build_piper_hardware_triage_text,
@@ -37,6 +41,7 @@ from .views_chat_helpers import (
     _is_piper_context,
     _is_piper_hardware_question,
     _json_response,
+    _load_cached_answer,
     _load_conversation_state,
     _load_reference_chunks,
     _load_reference_text,
@@ -44,8 +49,11 @@ from .views_chat_helpers import (
     _normalize_conversation_id,
     _redact,
     _request_id,
+    _save_cached_answer,
     _save_conversation_state,
+    _stream_response,
     _truncate_response_text,
+    _wants_stream,
 )
 from .views_chat_request import (
     enforce_rate_limits,
@@ -54,55 +62,95 @@ from .views_chat_request import (
     resolve_actor_and_client,
 )
 from .views_chat_runtime import (
+    acall_backend_stream_with_retries as runtime_acall_backend_stream_with_retries,
+    acall_backend_with_retries as runtime_acall_backend_with_retries,
+    acall_pool_stream_with_failover as runtime_acall_pool_stream_with_failover,
+    acall_pool_with_failover as runtime_acall_pool_with_failover,
     actor_key as runtime_actor_key,
-    backend_circuit_is_open as runtime_backend_circuit_is_open,
+    ainvoke_backend as runtime_ainvoke_backend,
+    ainvoke_backend_stream as runtime_ainvoke_backend_stream,
+    amock_chat as runtime_amock_chat,
+    amock_chat_stream as runtime_amock_chat_stream,
+    aollama_chat as runtime_aollama_chat,
+    aollama_chat_stream as runtime_aollama_chat_stream,
+    aopenai_chat as runtime_aopenai_chat,
+    aopenai_chat_stream as runtime_aopenai_chat_stream,
+    backend_pool as runtime_backend_pool,
+    begin_flight as runtime_begin_flight,
+    call_backend_stream_with_retries as runtime_call_backend_stream_with_retries,
     call_backend_with_retries as runtime_call_backend_with_retries,
+    call_pool_stream_with_failover as runtime_call_pool_stream_with_failover,
+    call_pool_with_failover as runtime_call_pool_with_failover,
+    check_backend_circuit as runtime_check_backend_circuit,
+    check_member_circuit as runtime_check_member_circuit,
+    circuit_policy as runtime_circuit_policy,
     invoke_backend as runtime_invoke_backend,
+    invoke_backend_stream as runtime_invoke_backend_stream,
     load_scope_from_token as runtime_load_scope_from_token,
     mock_chat as runtime_mock_chat,
+    mock_chat_stream as runtime_mock_chat_stream,
     ollama_chat as runtime_ollama_chat,
+    ollama_chat_stream as runtime_ollama_chat_stream,
     openai_chat as runtime_openai_chat,
-    record_backend_failure as runtime_record_backend_failure,
-    reset_backend_failure_state as runtime_reset_backend_failure_state,
+    openai_chat_stream as runtime_openai_chat_stream,
+    record_backend_outcome as runtime_record_backend_outcome,
+    record_member_outcome as runtime_record_member_outcome,
     student_session_exists as runtime_student_session_exists,
     table_exists as runtime_table_exists,
 )
-from .views_reset import reset_class_conversations
+from .views_reset import reset_class_conversations, reset_class_conversations_job
 
 logger = logging.getLogger(__name__)
 
 
-def _backend_circuit_is_open(backend: str) -> bool:
-    return runtime_backend_circuit_is_open(
+def _circuit_policy():
+    return runtime_circuit_policy(env_int=_env_int, env_float=_env_float)
+
+
+def _check_backend_circuit(backend: str):
+    return runtime_check_backend_circuit(
         cache_backend=cache,
         backend=backend,
+        policy=_circuit_policy(),
         logger=logger,
     )
 
 
-def _record_backend_failure(backend: str) -> None:
-    threshold = max(_env_int("HELPER_CIRCUIT_BREAKER_FAILURES", 5), 1)
-    ttl = max(_env_int("HELPER_CIRCUIT_BREAKER_TTL_SECONDS", 30), 1)
-    runtime_record_backend_failure(
+def _record_backend_outcome(backend: str, *, ok: bool, latency_ms: int | None = None):
+    return runtime_record_backend_outcome(
         cache_backend=cache,
         backend=backend,
-        threshold=threshold,
-        ttl=ttl,
+        policy=_circuit_policy(),
+        ok=ok,
+        latency_ms=latency_ms,
         logger=logger,
     )
 
 
-def _reset_backend_failure_state(backend: str) -> None:
-    runtime_reset_backend_failure_state(
+def _backend_pool(backend: str):
+    return runtime_backend_pool(
+        backend,
+        remote_acknowledged=bool(getattr(settings, "HELPER_REMOTE_MODE_ACKNOWLEDGED", False)),
+    )
+
+
+def _check_member_circuit(member) -> bool:
+    return runtime_check_member_circuit(cache_backend=cache, member=member, policy=_circuit_policy(), logger=logger)
+
+
+def _record_member_outcome(member, *, ok: bool, latency_ms: int | None = None) -> None:
+    runtime_record_member_outcome(
         cache_backend=cache,
-        backend=backend,
+        member=member,
+        policy=_circuit_policy(),
+        ok=ok,
+        latency_ms=latency_ms,
         logger=logger,
     )
 
 
-@lru_cache(maxsize=32)
 def _table_exists(table_name: str) -> bool:
-    """Best-effort table existence check without raising for missing tables."""
+    """Best-effort table existence check; the engine remembers tables once seen."""
     return runtime_table_exists(
         connection=connection,
         transaction_module=transaction,
@@ -119,6 +167,8 @@ def _student_session_exists(student_id: int, class_id: int) -> bool:
         student_id=student_id,
         class_id=class_id,
         table_exists_fn=_table_exists,
+        cache_backend=cache,
+        cache_ttl_seconds=max(_env_int("HELPER_STUDENT_SESSION_CACHE_SECONDS", 60), 0),
     )
 
 
@@ -169,7 +219,34 @@ def _mock_chat() -> tuple[str, str]:
     return runtime_mock_chat(text=os.getenv("HELPER_MOCK_RESPONSE_TEXT", ""))
 
 
-def _invoke_backend(backend: str, instructions: str, message: str) -> tuple[str, str]:
+def _ollama_chat_stream(base_url: str, model: str, instructions: str, message: str):
+    return runtime_ollama_chat_stream(
+        base_url=base_url,
+        model=model,
+        instructions=instructions,
+        message=message,
+        timeout_seconds=_env_int("OLLAMA_TIMEOUT_SECONDS", 30),
+        temperature=float(os.getenv("OLLAMA_TEMPERATURE", "0.2")),
+        top_p=float(os.getenv("OLLAMA_TOP_P", "0.9")),
+        num_predict=_env_int("OLLAMA_NUM_PREDICT", 0),
+    )
+
+
+def _openai_chat_stream(model: str, instructions: str, message: str):
+    return runtime_openai_chat_stream(
+        api_key=os.environ.get("OPENAI_API_KEY"),
+        model=model,
+        instructions=instructions,
+        message=message,
+        max_output_tokens=_env_int("OPENAI_MAX_OUTPUT_TOKENS", 0),
+    )
+
+
+def _mock_chat_stream():
+    return runtime_mock_chat_stream(text=os.getenv("HELPER_MOCK_RESPONSE_TEXT", ""))
+
+
+def _invoke_backend(backend: str, instructions: str, message: str, *, base_url: str = "") -> tuple[str, str]:
     return runtime_invoke_backend(
         backend=backend,
         instructions=instructions,
@@ -177,10 +254,26 @@ def _invoke_backend(backend: str, instructions: str, message: str) -> tuple[str,
         ollama_chat_fn=_ollama_chat,
         openai_chat_fn=_openai_chat,
         mock_chat_fn=_mock_chat,
+        ollama_base_url=base_url,
     )
 
 
 def _call_backend_with_retries(backend: str, instructions: str, message: str) -> tuple[str, str, int]:
+    pool = _backend_pool(backend)
+    if pool is not None:
+        return runtime_call_pool_with_failover(
+            pool=pool,
+            instructions=instructions,
+            message=message,
+            invoke_member_fn=lambda member, system_instructions, user_message: _invoke_backend(
+                member.backend, system_instructions, user_message, base_url=member.base_url
+            ),
+            allow_member_fn=_check_member_circuit,
+            record_member_fn=_record_member_outcome,
+            max_attempts=max(_env_int("HELPER_BACKEND_MAX_ATTEMPTS", 2), 1),
+            base_backoff=max(_env_float("HELPER_BACKOFF_SECONDS", 0.4), 0.0),
+            sleeper=time.sleep,
+        )
     return runtime_call_backend_with_retries(
         backend=backend,
         instructions=instructions,
@@ -196,32 +289,233 @@ def _call_backend_with_retries(backend: str, instructions: str, message: str) ->
     )
 
 
+def _invoke_backend_stream(backend: str, instructions: str, message: str, *, base_url: str = ""):
+    return runtime_invoke_backend_stream(
+        backend=backend,
+        instructions=instructions,
+        message=message,
+        ollama_chat_fn=_ollama_chat,
+        openai_chat_fn=_openai_chat,
+        mock_chat_fn=_mock_chat,
+        ollama_stream_fn=_ollama_chat_stream,
+        openai_stream_fn=_openai_chat_stream,
+        mock_stream_fn=_mock_chat_stream,
+        ollama_base_url=base_url,
+    )
+
+
+def _call_backend_stream_with_retries(backend: str, instructions: str, message: str):
+    pool = _backend_pool(backend)
+    if pool is not None:
+        return runtime_call_pool_stream_with_failover(
+            pool=pool,
+            instructions=instructions,
+            message=message,
+            invoke_member_stream_fn=lambda member, system_instructions, user_message: _invoke_backend_stream(
+                member.backend, system_instructions, user_message, base_url=member.base_url
+            ),
+            allow_member_fn=_check_member_circuit,
+            record_member_fn=_record_member_outcome,
+            max_attempts=max(_env_int("HELPER_BACKEND_MAX_ATTEMPTS", 2), 1),
+            base_backoff=max(_env_float("HELPER_BACKOFF_SECONDS", 0.4), 0.0),
+            sleeper=time.sleep,
+        )
+    return runtime_call_backend_stream_with_retries(
+        backend=backend,
+        instructions=instructions,
+        message=message,
+        invoke_stream_fn=lambda backend_name, system_instructions, user_message: _invoke_backend_stream(
+            backend_name,
+            system_instructions,
+            user_message,
+        ),
+        max_attempts=max(_env_int("HELPER_BACKEND_MAX_ATTEMPTS", 2), 1),
+        base_backoff=max(_env_float("HELPER_BACKOFF_SECONDS", 0.4), 0.0),
+        sleeper=time.sleep,
+    )
+
+
+async def _aollama_chat(base_url: str, model: str, instructions: str, message: str) -> tuple[str, str]:
+    return await runtime_aollama_chat(
+        base_url=base_url,
+        model=model,
+        instructions=instructions,
+        message=message,
+        timeout_seconds=_env_int("OLLAMA_TIMEOUT_SECONDS", 30),
+        temperature=float(os.getenv("OLLAMA_TEMPERATURE", "0.2")),
+        top_p=float(os.getenv("OLLAMA_TOP_P", "0.9")),
+        num_predict=_env_int("OLLAMA_NUM_PREDICT", 0),
+    )
+
+
+async def _aopenai_chat(model: str, instructions: str, message: str) -> tuple[str, str]:
+    return await runtime_aopenai_chat(
+        api_key=os.environ.get("OPENAI_API_KEY"),
+        model=model,
+        instructions=instructions,
+        message=message,
+        max_output_tokens=_env_int("OPENAI_MAX_OUTPUT_TOKENS", 0),
+    )
+
+
+async def _amock_chat() -> tuple[str, str]:
+    return await runtime_amock_chat(text=os.getenv("HELPER_MOCK_RESPONSE_TEXT", ""))
+
+
+def _aollama_chat_stream(base_url: str, model: str, instructions: str, message: str):
+    return runtime_aollama_chat_stream(
+        base_url=base_url,
+        model=model,
+        instructions=instructions,
+        message=message,
+        timeout_seconds=_env_int("OLLAMA_TIMEOUT_SECONDS", 30),
+        temperature=float(os.getenv("OLLAMA_TEMPERATURE", "0.2")),
+        top_p=float(os.getenv("OLLAMA_TOP_P", "0.9")),
+        num_predict=_env_int("OLLAMA_NUM_PREDICT", 0),
+    )
+
+
+def _aopenai_chat_stream(model: str, instructions: str, message: str):
+    return runtime_aopenai_chat_stream(
+        api_key=os.environ.get("OPENAI_API_KEY"),
+        model=model,
+        instructions=instructions,
+        message=message,
+        max_output_tokens=_env_int("OPENAI_MAX_OUTPUT_TOKENS", 0),
+    )
+
+
+def _amock_chat_stream():
+    return runtime_amock_chat_stream(text=os.getenv("HELPER_MOCK_RESPONSE_TEXT", ""))
+
+
+async def _ainvoke_backend(backend: str, instructions: str, message: str, *, base_url: str = "") -> tuple[str, str]:
+    return await runtime_ainvoke_backend(
+        backend=backend,
+        instructions=instructions,
+        message=message,
+        ollama_chat_fn=_ollama_chat,
+        openai_chat_fn=_openai_chat,
+        mock_chat_fn=_mock_chat,
+        ollama_achat_fn=_aollama_chat,
+        openai_achat_fn=_aopenai_chat,
+        mock_achat_fn=_amock_chat,
+        ollama_base_url=base_url,
+    )
+
+
+async def _acall_backend_with_retries(backend: str, instructions: str, message: str) -> tuple[str, str, int]:
+    pool = _backend_pool(backend)
+    if pool is not None:
+        return await runtime_acall_pool_with_failover(
+            pool=pool,
+            instructions=instructions,
+            message=message,
+            ainvoke_member_fn=lambda member, system_instructions, user_message: _ainvoke_backend(
+                member.backend, system_instructions, user_message, base_url=member.base_url
+            ),
+            allow_member_fn=_check_member_circuit,
+            record_member_fn=_record_member_outcome,
+            max_attempts=max(_env_int("HELPER_BACKEND_MAX_ATTEMPTS", 2), 1),
+            base_backoff=max(_env_float("HELPER_BACKOFF_SECONDS", 0.4), 0.0),
+            sleeper=asyncio.sleep,
+        )
+    return await runtime_acall_backend_with_retries(
+        backend=backend,
+        instructions=instructions,
+        message=message,
+        ainvoke_backend_fn=_ainvoke_backend,
+        max_attempts=max(_env_int("HELPER_BACKEND_MAX_ATTEMPTS", 2), 1),
+        base_backoff=max(_env_float("HELPER_BACKOFF_SECONDS", 0.4), 0.0),
+        sleeper=asyncio.sleep,
+    )
+
+
+def _ainvoke_backend_stream(backend: str, instructions: str, message: str, *, base_url: str = ""):
+    return runtime_ainvoke_backend_stream(
+        backend=backend,
+        instructions=instructions,
+        message=message,
+        ollama_chat_fn=_ollama_chat,
+        openai_chat_fn=_openai_chat,
+        mock_chat_fn=_mock_chat,
+        ollama_achat_fn=_aollama_chat,
+        openai_achat_fn=_aopenai_chat,
+        mock_achat_fn=_amock_chat,
+        ollama_astream_fn=_aollama_chat_stream,
+        openai_astream_fn=_aopenai_chat_stream,
+        mock_astream_fn=_amock_chat_stream,
+        ollama_base_url=base_url,
+    )
+
+
+async def _acall_backend_stream_with_retries(backend: str, instructions: str, message: str):
+    pool = _backend_pool(backend)
+    if pool is not None:
+        return await runtime_acall_pool_stream_with_failover(
+            pool=pool,
+            instructions=instructions,
+            message=message,
+            ainvoke_member_stream_fn=lambda member, system_instructions, user_message: _ainvoke_backend_stream(
+                member.backend, system_instructions, user_message, base_url=member.base_url
+            ),
+            allow_member_fn=_check_member_circuit,
+            record_member_fn=_record_member_outcome,
+            max_attempts=max(_env_int("HELPER_BACKEND_MAX_ATTEMPTS", 2), 1),
+            base_backoff=max(_env_float("HELPER_BACKOFF_SECONDS", 0.4), 0.0),
+            sleeper=asyncio.sleep,
+        )
+    return await runtime_acall_backend_stream_with_retries(
+        backend=backend,
+        instructions=instructions,
+        message=message,
+        ainvoke_stream_fn=_ainvoke_backend_stream,
+        max_attempts=max(_env_int("HELPER_BACKEND_MAX_ATTEMPTS", 2), 1),
+        base_backoff=max(_env_float("HELPER_BACKOFF_SECONDS", 0.4), 0.0),
+        sleeper=asyncio.sleep,
+    )
+
+
+def _begin_flight(*, backend: str, instructions: str, message: str, lease_seconds: int):
+    return runtime_begin_flight(
+        cache_backend=cache,
+        backend=backend,
+        instructions=instructions,
+        message=message,
+        lease_seconds=lease_seconds,
+    )
+
+
+def _allow_rate_limits(limits, *, cache_backend, request_id: str) -> list[bool]:
+    return prelimit_allow_many(
+        limits,
+        cache_backend=cache_backend,
+        request_id=request_id,
+        sync_fraction=getattr(settings, "REQUEST_SAFETY_PRELIMIT_SYNC_FRACTION", 0.5),
+        sync_interval_seconds=getattr(settings, "REQUEST_SAFETY_PRELIMIT_SYNC_INTERVAL_SECONDS", 2.0),
+    )
+
+
 @require_GET
 def healthz(request):
     backend = (os.getenv("HELPER_LLM_BACKEND", "ollama") or "ollama").lower()
     return JsonResponse({"ok": True, "backend": backend})
 
 
-@require_POST
-def chat(request):
-    """POST /helper/chat"""
-    started_at = time.monotonic()
-    request_id = _request_id(request)
-    actor, actor_type, client_ip = resolve_actor_and_client(
-        request=request,
-        actor_key_fn=_actor_key,
-        settings=settings,
-        client_ip_from_request_fn=client_ip_from_request,
-    )
-    backend = (os.getenv("HELPER_LLM_BACKEND", "ollama") or "ollama").lower()
+@dataclass(frozen=True)
+class _ChatPreflight:
+    actor: str
+    actor_type: str
+    client_ip: str
+    payload: dict
+    emit_helper_event: Callable[..., None]
 
-    if not actor:
-        _log_chat_event("warning", "unauthorized", request_id=request_id, actor_type=actor_type, ip=client_ip)
-        return _json_response({"error": "unauthorized"}, status=401, request_id=request_id)
 
+def _helper_event_emitter(request, *, request_id: str, actor_type: str, client_ip: str):
     classroom_id, student_id = load_session_ids(request)
+    backend = (os.getenv("HELPER_LLM_BACKEND", "ollama") or "ollama").lower()
 
-    def _emit_helper_event(response) -> None:
+    def _emit_helper_event(response, payload: dict | None = None) -> None:
         emit_helper_chat_access_event(
             classroom_id=classroom_id,
             student_id=student_id,
@@ -231,26 +525,52 @@ def chat(request):
                 request_id=request_id,
                 actor_type=actor_type,
                 backend=backend,
+                payload=payload,
             ),
         )
 
-    actor_limit = _env_int("HELPER_RATE_LIMIT_PER_MINUTE", 30)
-    ip_limit = _env_int("HELPER_RATE_LIMIT_PER_IP_PER_MINUTE", 90)
-    rate_limit_response = enforce_rate_limits(
+    return _emit_helper_event
+
+
+def _chat_rate_limit_response(*, actor: str, actor_type: str, client_ip: str, request_id: str):
+    return enforce_rate_limits(
         actor=actor,
         actor_type=actor_type,
         client_ip=client_ip,
         request_id=request_id,
-        actor_limit=actor_limit,
-        ip_limit=ip_limit,
-        fixed_window_allow_fn=fixed_window_allow,
+        actor_limit=_env_int("HELPER_RATE_LIMIT_PER_MINUTE", 30),
+        ip_limit=_env_int("HELPER_RATE_LIMIT_PER_IP_PER_MINUTE", 90),
+        allow_many_fn=_allow_rate_limits,
         cache_backend=cache,
         log_chat_event_fn=_log_chat_event,
         json_response_fn=_json_response,
     )
+
+
+def _chat_preflight(request, *, request_id: str):
+    """Authenticate, rate-limit, and parse a chat request for either view.
+
+    Returns `(preflight, None)` when the request may proceed, else `(None, response)`.
+    """
+    actor, actor_type, client_ip = resolve_actor_and_client(
+        request=request,
+        actor_key_fn=_actor_key,
+        settings=settings,
+        client_ip_from_request_fn=client_ip_from_request,
+    )
+    if not actor:
+        _log_chat_event("warning", "unauthorized", request_id=request_id, actor_type=actor_type, ip=client_ip)
+        return None, _json_response({"error": "unauthorized"}, status=401, request_id=request_id)
+
+    emit_helper_event = _helper_event_emitter(
+        request, request_id=request_id, actor_type=actor_type, client_ip=client_ip
+    )
+    rate_limit_response = _chat_rate_limit_response(
+        actor=actor, actor_type=actor_type, client_ip=client_ip, request_id=request_id
+    )
     if rate_limit_response is not None:
-        _emit_helper_event(rate_limit_response)
-        return rate_limit_response
+        emit_helper_event(rate_limit_response)
+        return None, rate_limit_response
 
     payload, bad_payload_response = parse_chat_payload(
         request_body=request.body,
@@ -261,11 +581,21 @@ def chat(request):
         json_response_fn=_json_response,
     )
     if bad_payload_response is not None:
-        response = bad_payload_response
-        _emit_helper_event(response)
-        return response
+        emit_helper_event(bad_payload_response)
+        return None, bad_payload_response
+
+    preflight = _ChatPreflight(
+        actor=actor,
+        actor_type=actor_type,
+        client_ip=client_ip,
+        payload=payload,
+        emit_helper_event=emit_helper_event,
+    )
+    return preflight, None
+
 
-    deps = build_chat_deps(
+def _chat_deps(*, stream_response_fn=_stream_response):
+    return build_chat_deps(
         json_response_fn=_json_response,
         log_chat_event_fn=_log_chat_event,
         env_int_fn=_env_int,
@@ -279,10 +609,9 @@ def chat(request):
         is_piper_hardware_question_fn=_is_piper_hardware_question,
         build_piper_hardware_triage_text_fn=_build_piper_hardware_triage_text,
         build_instructions_fn=build_instructions,
-        backend_circuit_is_open_fn=_backend_circuit_is_open,
+        check_backend_circuit_fn=_check_backend_circuit,
         call_backend_with_retries_fn=_call_backend_with_retries,
-        record_backend_failure_fn=_record_backend_failure,
-        reset_backend_failure_state_fn=_reset_backend_failure_state,
+        record_backend_outcome_fn=_record_backend_outcome,
         acquire_slot_fn=acquire_slot,
         release_slot_fn=release_slot,
         truncate_response_text_fn=_truncate_response_text,
@@ -295,20 +624,72 @@ def chat(request):
         format_conversation_for_prompt_fn=_format_conversation_for_prompt,
         classify_intent_fn=_classify_intent,
         build_follow_up_suggestions_fn=_build_follow_up_suggestions,
+        call_backend_stream_with_retries_fn=_call_backend_stream_with_retries,
+        stream_response_fn=stream_response_fn,
+        load_cached_answer_fn=_load_cached_answer,
+        save_cached_answer_fn=_save_cached_answer,
+        begin_flight_fn=_begin_flight,
     )
+
+
+def _handle_chat_kwargs(request, preflight: _ChatPreflight, *, request_id: str, started_at: float) -> dict:
+    return {
+        "request": request,
+        "payload": preflight.payload,
+        "request_id": request_id,
+        "actor_key": preflight.actor,
+        "actor_type": preflight.actor_type,
+        "client_ip": preflight.client_ip,
+        "settings": settings,
+        "started_at": started_at,
+        "default_text_language_keywords": DEFAULT_TEXT_LANGUAGE_KEYWORDS,
+        "signature_expired_exc": SignatureExpired,
+        "bad_signature_exc": BadSignature,
+    }
+
+
+@require_POST
+def chat(request):
+    """POST /helper/chat"""
+    started_at = time.monotonic()
+    request_id = _request_id(request)
+    preflight, early_response = _chat_preflight(request, request_id=request_id)
+    if early_response is not None:
+        return early_response
+
     response = engine_service.handle_chat(
-        request=request,
-        payload=payload,
-        request_id=request_id,
-        actor_key=actor,
-        actor_type=actor_type,
-        client_ip=client_ip,
-        settings=settings,
-        started_at=started_at,
-        default_text_language_keywords=DEFAULT_TEXT_LANGUAGE_KEYWORDS,
-        signature_expired_exc=SignatureExpired,
-        bad_signature_exc=BadSignature,
-        deps=deps,
+        **_handle_chat_kwargs(request, preflight, request_id=request_id, started_at=started_at),
+        deps=_chat_deps(),
+        stream=_wants_stream(request, preflight.payload),
+        on_stream_complete=lambda final_payload: preflight.emit_helper_event(None, final_payload),
+    )
+    if not getattr(response, "streaming", False):
+        # Streamed replies emit their access event from the final frame instead.
+        preflight.emit_helper_event(response)
+    return response
+
+
+@require_POST
+async def achat(request):
+    """POST /helper/chat when served under ASGI (`HELPER_ASGI_ENABLED=1`)."""
+    started_at = time.monotonic()
+    request_id = _request_id(request)
+    preflight, early_response = await sync_to_async(_chat_preflight)(request, request_id=request_id)
+    if early_response is not None:
+        return early_response
+
+    response = await engine_service.ahandle_chat(
+        **_handle_chat_kwargs(request, preflight, request_id=request_id, started_at=started_at),
+        deps=_chat_deps(stream_response_fn=_async_stream_response),
+        async_deps=build_async_chat_deps(
+            acquire_slot_fn=aacquire_slot,
+            release_slot_fn=arelease_slot,
+            call_backend_with_retries_fn=_acall_backend_with_retries,
+            call_backend_stream_with_retries_fn=_acall_backend_stream_with_retries,
+        ),
+        stream=_wants_stream(request, preflight.payload),
+        on_stream_complete=lambda final_payload: preflight.emit_helper_event(None, final_payload),
     )
-    _emit_helper_event(response)
+    if not getattr(response, "streaming", False):
+        await sync_to_async(preflight.emit_helper_event)(response)
     return response
@@ -19,10 +19,9 @@ def build_chat_deps(
     is_piper_hardware_question_fn,
     build_piper_hardware_triage_text_fn,
     build_instructions_fn,
-    backend_circuit_is_open_fn,
+    check_backend_circuit_fn,
     call_backend_with_retries_fn,
-    record_backend_failure_fn,
-    reset_backend_failure_state_fn,
+    record_backend_outcome_fn,
     acquire_slot_fn,
     release_slot_fn,
     truncate_response_text_fn,
@@ -35,6 +34,11 @@ def build_chat_deps(
     format_conversation_for_prompt_fn,
     classify_intent_fn,
     build_follow_up_suggestions_fn,
+    call_backend_stream_with_retries_fn=None,
+    stream_response_fn=None,
+    load_cached_answer_fn=None,
+    save_cached_answer_fn=None,
+    begin_flight_fn=None,
 ):
     deps = engine_service.ChatDeps(
         json_response=json_response_fn,
@@ -57,10 +61,9 @@ def build_chat_deps(
         build_piper_hardware_triage_text=build_piper_hardware_triage_text_fn,
         allowed_topic_overlap=engine_heuristics.allowed_topic_overlap,
         build_instructions=build_instructions_fn,
-        backend_circuit_is_open=backend_circuit_is_open_fn,
+        check_backend_circuit=check_backend_circuit_fn,
         call_backend_with_retries=call_backend_with_retries_fn,
-        record_backend_failure=record_backend_failure_fn,
-        reset_backend_failure_state=reset_backend_failure_state_fn,
+        record_backend_outcome=record_backend_outcome_fn,
         acquire_slot=acquire_slot_fn,
         release_slot=release_slot_fn,
         truncate_response_text=truncate_response_text_fn,
@@ -73,8 +76,28 @@ def build_chat_deps(
         format_conversation_for_prompt=format_conversation_for_prompt_fn,
         classify_intent=classify_intent_fn,
         build_follow_up_suggestions=build_follow_up_suggestions_fn,
+        call_backend_stream_with_retries=call_backend_stream_with_retries_fn,
+        stream_response=stream_response_fn,
+        load_cached_answer=load_cached_answer_fn,
+        save_cached_answer=save_cached_answer_fn,
+        begin_flight=begin_flight_fn,
     )
     return deps
 
 
-__all__ = ["DEFAULT_TEXT_LANGUAGE_KEYWORDS", "build_chat_deps"]
+def build_async_chat_deps(
+    *,
+    acquire_slot_fn,
+    release_slot_fn,
+    call_backend_with_retries_fn,
+    call_backend_stream_with_retries_fn=None,
+):
+    return engine_service.AsyncChatDeps(
+        acquire_slot=acquire_slot_fn,
+        release_slot=release_slot_fn,
+        call_backend_with_retries=call_backend_with_retries_fn,
+        call_backend_stream_with_retries=call_backend_stream_with_retries_fn,
+    )
+
+
+__all__ = ["DEFAULT_TEXT_LANGUAGE_KEYWORDS", "build_async_chat_deps", "build_chat_deps"]
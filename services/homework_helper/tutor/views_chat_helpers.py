@@ -2,11 +2,11 @@ import json
 import logging
 import os
 import re
-from functools import lru_cache
 
 from django.core.cache import cache
 from django.http import JsonResponse
 
+from .engine import answer_cache as engine_answer_cache
 from .engine import heuristics as engine_heuristics
 from .engine import memory as engine_memory
 from .engine import reference as engine_reference
@@ -45,6 +45,24 @@ def _json_response(payload: dict, *, request_id: str, status: int = 200) -> Json
     return engine_runtime.json_response(payload, request_id_value=request_id, status=status)
 
 
+def _stream_response(events, *, request_id: str, on_close=None):
+    return engine_runtime.stream_response(
+        engine_runtime.SSEStream(events, on_close=on_close),
+        request_id_value=request_id,
+    )
+
+
+def _async_stream_response(events, *, request_id: str, on_close=None):
+    return engine_runtime.stream_response(
+        engine_runtime.AsyncFrameRelay(engine_runtime.AsyncSSEStream(events, on_close=on_close)),
+        request_id_value=request_id,
+    )
+
+
+def _wants_stream(request, payload: dict) -> bool:
+    return engine_runtime.wants_stream(request, payload)
+
+
 def _log_chat_event(level: str, event: str, *, request_id: str, **fields):
     engine_runtime.log_chat_event(
         level,
@@ -74,22 +92,21 @@ def _is_piper_context(context_value: str, topics: list[str], reference_text: str
     )
 
 
-def _is_piper_hardware_question(message: str) -> bool:
+def _is_piper_hardware_question(message: str | engine_heuristics.MessageText) -> bool:
     hardware_keywords = engine_heuristics.parse_csv_list(os.getenv("HELPER_PIPER_HARDWARE_KEYWORDS", ""))
     keywords = hardware_keywords or DEFAULT_PIPER_HARDWARE_KEYWORDS
     return engine_heuristics.is_piper_hardware_question(message, keywords=keywords)
 
 
-def _build_piper_hardware_triage_text(message: str) -> str:
+def _build_piper_hardware_triage_text(message: str | engine_heuristics.MessageText) -> str:
     return engine_heuristics.build_piper_hardware_triage_text(message)
 
 
-@lru_cache(maxsize=4)
-def _load_reference_chunks(path_str: str) -> tuple[str, ...]:
+def _load_reference_chunks(path_str: str) -> engine_reference.ReferenceIndex:
+    # The engine caches the index per file and rebuilds it when the file changes.
     return engine_reference.load_reference_chunks(path_str, logger=logger)
 
 
-@lru_cache(maxsize=4)
 def _load_reference_text(path_str: str) -> str:
     return engine_reference.load_reference_text(path_str, logger=logger)
 
@@ -136,6 +153,7 @@ def _save_conversation_state(
         summary=summary,
         ttl_seconds=ttl_seconds,
         actor_key=actor_key,
+        compact=_env_bool("HELPER_CONVERSATION_COMPACT_STATE", True),
     )
 
 
@@ -151,6 +169,21 @@ def _clear_conversation_turns(*, conversation_id: str, actor_key: str, scope_fin
     )
 
 
+def _load_cached_answer(*, class_id: int, fingerprint: str) -> dict | None:
+    return engine_answer_cache.load_answer(cache_backend=cache, class_id=class_id, fingerprint=fingerprint)
+
+
+def _save_cached_answer(*, class_id: int, fingerprint: str, text: str, model: str, ttl_seconds: int) -> None:
+    engine_answer_cache.save_answer(
+        cache_backend=cache,
+        class_id=class_id,
+        fingerprint=fingerprint,
+        text=text,
+        model=model,
+        ttl_seconds=ttl_seconds,
+    )
+
+
 def _format_conversation_for_prompt(turns: list[dict], *, max_chars: int, summary: str = "") -> str:
     return engine_memory.format_turns_for_prompt(turns=turns, max_chars=max_chars, summary=summary)
 
@@ -164,7 +197,7 @@ def _compact_conversation(*, turns: list[dict], max_messages: int, summary: str,
     )
 
 
-def _classify_intent(message: str) -> str:
+def _classify_intent(message: str | engine_heuristics.MessageText) -> str:
     return engine_heuristics.classify_intent(message)
 
 
@@ -187,7 +220,14 @@ def _build_follow_up_suggestions(
     )
 
 
-def _build_helper_event_details(*, response, request_id: str, actor_type: str, backend: str) -> dict:
+def _build_helper_event_details(
+    *,
+    response,
+    request_id: str,
+    actor_type: str,
+    backend: str,
+    payload: dict | None = None,
+) -> dict:
     details: dict = {
         "request_id": request_id,
         "actor_type": actor_type,
@@ -196,10 +236,11 @@ def _build_helper_event_details(*, response, request_id: str, actor_type: str, b
     if backend_token and _SAFE_TOKEN_RE.fullmatch(backend_token):
         details["backend"] = backend_token
 
-    try:
-        payload = json.loads(response.content.decode("utf-8"))
-    except Exception:
-        return details
+    if payload is None:
+        try:
+            payload = json.loads(response.content.decode("utf-8"))
+        except Exception:
+            return details
     if not isinstance(payload, dict):
         return details
 
@@ -238,6 +279,7 @@ __all__ = [
     "DEFAULT_PIPER_CONTEXT_KEYWORDS",
     "DEFAULT_PIPER_HARDWARE_KEYWORDS",
     "DEFAULT_TEXT_LANGUAGE_KEYWORDS",
+    "_async_stream_response",
     "_build_follow_up_suggestions",
     "_build_helper_event_details",
     "_build_piper_hardware_triage_text",
@@ -252,6 +294,7 @@ __all__ = [
     "_is_piper_context",
     "_is_piper_hardware_question",
     "_json_response",
+    "_load_cached_answer",
     "_load_conversation_state",
     "_load_reference_chunks",
     "_load_reference_text",
@@ -259,6 +302,9 @@ __all__ = [
     "_normalize_conversation_id",
     "_redact",
     "_request_id",
+    "_save_cached_answer",
     "_save_conversation_state",
+    "_stream_response",
     "_truncate_response_text",
+    "_wants_stream",
 ]
@@ -1,5 +1,7 @@
 import json
 
+from common.request_safety import RateLimit
+
 
 def resolve_actor_and_client(*, request, actor_key_fn, settings, client_ip_from_request_fn):
     actor = actor_key_fn(request)
@@ -32,27 +34,24 @@ def enforce_rate_limits(
     request_id: str,
     actor_limit: int,
     ip_limit: int,
-    fixed_window_allow_fn,
     cache_backend,
     log_chat_event_fn,
     json_response_fn,
+    allow_many_fn,
 ):
-    if not fixed_window_allow_fn(
-        f"rl:actor:{actor}:m",
-        limit=actor_limit,
-        window_seconds=60,
+    # One limiter call checks both windows; neither is consumed when either denies.
+    actor_allowed, ip_allowed = allow_many_fn(
+        [
+            RateLimit(key=f"rl:actor:{actor}:m", limit=actor_limit, window_seconds=60),
+            RateLimit(key=f"rl:ip:{client_ip}:m", limit=ip_limit, window_seconds=60),
+        ],
         cache_backend=cache_backend,
         request_id=request_id,
-    ):
+    )
+    if not actor_allowed:
         log_chat_event_fn("warning", "rate_limited_actor", request_id=request_id, actor_type=actor_type, ip=client_ip)
         return json_response_fn({"error": "rate_limited"}, status=429, request_id=request_id)
-    if not fixed_window_allow_fn(
-        f"rl:ip:{client_ip}:m",
-        limit=ip_limit,
-        window_seconds=60,
-        cache_backend=cache_backend,
-        request_id=request_id,
-    ):
+    if not ip_allowed:
         log_chat_event_fn("warning", "rate_limited_ip", request_id=request_id, actor_type=actor_type, ip=client_ip)
         return json_response_fn({"error": "rate_limited"}, status=429, request_id=request_id)
     return None
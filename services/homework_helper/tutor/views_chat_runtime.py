@@ -1,34 +1,113 @@
 import os
+from urllib.parse import urlsplit
 
 from .engine import auth as engine_auth
 from .engine import backends as engine_backends
 from .engine import circuit as engine_circuit
+from .engine import routing as engine_routing
+from .engine import single_flight as engine_single_flight
 
 
-def backend_circuit_is_open(*, cache_backend, backend: str, logger) -> bool:
-    return engine_circuit.backend_circuit_is_open(
+def circuit_policy(*, env_int, env_float) -> engine_circuit.CircuitPolicy:
+    return engine_circuit.CircuitPolicy(
+        window_seconds=max(env_int("HELPER_CIRCUIT_BREAKER_WINDOW_SECONDS", 60), 10),
+        min_failures=max(env_int("HELPER_CIRCUIT_BREAKER_FAILURES", 5), 1),
+        error_rate=min(max(env_float("HELPER_CIRCUIT_BREAKER_ERROR_RATE", 0.5), 0.0), 1.0),
+        min_latency_samples=max(env_int("HELPER_CIRCUIT_BREAKER_MIN_SAMPLES", 5), 1),
+        p95_latency_ms=max(env_int("HELPER_CIRCUIT_BREAKER_P95_MS", 20000), 0),
+        open_seconds=max(env_int("HELPER_CIRCUIT_BREAKER_TTL_SECONDS", 30), 1),
+        half_open_probes=max(env_int("HELPER_CIRCUIT_BREAKER_HALF_OPEN_PROBES", 1), 1),
+    )
+
+
+def check_backend_circuit(*, cache_backend, backend: str, policy, logger) -> engine_circuit.CircuitDecision:
+    return engine_circuit.check_circuit(
         cache_backend=cache_backend,
-        backend=backend,
+        name=engine_circuit.circuit_name(backend, backend_model_name(backend)),
+        policy=policy,
         logger=logger,
     )
 
 
-def record_backend_failure(*, cache_backend, backend: str, threshold: int, ttl: int, logger) -> None:
-    engine_circuit.record_backend_failure(
+def record_backend_outcome(*, cache_backend, backend: str, policy, ok: bool, latency_ms: int | None, logger):
+    return engine_circuit.record_outcome(
         cache_backend=cache_backend,
-        backend=backend,
-        threshold=threshold,
-        ttl=ttl,
+        name=engine_circuit.circuit_name(backend, backend_model_name(backend)),
+        policy=policy,
+        ok=ok,
+        latency_ms=latency_ms,
         logger=logger,
     )
 
 
-def reset_backend_failure_state(*, cache_backend, backend: str, logger) -> None:
-    engine_circuit.reset_backend_failure_state(
+def member_circuit_name(member: engine_routing.BackendMember) -> str:
+    name = engine_circuit.circuit_name(member.backend, backend_model_name(member.backend))
+    host = urlsplit(member.base_url).netloc if member.base_url else ""
+    return f"{name}@{host}" if host else name
+
+
+def check_member_circuit(*, cache_backend, member: engine_routing.BackendMember, policy, logger) -> bool:
+    decision = engine_circuit.check_circuit(
         cache_backend=cache_backend,
-        backend=backend,
+        name=member_circuit_name(member),
+        policy=policy,
+        logger=logger,
+    )
+    if decision.transition:
+        logger.info("helper_backend_member_circuit_%s member=%s", decision.transition, member.name)
+    return decision.allowed
+
+
+def record_member_outcome(
+    *, cache_backend, member: engine_routing.BackendMember, policy, ok: bool, latency_ms: int | None, logger
+) -> None:
+    transition = engine_circuit.record_outcome(
+        cache_backend=cache_backend,
+        name=member_circuit_name(member),
+        policy=policy,
+        ok=ok,
+        latency_ms=latency_ms,
         logger=logger,
     )
+    if transition:
+        logger.warning(
+            "helper_backend_member_circuit_%s member=%s latency_ms=%s",
+            transition["transition"],
+            member.name,
+            latency_ms,
+        )
+
+
+def _env_list(name: str) -> list[str]:
+    return [item.strip() for item in os.getenv(name, "").split(",") if item.strip()]
+
+
+def backend_pool(backend: str, *, remote_acknowledged: bool) -> engine_routing.BackendPool | None:
+    """Routing pool for `backend`, or None when it has a single endpoint and no fallback.
+
+    Ollama gets one member per `OLLAMA_BASE_URLS` entry (default: `OLLAMA_BASE_URL`);
+    `HELPER_BACKEND_FALLBACKS` adds backends that are only used when every
+    primary member is unavailable. A remote `openai` fallback is dropped unless
+    remote mode is acknowledged, same as selecting it directly.
+    """
+    backend = (backend or "").strip().lower()
+    members = []
+    if backend == "ollama":
+        urls = _env_list("OLLAMA_BASE_URLS") or [os.getenv("OLLAMA_BASE_URL", "http://ollama:11434")]
+        for url in dict.fromkeys(urls):
+            members.append(engine_routing.BackendMember(name=f"ollama@{url}", backend="ollama", base_url=url))
+    else:
+        members.append(engine_routing.BackendMember(name=backend, backend=backend))
+    for fallback in dict.fromkeys(item.lower() for item in _env_list("HELPER_BACKEND_FALLBACKS")):
+        if fallback == backend or (fallback == "openai" and not remote_acknowledged):
+            continue
+        members.append(engine_routing.BackendMember(name=fallback, backend=fallback, fallback=True))
+    if len(members) < 2:
+        return None
+    strategy = os.getenv("HELPER_BACKEND_BALANCE", engine_routing.LEAST_OUTSTANDING).strip().lower()
+    if strategy not in engine_routing.STRATEGIES:
+        strategy = engine_routing.LEAST_OUTSTANDING
+    return engine_routing.get_pool(members, strategy=strategy)
 
 
 def table_exists(*, connection, transaction_module, table_name: str) -> bool:
@@ -47,6 +126,8 @@ def student_session_exists(
     student_id: int,
     class_id: int,
     table_exists_fn,
+    cache_backend=None,
+    cache_ttl_seconds: int = 0,
 ) -> bool:
     return engine_auth.student_session_exists(
         connection=connection,
@@ -55,6 +136,8 @@ def student_session_exists(
         student_id=student_id,
         class_id=class_id,
         table_exists_fn=table_exists_fn,
+        cache_backend=cache_backend,
+        cache_ttl_seconds=cache_ttl_seconds,
     )
 
 
@@ -103,6 +186,75 @@ def ollama_chat(
     )
 
 
+async def aollama_chat(
+    *,
+    base_url: str,
+    model: str,
+    instructions: str,
+    message: str,
+    timeout_seconds: int,
+    temperature: float,
+    top_p: float,
+    num_predict: int,
+) -> tuple[str, str]:
+    return await engine_backends.aollama_chat(
+        base_url=base_url,
+        model=model,
+        instructions=instructions,
+        message=message,
+        timeout_seconds=timeout_seconds,
+        temperature=temperature,
+        top_p=top_p,
+        num_predict=num_predict,
+    )
+
+
+def ollama_chat_stream(
+    *,
+    base_url: str,
+    model: str,
+    instructions: str,
+    message: str,
+    timeout_seconds: int,
+    temperature: float,
+    top_p: float,
+    num_predict: int,
+):
+    return engine_backends.ollama_chat_stream(
+        base_url=base_url,
+        model=model,
+        instructions=instructions,
+        message=message,
+        timeout_seconds=timeout_seconds,
+        temperature=temperature,
+        top_p=top_p,
+        num_predict=num_predict,
+    )
+
+
+def aollama_chat_stream(
+    *,
+    base_url: str,
+    model: str,
+    instructions: str,
+    message: str,
+    timeout_seconds: int,
+    temperature: float,
+    top_p: float,
+    num_predict: int,
+):
+    return engine_backends.aollama_chat_stream(
+        base_url=base_url,
+        model=model,
+        instructions=instructions,
+        message=message,
+        timeout_seconds=timeout_seconds,
+        temperature=temperature,
+        top_p=top_p,
+        num_predict=num_predict,
+    )
+
+
 def openai_chat(
     *,
     api_key: str | None,
@@ -120,39 +272,187 @@ def openai_chat(
     )
 
 
-def mock_chat(*, text: str) -> tuple[str, str]:
-    return engine_backends.mock_chat(text=text)
+async def aopenai_chat(
+    *,
+    api_key: str | None,
+    model: str,
+    instructions: str,
+    message: str,
+    max_output_tokens: int,
+) -> tuple[str, str]:
+    return await engine_backends.aopenai_chat(
+        api_key=api_key,
+        model=model,
+        instructions=instructions,
+        message=message,
+        max_output_tokens=max_output_tokens,
+    )
 
 
-def invoke_backend(
+def openai_chat_stream(
     *,
-    backend: str,
+    api_key: str | None,
+    model: str,
     instructions: str,
     message: str,
+    max_output_tokens: int,
+):
+    return engine_backends.openai_chat_stream(
+        api_key=api_key,
+        model=model,
+        instructions=instructions,
+        message=message,
+        max_output_tokens=max_output_tokens,
+    )
+
+
+def aopenai_chat_stream(
+    *,
+    api_key: str | None,
+    model: str,
+    instructions: str,
+    message: str,
+    max_output_tokens: int,
+):
+    return engine_backends.aopenai_chat_stream(
+        api_key=api_key,
+        model=model,
+        instructions=instructions,
+        message=message,
+        max_output_tokens=max_output_tokens,
+    )
+
+
+def mock_chat(*, text: str) -> tuple[str, str]:
+    return engine_backends.mock_chat(text=text)
+
+
+async def amock_chat(*, text: str) -> tuple[str, str]:
+    return await engine_backends.amock_chat(text=text)
+
+
+def mock_chat_stream(*, text: str):
+    return engine_backends.mock_chat_stream(text=text)
+
+
+def amock_chat_stream(*, text: str):
+    return engine_backends.amock_chat_stream(text=text)
+
+
+def backend_model_name(backend: str) -> str:
+    if backend == "ollama":
+        return os.getenv("OLLAMA_MODEL", "llama3.2:1b")
+    if backend == "openai":
+        return os.getenv("OPENAI_MODEL", "gpt-5.2")
+    return backend
+
+
+def begin_flight(*, cache_backend, backend: str, instructions: str, message: str, lease_seconds: int):
+    key = engine_single_flight.flight_key(
+        backend=backend,
+        model=backend_model_name(backend),
+        instructions=instructions,
+        message=message,
+    )
+    return engine_single_flight.begin_flight(cache_backend=cache_backend, key=key, lease_seconds=lease_seconds)
+
+
+def _backend_registry(
+    *,
     ollama_chat_fn,
     openai_chat_fn,
     mock_chat_fn,
-) -> tuple[str, str]:
-    registry = {
+    ollama_stream_fn=None,
+    openai_stream_fn=None,
+    mock_stream_fn=None,
+    ollama_achat_fn=None,
+    openai_achat_fn=None,
+    mock_achat_fn=None,
+    ollama_astream_fn=None,
+    openai_astream_fn=None,
+    mock_astream_fn=None,
+    ollama_base_url: str = "",
+) -> dict[str, engine_backends.CallableBackend]:
+    def _ollama_args(system_instructions: str, user_message: str) -> tuple[str, str, str, str]:
+        return (
+            ollama_base_url or os.getenv("OLLAMA_BASE_URL", "http://ollama:11434"),
+            backend_model_name("ollama"),
+            system_instructions,
+            user_message,
+        )
+
+    def _openai_args(system_instructions: str, user_message: str) -> tuple[str, str, str]:
+        return (backend_model_name("openai"), system_instructions, user_message)
+
+    def _ollama_stream(system_instructions: str, user_message: str):
+        return ollama_stream_fn(*_ollama_args(system_instructions, user_message))
+
+    def _openai_stream(system_instructions: str, user_message: str):
+        return openai_stream_fn(*_openai_args(system_instructions, user_message))
+
+    def _mock_stream(_system_instructions: str, _user_message: str):
+        return mock_stream_fn()
+
+    async def _ollama_achat(system_instructions: str, user_message: str) -> tuple[str, str]:
+        return await ollama_achat_fn(*_ollama_args(system_instructions, user_message))
+
+    async def _openai_achat(system_instructions: str, user_message: str) -> tuple[str, str]:
+        return await openai_achat_fn(*_openai_args(system_instructions, user_message))
+
+    async def _mock_achat(_system_instructions: str, _user_message: str) -> tuple[str, str]:
+        return await mock_achat_fn()
+
+    def _ollama_astream(system_instructions: str, user_message: str):
+        return ollama_astream_fn(*_ollama_args(system_instructions, user_message))
+
+    def _openai_astream(system_instructions: str, user_message: str):
+        return openai_astream_fn(*_openai_args(system_instructions, user_message))
+
+    def _mock_astream(_system_instructions: str, _user_message: str):
+        return mock_astream_fn()
+
+    return {
         "ollama": engine_backends.CallableBackend(
             chat_fn=lambda system_instructions, user_message: ollama_chat_fn(
-                os.getenv("OLLAMA_BASE_URL", "http://ollama:11434"),
-                os.getenv("OLLAMA_MODEL", "llama3.2:1b"),
-                system_instructions,
-                user_message,
-            )
+                *_ollama_args(system_instructions, user_message)
+            ),
+            stream_fn=_ollama_stream if ollama_stream_fn else None,
+            achat_fn=_ollama_achat if ollama_achat_fn else None,
+            astream_fn=_ollama_astream if ollama_astream_fn else None,
         ),
         "openai": engine_backends.CallableBackend(
             chat_fn=lambda system_instructions, user_message: openai_chat_fn(
-                os.getenv("OPENAI_MODEL", "gpt-5.2"),
-                system_instructions,
-                user_message,
-            )
+                *_openai_args(system_instructions, user_message)
+            ),
+            stream_fn=_openai_stream if openai_stream_fn else None,
+            achat_fn=_openai_achat if openai_achat_fn else None,
+            astream_fn=_openai_astream if openai_astream_fn else None,
         ),
         "mock": engine_backends.CallableBackend(
-            chat_fn=lambda _system_instructions, _user_message: mock_chat_fn()
+            chat_fn=lambda _system_instructions, _user_message: mock_chat_fn(),
+            stream_fn=_mock_stream if mock_stream_fn else None,
+            achat_fn=_mock_achat if mock_achat_fn else None,
+            astream_fn=_mock_astream if mock_astream_fn else None,
         ),
     }
+
+
+def invoke_backend(
+    *,
+    backend: str,
+    instructions: str,
+    message: str,
+    ollama_chat_fn,
+    openai_chat_fn,
+    mock_chat_fn,
+    ollama_base_url: str = "",
+) -> tuple[str, str]:
+    registry = _backend_registry(
+        ollama_chat_fn=ollama_chat_fn,
+        openai_chat_fn=openai_chat_fn,
+        mock_chat_fn=mock_chat_fn,
+        ollama_base_url=ollama_base_url,
+    )
     return engine_backends.invoke_backend(
         backend,
         instructions=instructions,
@@ -161,6 +461,102 @@ def invoke_backend(
     )
 
 
+async def ainvoke_backend(
+    *,
+    backend: str,
+    instructions: str,
+    message: str,
+    ollama_chat_fn,
+    openai_chat_fn,
+    mock_chat_fn,
+    ollama_achat_fn,
+    openai_achat_fn,
+    mock_achat_fn,
+    ollama_base_url: str = "",
+) -> tuple[str, str]:
+    registry = _backend_registry(
+        ollama_chat_fn=ollama_chat_fn,
+        openai_chat_fn=openai_chat_fn,
+        mock_chat_fn=mock_chat_fn,
+        ollama_achat_fn=ollama_achat_fn,
+        openai_achat_fn=openai_achat_fn,
+        mock_achat_fn=mock_achat_fn,
+        ollama_base_url=ollama_base_url,
+    )
+    return await engine_backends.ainvoke_backend(
+        backend,
+        instructions=instructions,
+        message=message,
+        registry=registry,
+    )
+
+
+def invoke_backend_stream(
+    *,
+    backend: str,
+    instructions: str,
+    message: str,
+    ollama_chat_fn,
+    openai_chat_fn,
+    mock_chat_fn,
+    ollama_stream_fn,
+    openai_stream_fn,
+    mock_stream_fn,
+    ollama_base_url: str = "",
+):
+    registry = _backend_registry(
+        ollama_chat_fn=ollama_chat_fn,
+        openai_chat_fn=openai_chat_fn,
+        mock_chat_fn=mock_chat_fn,
+        ollama_stream_fn=ollama_stream_fn,
+        openai_stream_fn=openai_stream_fn,
+        mock_stream_fn=mock_stream_fn,
+        ollama_base_url=ollama_base_url,
+    )
+    return engine_backends.invoke_backend_stream(
+        backend,
+        instructions=instructions,
+        message=message,
+        registry=registry,
+    )
+
+
+def ainvoke_backend_stream(
+    *,
+    backend: str,
+    instructions: str,
+    message: str,
+    ollama_chat_fn,
+    openai_chat_fn,
+    mock_chat_fn,
+    ollama_achat_fn,
+    openai_achat_fn,
+    mock_achat_fn,
+    ollama_astream_fn,
+    openai_astream_fn,
+    mock_astream_fn,
+    ollama_base_url: str = "",
+):
+    registry = _backend_registry(
+        ollama_chat_fn=ollama_chat_fn,
+        openai_chat_fn=openai_chat_fn,
+        mock_chat_fn=mock_chat_fn,
+        ollama_achat_fn=ollama_achat_fn,
+        openai_achat_fn=openai_achat_fn,
+        mock_achat_fn=mock_achat_fn,
+        ollama_astream_fn=ollama_astream_fn,
+        openai_astream_fn=openai_astream_fn,
+        mock_astream_fn=mock_astream_fn,
+        ollama_base_url=ollama_base_url,
+    )
+    return engine_backends.ainvoke_backend_stream(
+        backend,
+        instructions=instructions,
+        message=message,
+        registry=registry,
+    )
+
+
 def call_backend_with_retries(
     *,
     backend: str,
@@ -182,17 +578,204 @@ def call_backend_with_retries(
     )
 
 
+async def acall_backend_with_retries(
+    *,
+    backend: str,
+    instructions: str,
+    message: str,
+    ainvoke_backend_fn,
+    max_attempts: int,
+    base_backoff: float,
+    sleeper,
+) -> tuple[str, str, int]:
+    return await engine_backends.acall_backend_with_retries(
+        backend,
+        instructions=instructions,
+        message=message,
+        ainvoke_backend_fn=ainvoke_backend_fn,
+        max_attempts=max_attempts,
+        base_backoff=base_backoff,
+        sleeper=sleeper,
+    )
+
+
+def call_backend_stream_with_retries(
+    *,
+    backend: str,
+    instructions: str,
+    message: str,
+    invoke_stream_fn,
+    max_attempts: int,
+    base_backoff: float,
+    sleeper,
+):
+    return engine_backends.call_backend_stream_with_retries(
+        backend,
+        instructions=instructions,
+        message=message,
+        invoke_stream_fn=invoke_stream_fn,
+        max_attempts=max_attempts,
+        base_backoff=base_backoff,
+        sleeper=sleeper,
+    )
+
+
+async def acall_backend_stream_with_retries(
+    *,
+    backend: str,
+    instructions: str,
+    message: str,
+    ainvoke_stream_fn,
+    max_attempts: int,
+    base_backoff: float,
+    sleeper,
+):
+    return await engine_backends.acall_backend_stream_with_retries(
+        backend,
+        instructions=instructions,
+        message=message,
+        ainvoke_stream_fn=ainvoke_stream_fn,
+        max_attempts=max_attempts,
+        base_backoff=base_backoff,
+        sleeper=sleeper,
+    )
+
+
+def call_pool_with_failover(
+    *,
+    pool: engine_routing.BackendPool,
+    instructions: str,
+    message: str,
+    invoke_member_fn,
+    allow_member_fn,
+    record_member_fn,
+    max_attempts: int,
+    base_backoff: float,
+    sleeper,
+) -> tuple[str, str, int]:
+    # Every member gets one try even when the configured attempt budget is smaller.
+    return engine_routing.call_with_failover(
+        pool,
+        instructions=instructions,
+        message=message,
+        invoke_member_fn=invoke_member_fn,
+        allow_member_fn=allow_member_fn,
+        record_member_fn=record_member_fn,
+        max_attempts=max(max_attempts, len(pool.members)),
+        base_backoff=base_backoff,
+        sleeper=sleeper,
+    )
+
+
+async def acall_pool_with_failover(
+    *,
+    pool: engine_routing.BackendPool,
+    instructions: str,
+    message: str,
+    ainvoke_member_fn,
+    allow_member_fn,
+    record_member_fn,
+    max_attempts: int,
+    base_backoff: float,
+    sleeper,
+) -> tuple[str, str, int]:
+    return await engine_routing.acall_with_failover(
+        pool,
+        instructions=instructions,
+        message=message,
+        ainvoke_member_fn=ainvoke_member_fn,
+        allow_member_fn=allow_member_fn,
+        record_member_fn=record_member_fn,
+        max_attempts=max(max_attempts, len(pool.members)),
+        base_backoff=base_backoff,
+        sleeper=sleeper,
+    )
+
+
+def call_pool_stream_with_failover(
+    *,
+    pool: engine_routing.BackendPool,
+    instructions: str,
+    message: str,
+    invoke_member_stream_fn,
+    allow_member_fn,
+    record_member_fn,
+    max_attempts: int,
+    base_backoff: float,
+    sleeper,
+):
+    return engine_routing.call_stream_with_failover(
+        pool,
+        instructions=instructions,
+        message=message,
+        invoke_member_stream_fn=invoke_member_stream_fn,
+        allow_member_fn=allow_member_fn,
+        record_member_fn=record_member_fn,
+        max_attempts=max(max_attempts, len(pool.members)),
+        base_backoff=base_backoff,
+        sleeper=sleeper,
+    )
+
+
+async def acall_pool_stream_with_failover(
+    *,
+    pool: engine_routing.BackendPool,
+    instructions: str,
+    message: str,
+    ainvoke_member_stream_fn,
+    allow_member_fn,
+    record_member_fn,
+    max_attempts: int,
+    base_backoff: float,
+    sleeper,
+):
+    return await engine_routing.acall_stream_with_failover(
+        pool,
+        instructions=instructions,
+        message=message,
+        ainvoke_member_stream_fn=ainvoke_member_stream_fn,
+        allow_member_fn=allow_member_fn,
+        record_member_fn=record_member_fn,
+        max_attempts=max(max_attempts, len(pool.members)),
+        base_backoff=base_backoff,
+        sleeper=sleeper,
+    )
+
+
 __all__ = [
+    "acall_backend_stream_with_retries",
+    "acall_backend_with_retries",
+    "acall_pool_stream_with_failover",
+    "acall_pool_with_failover",
     "actor_key",
-    "backend_circuit_is_open",
+    "ainvoke_backend",
+    "ainvoke_backend_stream",
+    "amock_chat",
+    "amock_chat_stream",
+    "aollama_chat",
+    "aollama_chat_stream",
+    "aopenai_chat",
+    "aopenai_chat_stream",
+    "backend_pool",
+    "call_backend_stream_with_retries",
     "call_backend_with_retries",
+    "call_pool_stream_with_failover",
+    "call_pool_with_failover",
+    "check_backend_circuit",
+    "check_member_circuit",
+    "circuit_policy",
     "invoke_backend",
+    "invoke_backend_stream",
     "load_scope_from_token",
+    "member_circuit_name",
     "mock_chat",
+    "mock_chat_stream",
     "ollama_chat",
+    "ollama_chat_stream",
     "openai_chat",
-    "record_backend_failure",
-    "reset_backend_failure_state",
+    "openai_chat_stream",
+    "record_backend_outcome",
+    "record_member_outcome",
     "student_session_exists",
     "table_exists",
 ]
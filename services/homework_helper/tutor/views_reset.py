@@ -1,9 +1,11 @@
 """Internal helper conversation reset endpoint."""
 
 import hmac
+import itertools
 import json
 import logging
 import os
+from collections.abc import Callable, Iterable, Iterator
 from datetime import datetime, timezone
 from pathlib import Path
 from uuid import uuid4
@@ -11,9 +13,11 @@ from uuid import uuid4
 from django.conf import settings
 from django.core.cache import cache
 from django.views.decorators.csrf import csrf_exempt
-from django.views.decorators.http import require_POST
+from django.views.decorators.http import require_GET, require_POST
 
+from .engine import answer_cache as engine_answer_cache
 from .engine import memory as engine_memory
+from .engine import reset_jobs as engine_reset_jobs
 from .engine import runtime as engine_runtime
 
 logger = logging.getLogger(__name__)
@@ -63,7 +67,15 @@ def _payload_bool(value) -> bool:
     return text in {"1", "true", "yes", "on"}
 
 
-def _write_class_reset_archive(*, class_id: int, request_id: str, conversations: list[dict]) -> tuple[str, int]:
+def _write_class_reset_archive(
+    *, class_id: int, request_id: str, batches: Iterable[list[dict]]
+) -> tuple[str, int]:
+    """Stream snapshot batches into a JSON archive; no file is written when there is nothing to archive."""
+    batch_iter = iter(batches)
+    first = next(batch_iter, None)
+    if not first:
+        return "", 0
+
     archive_dir = (os.getenv("HELPER_CLASS_RESET_ARCHIVE_DIR", "/uploads/helper_reset_exports") or "").strip()
     if not archive_dir:
         raise RuntimeError("archive_directory_not_configured")
@@ -82,26 +94,35 @@ def _write_class_reset_archive(*, class_id: int, request_id: str, conversations:
     if archive_path.parent != archive_root:
         raise RuntimeError("archive_path_outside_root")
 
-    payload = {
-        "class_id": int(class_id),
-        "archived_at": datetime.now(timezone.utc).isoformat(),
-        "conversation_count": len(conversations),
-        "conversations": conversations,
-        "request_id": str(request_id or ""),
-    }
-    with archive_path.open("w", encoding="utf-8") as handle:
-        json.dump(payload, handle, ensure_ascii=True, indent=2)
+    count = 0
+    try:
+        with archive_path.open("w", encoding="utf-8") as handle:
+            handle.write("{\n")
+            handle.write(f'  "class_id": {int(class_id)},\n')
+            handle.write(f'  "archived_at": {json.dumps(datetime.now(timezone.utc).isoformat())},\n')
+            handle.write(f'  "request_id": {json.dumps(str(request_id or ""), ensure_ascii=True)},\n')
+            handle.write('  "conversations": [')
+            for batch in itertools.chain([first], batch_iter):
+                for conversation in batch:
+                    handle.write(",\n    " if count else "\n    ")
+                    handle.write(json.dumps(conversation, ensure_ascii=True))
+                    count += 1
+            handle.write("\n  ],\n")
+            handle.write(f'  "conversation_count": {count}\n')
+            handle.write("}\n")
+    except Exception:
+        # A half-written archive is not valid JSON; drop it rather than leave it for retention.
+        archive_path.unlink(missing_ok=True)
+        raise
     try:
         os.chmod(archive_path, 0o640)
     except Exception:
         pass
-    return str(archive_path), len(conversations)
+    return str(archive_path), count
 
 
-@csrf_exempt
-@require_POST
-def reset_class_conversations(request):
-    request_id = _request_id(request)
+def _authorize_internal(request, *, request_id: str):
+    """Return an error response unless the request carries the internal bearer token."""
     configured_token = _internal_api_token()
     if not configured_token:
         _log_chat_event("error", "internal_token_not_configured", request_id=request_id)
@@ -111,55 +132,73 @@ def reset_class_conversations(request):
     if not provided_token or not hmac.compare_digest(configured_token, provided_token):
         _log_chat_event("warning", "internal_unauthorized", request_id=request_id)
         return _json_response({"error": "unauthorized"}, status=401, request_id=request_id)
+    return None
 
-    try:
-        payload = json.loads(request.body.decode("utf-8"))
-    except Exception:
-        _log_chat_event("warning", "internal_bad_json", request_id=request_id)
-        return _json_response({"error": "bad_json"}, status=400, request_id=request_id)
-    if not isinstance(payload, dict):
-        return _json_response({"error": "bad_json"}, status=400, request_id=request_id)
 
-    try:
-        class_id = int(payload.get("class_id") or 0)
-    except Exception:
-        class_id = 0
-    if class_id <= 0:
-        return _json_response({"error": "invalid_class_id"}, status=400, request_id=request_id)
+def _report_batches(batches: Iterable[list[dict]], *, report, total: int) -> Iterator[list[dict]]:
+    processed = 0
+    for batch in batches:
+        yield batch
+        processed += len(batch)
+        report(phase="archive", processed=processed, total=total)
 
+
+def _run_class_reset(
+    *,
+    class_id: int,
+    request_id: str,
+    archive_before_reset: bool,
+    report: Callable[..., None] | None = None,
+) -> dict:
+    """Archive (optionally) and clear a class's conversations; shared by the inline and job modes."""
     max_keys = max(_env_int("HELPER_CLASS_RESET_MAX_KEYS", 4000), 1)
-    archive_enabled = _env_bool("HELPER_CLASS_RESET_ARCHIVE_ENABLED", True)
-    archive_requested = _payload_bool(payload.get("export_before_reset"))
-    archive_before_reset = archive_enabled and archive_requested
+    batch_size = max(_env_int("HELPER_CLASS_RESET_BATCH_SIZE", 200), 1)
     archive_path = ""
     archived_conversations = 0
+    total = 0
+    if report is not None:
+        total = engine_memory.count_class_conversations(cache_backend=cache, class_id=class_id, max_keys=max_keys)
     if archive_before_reset:
-        snapshot = engine_memory.snapshot_class_conversations(
+        batches = engine_memory.iter_class_conversation_batches(
             cache_backend=cache,
             class_id=class_id,
             max_keys=max_keys,
             max_messages=max(_env_int("HELPER_CLASS_RESET_ARCHIVE_MAX_MESSAGES", 120), 1),
+            batch_size=batch_size,
         )
-        if snapshot:
-            try:
-                archive_path, archived_conversations = _write_class_reset_archive(
-                    class_id=class_id,
-                    request_id=request_id,
-                    conversations=snapshot,
-                )
-            except Exception:
-                _log_chat_event(
-                    "warning",
-                    "class_conversations_archive_failed",
-                    request_id=request_id,
-                    class_id=class_id,
-                )
+        if report is not None:
+            report(phase="archive", processed=0, total=total)
+            batches = _report_batches(batches, report=report, total=total)
+        try:
+            archive_path, archived_conversations = _write_class_reset_archive(
+                class_id=class_id,
+                request_id=request_id,
+                batches=batches,
+            )
+        except Exception:
+            _log_chat_event(
+                "warning",
+                "class_conversations_archive_failed",
+                request_id=request_id,
+                class_id=class_id,
+            )
+
+    on_batch = None
+    if report is not None:
+        report(phase="clear", processed=0, total=total)
+
+        def on_batch(processed: int, batch_total: int) -> None:
+            report(phase="clear", processed=processed, total=batch_total)
 
     deleted = engine_memory.clear_class_conversations(
         cache_backend=cache,
         class_id=class_id,
         max_keys=max_keys,
+        batch_size=batch_size,
+        on_batch=on_batch,
     )
+    # Cached first-turn answers may quote conversations or lesson state the teacher just cleared.
+    engine_answer_cache.invalidate_class_answers(cache_backend=cache, class_id=class_id)
     _log_chat_event(
         "info",
         "class_conversations_reset",
@@ -169,15 +208,101 @@ def reset_class_conversations(request):
         archived_conversations=archived_conversations,
         archive_path=archive_path,
     )
-    response_payload = {
-        "ok": True,
-        "class_id": class_id,
+    result = {
         "deleted_conversations": deleted,
         "archived_conversations": archived_conversations,
     }
     if archive_path:
-        response_payload["archive_path"] = archive_path
-    return _json_response(response_payload, request_id=request_id)
+        result["archive_path"] = archive_path
+    return result
+
+
+def _job_payload(job: dict) -> dict:
+    fields = (
+        "job_id",
+        "class_id",
+        "status",
+        "phase",
+        "processed",
+        "total",
+        "deleted_conversations",
+        "archived_conversations",
+        "archive_path",
+        "error",
+    )
+    return {field: job[field] for field in fields if field in job}
+
+
+@csrf_exempt
+@require_POST
+def reset_class_conversations(request):
+    request_id = _request_id(request)
+    denied = _authorize_internal(request, request_id=request_id)
+    if denied is not None:
+        return denied
+
+    try:
+        payload = json.loads(request.body.decode("utf-8"))
+    except Exception:
+        _log_chat_event("warning", "internal_bad_json", request_id=request_id)
+        return _json_response({"error": "bad_json"}, status=400, request_id=request_id)
+    if not isinstance(payload, dict):
+        return _json_response({"error": "bad_json"}, status=400, request_id=request_id)
+
+    try:
+        class_id = int(payload.get("class_id") or 0)
+    except Exception:
+        class_id = 0
+    if class_id <= 0:
+        return _json_response({"error": "invalid_class_id"}, status=400, request_id=request_id)
+
+    archive_enabled = _env_bool("HELPER_CLASS_RESET_ARCHIVE_ENABLED", True)
+    archive_before_reset = archive_enabled and _payload_bool(payload.get("export_before_reset"))
+    if not _payload_bool(payload.get("background")):
+        result = _run_class_reset(
+            class_id=class_id,
+            request_id=request_id,
+            archive_before_reset=archive_before_reset,
+        )
+        return _json_response({"ok": True, "class_id": class_id, **result}, request_id=request_id)
+
+    job, created = engine_reset_jobs.start_job(
+        cache_backend=cache,
+        class_id=class_id,
+        request_id=request_id,
+        run_fn=lambda report: _run_class_reset(
+            class_id=class_id,
+            request_id=request_id,
+            archive_before_reset=archive_before_reset,
+            report=report,
+        ),
+        ttl_seconds=max(_env_int("HELPER_CLASS_RESET_JOB_TTL_SECONDS", 3600), 60),
+    )
+    _log_chat_event(
+        "info",
+        "class_conversations_reset_job_started" if created else "class_conversations_reset_job_attached",
+        request_id=request_id,
+        class_id=class_id,
+        job_id=job["job_id"],
+    )
+    return _json_response(
+        {"ok": True, "attached": not created, **_job_payload(job)},
+        status=202,
+        request_id=request_id,
+    )
+
+
+@require_GET
+def reset_class_conversations_job(request, job_id: str):
+    request_id = _request_id(request)
+    denied = _authorize_internal(request, request_id=request_id)
+    if denied is not None:
+        return denied
+
+    job = engine_reset_jobs.get_job(cache_backend=cache, job_id=job_id)
+    if job is None:
+        return _json_response({"error": "job_not_found"}, status=404, request_id=request_id)
+    return _json_response({"ok": True, **_job_payload(job)}, request_id=request_id)
 
 
-__all__ = ["reset_class_conversations"]
+__all__ = ["reset_class_conversations", "reset_class_conversations_job"]